@@ -156,6 +156,7 @@ run_cdk_project_test "CDK - DevOps Monitoring Dashboard on AWS"
 # echo "------------------------------------------------------------------------------"
 run_python_lambda_test quicksight-custom-resources "Quicksight - Custom Resources"
 run_python_lambda_test solution_helper "Solution Helper Lambda"
+run_python_lambda_test data_lake_tools "Data Lake Tools"
 run_javascript_lambda_test event_parser "Lambda transformation of Source Data"
 run_javascript_lambda_test query_runner "Build Athena Queries"
 run_javascript_lambda_test multi_account_custom_resources "Multiple Account Custom Resources"
@@ -0,0 +1,31 @@
+#!/usr/bin/env python
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+import argparse
+import json
+import logging
+import sys
+
+from util.datasets import DEFAULT_CONFIG_DIR
+from util.schema_contract import DEFAULT_SAMPLE_FILES, DEFAULT_SAMPLE_PARTITIONS, check_contracts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Check the InputColumns of the data set configs against the glue and parquet schemas"
+    )
+    parser.add_argument("root", nargs="?", help="root of the tables to sample, e.g. s3://metrics-bucket")
+    parser.add_argument("--config-dir", default=DEFAULT_CONFIG_DIR, help="directory of the data set configs")
+    parser.add_argument("--partitions", type=int, default=DEFAULT_SAMPLE_PARTITIONS, help="recent partitions sampled")
+    parser.add_argument("--files", type=int, default=DEFAULT_SAMPLE_FILES, help="files sampled of each partition")
+    args = parser.parse_args(argv)
+
+    result = check_contracts(args.root, args.config_dir, args.partitions, args.files)
+    print(json.dumps(result, indent=2))
+    return 1 if result["Problems"] else 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(main())
@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+import argparse
+import json
+import logging
+import sys
+from os import environ
+
+from util.compaction import (
+    DEFAULT_MIN_INPUT_FILES,
+    DEFAULT_ROW_GROUP_BYTES,
+    DEFAULT_TARGET_FILE_BYTES,
+    FAILED,
+    compact_partitions,
+)
+from util.partitions import (
+    TABLE_PREFIXES,
+    TABLE_SORT_KEYS,
+    get_dates,
+    get_filesystem,
+    get_table_path,
+    get_yesterday,
+    list_partition_dates,
+)
+
+logger = logging.getLogger(__name__)
+logger.setLevel(environ.get("LOG_LEVEL", "INFO"))
+
+
+def get_partitions(root_uri, table_prefixes, start_date, end_date):
+    """The (table prefix, date) partitions from start_date to end_date that exist under root_uri"""
+    filesystem, root_path = get_filesystem(root_uri)
+    dates = set(get_dates(start_date, end_date))
+    return [
+        (table_prefix, partition_date)
+        for table_prefix in table_prefixes
+        for partition_date in list_partition_dates(filesystem, get_table_path(root_path, table_prefix))
+        if partition_date in dates
+    ]
+
+
+def compact(
+    root_uri,
+    table_prefixes=None,
+    start_date=None,
+    end_date=None,
+    max_workers=1,
+    options=None,
+    sort_keys=None,
+    bloom_filter_columns=None,
+):
+    start_date = start_date or get_yesterday()
+    end_date = end_date or start_date
+    partitions = get_partitions(root_uri, table_prefixes or TABLE_PREFIXES, start_date, end_date)
+    logger.info(f"compacting {len(partitions)} partitions of {root_uri} from {start_date} to {end_date}")
+    return compact_partitions(root_uri, partitions, max_workers, options, sort_keys, bloom_filter_columns)
+
+
+def get_failures(results):
+    return [result for result in results if result["Status"] == FAILED]
+
+
+def handler(event, context):
+    """
+    Compact the partitions of the metrics bucket from the StartDate to the EndDate of the event, yesterday by default.
+    The bucket is the Root uri of the event or the METRICS_BUCKET environment variable. The SortKeys and
+    BloomFilterColumns of the event, by table prefix, override the default sort keys and add bloom filters.
+
+    While a partition is swapped, athena counts its rows twice, so schedule the function at a time the quicksight
+    data sets are not refreshed and nobody queries the views. Memory use is about a row group per worker plus the
+    read batches, COMPACTION_MAX_WORKERS times 2 * DEFAULT_ROW_GROUP_BYTES is a safe memory size for the function.
+    """
+    root_uri = event.get("Root") or f"s3://{environ['METRICS_BUCKET']}"
+    results = compact(
+        root_uri,
+        event.get("Tables"),
+        event.get("StartDate") or event.get("Date"),
+        event.get("EndDate"),
+        int(environ.get("COMPACTION_MAX_WORKERS", 1)),
+        sort_keys={**TABLE_SORT_KEYS, **event.get("SortKeys", {})},
+        bloom_filter_columns=event.get("BloomFilterColumns"),
+    )
+    failures = get_failures(results)
+    if failures:
+        raise RuntimeError(f"Error compacting {len(failures)} of {len(results)} partitions: {json.dumps(failures)}")
+    return {"Partitions": results}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Compact the small parquet files of the metrics table partitions. Athena counts the rows of a "
+        "partition twice while it is swapped, run it when no query reads the partitions."
+    )
+    parser.add_argument("root", help="root of the tables, e.g. s3://metrics-bucket or a local directory")
+    parser.add_argument("--tables", nargs="+", default=TABLE_PREFIXES, help="table prefixes to compact")
+    parser.add_argument("--start-date", help="first created_at date to compact, yesterday by default")
+    parser.add_argument("--end-date", help="last created_at date to compact, the start date by default")
+    parser.add_argument("--workers", type=int, default=1, help="partitions compacted at the same time")
+    parser.add_argument("--target-file-bytes", type=int, default=DEFAULT_TARGET_FILE_BYTES)
+    parser.add_argument("--row-group-bytes", type=int, default=DEFAULT_ROW_GROUP_BYTES)
+    parser.add_argument("--min-input-files", type=int, default=DEFAULT_MIN_INPUT_FILES)
+    parser.add_argument(
+        "--sort-keys",
+        nargs="*",
+        help="columns to sort every table by, the default sort keys of each table by default, none for arrival order",
+    )
+    parser.add_argument("--bloom-filter-columns", nargs="*", default=[], help="columns to write bloom filters for")
+    args = parser.parse_args(argv)
+
+    options = {
+        "target_file_bytes": args.target_file_bytes,
+        "row_group_bytes": args.row_group_bytes,
+        "min_input_files": args.min_input_files,
+    }
+    sort_keys = None if args.sort_keys is None else {table: args.sort_keys for table in args.tables}
+    bloom_filter_columns = {table: args.bloom_filter_columns for table in args.tables}
+    results = compact(
+        args.root,
+        args.tables,
+        args.start_date,
+        args.end_date,
+        args.workers,
+        options,
+        sort_keys,
+        bloom_filter_columns,
+    )
+    print(json.dumps(results, indent=2))
+    return 1 if get_failures(results) else 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(main())
@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+import argparse
+import json
+import logging
+import sys
+
+from util.event_generator import (
+    DEFAULT_CHUNK_ROWS,
+    DEFAULT_DAILY_EVENTS,
+    DEFAULT_REGIONS,
+    EVENT_TYPES,
+    GeneratorConfig,
+    generate_events,
+    generate_tags,
+)
+from util.partitions import get_yesterday
+
+
+def parse_daily_events(value):
+    """The event type and events per day of a --daily-events value like codecommit=1000000"""
+    event_type, separator, rows = value.partition("=")
+    if event_type not in EVENT_TYPES or not separator or not rows.isdigit():
+        raise argparse.ArgumentTypeError(f"{value} is not an event type and a number of events, e.g. github=1000")
+    return event_type, int(rows)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Generate synthetic devops events as the parquet firehose writes to the metrics bucket"
+    )
+    parser.add_argument("root", help="root of the tables, e.g. s3://metrics-bucket or a local directory")
+    parser.add_argument("--start-date", help="first created_at date to generate, the end date by default")
+    parser.add_argument("--end-date", help="last created_at date to generate, yesterday by default")
+    parser.add_argument("--event-types", nargs="+", choices=EVENT_TYPES, default=EVENT_TYPES)
+    parser.add_argument(
+        "--daily-events",
+        nargs="*",
+        default=[],
+        type=parse_daily_events,
+        help=f"events per day of event types, e.g. codecommit=1000000, by default {DEFAULT_DAILY_EVENTS}",
+    )
+    parser.add_argument("--accounts", type=int, default=3)
+    parser.add_argument("--regions", nargs="+", default=DEFAULT_REGIONS)
+    parser.add_argument("--repositories", type=int, default=20, help="repositories, pipelines and build projects")
+    parser.add_argument("--authors", type=int, default=50)
+    parser.add_argument("--failure-ratio", type=float, default=0.1)
+    parser.add_argument("--tag-ratio", type=float, default=0.5, help="share of resources with a tag report")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS, help="rows of each generated file")
+    parser.add_argument("--workers", type=int, default=1, help="files generated at the same time")
+    args = parser.parse_args(argv)
+
+    end_date = args.end_date or get_yesterday()
+    config = GeneratorConfig(
+        daily_events=dict(args.daily_events),
+        accounts=args.accounts,
+        regions=args.regions,
+        repositories=args.repositories,
+        authors=args.authors,
+        failure_ratio=args.failure_ratio,
+        tag_ratio=args.tag_ratio,
+        seed=args.seed,
+        chunk_rows=args.chunk_rows,
+    )
+    rows = generate_events(args.root, config, args.start_date or end_date, end_date, args.event_types, args.workers)
+    tagged = generate_tags(args.root, config, end_date)
+    print(json.dumps({"Rows": rows, "TaggedResources": tagged}, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(main())
@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+import argparse
+import json
+import logging
+import sys
+from datetime import timedelta
+from os import environ
+
+from util.partition_registrar import PartitionRegistrar
+from util.partitions import get_today, parse_date
+
+logger = logging.getLogger(__name__)
+logger.setLevel(environ.get("LOG_LEVEL", "INFO"))
+
+# days before today a scheduled run registers missing partitions for, so a few failed runs leave no gap
+DEFAULT_LOOKBACK_DAYS = 7
+# days after today registered ahead of the data, so data arriving before the next scheduled run is queryable
+DEFAULT_DAYS_AHEAD = 1
+# environment variables with the table names, as for the query runner
+TABLE_NAME_VARIABLES = ["MetricsTableName", "CodeBuildMetricsTableName", "GitHubMetricsTableName"]
+
+
+def get_table_names():
+    return [environ[variable] for variable in TABLE_NAME_VARIABLES if environ.get(variable)]
+
+
+def register_partitions(database_name, table_names, start_date=None, end_date=None, days_ahead=DEFAULT_DAYS_AHEAD):
+    """
+    Register the missing partitions of the tables. Without dates, the partitions of the last days and the days
+    ahead are registered. With dates, it is a backfill of the partitions from start_date to end_date that have data.
+    """
+    today = get_today()
+    if start_date or end_date:
+        start_date = parse_date(start_date or end_date)
+        end_date = parse_date(end_date or start_date)
+        dates_without_data = []
+    else:
+        start_date = today - timedelta(days=DEFAULT_LOOKBACK_DAYS)
+        end_date = today
+        dates_without_data = [today + timedelta(days=days) for days in range(days_ahead + 1)]
+    return [
+        PartitionRegistrar(database_name, table_name).register(start_date, end_date, dates_without_data)
+        for table_name in table_names
+    ]
+
+
+def handler(event, context):
+    """
+    Register the missing partitions of the metrics tables, a backfill when the event has StartDate and EndDate.
+    The database and tables are the MetricsDBName and table name environment variables of the query runner.
+    """
+    results = register_partitions(
+        environ["MetricsDBName"],
+        event.get("Tables") or get_table_names(),
+        event.get("StartDate"),
+        event.get("EndDate"),
+    )
+    failed = [result for result in results if result["Failed"]]
+    if failed:
+        raise RuntimeError(f"Error registering partitions: {json.dumps(failed)}")
+    return {"Tables": results}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Register the missing created_at partitions of the metrics tables")
+    parser.add_argument("database", help="glue database of the tables")
+    parser.add_argument("tables", nargs="+", help="glue tables to register partitions of")
+    parser.add_argument("--start-date", help="first created_at date to backfill")
+    parser.add_argument("--end-date", help="last created_at date to backfill, the start date by default")
+    parser.add_argument("--days-ahead", type=int, default=DEFAULT_DAYS_AHEAD, help="days registered ahead of data")
+    args = parser.parse_args(argv)
+
+    results = register_partitions(args.database, args.tables, args.start_date, args.end_date, args.days_ahead)
+    print(json.dumps(results, indent=2, default=str))
+    return 1 if any(result["Failed"] for result in results) else 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(main())
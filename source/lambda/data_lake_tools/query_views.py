@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+
+import pyarrow.parquet as pq
+
+from util.datasets import DEFAULT_CONFIG_DIR
+from util.local_views import DEFAULT_DATA_DURATION, ENGINES, VIEWS, LocalViews
+
+
+def query_views(local_views, view_names, output_dir=None):
+    """Run the views, return the rows and seconds of each, and write their rows to output_dir as parquet"""
+    results = []
+    for view_name in view_names:
+        start = time.perf_counter()
+        table = local_views.query(view_name)
+        seconds = time.perf_counter() - start
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+            pq.write_table(table, os.path.join(output_dir, f"{view_name}.parquet"))
+        results.append({"View": view_name, "Rows": table.num_rows, "Seconds": round(seconds, 3)})
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the athena views of the dashboard data sets on local data")
+    parser.add_argument("root", help="root of the tables, e.g. a local directory or s3://metrics-bucket")
+    parser.add_argument("--views", nargs="+", choices=list(VIEWS), default=list(VIEWS))
+    parser.add_argument("--data-duration", type=int, default=DEFAULT_DATA_DURATION, help="days of data queried")
+    parser.add_argument("--current-date", help="date the data duration ends on, today by default")
+    parser.add_argument("--included-repositories", nargs="*", help="repositories of the code change activity view")
+    parser.add_argument("--engine", choices=ENGINES, help="duckdb where it is installed by default")
+    parser.add_argument("--config-dir", default=DEFAULT_CONFIG_DIR, help="directory of the data set configs")
+    parser.add_argument("--output-dir", help="directory to write the rows of each view to")
+    args = parser.parse_args(argv)
+
+    local_views = LocalViews(
+        args.root,
+        args.data_duration,
+        args.current_date,
+        args.included_repositories,
+        args.engine,
+        args.config_dir,
+    )
+    print(json.dumps(query_views(local_views, args.views, args.output_dir), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(main())
@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+import argparse
+import json
+import logging
+import sys
+from os import environ
+
+from partition_registrar_function import get_table_names
+from util.retention import DEFAULT_MAX_WORKERS, RetentionPruner
+
+logger = logging.getLogger(__name__)
+logger.setLevel(environ.get("LOG_LEVEL", "INFO"))
+
+# days kept in addition to the data duration of the dashboards, so a longer duration can be set without data loss
+DEFAULT_RETENTION_MARGIN_DAYS = 30
+
+
+def get_retention_days():
+    """The days of data kept, the DataDuration the dashboard views query plus RETENTION_MARGIN_DAYS"""
+    if environ.get("RETENTION_DAYS"):
+        return int(environ["RETENTION_DAYS"])
+    return int(environ["DataDuration"]) + int(environ.get("RETENTION_MARGIN_DAYS", DEFAULT_RETENTION_MARGIN_DAYS))
+
+
+def prune_partitions(database_name, table_names, retention_days, dry_run=False, max_workers=DEFAULT_MAX_WORKERS):
+    return [
+        RetentionPruner(database_name, table_name, retention_days, dry_run, max_workers).prune()
+        for table_name in table_names
+    ]
+
+
+def handler(event, context):
+    """
+    Remove the partitions of the metrics tables older than the retention, the RetentionDays of the event or
+    get_retention_days(). With DryRun true in the event, true or "true" as delivered by cloudformation and
+    eventbridge, nothing is deleted.
+    """
+    results = prune_partitions(
+        environ["MetricsDBName"],
+        event.get("Tables") or get_table_names(),
+        int(event.get("RetentionDays") or get_retention_days()),
+        str(event.get("DryRun", "false")).strip().lower() == "true",
+        int(environ.get("RETENTION_MAX_WORKERS", DEFAULT_MAX_WORKERS)),
+    )
+    failed = [result for result in results if result["Failed"]]
+    if failed:
+        raise RuntimeError(f"Error pruning partitions: {json.dumps(failed)}")
+    return {"Tables": results}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Remove the created_at partitions older than the retention")
+    parser.add_argument("database", help="glue database of the tables")
+    parser.add_argument("tables", nargs="+", help="glue tables to prune")
+    parser.add_argument("--retention-days", type=int, required=True, help="days before today whose data is kept")
+    parser.add_argument("--dry-run", action="store_true", help="report what would be deleted without deleting it")
+    parser.add_argument("--workers", type=int, default=DEFAULT_MAX_WORKERS, help="prefixes deleted at the same time")
+    args = parser.parse_args(argv)
+
+    results = prune_partitions(args.database, args.tables, args.retention_days, args.dry_run, args.workers)
+    print(json.dumps(results, indent=2))
+    return 1 if any(result["Failed"] for result in results) else 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(main())
@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+import copy
+import threading
+from collections import Counter
+
+import boto3
+import pytest
+
+FAKE_REGION = "us-east-1"
+# partitions returned by one get_partitions call
+FAKE_PAGE_SIZE = 50
+# partitions accepted by one batch_create_partition call
+BATCH_CREATE_PARTITION_LIMIT = 100
+# partitions accepted by one batch_delete_partition call
+BATCH_DELETE_PARTITION_LIMIT = 25
+
+
+class FakeGlueClient:
+    """
+    Stateful in-memory stand-in for the boto3 Glue client, for the catalog operations on tables and partitions.
+
+    Tables are added with add_table. get_partitions pages its results. batch_create_partition and
+    batch_delete_partition report partitions that already exist or do not exist in Errors like glue does, and
+    reject more than 100 and 25 partitions per call. Exceptions are the botocore modeled exceptions of a real
+    client.
+    """
+
+    def __init__(self, region=FAKE_REGION):
+        self._real_client = boto3.client("glue", region_name=region)
+        self.exceptions = self._real_client.exceptions
+        self.meta = self._real_client.meta
+        self.region = region
+        self.lock = threading.Lock()
+        self.tables = dict()
+        self.partitions = dict()
+        self.call_counts = Counter()
+
+    def _error(self, exception_name, operation, message):
+        error_response = {"Error": {"Code": exception_name, "Message": message}}
+        return getattr(self.exceptions, exception_name)(error_response, operation)
+
+    def _get_partitions(self, operation, database_name, table_name):
+        if (database_name, table_name) not in self.tables:
+            raise self._error("EntityNotFoundException", operation, f"Table {table_name} not found.")
+        return self.partitions[(database_name, table_name)]
+
+    def add_table(self, database_name, table_name, location, partition_values=()):
+        storage_descriptor = {
+            "Columns": [{"Name": "id", "Type": "bigint"}],
+            "Location": location,
+            "InputFormat": "org.apache.hadoop.hive.ql.io.parquet.MapredParquetInputFormat",
+            "OutputFormat": "org.apache.hadoop.hive.ql.io.parquet.MapredParquetOutputFormat",
+            "SerdeInfo": {"SerializationLibrary": "org.apache.hadoop.hive.ql.io.parquet.serde.ParquetHiveSerDe"},
+            "StoredAsSubDirectories": True,
+        }
+        self.tables[(database_name, table_name)] = {
+            "Name": table_name,
+            "DatabaseName": database_name,
+            "StorageDescriptor": storage_descriptor,
+            "PartitionKeys": [{"Name": "created_at", "Type": "timestamp"}],
+        }
+        self.partitions[(database_name, table_name)] = {
+            value: {"Values": [value], "StorageDescriptor": {**storage_descriptor, "Location": f"{location}{value}/"}}
+            for value in partition_values
+        }
+
+    def get_table(self, DatabaseName, Name):
+        self.call_counts["get_table"] += 1
+        if (DatabaseName, Name) not in self.tables:
+            raise self._error("EntityNotFoundException", "GetTable", f"Table {Name} not found.")
+        return {"Table": copy.deepcopy(self.tables[(DatabaseName, Name)])}
+
+    def get_partitions(self, DatabaseName, TableName, NextToken=None, ExcludeColumnSchema=False, **_):
+        self.call_counts["get_partitions"] += 1
+        with self.lock:
+            partitions = self._get_partitions("GetPartitions", DatabaseName, TableName)
+            values = sorted(partitions)
+        offset = int(NextToken or 0)
+        page = [copy.deepcopy(partitions[value]) for value in values[offset : offset + FAKE_PAGE_SIZE]]
+        if ExcludeColumnSchema:
+            for partition in page:
+                partition["StorageDescriptor"].pop("Columns", None)
+        response = {"Partitions": page}
+        if offset + FAKE_PAGE_SIZE < len(values):
+            response["NextToken"] = str(offset + FAKE_PAGE_SIZE)
+        return response
+
+    def batch_create_partition(self, DatabaseName, TableName, PartitionInputList):
+        self.call_counts["batch_create_partition"] += 1
+        if len(PartitionInputList) > BATCH_CREATE_PARTITION_LIMIT:
+            raise self._error(
+                "InvalidInputException", "BatchCreatePartition", "Too many partitions, at most 100 are allowed."
+            )
+        errors = []
+        with self.lock:
+            partitions = self._get_partitions("BatchCreatePartition", DatabaseName, TableName)
+            for partition_input in PartitionInputList:
+                value = partition_input["Values"][0]
+                if value in partitions:
+                    error_detail = {"ErrorCode": "AlreadyExistsException", "ErrorMessage": "Partition already exists."}
+                    errors.append({"PartitionValues": [value], "ErrorDetail": error_detail})
+                else:
+                    partitions[value] = copy.deepcopy(partition_input)
+        return {"Errors": errors} if errors else {}
+
+    def batch_delete_partition(self, DatabaseName, TableName, PartitionsToDelete):
+        self.call_counts["batch_delete_partition"] += 1
+        if len(PartitionsToDelete) > BATCH_DELETE_PARTITION_LIMIT:
+            raise self._error(
+                "InvalidInputException", "BatchDeletePartition", "Too many partitions, at most 25 are allowed."
+            )
+        errors = []
+        with self.lock:
+            partitions = self._get_partitions("BatchDeletePartition", DatabaseName, TableName)
+            for partition in PartitionsToDelete:
+                value = partition["Values"][0]
+                if partitions.pop(value, None) is None:
+                    error_detail = {"ErrorCode": "EntityNotFoundException", "ErrorMessage": "Partition not found."}
+                    errors.append({"PartitionValues": [value], "ErrorDetail": error_detail})
+        return {"Errors": errors} if errors else {}
+
+    def get_partition_values(self, database_name, table_name):
+        with self.lock:
+            return sorted(self.partitions[(database_name, table_name)])
+
+
+def install_fake_glue_client(fake_client, monkeypatch):
+    """Make util.helpers.get_glue_client() return fake_client for the region of the fake client"""
+    import util.helpers
+
+    monkeypatch.setitem(util.helpers._helpers_service_clients, ("glue", fake_client.region), fake_client)
+    return fake_client
+
+
+@pytest.fixture
+def glue_fake(monkeypatch):
+    return install_fake_glue_client(FakeGlueClient(), monkeypatch)
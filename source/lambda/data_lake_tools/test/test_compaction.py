@@ -0,0 +1,244 @@
+#!/usr/bin/env python
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+from pyarrow import fs
+
+from util.compaction import (
+    COMMITTED,
+    COMPACTED,
+    COMPACTED_FILE_PREFIX,
+    FAILED,
+    MANIFEST_FILE,
+    SKIPPED,
+    STAGING_FILE_PREFIX,
+    CompactionManifest,
+    PartitionCompactor,
+    compact_partitions,
+)
+from util.partitions import get_partition_path
+
+
+def write_small_files(partition_path, files, rows_per_file, first_id=0):
+    partition_path.mkdir(parents=True, exist_ok=True)
+    for index in range(files):
+        start = first_id + index * rows_per_file
+        table = pa.table(
+            {
+                "id": pa.array(range(start, start + rows_per_file), pa.int64()),
+                "account": pa.array([f"11111111111{i % 3}" for i in range(rows_per_file)]),
+            }
+        )
+        pq.write_table(table, str(partition_path / f"firehose-{first_id}-{index:03d}.parquet"))
+
+
+def read_ids(partition_path):
+    return sorted(pq.read_table(str(partition_path)).column("id").to_pylist())
+
+
+def list_names(partition_path):
+    return sorted(path.name for path in partition_path.iterdir())
+
+
+@pytest.fixture
+def partition_path(tmp_path):
+    return tmp_path / "DevopsEvents" / "created_at=2024-01-01"
+
+
+def test_compact_partition(partition_path):
+    write_small_files(partition_path, files=20, rows_per_file=50)
+
+    result = PartitionCompactor(fs.LocalFileSystem(), str(partition_path)).compact()
+
+    assert result == {"Status": COMPACTED, "InputFiles": 20, "OutputFiles": 1, "Rows": 1000}
+    names = list_names(partition_path)
+    assert names[0] == MANIFEST_FILE and len(names) == 2 and names[1].startswith(COMPACTED_FILE_PREFIX)
+    assert read_ids(partition_path) == list(range(1000))
+    manifest = CompactionManifest.read(fs.LocalFileSystem(), str(partition_path / MANIFEST_FILE))
+    assert manifest.state == COMMITTED and len(manifest.inputs) == 20
+
+
+def test_compact_rolls_files_and_row_groups(partition_path):
+    write_small_files(partition_path, files=10, rows_per_file=1000)
+
+    compactor = PartitionCompactor(
+        fs.LocalFileSystem(), str(partition_path), target_file_bytes=1, row_group_bytes=16000, read_batch_rows=500
+    )
+    result = compactor.compact()
+
+    # every row group of 2 batches of 500 rows fills a file
+    assert result["OutputFiles"] == 10
+    for name in list_names(partition_path):
+        if name.startswith(COMPACTED_FILE_PREFIX):
+            metadata = pq.read_metadata(str(partition_path / name))
+            assert (metadata.num_row_groups, metadata.num_rows) == (1, 1000)
+    assert read_ids(partition_path) == list(range(10000))
+
+
+def test_compact_skips_compacted_partition(partition_path):
+    write_small_files(partition_path, files=3, rows_per_file=10)
+    compactor = PartitionCompactor(fs.LocalFileSystem(), str(partition_path))
+    compactor.compact()
+
+    assert compactor.compact()["Status"] == SKIPPED
+    # files delivered after the compaction are compacted with the next run, next to the first compacted file
+    write_small_files(partition_path, files=2, rows_per_file=10, first_id=30)
+    assert compactor.compact()["InputFiles"] == 2
+    assert read_ids(partition_path) == list(range(50))
+
+
+def test_compact_unifies_schemas(partition_path):
+    write_small_files(partition_path, files=1, rows_per_file=10)
+    pq.write_table(pa.table({"id": pa.array([10], pa.int64())}), str(partition_path / "firehose-late.parquet"))
+
+    PartitionCompactor(fs.LocalFileSystem(), str(partition_path)).compact()
+
+    table = pq.read_table(str(partition_path))
+    assert table.num_rows == 11
+    assert table.column("account").null_count == 1
+
+
+def test_staged_files_without_manifest_discarded(partition_path):
+    write_small_files(partition_path, files=2, rows_per_file=10)
+    compactor = PartitionCompactor(fs.LocalFileSystem(), str(partition_path))
+    # interrupted before the manifest was written
+    compactor.write_staged(compactor.list_inputs(), compactor.get_schema(compactor.list_inputs()), "interrupted")
+
+    compactor.compact()
+
+    assert not [name for name in list_names(partition_path) if name.startswith(STAGING_FILE_PREFIX)]
+    assert read_ids(partition_path) == list(range(20))
+
+
+def test_pending_manifest_rolled_forward(partition_path):
+    write_small_files(partition_path, files=4, rows_per_file=10)
+    filesystem = fs.LocalFileSystem()
+    compactor = PartitionCompactor(filesystem, str(partition_path))
+    inputs = compactor.list_inputs()
+    outputs, _ = compactor.write_staged(inputs, compactor.get_schema(inputs), "interrupted")
+    # interrupted after the commit point, with the swap half done
+    CompactionManifest("interrupted", inputs, outputs).write(filesystem, compactor.manifest_path)
+    filesystem.move(*outputs[0])
+    filesystem.delete_file(inputs[0])
+
+    assert compactor.compact()["Status"] == SKIPPED
+
+    assert CompactionManifest.read(filesystem, compactor.manifest_path).state == COMMITTED
+    assert read_ids(partition_path) == list(range(40))
+
+
+def test_compact_partitions(tmp_path):
+    for table_prefix in ["DevopsEvents", "GitHubEvents"]:
+        write_small_files(tmp_path / table_prefix / "created_at=2024-01-01", files=3, rows_per_file=10)
+    (tmp_path / "CodeBuildEvents" / "created_at=2024-01-01").mkdir(parents=True)
+    (tmp_path / "CodeBuildEvents" / "created_at=2024-01-01" / "corrupt.parquet").write_bytes(b"corrupt")
+    (tmp_path / "CodeBuildEvents" / "created_at=2024-01-01" / "other.parquet").write_bytes(b"corrupt")
+    partitions = [(prefix, "2024-01-01") for prefix in ["DevopsEvents", "GitHubEvents", "CodeBuildEvents"]]
+
+    results = compact_partitions(str(tmp_path), partitions, max_workers=2)
+
+    assert [result["Status"] for result in results] == [COMPACTED, COMPACTED, FAILED]
+    assert results[2]["Table"] == "CodeBuildEvents" and results[2]["Error"]
+    for table_prefix in ["DevopsEvents", "GitHubEvents"]:
+        assert read_ids(tmp_path / table_prefix / "created_at=2024-01-01") == list(range(30))
+    # the small files of a failed compaction are left in place
+    assert list_names(tmp_path / "CodeBuildEvents" / "created_at=2024-01-01") == ["corrupt.parquet", "other.parquet"]
+
+
+def test_partition_path():
+    assert get_partition_path("bucket/", "GitHubEvents", "2024-01-31") == "bucket/GitHubEvents/created_at=2024-01-31"
+
+
+def write_events(partition_path, files, rows_per_file):
+    partition_path.mkdir(parents=True, exist_ok=True)
+    for index in range(files):
+        ids = range(index * rows_per_file, (index + 1) * rows_per_file)
+        table = pa.table(
+            {
+                "id": pa.array(ids, pa.int64()),
+                "account": pa.array([f"11111111111{i % 7}" for i in ids]),
+                "region": pa.array(["us-east-1" if i % 2 else "us-west-2" for i in ids]),
+                "detail": pa.array([{"repositoryName": f"repo-{i % 13}"} for i in ids]),
+            }
+        )
+        pq.write_table(table, str(partition_path / f"firehose-{index:03d}.parquet"))
+
+
+def read_compacted_metadata(partition_path):
+    return [
+        pq.read_metadata(str(path))
+        for path in sorted(partition_path.iterdir())
+        if path.name.startswith(COMPACTED_FILE_PREFIX)
+    ]
+
+
+def get_statistics(metadata, column):
+    for row_group in range(metadata.num_row_groups):
+        statistics = metadata.row_group(row_group).column(column).statistics
+        yield statistics.min, statistics.max
+
+
+def test_compact_sorted(partition_path):
+    write_events(partition_path, files=10, rows_per_file=70)
+    sort_keys = ["account", "region", "detail.repositoryName", "missing"]
+
+    compactor = PartitionCompactor(
+        fs.LocalFileSystem(),
+        str(partition_path),
+        row_group_bytes=5000,
+        sort_keys=sort_keys,
+        bloom_filter_columns=["detail.repositoryName", "missing"],
+    )
+    compactor.compact()
+
+    (metadata,) = read_compacted_metadata(partition_path)
+    assert metadata.num_row_groups > 1
+    # sorted as a whole, the account ranges of the row groups do not overlap
+    account_ranges = list(get_statistics(metadata, 1))
+    for (_, previous_max), (next_min, _) in zip(account_ranges, account_ranges[1:]):
+        assert previous_max <= next_min
+    row_group = metadata.row_group(0)
+    assert [column.column_index for column in row_group.sorting_columns] == [1, 2, 3]
+    assert row_group.column(3).path_in_schema == "detail.repositoryName"
+    assert row_group.column(3).bloom_filter_offset is not None
+    assert row_group.column(1).bloom_filter_offset is None
+
+    table = pq.read_table(str(partition_path))
+    rows = [(row["account"], row["region"], row["detail"]["repositoryName"]) for row in table.to_pylist()]
+    assert rows == sorted(rows) and len(rows) == 700
+
+
+def test_compact_sorted_in_runs(partition_path):
+    write_events(partition_path, files=10, rows_per_file=70)
+
+    compactor = PartitionCompactor(
+        fs.LocalFileSystem(), str(partition_path), row_group_bytes=2000, read_batch_rows=40, sort_keys=["account"]
+    )
+    compactor.compact()
+
+    (metadata,) = read_compacted_metadata(partition_path)
+    assert metadata.num_row_groups > 1
+    # the runs are merged, the whole file is sorted, not only each row group
+    table = pq.read_table(str(partition_path))
+    accounts = table.column("account").to_pylist()
+    assert accounts == sorted(accounts)
+    assert sorted(table.column("id").to_pylist()) == list(range(700))
+    assert not [name for name in list_names(partition_path) if name.startswith(STAGING_FILE_PREFIX)]
+
+
+def test_compact_partitions_table_sort_keys(tmp_path):
+    write_events(tmp_path / "DevopsEvents" / "created_at=2024-01-01", files=2, rows_per_file=10)
+    write_events(tmp_path / "GitHubEvents" / "created_at=2024-01-01", files=2, rows_per_file=10)
+    partitions = [("DevopsEvents", "2024-01-01"), ("GitHubEvents", "2024-01-01")]
+
+    compact_partitions(str(tmp_path), partitions, bloom_filter_columns={"GitHubEvents": ["account"]})
+
+    (devops_metadata,) = read_compacted_metadata(tmp_path / "DevopsEvents" / "created_at=2024-01-01")
+    assert [column.column_index for column in devops_metadata.row_group(0).sorting_columns] == [1, 2, 3]
+    (github_metadata,) = read_compacted_metadata(tmp_path / "GitHubEvents" / "created_at=2024-01-01")
+    # the github table has none of the default sort keys
+    assert github_metadata.row_group(0).sorting_columns == ()
+    assert github_metadata.row_group(0).column(1).bloom_filter_offset is not None
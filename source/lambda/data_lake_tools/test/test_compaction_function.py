@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+import json
+
+import pyarrow.parquet as pq
+import pytest
+
+import compaction_function
+from test.test_compaction import read_ids, write_small_files
+from util.compaction import COMPACTED
+
+
+@pytest.fixture
+def tables(tmp_path):
+    for day in ["2024-01-01", "2024-01-02", "2024-01-03"]:
+        write_small_files(tmp_path / "DevopsEvents" / f"created_at={day}", files=2, rows_per_file=5)
+    write_small_files(tmp_path / "GitHubEvents" / "created_at=2024-01-02", files=2, rows_per_file=5)
+    return tmp_path
+
+
+def test_get_partitions(tables):
+    partitions = compaction_function.get_partitions(
+        str(tables), ["DevopsEvents", "GitHubEvents", "CodeBuildEvents"], "2024-01-02", "2024-01-05"
+    )
+
+    assert [(prefix, str(day)) for prefix, day in partitions] == [
+        ("DevopsEvents", "2024-01-02"),
+        ("DevopsEvents", "2024-01-03"),
+        ("GitHubEvents", "2024-01-02"),
+    ]
+
+
+def test_handler(tables):
+    response = compaction_function.handler({"Root": str(tables), "Date": "2024-01-02"}, None)
+
+    assert [(result["Table"], result["Status"]) for result in response["Partitions"]] == [
+        ("DevopsEvents", COMPACTED),
+        ("GitHubEvents", COMPACTED),
+    ]
+    assert read_ids(tables / "DevopsEvents" / "created_at=2024-01-02") == list(range(10))
+    assert len(list((tables / "DevopsEvents" / "created_at=2024-01-01").iterdir())) == 2
+
+
+def test_handler_failure(tables):
+    (tables / "DevopsEvents" / "created_at=2024-01-01" / "corrupt.parquet").write_bytes(b"corrupt")
+
+    with pytest.raises(RuntimeError, match="1 of 1 partitions"):
+        compaction_function.handler({"Root": str(tables), "StartDate": "2024-01-01"}, None)
+
+
+def test_main(tables, capsys):
+    exit_code = compaction_function.main(
+        [str(tables), "--tables", "DevopsEvents", "--start-date", "2024-01-01", "--end-date", "2024-01-03"]
+    )
+
+    assert exit_code == 0
+    results = json.loads(capsys.readouterr().out)
+    assert [result["Status"] for result in results] == [COMPACTED] * 3
+
+
+def test_main_sort_keys(tables):
+    exit_code = compaction_function.main(
+        [str(tables), "--start-date", "2024-01-02", "--sort-keys", "id", "--bloom-filter-columns", "account"]
+    )
+
+    assert exit_code == 0
+    for table_prefix in ["DevopsEvents", "GitHubEvents"]:
+        (path,) = [path for path in (tables / table_prefix / "created_at=2024-01-02").glob("compacted-*")]
+        row_group = pq.read_metadata(str(path)).row_group(0)
+        assert [column.column_index for column in row_group.sorting_columns] == [0]
+        assert row_group.column(1).bloom_filter_offset is not None
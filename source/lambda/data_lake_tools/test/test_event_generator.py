@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+import json
+
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+import pytest
+
+from generate_events import main
+from util.event_generator import (
+    CANARY_ALARM,
+    CODEBUILD_METRIC,
+    CODECOMMIT,
+    CODEDEPLOY,
+    CODEPIPELINE,
+    EVENT_TYPES,
+    GITHUB,
+    GeneratorConfig,
+    generate_events,
+    generate_tags,
+)
+from util.partitions import CODE_BUILD_EVENTS_PREFIX, DEVOPS_EVENTS_PREFIX, GITHUB_EVENTS_PREFIX
+from util.schemas import TABLE_SCHEMAS, TAGGED_CODECOMMIT_PREFIX
+
+
+def read_partition(root, table_prefix, partition_date="2024-01-01"):
+    return pq.read_table(str(root / table_prefix / f"created_at={partition_date}"))
+
+
+def read_files(root):
+    return {str(path.relative_to(root)): path.read_bytes() for path in sorted(root.rglob("*.parquet"))}
+
+
+def make_config(seed=0):
+    daily_events = {event_type: 300 for event_type in EVENT_TYPES}
+    return GeneratorConfig(daily_events=daily_events, accounts=2, repositories=5, seed=seed, chunk_rows=128)
+
+
+@pytest.fixture
+def config():
+    return make_config()
+
+
+def test_generate_events(tmp_path, config):
+    rows = generate_events(str(tmp_path), config, "2024-01-01", "2024-01-02")
+
+    assert rows == {event_type: 600 for event_type in EVENT_TYPES}
+    for table_prefix, schema in TABLE_SCHEMAS.items():
+        for partition_date in ["2024-01-01", "2024-01-02"]:
+            assert read_partition(tmp_path, table_prefix, partition_date).schema.remove_metadata() == schema
+    # 300 rows of a day in files of at most 128 rows
+    assert len(list((tmp_path / GITHUB_EVENTS_PREFIX / "created_at=2024-01-01").iterdir())) == 3
+
+    devops_events = read_partition(tmp_path, DEVOPS_EVENTS_PREFIX)
+    assert devops_events.num_rows == 1200
+    assert set(devops_events.column("account").to_pylist()) == set(config.account_ids)
+    sources = pc.value_counts(devops_events.column("source")).to_pylist()
+    assert {count["values"]: count["counts"] for count in sources} == {
+        "aws.codecommit": 300,
+        "aws.codedeploy": 300,
+        "aws.codepipeline": 300,
+        "aws.cloudwatch": 300,
+    }
+    times = devops_events.column("time").to_pylist()
+    assert all(str(event_time).startswith("2024-01-01") for event_time in times)
+
+
+def test_generate_events_is_deterministic(tmp_path, config):
+    generate_events(str(tmp_path / "sequential"), config, "2024-01-01", "2024-01-02")
+    generate_events(str(tmp_path / "parallel"), config, "2024-01-01", "2024-01-02", max_workers=3)
+    generate_events(str(tmp_path / "other"), make_config(seed=1), "2024-01-01", "2024-01-02")
+
+    assert read_files(tmp_path / "sequential") == read_files(tmp_path / "parallel")
+    assert read_files(tmp_path / "sequential") != read_files(tmp_path / "other")
+
+
+def test_generate_events_failure_ratio(tmp_path):
+    config = GeneratorConfig(daily_events={CODEDEPLOY: 20000, CODEBUILD_METRIC: 30000}, failure_ratio=0.25)
+    generate_events(str(tmp_path), config, "2024-01-01", "2024-01-01", [CODEDEPLOY, CODEBUILD_METRIC])
+
+    details = read_partition(tmp_path, DEVOPS_EVENTS_PREFIX).column("detail").combine_chunks()
+    deployments = details.field("deploymentState")
+    assert pc.mean(pc.equal(deployments, "FAILURE")).as_py() == pytest.approx(0.25, abs=0.02)
+    metric_names = read_partition(tmp_path, CODE_BUILD_EVENTS_PREFIX).column("metric_name")
+    failed = pc.sum(pc.equal(metric_names, "FailedBuilds")).as_py()
+    succeeded = pc.sum(pc.equal(metric_names, "SucceededBuilds")).as_py()
+    assert failed / (failed + succeeded) == pytest.approx(0.25, abs=0.03)
+
+
+def test_generate_events_content(tmp_path):
+    event_types = [CODECOMMIT, CODEPIPELINE, CANARY_ALARM, GITHUB]
+    config = GeneratorConfig(daily_events={event_type: 100 for event_type in event_types})
+    generate_events(str(tmp_path), config, "2024-01-01", "2024-01-01", event_types)
+
+    events = read_partition(tmp_path, DEVOPS_EVENTS_PREFIX).to_pylist()
+    for event in events:
+        detail = event["detail"]
+        assert event["resources"][0].startswith(f"arn:aws:{event['source'][len('aws.'):]}:{event['region']}:")
+        if event["source"] == "aws.cloudwatch":
+            assert detail["canaryAlarmName"].endswith(f"-{detail['canaryAlarmRepoName']}-MTTR")
+            assert detail["canaryAlarmCurrStateTimeStamp"] == event["time"]
+            recovery = detail["canaryAlarmCurrStateTimeStamp"] - detail["canaryAlarmPrevStateTimeStamp"]
+            assert recovery.total_seconds() == detail["recoveryDurationMinutes"] * 60
+        elif event["source"] == "aws.codepipeline":
+            assert detail["state"] in ["STARTED", "SUCCEEDED", "FAILED"]
+            assert detail["actionOwner"] == "AWS"
+    # each repository lives in one account and region
+    locations = {
+        (event["detail"]["repositoryName"], event["account"], event["region"])
+        for event in events
+        if event["detail"]["repositoryName"]
+    }
+    assert len(locations) == len({repository for repository, _, _ in locations})
+
+    commit_counts = read_partition(tmp_path, GITHUB_EVENTS_PREFIX).column("commit_id").to_pylist()
+    assert all(1 <= len(commit_ids) <= 5 for commit_ids in commit_counts)
+
+
+def test_generate_tags(tmp_path):
+    config = GeneratorConfig(accounts=2, repositories=40, tag_ratio=0.5)
+
+    tagged = generate_tags(str(tmp_path), config, "2024-01-02")
+
+    reports = sorted((tmp_path / TAGGED_CODECOMMIT_PREFIX).iterdir())
+    lines = [json.loads(line) for path in reports for line in path.read_text().splitlines()]
+    assert len(lines) * 3 == tagged and 0 < len(lines) < 40
+    for path in reports:
+        account_id, region, resource_type, _ = path.name.split("_")
+        assert resource_type == "repository" and account_id in config.account_ids
+    assert lines[0]["create_time_stamp"] == "2024-01-02 00:00:00.000"
+
+
+def test_generator_config_validation():
+    with pytest.raises(ValueError):
+        GeneratorConfig(daily_events={"codestar": 1})
+    with pytest.raises(ValueError):
+        GeneratorConfig(failure_ratio=1.5)
+
+
+def test_main(tmp_path, capsys):
+    arguments = [str(tmp_path), "--start-date", "2024-01-01", "--event-types", GITHUB, "--daily-events", "github=10"]
+    status = main(arguments + ["--end-date", "2024-01-01", "--seed", "7"])
+
+    assert status == 0
+    assert json.loads(capsys.readouterr().out)["Rows"] == {GITHUB: 10}
+    assert read_partition(tmp_path, GITHUB_EVENTS_PREFIX).num_rows == 10
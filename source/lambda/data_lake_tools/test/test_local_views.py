@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+import json
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from query_views import main
+from util.datasets import get_input_schema, read_input_columns
+from util.event_generator import EVENT_TYPES, GeneratorConfig, generate_events, generate_tags
+from util.local_views import (
+    CODE_BUILD_DETAIL_VIEW,
+    CODE_CHANGE_ACTIVITY_VIEW,
+    CODE_DEPLOYMENT_DETAIL_VIEW,
+    DUCKDB,
+    ENGINES,
+    GITHUB_CHANGE_ACTIVITY_VIEW,
+    PYARROW,
+    VIEWS,
+    LocalViews,
+    duckdb,
+)
+from util.partitions import DEVOPS_EVENTS_PREFIX, get_partition_path
+
+DAILY_EVENTS = 40
+
+engines = pytest.mark.parametrize(
+    "engine",
+    [
+        pytest.param(engine, marks=pytest.mark.skipif(engine == DUCKDB and duckdb is None, reason="no duckdb"))
+        for engine in ENGINES
+    ],
+)
+
+
+def sorted_rows(table):
+    return sorted(table.to_pylist(), key=lambda row: [str(value) for value in row.values()])
+
+
+@pytest.fixture(scope="module")
+def root(tmp_path_factory):
+    root = tmp_path_factory.mktemp("metrics")
+    config = GeneratorConfig(daily_events={event_type: DAILY_EVENTS for event_type in EVENT_TYPES}, repositories=8)
+    generate_events(str(root), config, "2024-01-01", "2024-01-03")
+    generate_tags(str(root), config, "2024-01-03")
+    return root
+
+
+def test_read_input_columns():
+    input_columns = read_input_columns()
+
+    assert sorted(input_columns) == sorted(VIEWS)
+    assert get_input_schema(input_columns[GITHUB_CHANGE_ACTIVITY_VIEW]).field("commit_count").type == pa.int64()
+
+
+@engines
+def test_query(root, engine):
+    local_views = LocalViews(str(root), data_duration=1, current_date="2024-01-03", engine=engine)
+    input_columns = read_input_columns()
+
+    for view_name in VIEWS:
+        table = local_views.query(view_name)
+
+        assert table.schema == get_input_schema(input_columns[view_name])
+        # a right join on the tags keeps every event of the last two days
+        assert table.num_rows == 2 * DAILY_EVENTS
+        assert {str(created_at) for created_at in table.column("created_at").to_pylist()} == {
+            "2024-01-02 00:00:00",
+            "2024-01-03 00:00:00",
+        }
+
+
+@engines
+def test_query_tags(root, engine):
+    table = LocalViews(str(root), current_date="2024-01-03", engine=engine).query(CODE_BUILD_DETAIL_VIEW)
+
+    tags = {row["project_name"]: row["tag"] for row in table.to_pylist()}
+    tagged = [
+        json.loads(line)["resource_name"]
+        for path in (root / "TaggedResources" / "CodeBuild").iterdir()
+        for line in path.read_text().splitlines()
+    ]
+    assert {project for project, tag in tags.items() if tag} == set(tagged)
+    assert len(tagged) < len(tags)
+
+
+@engines
+def test_query_included_repositories(root, engine):
+    local_views = LocalViews(
+        str(root), current_date="2024-01-03", included_repositories=["repository-1", "repository-2"], engine=engine
+    )
+
+    repositories = set(local_views.query(CODE_CHANGE_ACTIVITY_VIEW).column("repository_name").to_pylist())
+
+    assert repositories == {"repository-1", "repository-2"}
+
+
+@pytest.mark.skipif(duckdb is None, reason="no duckdb")
+def test_engines_agree(root):
+    duckdb_views = LocalViews(str(root), current_date="2024-01-03", engine=DUCKDB)
+    pyarrow_views = LocalViews(str(root), current_date="2024-01-03", engine=PYARROW)
+
+    for view_name in VIEWS:
+        assert sorted_rows(duckdb_views.query(view_name)) == sorted_rows(pyarrow_views.query(view_name))
+
+
+@engines
+def test_query_ignores_hidden_files(tmp_path, engine):
+    config = GeneratorConfig(daily_events={event_type: 10 for event_type in EVENT_TYPES})
+    generate_events(str(tmp_path), config, "2024-01-01", "2024-01-01")
+    partition_path = get_partition_path(str(tmp_path), DEVOPS_EVENTS_PREFIX, "2024-01-01")
+    staged = pq.read_table(f"{partition_path}/codedeploy-00000.parquet")
+    pq.write_table(staged, f"{partition_path}/_staging-codedeploy.parquet")
+
+    table = LocalViews(str(tmp_path), current_date="2024-01-01", engine=engine).query(CODE_DEPLOYMENT_DETAIL_VIEW)
+
+    assert table.num_rows == 10
+
+
+def test_query_without_data(tmp_path):
+    table = LocalViews(str(tmp_path), current_date="2024-01-01", engine=PYARROW).query(CODE_CHANGE_ACTIVITY_VIEW)
+
+    assert table.num_rows == 0
+    assert table.schema == get_input_schema(read_input_columns()[CODE_CHANGE_ACTIVITY_VIEW])
+
+
+def test_unknown_view_and_engine(root):
+    with pytest.raises(ValueError):
+        LocalViews(str(root), engine="athena")
+    with pytest.raises(ValueError):
+        LocalViews(str(root)).query("code_review_view")
+
+
+def test_main(root, tmp_path, capsys):
+    arguments = [str(root), "--views", GITHUB_CHANGE_ACTIVITY_VIEW, "--current-date", "2024-01-03"]
+    status = main(arguments + ["--engine", PYARROW, "--output-dir", str(tmp_path)])
+
+    assert status == 0
+    results = json.loads(capsys.readouterr().out)
+    assert [(result["View"], result["Rows"]) for result in results] == [(GITHUB_CHANGE_ACTIVITY_VIEW, 3 * DAILY_EVENTS)]
+    assert pq.read_table(str(tmp_path / f"{GITHUB_CHANGE_ACTIVITY_VIEW}.parquet")).num_rows == 3 * DAILY_EVENTS
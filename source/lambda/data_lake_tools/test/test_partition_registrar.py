@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+from datetime import date, timedelta
+
+import pytest
+
+from test.fixtures.glue_fake import glue_fake
+from util.partition_registrar import PartitionRegistrar
+
+DATABASE = "aws_devops_metrics_db"
+TABLE = "aws_devops_metrics_table"
+
+
+def make_partition_dirs(table_path, start_date, days):
+    partition_dates = [start_date + timedelta(days=offset) for offset in range(days)]
+    for partition_date in partition_dates:
+        (table_path / f"created_at={partition_date}").mkdir(parents=True)
+    return partition_dates
+
+
+@pytest.fixture
+def table_path(tmp_path, glue_fake):
+    table_path = tmp_path / "DevopsEvents"
+    table_path.mkdir()
+    glue_fake.add_table(DATABASE, TABLE, f"{table_path}/", partition_values=["2024-01-02"])
+    return table_path
+
+
+def test_register_missing_partitions(table_path, glue_fake):
+    make_partition_dirs(table_path, date(2024, 1, 1), 5)
+    (table_path / "not-a-partition").mkdir()
+
+    result = PartitionRegistrar(DATABASE, TABLE).register("2024-01-01", "2024-01-04")
+
+    assert result == {"Table": TABLE, "Created": 3, "Failed": []}
+    assert glue_fake.get_partition_values(DATABASE, TABLE) == ["2024-01-01", "2024-01-02", "2024-01-03", "2024-01-04"]
+    partition = glue_fake.partitions[(DATABASE, TABLE)]["2024-01-03"]
+    assert partition["StorageDescriptor"]["Location"] == f"{table_path}/created_at=2024-01-03/"
+    assert partition["StorageDescriptor"]["InputFormat"].endswith("MapredParquetInputFormat")
+    assert glue_fake.call_counts["batch_create_partition"] == 1
+
+
+def test_register_backfill_in_chunks(table_path, glue_fake):
+    make_partition_dirs(table_path, date(2023, 1, 1), 365)
+
+    result = PartitionRegistrar(DATABASE, TABLE).register("2023-01-01", "2023-12-31")
+
+    assert result["Created"] == 365
+    assert len(glue_fake.get_partition_values(DATABASE, TABLE)) == 366
+    assert glue_fake.call_counts["batch_create_partition"] == 4
+    # a second pass finds nothing missing, reading the catalog page by page
+    assert PartitionRegistrar(DATABASE, TABLE).register("2023-01-01", "2023-12-31")["Created"] == 0
+    assert glue_fake.call_counts["batch_create_partition"] == 4
+    assert glue_fake.call_counts["get_partitions"] == 1 + 8
+
+
+def test_register_dates_without_data(table_path, glue_fake):
+    result = PartitionRegistrar(DATABASE, TABLE).register(
+        "2024-01-01", "2024-01-10", dates_without_data=[date(2024, 1, 10), date(2024, 1, 11)]
+    )
+
+    assert result["Created"] == 2
+    assert glue_fake.get_partition_values(DATABASE, TABLE) == ["2024-01-02", "2024-01-10", "2024-01-11"]
+
+
+def test_register_concurrently_created(table_path, glue_fake):
+    make_partition_dirs(table_path, date(2024, 1, 3), 2)
+    registrar = PartitionRegistrar(DATABASE, TABLE)
+    registrar.list_registered_values = lambda: set()
+
+    assert registrar.register("2024-01-01", "2024-01-04") == {"Table": TABLE, "Created": 2, "Failed": []}
+
+
+def test_register_unknown_table(glue_fake):
+    with pytest.raises(glue_fake.exceptions.EntityNotFoundException):
+        PartitionRegistrar(DATABASE, "unknown").register("2024-01-01", "2024-01-01")
@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+from datetime import date, timedelta
+
+import pytest
+
+import partition_registrar_function
+from test.fixtures.glue_fake import glue_fake
+from test.test_partition_registrar import make_partition_dirs
+from util.partitions import get_today
+
+DATABASE = "aws_devops_metrics_db"
+TABLES = {
+    "MetricsTableName": ("aws_devops_metrics_table", "DevopsEvents"),
+    "CodeBuildMetricsTableName": ("aws_codebuild_metrics_table", "CodeBuildEvents"),
+    "GitHubMetricsTableName": ("aws_github_metrics_table", "GitHubEvents"),
+}
+
+
+@pytest.fixture
+def tables(tmp_path, glue_fake, monkeypatch):
+    monkeypatch.setenv("MetricsDBName", DATABASE)
+    for variable, (table_name, prefix) in TABLES.items():
+        monkeypatch.setenv(variable, table_name)
+        (tmp_path / prefix).mkdir()
+        glue_fake.add_table(DATABASE, table_name, f"{tmp_path / prefix}/")
+    return tmp_path
+
+
+def test_handler_registers_recent_days(tables, glue_fake):
+    today = get_today()
+    make_partition_dirs(tables / "DevopsEvents", today - timedelta(days=30), 28)
+
+    response = partition_registrar_function.handler({}, None)
+
+    assert [result["Table"] for result in response["Tables"]] == [table for table, _ in TABLES.values()]
+    expected = [str(today - timedelta(days=days)) for days in [7, 6, 5, 4, 3]] + [
+        str(today),
+        str(today + timedelta(days=1)),
+    ]
+    assert glue_fake.get_partition_values(DATABASE, "aws_devops_metrics_table") == expected
+    assert glue_fake.get_partition_values(DATABASE, "aws_github_metrics_table") == expected[-2:]
+
+
+def test_handler_backfill(tables, glue_fake):
+    make_partition_dirs(tables / "GitHubEvents", date(2023, 6, 1), 30)
+
+    response = partition_registrar_function.handler(
+        {"StartDate": "2023-06-10", "EndDate": "2023-12-31", "Tables": ["aws_github_metrics_table"]}, None
+    )
+
+    assert response == {"Tables": [{"Table": "aws_github_metrics_table", "Created": 21, "Failed": []}]}
+    assert glue_fake.get_partition_values(DATABASE, "aws_devops_metrics_table") == []
+
+
+def test_main(tables, glue_fake):
+    make_partition_dirs(tables / "CodeBuildEvents", date(2023, 6, 1), 3)
+
+    exit_code = partition_registrar_function.main(
+        [DATABASE, "aws_codebuild_metrics_table", "--start-date", "2023-06-01", "--end-date", "2023-06-02"]
+    )
+
+    assert exit_code == 0
+    assert glue_fake.get_partition_values(DATABASE, "aws_codebuild_metrics_table") == ["2023-06-01", "2023-06-02"]
@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+from datetime import timedelta
+
+import boto3
+import pytest
+from moto import mock_s3
+
+from test.fixtures.glue_fake import glue_fake
+from util.partitions import get_today
+from util.retention import RetentionPruner, parse_s3_uri
+
+BUCKET = "metrics-bucket"
+DATABASE = "aws_devops_metrics_db"
+TABLE = "aws_devops_metrics_table"
+
+
+@pytest.fixture
+def s3_client(monkeypatch):
+    import util.helpers
+
+    with mock_s3():
+        s3_client = boto3.client("s3", region_name="us-east-1")
+        s3_client.create_bucket(Bucket=BUCKET)
+        monkeypatch.setitem(util.helpers._helpers_service_clients, ("s3", "us-east-1"), s3_client)
+        yield s3_client
+
+
+def put_partitions(s3_client, prefix, days_ago, objects_per_partition):
+    for days in days_ago:
+        for index in range(objects_per_partition):
+            key = f"{prefix}created_at={get_today() - timedelta(days=days)}/part-{index:05d}.parquet"
+            s3_client.put_object(Bucket=BUCKET, Key=key, Body=b"PAR1")
+
+
+def list_keys(s3_client):
+    paginator = s3_client.get_paginator("list_objects_v2")
+    return [s3_object["Key"] for page in paginator.paginate(Bucket=BUCKET) for s3_object in page.get("Contents", [])]
+
+
+@pytest.fixture
+def table(glue_fake, s3_client):
+    # registered from 100 days ago, with data from 120 days ago
+    values = [str(get_today() - timedelta(days=days)) for days in range(100, -1, -1)]
+    glue_fake.add_table(DATABASE, TABLE, f"s3://{BUCKET}/DevopsEvents/", partition_values=values)
+    put_partitions(s3_client, "DevopsEvents/", range(120, -1, -1), 2)
+    put_partitions(s3_client, "GitHubEvents/", [120], 1)
+
+
+def test_prune(table, glue_fake, s3_client):
+    result = RetentionPruner(DATABASE, TABLE, retention_days=90).prune()
+
+    cutoff = get_today() - timedelta(days=90)
+    assert result["Cutoff"] == str(cutoff)
+    assert len(result["Partitions"]) == 10 and len(result["Prefixes"]) == 30
+    assert result["DeletedObjects"] == 60 and result["Failed"] == []
+    assert glue_fake.get_partition_values(DATABASE, TABLE)[0] == str(cutoff)
+    assert glue_fake.call_counts["batch_delete_partition"] == 1
+    keys = list_keys(s3_client)
+    assert len(keys) == 2 * 91 + 1
+    assert min(key for key in keys if key.startswith("DevopsEvents/")).startswith(f"DevopsEvents/created_at={cutoff}/")
+
+
+def test_prune_dry_run(table, glue_fake, s3_client):
+    result = RetentionPruner(DATABASE, TABLE, retention_days=30, dry_run=True).prune()
+
+    assert len(result["Partitions"]) == 70 and result["DeletedObjects"] == 180 and result["DryRun"]
+    assert len(glue_fake.get_partition_values(DATABASE, TABLE)) == 101
+    assert len(list_keys(s3_client)) == 2 * 121 + 1
+
+
+def test_prune_in_batches(glue_fake, s3_client):
+    values = [str(get_today() - timedelta(days=days)) for days in range(60, 0, -1)]
+    glue_fake.add_table(DATABASE, TABLE, f"s3://{BUCKET}/DevopsEvents/", partition_values=values)
+    put_partitions(s3_client, "DevopsEvents/", [45], 1200)
+
+    result = RetentionPruner(DATABASE, TABLE, retention_days=2, max_workers=4).prune()
+
+    assert len(result["Partitions"]) == 58 and result["DeletedObjects"] == 1200
+    assert glue_fake.call_counts["batch_delete_partition"] == 3
+    assert list_keys(s3_client) == []
+
+
+def test_prune_keeps_data_of_partitions_not_deleted(table, glue_fake, s3_client):
+    failed_value = str(get_today() - timedelta(days=95))
+
+    def batch_delete_partition(DatabaseName, TableName, PartitionsToDelete):
+        error_detail = {"ErrorCode": "InternalServiceException", "ErrorMessage": "Internal error."}
+        return {"Errors": [{"PartitionValues": [failed_value], "ErrorDetail": error_detail}]}
+
+    glue_fake.batch_delete_partition = batch_delete_partition
+    result = RetentionPruner(DATABASE, TABLE, retention_days=90).prune()
+
+    assert result["Failed"] == [failed_value]
+    assert result["DeletedObjects"] == 58
+    assert len([key for key in list_keys(s3_client) if f"created_at={failed_value}/" in key]) == 2
+
+
+def test_retention_days():
+    with pytest.raises(ValueError):
+        RetentionPruner(DATABASE, TABLE, retention_days=0, glue_client=object(), s3_client=object())
+
+
+def test_parse_s3_uri():
+    assert parse_s3_uri("s3://bucket/DevopsEvents") == ("bucket", "DevopsEvents/")
+    assert parse_s3_uri("s3://bucket/a/b/") == ("bucket", "a/b/")
+    assert parse_s3_uri("s3://bucket") == ("bucket", "")
+    with pytest.raises(ValueError):
+        parse_s3_uri("/tmp/bucket")
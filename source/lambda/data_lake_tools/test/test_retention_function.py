@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+import json
+
+import pytest
+
+import retention_function
+from test.fixtures.glue_fake import glue_fake
+from test.test_retention import DATABASE, TABLE, list_keys, s3_client, table
+
+
+@pytest.fixture
+def environment(monkeypatch):
+    monkeypatch.setenv("MetricsDBName", DATABASE)
+    monkeypatch.setenv("MetricsTableName", TABLE)
+    monkeypatch.setenv("DataDuration", "60")
+    monkeypatch.delenv("CodeBuildMetricsTableName", raising=False)
+    monkeypatch.delenv("GitHubMetricsTableName", raising=False)
+
+
+def test_get_retention_days(environment, monkeypatch):
+    assert retention_function.get_retention_days() == 60 + retention_function.DEFAULT_RETENTION_MARGIN_DAYS
+    monkeypatch.setenv("RETENTION_MARGIN_DAYS", "0")
+    assert retention_function.get_retention_days() == 60
+    monkeypatch.setenv("RETENTION_DAYS", "365")
+    assert retention_function.get_retention_days() == 365
+
+
+def test_handler(environment, table, glue_fake, s3_client):
+    response = retention_function.handler({}, None)
+
+    (result,) = response["Tables"]
+    assert result["Table"] == TABLE and len(result["Partitions"]) == 10 and result["DeletedObjects"] == 60
+    assert len(glue_fake.get_partition_values(DATABASE, TABLE)) == 91
+
+
+def test_handler_dry_run(environment, table, glue_fake, s3_client):
+    response = retention_function.handler({"DryRun": True, "RetentionDays": 100}, None)
+
+    assert response["Tables"][0]["DeletedObjects"] == 40
+    assert len(list_keys(s3_client)) == 2 * 121 + 1
+
+
+def test_handler_dry_run_string(environment, table, glue_fake, s3_client):
+    response = retention_function.handler({"DryRun": "True", "RetentionDays": 100}, None)
+
+    assert response["Tables"][0]["DryRun"]
+    assert len(list_keys(s3_client)) == 2 * 121 + 1
+
+    # a scheduled run configured to delete
+    response = retention_function.handler({"DryRun": "false"}, None)
+
+    assert not response["Tables"][0]["DryRun"] and response["Tables"][0]["DeletedObjects"] == 60
+    assert len(glue_fake.get_partition_values(DATABASE, TABLE)) == 91
+
+
+def test_main(table, glue_fake, s3_client, capsys):
+    exit_code = retention_function.main([DATABASE, TABLE, "--retention-days", "110", "--dry-run"])
+
+    assert exit_code == 0
+    (result,) = json.loads(capsys.readouterr().out)
+    assert result["DryRun"] and result["DeletedObjects"] == 20
@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+import json
+import shutil
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from check_schemas import main
+from util.datasets import DEFAULT_CONFIG_DIR
+from util.event_generator import CODEBUILD_METRIC, EVENT_TYPES, GITHUB, GeneratorConfig, generate_events
+from util.local_views import CODE_BUILD_DETAIL_VIEW, GITHUB_CHANGE_ACTIVITY_VIEW, RECOVERY_TIME_DETAIL_VIEW
+from util.partitions import CODE_BUILD_EVENTS_PREFIX, GITHUB_EVENTS_PREFIX, get_partition_path
+from util.schema_contract import GLUE_TABLE_SOURCE, check_contracts
+
+
+@pytest.fixture
+def root(tmp_path):
+    root = tmp_path / "metrics"
+    config = GeneratorConfig(daily_events={event_type: 10 for event_type in EVENT_TYPES})
+    generate_events(str(root), config, "2024-01-01", "2024-01-03")
+    return root
+
+
+@pytest.fixture
+def config_dir(tmp_path):
+    return shutil.copytree(DEFAULT_CONFIG_DIR, tmp_path / "config")
+
+
+def set_input_column_type(config_dir, config_name, column_name, column_type):
+    config_file = config_dir / f"dataset-{config_name}.config.json"
+    config = json.loads(config_file.read_text())
+    for physical_table in config["PhysicalTableMap"].values():
+        for input_column in physical_table["RelationalTable"]["InputColumns"]:
+            if input_column["Name"] == column_name:
+                input_column["Type"] = column_type
+    config_file.write_text(json.dumps(config))
+
+
+def test_check_contracts_of_dataset_configs():
+    assert check_contracts() == {"DataSets": 6, "Files": 0, "Problems": []}
+
+
+def test_check_contracts_of_files(root):
+    result = check_contracts(str(root), sample_partitions=2)
+
+    # the devops events files of four event types and one file of each other table in two partitions
+    assert result == {"DataSets": 6, "Files": 12, "Problems": []}
+
+
+def test_check_contracts_type_drift(config_dir):
+    set_input_column_type(config_dir, "recovery-time-detail", "duration_minutes", "STRING")
+    set_input_column_type(config_dir, "code-build-detail", "timestamp", "DATETIME")
+
+    problems = check_contracts(config_dir=str(config_dir))["Problems"]
+
+    assert [(problem["View"], problem["Column"], problem["Problem"]) for problem in problems] == [
+        (CODE_BUILD_DETAIL_VIEW, "timestamp", "the view column is int64"),
+        (RECOVERY_TIME_DETAIL_VIEW, "duration_minutes", "the view column is int32"),
+    ]
+    assert {problem["Source"] for problem in problems} == {GLUE_TABLE_SOURCE}
+
+
+def test_check_contracts_file_drift(root):
+    code_build_path = get_partition_path(str(root), CODE_BUILD_EVENTS_PREFIX, "2024-01-03")
+    table = pq.read_table(f"{code_build_path}/{CODEBUILD_METRIC}-00000.parquet")
+    timestamps = table.column("timestamp").cast(pa.string())
+    drifted_file = f"{code_build_path}/{CODEBUILD_METRIC}-00001.parquet"
+    pq.write_table(table.set_column(table.schema.get_field_index("timestamp"), "timestamp", timestamps), drifted_file)
+    github_path = get_partition_path(str(root), GITHUB_EVENTS_PREFIX, "2024-01-03")
+    github_file = f"{github_path}/{GITHUB}-00000.parquet"
+    pq.write_table(pq.read_table(github_file).drop_columns(["commit_id"]), github_file)
+
+    problems = check_contracts(str(root))["Problems"]
+
+    assert [(problem["View"], problem["Column"], problem["Source"], problem["Problem"]) for problem in problems] == [
+        (CODE_BUILD_DETAIL_VIEW, "timestamp", drifted_file, "the view column is string"),
+        (GITHUB_CHANGE_ACTIVITY_VIEW, "commit_count", github_file, "the columns the view reads are missing"),
+    ]
+
+
+def test_check_contracts_unknown_view_and_type(config_dir):
+    set_input_column_type(config_dir, "code-deployment-detail", "state", "BOOLEAN")
+    config_file = config_dir / "dataset-github-change-activity.config.json"
+    config_file.write_text(config_file.read_text().replace("github_change_activity_view", "github_review_view"))
+
+    problems = check_contracts(config_dir=str(config_dir))["Problems"]
+
+    assert sorted(problem["Problem"].split(",")[0] for problem in problems) == ["no such athena view", "unknown type"]
+
+
+def test_main(root, config_dir, capsys):
+    assert main([str(root), "--config-dir", str(config_dir), "--partitions", "1"]) == 0
+    assert json.loads(capsys.readouterr().out)["Files"] == 6
+
+    set_input_column_type(config_dir, "code-change-activity", "time", "INTEGER")
+    assert main(["--config-dir", str(config_dir)]) == 1
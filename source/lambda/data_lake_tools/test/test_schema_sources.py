@@ -0,0 +1,182 @@
+#!/usr/bin/env python
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+# The table schemas and views of the tools mirror the glue tables of database_construct.ts and the views of
+# build_athena_query.js. These tests read both sources, so a change there that is not made here fails the build.
+
+import re
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pytest
+
+from util.local_views import VIEWS, field
+from util.schemas import TABLE_SCHEMAS, TAGGED_RESOURCES_PREFIX, TAGS_SCHEMA
+
+SOURCE_DIR = Path(__file__).resolve().parents[3]
+DATABASE_CONSTRUCT = SOURCE_DIR / "lib" / "database" / "database_construct.ts"
+ATHENA_QUERIES = SOURCE_DIR / "lambda" / "query_runner" / "build_athena_query.js"
+
+GLUE_TYPES = {
+    "Schema.STRING": pa.string(),
+    "Schema.INTEGER": pa.int32(),
+    "Schema.BIG_INT": pa.int64(),
+    "Schema.DOUBLE": pa.float64(),
+    "Schema.TIMESTAMP": pa.timestamp("ms"),
+}
+TOKEN_PATTERN = re.compile(r"'[^']*'|[A-Za-z_][\w.]*|[{}\[\](),:]")
+VIEW_PATTERN = re.compile(r"CREATE OR REPLACE VIEW \$\{athenaDB\}\.(\w+) AS(.*?);`", re.DOTALL)
+SELECT_PATTERN = re.compile(r"SELECT\s(.*?)\sFROM\s", re.DOTALL)
+CONDITION_PATTERN = re.compile(r"WHERE (\w+) = '([^']*)'")
+TAGS_TABLE_PATTERN = re.compile(r"\$\{athenaDB\}\.\$\{athena(\w+)TagsTable\}")
+RESOURCE_COLUMN_PATTERN = re.compile(r"tags\.resource_name = metrics\.(\w+)")
+REPOSITORY_FILTER_PATTERN = re.compile(r"AND ([\w.]+) in \(\$\{includedRepositoryList\}\)")
+
+
+class Tokens:
+    def __init__(self, text):
+        self.tokens = TOKEN_PATTERN.findall(text)
+        self.position = 0
+
+    def next(self):
+        token = self.tokens[self.position]
+        self.position += 1
+        return token
+
+    def expect(self, expected):
+        token = self.next()
+        assert token == expected, f"expected {expected} got {token}"
+
+    def skip_comma(self):
+        if self.tokens[self.position] == ",":
+            self.position += 1
+
+
+def parse_type(tokens):
+    """The arrow type of a glue column type, e.g. Schema.array(Schema.STRING)"""
+    name = tokens.next()
+    if name == "Schema.struct":
+        tokens.expect("(")
+        data_type = pa.struct(list(parse_columns(tokens)))
+        tokens.expect(")")
+        return data_type
+    if name == "Schema.array":
+        tokens.expect("(")
+        data_type = pa.list_(parse_type(tokens))
+        tokens.expect(")")
+        return data_type
+    return GLUE_TYPES[name]
+
+
+def parse_columns(tokens):
+    """The (name, type) of a list of glue columns, { name: '...', type: ..., comment: '...' }"""
+    tokens.expect("[")
+    while tokens.tokens[tokens.position] != "]":
+        tokens.expect("{")
+        column = dict()
+        while tokens.tokens[tokens.position] != "}":
+            key = tokens.next()
+            tokens.expect(":")
+            column[key] = parse_type(tokens) if key == "type" else tokens.next().strip("'")
+            tokens.skip_comma()
+        tokens.expect("}")
+        tokens.skip_comma()
+        yield column["name"], column["type"]
+    tokens.expect("]")
+
+
+def read_glue_tables():
+    """The schemas of the S3Table of database_construct.ts by their s3 prefix, without the partition keys"""
+    text = DATABASE_CONSTRUCT.read_text()
+    tables = dict()
+    for table in re.split(r"new S3Table\(", text)[1:]:
+        prefix = re.search(r"s3Prefix: '([^']*)/'", table).group(1)
+        tokens = Tokens(table[table.index("columns:") + len("columns:") :])
+        tables[prefix] = pa.schema(list(parse_columns(tokens)))
+    return tables
+
+
+def split_select(select):
+    """The expression of each column of a select list by its name"""
+    items, depth, item = [], 0, ""
+    for character in select:
+        depth += {"(": 1, ")": -1}.get(character, 0)
+        if character == "," and depth == 0:
+            items.append(item)
+            item = ""
+        else:
+            item += character
+    items.append(item)
+    columns = dict()
+    for item in items:
+        expression, _, name = " ".join(item.split()).rpartition(" as ")
+        columns[name] = expression or name
+    return columns
+
+
+def read_athena_views():
+    return dict(VIEW_PATTERN.findall(ATHENA_QUERIES.read_text()))
+
+
+def test_table_schemas_match_database_construct():
+    tables = read_glue_tables()
+
+    for prefix, schema in TABLE_SCHEMAS.items():
+        assert tables.pop(prefix) == schema, prefix
+    for prefix, schema in tables.items():
+        assert prefix.startswith(f"{TAGGED_RESOURCES_PREFIX}/")
+        assert schema == TAGS_SCHEMA, prefix
+
+
+def test_parse_columns():
+    columns = """[
+      { name: 'commit_id', type: Schema.array(Schema.STRING), },
+      { name: 'value', type: Schema.struct([{ name: 'count', type: Schema.DOUBLE }]), comment: 'struct' }
+    ]"""
+
+    assert list(parse_columns(Tokens(columns))) == [
+        ("commit_id", pa.list_(pa.string())),
+        ("value", pa.struct([("count", pa.float64())])),
+    ]
+
+
+def test_views_match_athena_queries():
+    assert set(read_athena_views()) == set(VIEWS)
+
+
+@pytest.mark.parametrize("view_name", VIEWS)
+def test_view_matches_athena_query(view_name):
+    view = VIEWS[view_name]
+    query = read_athena_views()[view_name]
+    # the select of the metrics table, the inner one of the views joined with the tags
+    columns = split_select(SELECT_PATTERN.search(query).group(1))
+
+    assert list(columns) == list(view.columns)
+    for name, expression in columns.items():
+        if re.fullmatch(r"[\w.]+", expression):
+            assert view.columns[name].equals(field(expression)), name
+        else:
+            # cardinality of athena is len in duckdb
+            assert expression.replace("cardinality(", "len(") in " ".join(view.sql.split()), name
+
+    condition = CONDITION_PATTERN.search(query)
+    if condition:
+        assert view.condition.equals(pc.field(condition.group(1)) == condition.group(2))
+    else:
+        assert view.condition is None
+
+    tags_table = TAGS_TABLE_PATTERN.search(query)
+    if tags_table:
+        assert "tags.tag" in query
+        assert view.tags_prefix == f"{TAGGED_RESOURCES_PREFIX}/{tags_table.group(1)}"
+        assert view.resource_column == RESOURCE_COLUMN_PATTERN.search(query).group(1)
+    else:
+        assert view.tags_prefix is None
+
+    if "${repoFilterString}" in query:
+        repository_filter = REPOSITORY_FILTER_PATTERN.search(ATHENA_QUERIES.read_text())
+        assert view.repository_column == repository_filter.group(1)
+    else:
+        assert view.repository_column is None
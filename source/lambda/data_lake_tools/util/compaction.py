@@ -0,0 +1,471 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+import json
+import logging
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from pyarrow import fs
+
+from util.partitions import TABLE_SORT_KEYS, get_filesystem, get_partition_path
+
+logger = logging.getLogger(__name__)
+
+# compacted files are rolled over once they reach this size
+DEFAULT_TARGET_FILE_BYTES = 512 * 1024 * 1024
+# uncompressed bytes of a row group, athena reads a file in splits of about this size
+DEFAULT_ROW_GROUP_BYTES = 128 * 1024 * 1024
+# rows read at once from the small files, memory use is bounded by one row group plus one batch
+DEFAULT_READ_BATCH_ROWS = 64 * 1024
+# partitions with fewer small files are left as they are
+DEFAULT_MIN_INPUT_FILES = 2
+# compression of the firehose ParquetSerDe
+DEFAULT_COMPRESSION = "snappy"
+
+# athena and glue ignore objects whose name starts with _ or ., so the manifest and the staged files never
+# show up in query results
+MANIFEST_FILE = "_compaction_manifest.json"
+STAGING_FILE_PREFIX = "_staging-"
+COMPACTED_FILE_PREFIX = "compacted-"
+SORTED_RUN_INFIX = "run-"
+HIDDEN_FILE_PREFIXES = ("_", ".")
+
+# columns added to the rows of the sorted runs while they are merged
+RUN_COLUMN = "__run"
+ROW_ID_COLUMN = "__row_id"
+
+PENDING = "pending"
+COMMITTED = "committed"
+
+COMPACTED = "compacted"
+SKIPPED = "skipped"
+FAILED = "failed"
+
+
+class CompactionManifest:
+    """
+    Record of a compaction of a partition, the small input files and the (staged, final) paths of the compacted
+    files that replace them. Writing it pending is the commit point of the compaction: from then on, every run
+    rolls the swap forward until it is committed. Files staged without a manifest are discarded.
+    """
+
+    def __init__(self, run_id, inputs, outputs, state=PENDING):
+        self.run_id = run_id
+        self.inputs = inputs
+        self.outputs = outputs
+        self.state = state
+
+    def to_json(self):
+        return json.dumps(
+            {"RunId": self.run_id, "State": self.state, "Inputs": self.inputs, "Outputs": self.outputs}, indent=2
+        )
+
+    @classmethod
+    def from_json(cls, content):
+        manifest = json.loads(content)
+        outputs = [tuple(output) for output in manifest["Outputs"]]
+        return cls(manifest["RunId"], manifest["Inputs"], outputs, manifest["State"])
+
+    @classmethod
+    def read(cls, filesystem, path):
+        try:
+            with filesystem.open_input_stream(path) as manifest_fd:
+                return cls.from_json(manifest_fd.read().decode("utf-8"))
+        except FileNotFoundError:
+            return None
+
+    def write(self, filesystem, path):
+        # the manifest is replaced in one step, it is never seen partially written
+        temporary_path = f"{path}.tmp"
+        with filesystem.open_output_stream(temporary_path) as manifest_fd:
+            manifest_fd.write(self.to_json().encode("utf-8"))
+        filesystem.move(temporary_path, path)
+
+
+class CompactedFileWriter:
+    """
+    Writes row groups to parquet files, a new file is started once the current one reaches target_file_bytes.
+    Every column gets row group statistics, the sort keys are recorded as the sorting columns of the row groups and
+    the bloom filter columns get a bloom filter.
+    """
+
+    def __init__(
+        self,
+        filesystem,
+        get_path,
+        schema,
+        target_file_bytes,
+        compression=DEFAULT_COMPRESSION,
+        sort_keys=None,
+        bloom_filter_columns=None,
+    ):
+        self.filesystem = filesystem
+        self.get_path = get_path
+        self.schema = schema
+        self.target_file_bytes = target_file_bytes
+        self.compression = compression
+        self.sorting_columns = (
+            pq.SortingColumn.from_ordering(schema, [(key, "ascending") for key in sort_keys]) if sort_keys else None
+        )
+        self.bloom_filter_options = {column: True for column in bloom_filter_columns or []} or None
+        self.paths = []
+        self.rows = 0
+        self.sink = None
+        self.writer = None
+
+    def write_row_group(self, table):
+        if self.writer is None:
+            path = self.get_path(len(self.paths))
+            self.paths.append(path)
+            self.sink = self.filesystem.open_output_stream(path)
+            self.writer = pq.ParquetWriter(
+                self.sink,
+                self.schema,
+                compression=self.compression,
+                write_statistics=True,
+                sorting_columns=self.sorting_columns,
+                bloom_filter_options=self.bloom_filter_options,
+            )
+        self.writer.write_table(table, row_group_size=max(1, table.num_rows))
+        self.rows += table.num_rows
+        if self.sink.tell() >= self.target_file_bytes:
+            self.close()
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.sink.close()
+            self.writer = None
+            self.sink = None
+
+
+def conform_batch(batch, schema):
+    """The batch with the columns of schema, cast to its types, missing columns are null"""
+    if batch.schema.equals(schema):
+        return batch
+    columns = []
+    for field in schema:
+        index = batch.schema.get_field_index(field.name)
+        column = batch.column(index).cast(field.type) if index >= 0 else pa.nulls(batch.num_rows, field.type)
+        columns.append(column)
+    return pa.RecordBatch.from_arrays(columns, schema=schema)
+
+
+def has_column(schema, column):
+    """Whether schema has the column, nested columns are named by their path, e.g. detail.repositoryName"""
+    names = column.split(".")
+    field_type = schema
+    for name in names:
+        index = field_type.get_field_index(name) if isinstance(field_type, (pa.Schema, pa.StructType)) else -1
+        if index < 0:
+            return False
+        field_type = field_type.field(index).type
+    return True
+
+
+def sort_table(table, sort_keys):
+    return table.sort_by([(tuple(key.split(".")), "ascending") for key in sort_keys])
+
+
+class PartitionCompactor:
+    """
+    Rewrites the small parquet files firehose delivered to a partition into a few large files with row groups
+    sized for athena. The small files are streamed batch by batch, so memory use does not depend on the size of
+    the partition.
+
+    With sort keys, the rows are sorted by them, so the min/max statistics of the row groups let athena skip the
+    row groups of other accounts, regions or repositories. A partition of up to one row group is sorted in memory,
+    a larger one is sorted row group by row group into staged runs that are then merged a few rows of each run at a
+    time, so memory use stays at about one row group either way.
+
+    The swap is not atomic for athena: S3 has no rename, so between moving the compacted files in and deleting the
+    last small file, a query of the partition reads rows of both and counts them twice. Compact the partitions of
+    past days at a time no dashboard refresh or other query reads them, see the compaction function.
+    """
+
+    def __init__(
+        self,
+        filesystem,
+        partition_path,
+        target_file_bytes=DEFAULT_TARGET_FILE_BYTES,
+        row_group_bytes=DEFAULT_ROW_GROUP_BYTES,
+        read_batch_rows=DEFAULT_READ_BATCH_ROWS,
+        min_input_files=DEFAULT_MIN_INPUT_FILES,
+        compression=DEFAULT_COMPRESSION,
+        sort_keys=None,
+        bloom_filter_columns=None,
+    ):
+        self.filesystem = filesystem
+        self.partition_path = partition_path.rstrip("/")
+        self.target_file_bytes = target_file_bytes
+        self.row_group_bytes = row_group_bytes
+        self.read_batch_rows = read_batch_rows
+        self.min_input_files = min_input_files
+        self.compression = compression
+        self.sort_keys = sort_keys or []
+        self.bloom_filter_columns = bloom_filter_columns or []
+        self.manifest_path = f"{self.partition_path}/{MANIFEST_FILE}"
+
+    def _list_files(self):
+        selector = fs.FileSelector(self.partition_path, allow_not_found=True)
+        return [
+            file_info
+            for file_info in self.filesystem.get_file_info(selector)
+            if file_info.type == fs.FileType.File
+        ]
+
+    def list_inputs(self):
+        """The visible files of the partition that were not written by a compaction, sorted by name"""
+        return sorted(
+            file_info.path
+            for file_info in self._list_files()
+            if not file_info.base_name.startswith(HIDDEN_FILE_PREFIXES)
+            and not file_info.base_name.startswith(COMPACTED_FILE_PREFIX)
+        )
+
+    def recover(self):
+        """Finish a compaction that was committed but not swapped in, and discard files staged without manifest"""
+        manifest = CompactionManifest.read(self.filesystem, self.manifest_path)
+        if manifest and manifest.state == PENDING:
+            logger.info(f"rolling forward compaction {manifest.run_id} of {self.partition_path}")
+            self.publish(manifest)
+        for file_info in self._list_files():
+            if file_info.base_name.startswith(STAGING_FILE_PREFIX):
+                logger.info(f"discarding uncommitted staged file {file_info.path}")
+                self.filesystem.delete_file(file_info.path)
+
+    def read_footers(self, inputs):
+        return [pq.read_metadata(path, filesystem=self.filesystem) for path in inputs]
+
+    def get_schema(self, inputs, footers=None):
+        """The schema of all input files, read from their footers"""
+        footers = footers or self.read_footers(inputs)
+        return pa.unify_schemas([footer.schema.to_arrow_schema() for footer in footers])
+
+    def _get_columns(self, schema, columns):
+        present = [column for column in columns if has_column(schema, column)]
+        if len(present) < len(columns):
+            logger.warning(f"ignoring columns {sorted(set(columns) - set(present))} missing in {self.partition_path}")
+        return present
+
+    def _read_batches(self, inputs, schema):
+        for path in inputs:
+            with self.filesystem.open_input_file(path) as input_fd:
+                for batch in pq.ParquetFile(input_fd).iter_batches(batch_size=self.read_batch_rows):
+                    yield conform_batch(batch, schema)
+
+    def _get_row_groups(self, inputs, schema):
+        batches = []
+        buffered_bytes = 0
+        for batch in self._read_batches(inputs, schema):
+            batches.append(batch)
+            buffered_bytes += batch.nbytes
+            if buffered_bytes >= self.row_group_bytes:
+                yield pa.Table.from_batches(batches, schema=schema)
+                batches = []
+                buffered_bytes = 0
+        if batches:
+            yield pa.Table.from_batches(batches, schema=schema)
+
+    def _get_sorted_row_groups(self, inputs, schema, sort_keys):
+        table = sort_table(pa.Table.from_batches(self._read_batches(inputs, schema), schema=schema), sort_keys)
+        rows_per_row_group = max(1, table.num_rows * self.row_group_bytes // max(1, table.nbytes))
+        for offset in range(0, table.num_rows, rows_per_row_group):
+            yield table.slice(offset, rows_per_row_group)
+
+    def _write_sorted_runs(self, inputs, schema, sort_keys, run_id):
+        """Sort the inputs row group by row group into staged run files, return their paths"""
+        paths = []
+        for row_group in self._get_row_groups(inputs, schema):
+            path = f"{self.partition_path}/{STAGING_FILE_PREFIX}{run_id}-{SORTED_RUN_INFIX}{len(paths):05d}.parquet"
+            paths.append(path)
+            with self.filesystem.open_output_stream(path) as sink:
+                pq.write_table(sort_table(row_group, sort_keys), sink, compression=self.compression)
+        return paths
+
+    def _read_run(self, path, batch_rows):
+        with self.filesystem.open_input_file(path) as input_fd:
+            yield from pq.ParquetFile(input_fd).iter_batches(batch_size=batch_rows)
+
+    def _merge_sorted_runs(self, paths, schema, sort_keys):
+        """
+        Merge the sorted runs into sorted row groups. About read_batch_rows rows of the runs are buffered: the buffer
+        is sorted and the rows up to the first row that is the last buffered row of its run are emitted, none of
+        the rows still to be read from the runs sorts before them. Then the next batch of that run is read.
+        """
+        runs = [self._read_run(path, max(1, self.read_batch_rows // len(paths))) for path in paths]
+        read_rows = 0
+        last_row_ids = {}
+
+        def read_batch(run):
+            nonlocal read_rows
+            batch = next(runs[run], None)
+            if batch is None:
+                last_row_ids.pop(run, None)
+                return None
+            table = pa.Table.from_batches([conform_batch(batch, schema)])
+            table = table.append_column(RUN_COLUMN, pa.array([run] * table.num_rows, pa.int32()))
+            table = table.append_column(
+                ROW_ID_COLUMN, pa.array(range(read_rows, read_rows + table.num_rows), pa.int64())
+            )
+            read_rows += table.num_rows
+            last_row_ids[run] = read_rows - 1
+            return table
+
+        buffered = [table for table in map(read_batch, range(len(runs))) if table is not None]
+        row_group = []
+        output_bytes = 0
+        while buffered:
+            merged = sort_table(pa.concat_tables(buffered), sort_keys)
+            if last_row_ids:
+                is_last_row = pc.is_in(merged.column(ROW_ID_COLUMN), value_set=pa.array(list(last_row_ids.values())))
+                position = pc.index(is_last_row, True).as_py()
+                run = merged.column(RUN_COLUMN)[position].as_py()
+                emitted, retained = merged.slice(0, position + 1), merged.slice(position + 1)
+                buffered = [retained] + [table for table in [read_batch(run)] if table is not None]
+            else:
+                emitted, buffered = merged, []
+            row_group.append(emitted.drop_columns([RUN_COLUMN, ROW_ID_COLUMN]))
+            output_bytes += emitted.nbytes
+            if output_bytes >= self.row_group_bytes or not buffered:
+                yield pa.concat_tables(row_group).combine_chunks()
+                row_group = []
+                output_bytes = 0
+
+    def _get_merged_row_groups(self, inputs, schema, sort_keys, run_id):
+        paths = self._write_sorted_runs(inputs, schema, sort_keys, run_id)
+        try:
+            yield from self._merge_sorted_runs(paths, schema, sort_keys)
+        finally:
+            for path in paths:
+                self.filesystem.delete_file(path)
+
+    def write_staged(self, inputs, schema, run_id, footers=None):
+        """Stream the rows of the inputs into staged files, return the (staged, final) paths and the row count"""
+        sort_keys = self._get_columns(schema, self.sort_keys)
+        writer = CompactedFileWriter(
+            self.filesystem,
+            lambda index: f"{self.partition_path}/{STAGING_FILE_PREFIX}{run_id}-{index:05d}.parquet",
+            schema,
+            self.target_file_bytes,
+            self.compression,
+            sort_keys,
+            self._get_columns(schema, self.bloom_filter_columns),
+        )
+        if not sort_keys:
+            row_groups = self._get_row_groups(inputs, schema)
+        elif sum(row_group_bytes(footer) for footer in footers or self.read_footers(inputs)) <= self.row_group_bytes:
+            row_groups = self._get_sorted_row_groups(inputs, schema, sort_keys)
+        else:
+            logger.info(f"{self.partition_path} is larger than a row group, sorting it in runs")
+            row_groups = self._get_merged_row_groups(inputs, schema, sort_keys, run_id)
+        try:
+            for row_group in row_groups:
+                writer.write_row_group(row_group)
+        finally:
+            writer.close()
+        outputs = [
+            (path, path.replace(f"/{STAGING_FILE_PREFIX}", f"/{COMPACTED_FILE_PREFIX}")) for path in writer.paths
+        ]
+        return outputs, writer.rows
+
+    def publish(self, manifest):
+        """
+        Swap the compacted files in for the inputs, every step can be repeated after an interruption. Athena reads
+        the rows of both until the last input is deleted, the window is kept short by staging every file first.
+        """
+        for staged_path, final_path in manifest.outputs:
+            if self.filesystem.get_file_info(staged_path).type == fs.FileType.File:
+                self.filesystem.move(staged_path, final_path)
+        for path in manifest.inputs:
+            try:
+                self.filesystem.delete_file(path)
+            except FileNotFoundError:
+                pass
+        manifest.state = COMMITTED
+        manifest.write(self.filesystem, self.manifest_path)
+
+    def compact(self):
+        self.recover()
+        inputs = self.list_inputs()
+        if len(inputs) < self.min_input_files:
+            logger.info(f"skipping {self.partition_path}, {len(inputs)} files to compact")
+            return {"Status": SKIPPED, "InputFiles": len(inputs), "OutputFiles": 0, "Rows": 0}
+
+        run_id = f"{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        footers = self.read_footers(inputs)
+        outputs, rows = self.write_staged(inputs, self.get_schema(inputs, footers), run_id, footers)
+        manifest = CompactionManifest(run_id, inputs, outputs)
+        manifest.write(self.filesystem, self.manifest_path)
+        self.publish(manifest)
+        logger.info(f"compacted {len(inputs)} files of {self.partition_path} into {len(outputs)} files")
+        return {"Status": COMPACTED, "InputFiles": len(inputs), "OutputFiles": len(outputs), "Rows": rows}
+
+
+def row_group_bytes(footer):
+    """The uncompressed bytes of the row groups of a parquet file"""
+    return sum(footer.row_group(index).total_byte_size for index in range(footer.num_row_groups))
+
+
+def compact_partition(
+    root_uri, table_prefix, partition_date, options=None, sort_keys=None, bloom_filter_columns=None
+):
+    """Compact a partition, the result includes the error instead of raising it, e.g. when run in a process pool"""
+    result = {"Table": table_prefix, "Partition": str(partition_date)}
+    try:
+        filesystem, root_path = get_filesystem(root_uri)
+        partition_path = get_partition_path(root_path, table_prefix, partition_date)
+        compactor = PartitionCompactor(
+            filesystem,
+            partition_path,
+            sort_keys=sort_keys,
+            bloom_filter_columns=bloom_filter_columns,
+            **(options or {}),
+        )
+        result.update(compactor.compact())
+    except Exception as error:
+        logger.exception(f"Error compacting {table_prefix} partition {partition_date}: {error}")
+        result.update({"Status": FAILED, "Error": str(error)})
+    return result
+
+
+def compact_partitions(
+    root_uri, partitions, max_workers=1, options=None, sort_keys=None, bloom_filter_columns=None
+):
+    """
+    Compact the (table prefix, date) partitions under root_uri, max_workers partitions at the same time in a process
+    pool. Where processes cannot be started, e.g. in lambda which has no shared memory for their queues, the
+    partitions are compacted one after the other.
+
+    sort_keys and bloom_filter_columns are the columns of each table prefix, by default TABLE_SORT_KEYS and none.
+    """
+    sort_keys = TABLE_SORT_KEYS if sort_keys is None else sort_keys
+    bloom_filter_columns = bloom_filter_columns or {}
+    arguments = [
+        (
+            root_uri,
+            table_prefix,
+            partition_date,
+            options,
+            sort_keys.get(table_prefix),
+            bloom_filter_columns.get(table_prefix),
+        )
+        for table_prefix, partition_date in partitions
+    ]
+    if max_workers > 1 and len(partitions) > 1:
+        try:
+            executor = ProcessPoolExecutor(max_workers=min(max_workers, len(partitions)))
+        except OSError as error:
+            logger.warning(f"process pool not available, compacting partitions one by one: {error}")
+        else:
+            with executor:
+                futures = [
+                    executor.submit(compact_partition, *partition_arguments) for partition_arguments in arguments
+                ]
+                return [future.result() for future in futures]
+    return [compact_partition(*partition_arguments) for partition_arguments in arguments]
@@ -0,0 +1,53 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+import glob
+import json
+import os
+
+import pyarrow as pa
+
+# data set configs of the quicksight custom resources, in the source tree next to these tools
+DEFAULT_CONFIG_DIR = os.path.join(
+    os.path.dirname(__file__), os.pardir, os.pardir, "quicksight-custom-resources", "util", "config"
+)
+DATASET_CONFIG_PATTERN = "dataset-*.config.json"
+
+# arrow types of the quicksight InputColumns types, INTEGER is a 64 bit integer and DECIMAL a double in spice
+INPUT_COLUMN_TYPES = {
+    "STRING": pa.string(),
+    "INTEGER": pa.int64(),
+    "DECIMAL": pa.float64(),
+    "DATETIME": pa.timestamp("ms"),
+}
+
+# arrow types quicksight reads as each InputColumns type without a cast
+INPUT_COLUMN_TYPE_CHECKS = {
+    "STRING": lambda arrow_type: pa.types.is_string(arrow_type) or pa.types.is_large_string(arrow_type),
+    "INTEGER": pa.types.is_integer,
+    "DECIMAL": lambda arrow_type: pa.types.is_floating(arrow_type) or pa.types.is_decimal(arrow_type),
+    "DATETIME": lambda arrow_type: pa.types.is_timestamp(arrow_type) or pa.types.is_date(arrow_type),
+}
+
+
+def read_input_columns(config_dir=DEFAULT_CONFIG_DIR):
+    """
+    The InputColumns of the relational tables of the data set configs in config_dir, by the athena view they read,
+    e.g. {"code_build_detail_view": [{"Name": "account", "Type": "STRING"}, ...]}
+    """
+    input_columns = dict()
+    for config_file in sorted(glob.glob(os.path.join(config_dir, DATASET_CONFIG_PATTERN))):
+        with open(config_file, "r") as config_fd:
+            config = json.load(config_fd)
+        for physical_table in config["PhysicalTableMap"].values():
+            relational_table = physical_table.get("RelationalTable")
+            if relational_table:
+                input_columns[relational_table["Name"]] = relational_table["InputColumns"]
+    if not input_columns:
+        raise ValueError(f"no data set configs in {config_dir}")
+    return input_columns
+
+
+def get_input_schema(input_columns):
+    """The arrow schema of InputColumns"""
+    return pa.schema([(column["Name"], INPUT_COLUMN_TYPES[column["Type"]]) for column in input_columns])
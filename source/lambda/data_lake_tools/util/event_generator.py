@@ -0,0 +1,464 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+import hashlib
+import json
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, time, timezone
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from util.partitions import (
+    CODE_BUILD_EVENTS_PREFIX,
+    DEVOPS_EVENTS_PREFIX,
+    GITHUB_EVENTS_PREFIX,
+    get_dates,
+    get_filesystem,
+    get_partition_path,
+    parse_date,
+)
+from util.schemas import (
+    DEVOPS_EVENTS_DETAIL_TYPE,
+    TABLE_SCHEMAS,
+    TAGGED_CODEBUILD_PREFIX,
+    TAGGED_CODECOMMIT_PREFIX,
+    TAGGED_CODEPIPELINE_PREFIX,
+)
+
+logger = logging.getLogger(__name__)
+
+CODECOMMIT = "codecommit"
+CODEDEPLOY = "codedeploy"
+CODEPIPELINE = "codepipeline"
+CANARY_ALARM = "canary_alarm"
+CODEBUILD_METRIC = "codebuild_metric"
+GITHUB = "github"
+EVENT_TYPES = [CODECOMMIT, CODEDEPLOY, CODEPIPELINE, CANARY_ALARM, CODEBUILD_METRIC, GITHUB]
+
+# table prefix each event type is delivered to by firehose
+EVENT_TABLES = {
+    CODECOMMIT: DEVOPS_EVENTS_PREFIX,
+    CODEDEPLOY: DEVOPS_EVENTS_PREFIX,
+    CODEPIPELINE: DEVOPS_EVENTS_PREFIX,
+    CANARY_ALARM: DEVOPS_EVENTS_PREFIX,
+    CODEBUILD_METRIC: CODE_BUILD_EVENTS_PREFIX,
+    GITHUB: GITHUB_EVENTS_PREFIX,
+}
+
+# events of each type per day
+DEFAULT_DAILY_EVENTS = {
+    CODECOMMIT: 1000,
+    CODEDEPLOY: 200,
+    CODEPIPELINE: 2000,
+    CANARY_ALARM: 100,
+    CODEBUILD_METRIC: 1000,
+    GITHUB: 500,
+}
+# rows of one generated file, memory use of a worker is bounded by the columns of one chunk
+DEFAULT_CHUNK_ROWS = 256 * 1024
+DEFAULT_REGIONS = ["us-east-1", "us-west-2", "eu-west-1"]
+DEFAULT_BRANCHES = ["main", "develop", "release", "feature"]
+DEFAULT_COMPRESSION = "snappy"
+# canary alarms are named SolutionId-[AppName]-[RepoName]-MTTR
+SOLUTION_ID = "SO0143"
+FIRST_ACCOUNT_ID = 100000000000
+DAY_MILLISECONDS = 24 * 60 * 60 * 1000
+# recovery durations of canary alarms, in minutes
+MAX_RECOVERY_MINUTES = 240
+MAX_COMMITS_PER_PUSH = 5
+TAG = "Environment,Production"
+
+# (stage, action, action category, action provider) of the generated pipeline actions
+PIPELINE_ACTIONS = [
+    ("Source", "Source", "Source", "CodeCommit"),
+    ("Build", "Build", "Build", "CodeBuild"),
+    ("Test", "Test", "Test", "CodeBuild"),
+    ("Deploy", "Deploy", "Deploy", "CodeDeploy"),
+]
+
+
+def get_seed(*parts):
+    """A 63 bit seed derived from parts, the same in every process unlike hash()"""
+    digest = hashlib.sha256("-".join(str(part) for part in parts).encode()).digest()
+    return int.from_bytes(digest[:8], "big") >> 1
+
+
+def get_resource_name(prefix, index):
+    return f"{prefix}-{index}"
+
+
+class GeneratorConfig:
+    """
+    Shape of the generated data: the events of each type per day, the number of accounts, regions and
+    repositories they are spread over, the share of failed deployments, pipeline actions, builds and canaries, and
+    the share of resources that are tagged. Each repository lives in one account and region and has an application,
+    a pipeline and a build project of the same number.
+    """
+
+    def __init__(
+        self,
+        daily_events=None,
+        accounts=3,
+        regions=None,
+        repositories=20,
+        authors=50,
+        failure_ratio=0.1,
+        tag_ratio=0.5,
+        seed=0,
+        chunk_rows=DEFAULT_CHUNK_ROWS,
+    ):
+        unknown = set(daily_events or {}) - set(EVENT_TYPES)
+        if unknown:
+            raise ValueError(f"unknown event types {sorted(unknown)}, expected some of {EVENT_TYPES}")
+        if not 0 <= failure_ratio <= 1 or not 0 <= tag_ratio <= 1:
+            raise ValueError("failure and tag ratios must be between 0 and 1")
+        if min(accounts, repositories, authors, chunk_rows) < 1:
+            raise ValueError("accounts, repositories, authors and chunk rows must be at least 1")
+        self.daily_events = {**DEFAULT_DAILY_EVENTS, **(daily_events or {})}
+        self.account_ids = [str(FIRST_ACCOUNT_ID + index) for index in range(accounts)]
+        self.regions = regions or DEFAULT_REGIONS
+        self.repositories = repositories
+        self.authors = authors
+        self.failure_ratio = failure_ratio
+        self.tag_ratio = tag_ratio
+        self.seed = seed
+        self.chunk_rows = chunk_rows
+
+    def get_resource_names(self, prefix):
+        return [get_resource_name(prefix, index) for index in range(self.repositories)]
+
+    def get_resource_account_ids(self):
+        return [self.account_ids[index % len(self.account_ids)] for index in range(self.repositories)]
+
+    def get_resource_regions(self):
+        return [
+            self.regions[index // len(self.account_ids) % len(self.regions)] for index in range(self.repositories)
+        ]
+
+    def get_chunk_sizes(self, event_type):
+        """The rows of each file of a day of event_type"""
+        rows = self.daily_events[event_type]
+        return [min(self.chunk_rows, rows - offset) for offset in range(0, rows, self.chunk_rows)]
+
+
+class ChunkRandom:
+    """Random columns of size rows, every draw is seeded from the seed of the chunk and the number of the draw"""
+
+    def __init__(self, seed, size):
+        self.seed = seed
+        self.size = size
+        self.draws = 0
+
+    def uniform(self):
+        self.draws += 1
+        return pc.random(self.size, initializer=get_seed(self.seed, self.draws))
+
+    def integers(self, low, high, size=None):
+        """Integers from low to high, high excluded"""
+        self.draws += 1
+        values = pc.random(size or self.size, initializer=get_seed(self.seed, self.draws))
+        return pc.add(pc.cast(pc.floor(pc.multiply(values, high - low)), pa.int64()), low)
+
+    def bernoulli(self, probability):
+        return pc.less(self.uniform(), probability)
+
+    def take(self, values, indices):
+        return pa.array(values, pa.string()).take(indices)
+
+    def choice(self, values):
+        return self.take(values, self.integers(0, len(values)))
+
+    def identifiers(self, prefix, size=None):
+        return pc.binary_join_element_wise(prefix, pc.cast(self.integers(0, 2**53, size), pa.string()), "")
+
+
+class ChunkGenerator:
+    """Generates the rows of one file of one event type and day"""
+
+    def __init__(self, config, event_type, partition_date, chunk_index, rows):
+        self.config = config
+        self.event_type = event_type
+        self.partition_date = partition_date
+        self.chunk_index = chunk_index
+        self.random = ChunkRandom(get_seed(config.seed, event_type, partition_date, chunk_index), rows)
+        self.rows = rows
+        # the repository, application, pipeline and project of each row, and its account and region as in config
+        self.resource_indices = self.random.integers(0, config.repositories)
+        accounts = len(config.account_ids)
+        account_indices = pc.remainder(self.resource_indices, accounts)
+        self.account_ids = pc.cast(pc.add(account_indices, FIRST_ACCOUNT_ID), pa.string())
+        self.regions = self.random.take(
+            config.regions, pc.remainder(pc.divide(self.resource_indices, accounts), len(config.regions))
+        )
+
+    def get_names(self, prefix, indices):
+        """Names like get_resource_name of a column of indices"""
+        return pc.binary_join_element_wise(prefix, pc.cast(indices, pa.string()), "-")
+
+    def get_resource_names(self, prefix):
+        return self.get_names(prefix, self.resource_indices)
+
+    def get_author_names(self):
+        return self.get_names("author", self.random.integers(0, self.config.authors))
+
+    def get_arns(self, service, resource_names):
+        arns = pc.binary_join_element_wise("arn:aws", service, self.regions, self.account_ids, resource_names, ":")
+        return pa.ListArray.from_arrays(pa.array(range(self.rows + 1), pa.int32()), arns)
+
+    def get_times(self):
+        """Event times in milliseconds, in ascending order over the day like firehose delivers them"""
+        day_start = datetime.combine(self.partition_date, time(), tzinfo=timezone.utc)
+        milliseconds = pc.add(self.random.integers(0, DAY_MILLISECONDS), int(day_start.timestamp() * 1000))
+        return pc.array_take(milliseconds, pc.sort_indices(milliseconds))
+
+    def get_devops_events(self, source, detail_type, resources, detail, times=None):
+        detail_fields = [
+            detail.get(field.name, pa.nulls(self.rows, field.type)) for field in DEVOPS_EVENTS_DETAIL_TYPE
+        ]
+        columns = {
+            "version": pa.array(["0"] * self.rows, pa.string()),
+            "id": self.random.identifiers(f"{self.event_type}-{self.partition_date}-{self.chunk_index}-"),
+            "detail_type": pa.array([detail_type] * self.rows, pa.string()),
+            "source": pa.array([source] * self.rows, pa.string()),
+            "account": self.account_ids,
+            "time": pc.cast(self.get_times() if times is None else times, pa.timestamp("ms")),
+            "region": self.regions,
+            "resources": resources,
+            "detail": pa.StructArray.from_arrays(detail_fields, fields=list(DEVOPS_EVENTS_DETAIL_TYPE)),
+        }
+        return pa.Table.from_pydict(columns, schema=TABLE_SCHEMAS[DEVOPS_EVENTS_PREFIX])
+
+    def get_states(self, succeeded, failed):
+        return pc.if_else(self.random.bernoulli(self.config.failure_ratio), failed, succeeded)
+
+    def generate_codecommit(self):
+        repository_names = self.get_resource_names("repository")
+        detail = {
+            "eventName": self.random.choice(["referenceUpdated", "referenceUpdated", "referenceCreated"]),
+            "repositoryName": repository_names,
+            "branchName": self.random.choice(DEFAULT_BRANCHES),
+            "authorName": self.get_author_names(),
+            "commitId": self.random.identifiers("commit-"),
+        }
+        return self.get_devops_events(
+            "aws.codecommit",
+            "CodeCommit Repository State Change",
+            self.get_arns("codecommit", repository_names),
+            detail,
+        )
+
+    def generate_codedeploy(self):
+        application_names = self.get_resource_names("application")
+        detail = {
+            "deploymentState": self.get_states("SUCCESS", "FAILURE"),
+            "deploymentId": self.random.identifiers("d-"),
+            "deploymentApplication": application_names,
+        }
+        return self.get_devops_events(
+            "aws.codedeploy",
+            "CodeDeploy Deployment State-change Notification",
+            self.get_arns("codedeploy", application_names),
+            detail,
+        )
+
+    def generate_codepipeline(self):
+        pipeline_names = self.get_resource_names("pipeline")
+        action_indices = self.random.integers(0, len(PIPELINE_ACTIONS))
+        stages, actions, categories, providers = zip(*PIPELINE_ACTIONS)
+        # an action emits an event when it starts and one when it succeeds or fails
+        states = pc.if_else(self.random.bernoulli(0.5), "STARTED", self.get_states("SUCCEEDED", "FAILED"))
+        detail = {
+            "pipelineName": pipeline_names,
+            "executionId": self.random.identifiers("execution-"),
+            "stage": self.random.take(stages, action_indices),
+            "action": self.random.take(actions, action_indices),
+            "state": states,
+            "externalExecutionId": self.random.identifiers("external-execution-"),
+            "actionCategory": self.random.take(categories, action_indices),
+            "actionOwner": pa.array(["AWS"] * self.rows, pa.string()),
+            "actionProvider": self.random.take(providers, action_indices),
+        }
+        return self.get_devops_events(
+            "aws.codepipeline",
+            "CodePipeline Action Execution State Change",
+            self.get_arns("codepipeline", pipeline_names),
+            detail,
+        )
+
+    def generate_canary_alarm(self):
+        application_names = self.get_resource_names("application")
+        repository_names = self.get_resource_names("repository")
+        alarm_names = pc.binary_join_element_wise(SOLUTION_ID, application_names, repository_names, "MTTR", "-")
+        # a failing canary goes into alarm, a recovered one back to ok after the recovery duration
+        in_alarm = self.random.bernoulli(self.config.failure_ratio)
+        durations = self.random.integers(1, MAX_RECOVERY_MINUTES + 1)
+        current_times = self.get_times()
+        detail = {
+            "canaryAlarmName": alarm_names,
+            "canaryAlarmAppName": application_names,
+            "canaryAlarmRepoName": repository_names,
+            "canaryAlarmCurrState": pc.if_else(in_alarm, "ALARM", "OK"),
+            "canaryAlarmPrevState": pc.if_else(in_alarm, "OK", "ALARM"),
+            "canaryAlarmCurrStateTimeStamp": pc.cast(current_times, pa.timestamp("ms")),
+            "canaryAlarmPrevStateTimeStamp": pc.cast(
+                pc.subtract(current_times, pc.multiply(durations, 60 * 1000)), pa.timestamp("ms")
+            ),
+            "recoveryDurationMinutes": pc.cast(durations, pa.int32()),
+            "alarmType": pa.array(["Canary"] * self.rows, pa.string()),
+        }
+        return self.get_devops_events(
+            "aws.cloudwatch",
+            "CloudWatch Alarm State Change",
+            self.get_arns("cloudwatch", pc.binary_join_element_wise("alarm", alarm_names, ":")),
+            detail,
+            current_times,
+        )
+
+    def generate_codebuild_metric(self):
+        project_names = self.get_resource_names("project")
+        # a third each of Builds, Duration and SucceededBuilds or FailedBuilds datapoints
+        metric_kinds = self.random.integers(0, 3)
+        is_duration = pc.equal(metric_kinds, 1)
+        metric_names = pc.if_else(
+            pc.equal(metric_kinds, 0),
+            "Builds",
+            pc.if_else(is_duration, "Duration", self.get_states("SucceededBuilds", "FailedBuilds")),
+        )
+        values = pc.if_else(is_duration, pc.round(pc.multiply(self.random.uniform(), 900), 1), 1.0)
+        build_numbers = self.random.integers(1, 100000)
+        dimensions = pa.StructArray.from_arrays(
+            [
+                project_names,
+                pc.binary_join_element_wise(project_names, self.random.identifiers(""), ":"),
+                pc.cast(build_numbers, pa.int32()),
+            ],
+            fields=list(TABLE_SCHEMAS[CODE_BUILD_EVENTS_PREFIX].field("dimensions").type),
+        )
+        columns = {
+            "metric_stream_name": pa.array(["codebuild-metric-stream"] * self.rows, pa.string()),
+            "account_id": self.account_ids,
+            "region": self.regions,
+            "namespace": pa.array(["AWS/CodeBuild"] * self.rows, pa.string()),
+            "metric_name": metric_names,
+            "dimensions": dimensions,
+            "timestamp": self.get_times(),
+            "value": pa.StructArray.from_arrays(
+                [pa.array([1.0] * self.rows), values, values, values], names=["count", "sum", "max", "min"]
+            ),
+            "unit": pc.if_else(is_duration, "Seconds", "Count"),
+        }
+        return pa.Table.from_pydict(columns, schema=TABLE_SCHEMAS[CODE_BUILD_EVENTS_PREFIX])
+
+    def generate_github(self):
+        commit_counts = self.random.integers(1, MAX_COMMITS_PER_PUSH + 1)
+        offsets = pa.concat_arrays([pa.array([0], pa.int64()), pc.cumulative_sum(commit_counts)])
+        commit_ids = self.random.identifiers("commit-", size=pc.sum(commit_counts).as_py())
+        columns = {
+            "repository_name": self.get_resource_names("repository"),
+            "branch_name": self.random.choice(DEFAULT_BRANCHES),
+            "author_name": self.get_author_names(),
+            "event_name": pa.array(["push"] * self.rows, pa.string()),
+            "commit_id": pa.ListArray.from_arrays(pc.cast(offsets, pa.int32()), commit_ids),
+            "time": pc.cast(self.get_times(), pa.timestamp("ms")),
+        }
+        return pa.Table.from_pydict(columns, schema=TABLE_SCHEMAS[GITHUB_EVENTS_PREFIX])
+
+    def generate(self):
+        return getattr(self, f"generate_{self.event_type}")()
+
+
+def get_file_name(event_type, chunk_index):
+    return f"{event_type}-{chunk_index:05d}.parquet"
+
+
+def generate_chunk(root_uri, config, event_type, partition_date, chunk_index, rows):
+    """Generate and write one file, return the number of rows"""
+    table = ChunkGenerator(config, event_type, partition_date, chunk_index, rows).generate()
+    filesystem, root_path = get_filesystem(root_uri)
+    partition_path = get_partition_path(root_path, EVENT_TABLES[event_type], partition_date)
+    filesystem.create_dir(partition_path)
+    pq.write_table(
+        table,
+        f"{partition_path}/{get_file_name(event_type, chunk_index)}",
+        filesystem=filesystem,
+        compression=DEFAULT_COMPRESSION,
+    )
+    return table.num_rows
+
+
+def generate_events(root_uri, config, start_date, end_date, event_types=None, max_workers=1):
+    """
+    Write the events of event_types, by default all, from start_date to end_date under root_uri, max_workers files
+    at the same time in a process pool. A file only depends on the config and its event type, day and chunk, so the
+    output of a seed is the same for any number of workers, and a rerun overwrites the files of a previous one.
+    Return the rows written of each event type.
+    """
+    event_types = event_types or EVENT_TYPES
+    arguments = [
+        (root_uri, config, event_type, partition_date, chunk_index, rows)
+        for partition_date in get_dates(start_date, end_date)
+        for event_type in event_types
+        for chunk_index, rows in enumerate(config.get_chunk_sizes(event_type))
+    ]
+    logger.info(f"generating {len(arguments)} files of {event_types} from {start_date} to {end_date}")
+    rows = None
+    if max_workers > 1 and len(arguments) > 1:
+        try:
+            executor = ProcessPoolExecutor(max_workers=min(max_workers, len(arguments)))
+        except OSError as error:
+            logger.warning(f"process pool not available, generating files one by one: {error}")
+        else:
+            with executor:
+                rows = list(executor.map(generate_chunk, *zip(*arguments), chunksize=1))
+    if rows is None:
+        rows = [generate_chunk(*chunk_arguments) for chunk_arguments in arguments]
+
+    totals = {event_type: 0 for event_type in event_types}
+    for chunk_arguments, chunk_rows in zip(arguments, rows):
+        totals[chunk_arguments[2]] += chunk_rows
+    return totals
+
+
+def generate_tags(root_uri, config, create_date):
+    """
+    Write the TaggedResources reports of the tag query lambda for the tagged share of the repositories, build
+    projects and pipelines, one json lines file per account, region and resource type, as created on create_date.
+    Return the number of tagged resources.
+    """
+    filesystem, root_path = get_filesystem(root_uri)
+    # athena timestamps are SQL not ISO
+    create_time_stamp = f"{parse_date(create_date)} 00:00:00.000"
+    random = ChunkRandom(get_seed(config.seed, "tags"), config.repositories)
+    tagged = pc.less(random.uniform(), config.tag_ratio).to_pylist()
+    reports = dict()
+    for prefix, resource_type in [
+        (TAGGED_CODECOMMIT_PREFIX, "repository"),
+        (TAGGED_CODEBUILD_PREFIX, "project"),
+        (TAGGED_CODEPIPELINE_PREFIX, "pipeline"),
+    ]:
+        for is_tagged, account_id, region, resource_name in zip(
+            tagged,
+            config.get_resource_account_ids(),
+            config.get_resource_regions(),
+            config.get_resource_names(resource_type),
+        ):
+            if not is_tagged:
+                continue
+            report = {
+                "account_id": account_id,
+                "region": region,
+                "resource_type": resource_type,
+                "resource_name": resource_name,
+                "tag": TAG,
+                "create_time_stamp": create_time_stamp,
+            }
+            key = f"{root_path}/{prefix}/{account_id}_{region}_{resource_type}_tagged.json"
+            reports.setdefault(key, []).append(json.dumps(report))
+    for key, lines in reports.items():
+        filesystem.create_dir(key.rsplit("/", 1)[0])
+        with filesystem.open_output_stream(key) as stream:
+            stream.write(("\n".join(lines) + "\n").encode())
+    return sum(len(lines) for lines in reports.values())
@@ -0,0 +1,42 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+import logging
+import threading
+from os import environ
+
+import boto3
+import botocore.config
+
+logger = logging.getLogger(__name__)
+
+# Global boto3 clients to help with initialization and performance
+_helpers_service_clients = dict()
+# Creating clients from the default boto3 session is not thread safe
+_helpers_service_clients_lock = threading.Lock()
+
+
+def get_service_client(service_name, region_name=None):
+    """Get the global service boto3 client of a region, by default of the lambda region"""
+    region_name = region_name or environ.get("AWS_REGION")
+    client_key = (service_name, region_name)
+    if client_key in _helpers_service_clients:
+        return _helpers_service_clients[client_key]
+    with _helpers_service_clients_lock:
+        if client_key not in _helpers_service_clients:
+            config = botocore.config.Config(
+                retries=dict(max_attempts=3), user_agent_extra=environ.get("UserAgentExtra")
+            )
+            logger.debug(f"Initializing global boto3 client for {service_name} in {region_name}")
+            _helpers_service_clients[client_key] = boto3.client(service_name, config=config, region_name=region_name)
+    return _helpers_service_clients[client_key]
+
+
+def get_glue_client(region_name=None):
+    """Get the global glue boto3 client"""
+    return get_service_client("glue", region_name)
+
+
+def get_s3_client(region_name=None):
+    """Get the global s3 boto3 client"""
+    return get_service_client("s3", region_name)
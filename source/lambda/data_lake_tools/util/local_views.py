@@ -0,0 +1,434 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+import logging
+from datetime import timedelta
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+from pyarrow import fs, json
+
+from util.compaction import HIDDEN_FILE_PREFIXES
+from util.datasets import DEFAULT_CONFIG_DIR, get_input_schema, read_input_columns
+from util.partitions import (
+    CODE_BUILD_EVENTS_PREFIX,
+    DEVOPS_EVENTS_PREFIX,
+    GITHUB_EVENTS_PREFIX,
+    PARTITION_KEY,
+    get_dates,
+    get_filesystem,
+    get_partition_path,
+    get_table_path,
+    get_today,
+    list_partition_dates,
+    parse_date,
+)
+from util.schemas import TABLE_SCHEMAS, TAGGED_CODEBUILD_PREFIX, TAGGED_CODECOMMIT_PREFIX, TAGGED_CODEPIPELINE_PREFIX
+
+try:
+    import duckdb
+except ImportError:  # the views run on pyarrow alone
+    duckdb = None
+
+logger = logging.getLogger(__name__)
+
+CODE_CHANGE_ACTIVITY_VIEW = "code_change_activity_view"
+RECOVERY_TIME_DETAIL_VIEW = "recovery_time_detail_view"
+CODE_DEPLOYMENT_DETAIL_VIEW = "code_deployment_detail_view"
+CODE_PIPELINE_DETAIL_VIEW = "code_pipeline_detail_view"
+CODE_BUILD_DETAIL_VIEW = "code_build_detail_view"
+GITHUB_CHANGE_ACTIVITY_VIEW = "github_change_activity_view"
+
+DUCKDB = "duckdb"
+PYARROW = "pyarrow"
+ENGINES = [DUCKDB, PYARROW]
+
+# days of data the views read, the default DataDuration of the solution
+DEFAULT_DATA_DURATION = 90
+
+# columns of the TaggedResources tables the views join on
+TAG_SCHEMA = pa.schema(
+    [("account_id", pa.string()), ("region", pa.string()), ("resource_name", pa.string()), ("tag", pa.string())]
+)
+
+
+def field(path):
+    """The expression of a column, nested columns are named by their path, e.g. detail.repositoryName"""
+    return pc.field(*path.split("."))
+
+
+class View:
+    """
+    An athena view of build_athena_query.js: the table it reads, the condition of the rows it keeps, its columns and
+    the TaggedResources table it joins on resource_column. sql is the view query with the tables named metrics_table
+    and tags_table, columns and condition the same query as arrow expressions. The data duration filter on
+    created_at is applied by the partitions that are read, the included repositories filter on repository_column.
+    """
+
+    def __init__(
+        self, table_prefix, condition, columns, sql, tags_prefix=None, resource_column=None, repository_column=None
+    ):
+        self.table_prefix = table_prefix
+        self.condition = condition
+        self.columns = {name: field(value) if isinstance(value, str) else value for name, value in columns.items()}
+        self.sql = sql
+        self.tags_prefix = tags_prefix
+        self.resource_column = resource_column
+        self.repository_column = repository_column
+
+
+VIEWS = {
+    CODE_CHANGE_ACTIVITY_VIEW: View(
+        DEVOPS_EVENTS_PREFIX,
+        pc.field("source") == "aws.codecommit",
+        {
+            "account": "account",
+            "time": "time",
+            "region": "region",
+            "event_name": "detail.eventName",
+            "repository_name": "detail.repositoryName",
+            "branch_name": "detail.branchName",
+            "author_name": "detail.authorName",
+            "commit_id": "detail.commitId",
+            "created_at": PARTITION_KEY,
+        },
+        """
+        WITH metrics AS (
+          SELECT account, time, region,
+          detail.eventName as event_name,
+          detail.repositoryName as repository_name,
+          detail.branchName as branch_name,
+          detail.authorName as author_name,
+          detail.commitId as commit_id,
+          created_at
+          FROM metrics_table
+          WHERE source = 'aws.codecommit'
+              {repository_filter}
+        )
+        SELECT metrics.account,
+        metrics.time,
+        metrics.region,
+        metrics.event_name,
+        metrics.repository_name,
+        metrics.branch_name,
+        metrics.author_name,
+        metrics.commit_id,
+        metrics.created_at,
+        tags.tag
+        FROM tags_table AS tags
+        RIGHT JOIN metrics
+        ON tags.account_id = metrics.account AND tags.region = metrics.region
+            AND tags.resource_name = metrics.repository_name
+        """,
+        TAGGED_CODECOMMIT_PREFIX,
+        "repository_name",
+        "detail.repositoryName",
+    ),
+    RECOVERY_TIME_DETAIL_VIEW: View(
+        DEVOPS_EVENTS_PREFIX,
+        pc.field("source") == "aws.cloudwatch",
+        {
+            "account": "account",
+            "time": "time",
+            "region": "region",
+            "alarm_name": "detail.canaryAlarmName",
+            "alarm_type": "detail.alarmType",
+            "application_name": "detail.canaryAlarmAppName",
+            "repository_name": "detail.canaryAlarmRepoName",
+            "current_state": "detail.canaryAlarmCurrState",
+            "previous_state": "detail.canaryAlarmPrevState",
+            "current_state_timestamp": "detail.canaryAlarmCurrStateTimeStamp",
+            "previous_state_timestamp": "detail.canaryAlarmPrevStateTimeStamp",
+            "duration_minutes": "detail.recoveryDurationMinutes",
+            "created_at": PARTITION_KEY,
+        },
+        """
+        SELECT account, time, region,
+        detail.canaryAlarmName as alarm_name,
+        detail.alarmType as alarm_type,
+        detail.canaryAlarmAppName as application_name,
+        detail.canaryAlarmRepoName as repository_name,
+        detail.canaryAlarmCurrState as current_state,
+        detail.canaryAlarmPrevState as previous_state,
+        detail.canaryAlarmCurrStateTimeStamp as current_state_timestamp,
+        detail.canaryAlarmPrevStateTimeStamp as previous_state_timestamp,
+        detail.recoveryDurationMinutes as duration_minutes, created_at
+        FROM metrics_table
+        WHERE source = 'aws.cloudwatch'
+        """,
+    ),
+    CODE_DEPLOYMENT_DETAIL_VIEW: View(
+        DEVOPS_EVENTS_PREFIX,
+        pc.field("source") == "aws.codedeploy",
+        {
+            "account": "account",
+            "time": "time",
+            "region": "region",
+            "deployment_id": "detail.deploymentId",
+            "application": "detail.deploymentApplication",
+            "state": "detail.deploymentState",
+            "created_at": PARTITION_KEY,
+        },
+        """
+        SELECT account, time, region,
+        detail.deploymentId as deployment_id,
+        detail.deploymentApplication as application,
+        detail.deploymentState as state,
+        created_at
+        FROM metrics_table
+        WHERE source = 'aws.codedeploy'
+        """,
+    ),
+    CODE_PIPELINE_DETAIL_VIEW: View(
+        DEVOPS_EVENTS_PREFIX,
+        pc.field("source") == "aws.codepipeline",
+        {
+            "account": "account",
+            "time": "time",
+            "region": "region",
+            "pipeline_name": "detail.pipelineName",
+            "execution_id": "detail.executionId",
+            "stage": "detail.stage",
+            "action": "detail.action",
+            "state": "detail.state",
+            "external_execution_id": "detail.externalExecutionId",
+            "action_category": "detail.actionCategory",
+            "action_owner": "detail.actionOwner",
+            "action_provider": "detail.actionProvider",
+            "created_at": PARTITION_KEY,
+        },
+        """
+        WITH metrics AS (
+          SELECT account, time, region,
+          detail.pipelineName as pipeline_name,
+          detail.executionId as execution_id,
+          detail.stage as stage,
+          detail.action as action,
+          detail.state as state,
+          detail.externalExecutionId as external_execution_id,
+          detail.actionCategory as action_category,
+          detail.actionOwner as action_owner,
+          detail.actionProvider as action_provider,
+          created_at
+          FROM metrics_table
+          WHERE source = 'aws.codepipeline'
+        )
+        SELECT metrics.account,
+        metrics.time,
+        metrics.region,
+        metrics.pipeline_name,
+        metrics.execution_id,
+        metrics.stage,
+        metrics.action,
+        metrics.state,
+        metrics.external_execution_id,
+        metrics.action_category,
+        metrics.action_owner,
+        metrics.action_provider,
+        metrics.created_at,
+        tags.tag
+        FROM tags_table AS tags
+        RIGHT JOIN metrics
+        ON tags.account_id = metrics.account AND tags.region = metrics.region
+            AND tags.resource_name = metrics.pipeline_name
+        """,
+        TAGGED_CODEPIPELINE_PREFIX,
+        "pipeline_name",
+    ),
+    CODE_BUILD_DETAIL_VIEW: View(
+        CODE_BUILD_EVENTS_PREFIX,
+        pc.field("namespace") == "AWS/CodeBuild",
+        {
+            "account": "account_id",
+            "region": "region",
+            "namespace": "namespace",
+            "metric_name": "metric_name",
+            "timestamp": "timestamp",
+            "project_name": "dimensions.ProjectName",
+            "build_id": "dimensions.BuildId",
+            "build_number": "dimensions.BuildNumber",
+            "count": "value.count",
+            "sum": "value.sum",
+            "max": "value.max",
+            "min": "value.min",
+            "unit": "unit",
+            "created_at": PARTITION_KEY,
+        },
+        """
+        WITH metrics AS (
+          SELECT account_id as account, region, namespace, metric_name, timestamp,
+          dimensions.ProjectName as project_name, dimensions.BuildId as build_id,
+          dimensions.BuildNumber as build_number, value.count as count, value.sum as sum,
+          value.max as max, value.min as min, unit, created_at
+          FROM metrics_table
+          WHERE namespace = 'AWS/CodeBuild'
+        )
+        SELECT metrics.account,
+        metrics.region,
+        metrics.namespace,
+        metrics.metric_name,
+        metrics.timestamp,
+        metrics.project_name,
+        metrics.build_id,
+        metrics.build_number,
+        metrics.count,
+        metrics.sum,
+        metrics.max,
+        metrics.min,
+        metrics.unit,
+        metrics.created_at,
+        tags.tag
+        FROM tags_table AS tags
+        RIGHT JOIN metrics
+        ON tags.account_id = metrics.account AND tags.region = metrics.region
+            AND tags.resource_name = metrics.project_name
+        """,
+        TAGGED_CODEBUILD_PREFIX,
+        "project_name",
+    ),
+    GITHUB_CHANGE_ACTIVITY_VIEW: View(
+        GITHUB_EVENTS_PREFIX,
+        None,
+        {
+            "repository_name": "repository_name",
+            "branch_name": "branch_name",
+            "author_name": "author_name",
+            "event_name": "event_name",
+            "commit_count": pc.list_value_length(pc.field("commit_id")).cast(pa.int32()),
+            "time": "time",
+            "created_at": PARTITION_KEY,
+        },
+        # cardinality of athena is len in duckdb
+        """
+        SELECT repository_name, branch_name, author_name, event_name, cast(len(commit_id) as int) as commit_count,
+        time, created_at
+        FROM metrics_table
+        """,
+    ),
+}
+
+
+def conform_table(table, schema):
+    """The columns of schema of table cast to their type, as quicksight reads the InputColumns of a data set"""
+    missing = [name for name in schema.names if name not in table.column_names]
+    if missing:
+        raise ValueError(f"view has no columns {missing} of the data set")
+    return pa.Table.from_arrays([table.column(column.name).cast(column.type) for column in schema], schema=schema)
+
+
+def list_data_files(filesystem, partition_path):
+    """The files of a partition athena reads, without the hidden staging and manifest files, sorted"""
+    return sorted(
+        file_info.path
+        for file_info in filesystem.get_file_info(fs.FileSelector(partition_path))
+        if file_info.type == fs.FileType.File and not file_info.base_name.startswith(HIDDEN_FILE_PREFIXES)
+    )
+
+
+class LocalViews:
+    """
+    Runs the athena views of the dashboard data sets over the metrics tables under a root uri, e.g. a local
+    directory written by the event generator or s3://metrics-bucket, with duckdb where it is installed and pyarrow
+    otherwise. The result of a view has the InputColumns of the data set that reads it.
+
+    The views read the created_at partitions of the data_duration days before current_date and current_date itself,
+    like the data duration filter of the athena views.
+    """
+
+    def __init__(
+        self,
+        root_uri,
+        data_duration=DEFAULT_DATA_DURATION,
+        current_date=None,
+        included_repositories=None,
+        engine=None,
+        config_dir=DEFAULT_CONFIG_DIR,
+    ):
+        engine = engine or (DUCKDB if duckdb else PYARROW)
+        if engine not in ENGINES:
+            raise ValueError(f"unknown engine {engine}, expected one of {ENGINES}")
+        if engine == DUCKDB and duckdb is None:
+            raise ValueError("duckdb is not installed")
+        self.filesystem, self.root_path = get_filesystem(root_uri)
+        self.current_date = parse_date(current_date) if current_date else get_today()
+        self.dates = get_dates(self.current_date - timedelta(days=data_duration), self.current_date)
+        self.included_repositories = included_repositories or []
+        self.engine = engine
+        self.input_columns = read_input_columns(config_dir)
+
+    def list_files(self, table_prefix):
+        """The data files of the partitions of table_prefix the views read"""
+        table_path = get_table_path(self.root_path, table_prefix)
+        files = []
+        for partition_date in sorted(set(self.dates) & set(list_partition_dates(self.filesystem, table_path))):
+            partition_path = get_partition_path(self.root_path, table_prefix, partition_date)
+            files.extend(list_data_files(self.filesystem, partition_path))
+        return files
+
+    def get_dataset(self, table_prefix):
+        """The partitions of table_prefix the views read, with the created_at partition key as a column"""
+        partition_schema = pa.schema([(PARTITION_KEY, pa.string())])
+        return ds.dataset(
+            self.list_files(table_prefix),
+            schema=pa.unify_schemas([TABLE_SCHEMAS[table_prefix], partition_schema]),
+            format="parquet",
+            filesystem=self.filesystem,
+            partitioning=ds.partitioning(partition_schema, flavor="hive"),
+            partition_base_dir=get_table_path(self.root_path, table_prefix),
+        )
+
+    def read_tags(self, tags_prefix):
+        """The TaggedResources reports of tags_prefix, json lines files of one account, region and resource type"""
+        selector = fs.FileSelector(f"{self.root_path}/{tags_prefix}", allow_not_found=True, recursive=True)
+        parse_options = json.ParseOptions(explicit_schema=TAG_SCHEMA, unexpected_field_behavior="ignore")
+        tables = []
+        for file_info in self.filesystem.get_file_info(selector):
+            if file_info.type == fs.FileType.File and not file_info.base_name.startswith(HIDDEN_FILE_PREFIXES):
+                with self.filesystem.open_input_stream(file_info.path) as stream:
+                    tables.append(json.read_json(stream, parse_options=parse_options))
+        return pa.concat_tables(tables) if tables else TAG_SCHEMA.empty_table()
+
+    def query_duckdb(self, view, dataset, tags):
+        repository_filter = ""
+        parameters = None
+        if view.repository_column and self.included_repositories:
+            repository_filter = f"AND list_contains($repositories, {view.repository_column})"
+            parameters = {"repositories": self.included_repositories}
+        # the connection is closed before the arrow data it scans is released
+        with duckdb.connect() as connection:
+            connection.register("metrics_table", dataset)
+            if tags is not None:
+                connection.register("tags_table", tags)
+            sql = view.sql.format(repository_filter=repository_filter)
+            return connection.execute(sql, parameters).to_arrow_table()
+
+    def query_pyarrow(self, view, dataset, tags):
+        condition = view.condition
+        if view.repository_column and self.included_repositories:
+            condition = condition & field(view.repository_column).isin(self.included_repositories)
+        table = dataset.to_table(columns=view.columns, filter=condition)
+        if tags is None:
+            return table
+        # the right join of metrics on tags keeps every metrics row
+        return table.join(
+            tags,
+            keys=["account", "region", view.resource_column],
+            right_keys=["account_id", "region", "resource_name"],
+            join_type="left outer",
+        )
+
+    def query(self, view_name):
+        """The rows of a view as the data set reading it gets them"""
+        if view_name not in VIEWS:
+            raise ValueError(f"unknown view {view_name}, expected one of {list(VIEWS)}")
+        if view_name not in self.input_columns:
+            raise ValueError(f"no data set config reads {view_name}")
+        view = VIEWS[view_name]
+        dataset = self.get_dataset(view.table_prefix)
+        tags = self.read_tags(view.tags_prefix) if view.tags_prefix else None
+        if self.engine == DUCKDB:
+            table = self.query_duckdb(view, dataset, tags)
+        else:
+            table = self.query_pyarrow(view, dataset, tags)
+        return conform_table(table, get_input_schema(self.input_columns[view_name]))
@@ -0,0 +1,105 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+import copy
+import logging
+
+from util.helpers import get_glue_client
+from util.partitions import PARTITION_DATE_FORMAT, get_dates, get_filesystem, get_partition_name, list_partition_dates
+
+logger = logging.getLogger(__name__)
+
+# partitions created by one batch_create_partition call at most
+BATCH_CREATE_PARTITION_LIMIT = 100
+ALREADY_EXISTS_ERROR = "AlreadyExistsException"
+
+
+def chunks(items, size):
+    for offset in range(0, len(items), size):
+        yield items[offset : offset + size]
+
+
+def list_partitions(glue_client, database_name, table_name):
+    """The partitions of a table in the catalog, without their column schema"""
+    parameters = {"DatabaseName": database_name, "TableName": table_name, "ExcludeColumnSchema": True}
+    while True:
+        response = glue_client.get_partitions(**parameters)
+        yield from response.get("Partitions", [])
+        if not response.get("NextToken"):
+            break
+        parameters["NextToken"] = response["NextToken"]
+
+
+class PartitionRegistrar:
+    """
+    Registers the created_at partitions of a glue table: the partition prefixes that exist under the table location
+    are diffed against the partitions in the catalog, and the missing ones are created in batches. A day that was
+    missed, e.g. after a failed run, is registered by the next run that covers it.
+    """
+
+    def __init__(self, database_name, table_name, glue_client=None):
+        self.database_name = database_name
+        self.table_name = table_name
+        self.glue_client = glue_client or get_glue_client()
+        self._storage_descriptor = None
+
+    @property
+    def storage_descriptor(self):
+        if self._storage_descriptor is None:
+            response = self.glue_client.get_table(DatabaseName=self.database_name, Name=self.table_name)
+            self._storage_descriptor = response["Table"]["StorageDescriptor"]
+        return self._storage_descriptor
+
+    @property
+    def location(self):
+        return self.storage_descriptor["Location"].rstrip("/")
+
+    def list_data_dates(self):
+        """The dates of the partition prefixes under the table location"""
+        filesystem, table_path = get_filesystem(self.location)
+        return list_partition_dates(filesystem, table_path)
+
+    def list_registered_values(self):
+        """The created_at values of the partitions in the catalog"""
+        return {
+            partition["Values"][0]
+            for partition in list_partitions(self.glue_client, self.database_name, self.table_name)
+        }
+
+    def get_partition_input(self, partition_date):
+        storage_descriptor = copy.deepcopy(self.storage_descriptor)
+        storage_descriptor["Location"] = f"{self.location}/{get_partition_name(partition_date)}/"
+        return {"Values": [partition_date.strftime(PARTITION_DATE_FORMAT)], "StorageDescriptor": storage_descriptor}
+
+    def create_partitions(self, partition_dates):
+        """Create the partitions of the dates, return the values of the partitions that could not be created"""
+        failed = []
+        for chunk in chunks(sorted(partition_dates), BATCH_CREATE_PARTITION_LIMIT):
+            response = self.glue_client.batch_create_partition(
+                DatabaseName=self.database_name,
+                TableName=self.table_name,
+                PartitionInputList=[self.get_partition_input(partition_date) for partition_date in chunk],
+            )
+            for error in response.get("Errors", []):
+                # created in the meantime, e.g. by a concurrent run
+                if error["ErrorDetail"]["ErrorCode"] != ALREADY_EXISTS_ERROR:
+                    logger.error(f"Error creating partition {error['PartitionValues']} of {self.table_name}: {error}")
+                    failed.extend(error["PartitionValues"])
+        return failed
+
+    def register(self, start_date, end_date, dates_without_data=None):
+        """
+        Create the missing partitions from start_date to end_date, both included, of the prefixes that exist and
+        of dates_without_data, e.g. today before firehose delivered data for it
+        """
+        dates = set(get_dates(start_date, end_date))
+        candidates = (dates & set(self.list_data_dates())) | set(dates_without_data or [])
+        registered = self.list_registered_values()
+        missing = sorted(
+            partition_date
+            for partition_date in candidates
+            if partition_date.strftime(PARTITION_DATE_FORMAT) not in registered
+        )
+        failed = self.create_partitions(missing) if missing else []
+        logger.info(f"registered {len(missing) - len(failed)} partitions of {self.database_name}.{self.table_name}")
+        return {"Table": self.table_name, "Created": len(missing) - len(failed), "Failed": failed}
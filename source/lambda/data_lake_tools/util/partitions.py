@@ -0,0 +1,80 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+import logging
+import re
+from datetime import date, datetime, timedelta, timezone
+
+from pyarrow import fs
+
+logger = logging.getLogger(__name__)
+
+PARTITION_KEY = "created_at"
+PARTITION_DATE_FORMAT = "%Y-%m-%d"
+PARTITION_PATTERN = re.compile(rf"^{PARTITION_KEY}=(\d{{4}}-\d{{2}}-\d{{2}})$")
+
+# s3 prefixes of the glue tables the firehose delivery streams write parquet to, by created_at of arrival
+DEVOPS_EVENTS_PREFIX = "DevopsEvents"
+CODE_BUILD_EVENTS_PREFIX = "CodeBuildEvents"
+GITHUB_EVENTS_PREFIX = "GitHubEvents"
+TABLE_PREFIXES = [DEVOPS_EVENTS_PREFIX, CODE_BUILD_EVENTS_PREFIX, GITHUB_EVENTS_PREFIX]
+
+# columns the compacted files of each table are sorted by, the account, region and repository or project the data
+# sets filter and join on. Nested columns are named by their path.
+TABLE_SORT_KEYS = {
+    DEVOPS_EVENTS_PREFIX: ["account", "region", "detail.repositoryName"],
+    CODE_BUILD_EVENTS_PREFIX: ["account_id", "region", "dimensions.ProjectName"],
+    GITHUB_EVENTS_PREFIX: ["repository_name", "branch_name"],
+}
+
+
+def get_filesystem(root_uri):
+    """Get the filesystem and root path of a uri, e.g. s3://metrics-bucket or a local directory"""
+    return fs.FileSystem.from_uri(root_uri)
+
+
+def parse_date(value):
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(value, PARTITION_DATE_FORMAT).date()
+
+
+def get_today():
+    """The day firehose writes to, partitions are created by arrival time in UTC"""
+    return datetime.now(timezone.utc).date()
+
+
+def get_yesterday():
+    """The most recent day firehose no longer writes to"""
+    return get_today() - timedelta(days=1)
+
+
+def get_dates(start_date, end_date):
+    """The dates from start_date to end_date, both included"""
+    start_date, end_date = parse_date(start_date), parse_date(end_date)
+    if start_date > end_date:
+        raise ValueError(f"start date {start_date} is after end date {end_date}")
+    return [start_date + timedelta(days=days) for days in range((end_date - start_date).days + 1)]
+
+
+def get_partition_name(partition_date):
+    return f"{PARTITION_KEY}={parse_date(partition_date).strftime(PARTITION_DATE_FORMAT)}"
+
+
+def get_partition_path(root_path, table_prefix, partition_date):
+    return f"{get_table_path(root_path, table_prefix)}/{get_partition_name(partition_date)}"
+
+
+def get_table_path(root_path, table_prefix):
+    return f"{root_path.rstrip('/')}/{table_prefix}"
+
+
+def list_partition_dates(filesystem, table_path):
+    """The dates of the created_at partitions that exist under the path of a table, sorted"""
+    selector = fs.FileSelector(table_path.rstrip("/"), allow_not_found=True)
+    partition_dates = []
+    for file_info in filesystem.get_file_info(selector):
+        match = PARTITION_PATTERN.match(file_info.base_name)
+        if file_info.type == fs.FileType.Directory and match:
+            partition_dates.append(parse_date(match.group(1)))
+    return sorted(partition_dates)
@@ -0,0 +1,169 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from util.helpers import get_glue_client, get_s3_client
+from util.partition_registrar import chunks, list_partitions
+from util.partitions import PARTITION_PATTERN, get_partition_name, get_today, parse_date
+
+logger = logging.getLogger(__name__)
+
+# partitions deleted by one batch_delete_partition call at most
+BATCH_DELETE_PARTITION_LIMIT = 25
+# objects deleted by one delete_objects call at most
+DELETE_OBJECTS_LIMIT = 1000
+# partition prefixes whose objects are deleted at the same time
+DEFAULT_MAX_WORKERS = 8
+ENTITY_NOT_FOUND_ERROR = "EntityNotFoundException"
+
+
+def parse_s3_uri(uri):
+    """The bucket and key prefix of an s3 uri, e.g. s3://metrics-bucket/DevopsEvents/"""
+    if not uri.startswith("s3://"):
+        raise ValueError(f"{uri} is not an s3 uri")
+    bucket, _, prefix = uri[len("s3://") :].partition("/")
+    return bucket, prefix.rstrip("/") + "/" if prefix else ""
+
+
+def get_partition_date(value):
+    """The date of a created_at partition value, e.g. 2024-01-31 or 2024-01-31 00:00:00, None if it is not one"""
+    try:
+        return parse_date(value[:10])
+    except ValueError:
+        return None
+
+
+class RetentionPruner:
+    """
+    Removes the created_at partitions of a glue table older than retention_days, first from the catalog so queries
+    stop reading them, then their objects from s3. The partitions are those in the catalog and those with objects
+    in s3, so data that was never registered is removed too. In dry run mode, nothing is deleted and the result
+    reports what would be.
+    """
+
+    def __init__(
+        self,
+        database_name,
+        table_name,
+        retention_days,
+        dry_run=False,
+        max_workers=DEFAULT_MAX_WORKERS,
+        glue_client=None,
+        s3_client=None,
+    ):
+        if retention_days < 1:
+            raise ValueError(f"retention of {retention_days} days would remove the partition of today")
+        self.database_name = database_name
+        self.table_name = table_name
+        self.retention_days = retention_days
+        self.dry_run = dry_run
+        self.max_workers = max_workers
+        self.glue_client = glue_client or get_glue_client()
+        self.s3_client = s3_client or get_s3_client()
+
+    def get_cutoff(self):
+        """The oldest date that is kept"""
+        return get_today() - timedelta(days=self.retention_days)
+
+    def get_location(self):
+        response = self.glue_client.get_table(DatabaseName=self.database_name, Name=self.table_name)
+        return parse_s3_uri(response["Table"]["StorageDescriptor"]["Location"])
+
+    def list_expired_values(self, cutoff):
+        """The created_at values of the partitions in the catalog older than cutoff"""
+        values = []
+        for partition in list_partitions(self.glue_client, self.database_name, self.table_name):
+            partition_date = get_partition_date(partition["Values"][0])
+            if partition_date and partition_date < cutoff:
+                values.append(partition["Values"][0])
+        return sorted(values)
+
+    def list_expired_dates(self, bucket, prefix, cutoff):
+        """The dates of the partition prefixes in s3 older than cutoff"""
+        parameters = {"Bucket": bucket, "Prefix": prefix, "Delimiter": "/"}
+        dates = []
+        while True:
+            response = self.s3_client.list_objects_v2(**parameters)
+            for common_prefix in response.get("CommonPrefixes", []):
+                match = PARTITION_PATTERN.match(common_prefix["Prefix"][len(prefix) :].rstrip("/"))
+                if match and parse_date(match.group(1)) < cutoff:
+                    dates.append(parse_date(match.group(1)))
+            if not response.get("IsTruncated"):
+                break
+            parameters["ContinuationToken"] = response["NextContinuationToken"]
+        return dates
+
+    def delete_partitions(self, values):
+        """Delete the partitions of the values from the catalog, return the values that could not be deleted"""
+        failed = []
+        for chunk in chunks(values, BATCH_DELETE_PARTITION_LIMIT):
+            response = self.glue_client.batch_delete_partition(
+                DatabaseName=self.database_name,
+                TableName=self.table_name,
+                PartitionsToDelete=[{"Values": [value]} for value in chunk],
+            )
+            for error in response.get("Errors", []):
+                # deleted in the meantime, e.g. by a concurrent run
+                if error["ErrorDetail"]["ErrorCode"] != ENTITY_NOT_FOUND_ERROR:
+                    logger.error(f"Error deleting partition {error['PartitionValues']} of {self.table_name}: {error}")
+                    failed.extend(error["PartitionValues"])
+        return failed
+
+    def delete_objects(self, bucket, prefix):
+        """
+        Delete the objects under prefix, a page of the listing at a time, return the number of objects deleted,
+        or that would be in dry run mode, and the keys that could not be deleted
+        """
+        parameters = {"Bucket": bucket, "Prefix": prefix, "MaxKeys": DELETE_OBJECTS_LIMIT}
+        deleted = 0
+        failed = []
+        while True:
+            response = self.s3_client.list_objects_v2(**parameters)
+            keys = [{"Key": s3_object["Key"]} for s3_object in response.get("Contents", [])]
+            if keys and not self.dry_run:
+                result = self.s3_client.delete_objects(Bucket=bucket, Delete={"Objects": keys, "Quiet": True})
+                errors = result.get("Errors", [])
+                for error in errors:
+                    logger.error(f"Error deleting s3://{bucket}/{error['Key']}: {error.get('Message')}")
+                failed.extend(error["Key"] for error in errors)
+                deleted += len(keys) - len(errors)
+            else:
+                deleted += len(keys)
+            if not response.get("IsTruncated"):
+                break
+            parameters["ContinuationToken"] = response["NextContinuationToken"]
+        return deleted, failed
+
+    def prune(self):
+        cutoff = self.get_cutoff()
+        bucket, prefix = self.get_location()
+        values = self.list_expired_values(cutoff)
+        dates = {get_partition_date(value) for value in values} | set(self.list_expired_dates(bucket, prefix, cutoff))
+        partition_prefixes = [f"{prefix}{get_partition_name(partition_date)}/" for partition_date in sorted(dates)]
+        logger.info(
+            f"{'would prune' if self.dry_run else 'pruning'} {len(values)} partitions and {len(partition_prefixes)} "
+            f"prefixes of {self.database_name}.{self.table_name} before {cutoff}"
+        )
+
+        failed_partitions = [] if self.dry_run else self.delete_partitions(values)
+        # the data of a partition that is still in the catalog is kept
+        kept = {f"{prefix}{get_partition_name(get_partition_date(value))}/" for value in failed_partitions}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            results = list(
+                executor.map(
+                    lambda partition_prefix: self.delete_objects(bucket, partition_prefix),
+                    [partition_prefix for partition_prefix in partition_prefixes if partition_prefix not in kept],
+                )
+            )
+        return {
+            "Table": self.table_name,
+            "Cutoff": str(cutoff),
+            "DryRun": self.dry_run,
+            "Partitions": values,
+            "Prefixes": partition_prefixes,
+            "DeletedObjects": sum(deleted for deleted, _ in results),
+            "Failed": failed_partitions + [key for _, failed_keys in results for key in failed_keys],
+        }
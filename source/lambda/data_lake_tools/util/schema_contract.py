@@ -0,0 +1,137 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from util.datasets import DEFAULT_CONFIG_DIR, INPUT_COLUMN_TYPE_CHECKS, read_input_columns
+from util.local_views import TAG_SCHEMA, VIEWS, list_data_files
+from util.partitions import (
+    PARTITION_KEY,
+    TABLE_PREFIXES,
+    get_filesystem,
+    get_partition_path,
+    get_table_path,
+    list_partition_dates,
+)
+from util.schemas import TABLE_SCHEMAS
+
+logger = logging.getLogger(__name__)
+
+# most recent partitions of each table whose files are checked
+DEFAULT_SAMPLE_PARTITIONS = 2
+# files of a partition whose footers are read at most
+DEFAULT_SAMPLE_FILES = 10
+# footers read at the same time, from s3 most of the time is latency
+DEFAULT_MAX_WORKERS = 16
+# the created_at partition key of the glue tables is a TIMESTAMP
+PARTITION_KEY_TYPE = pa.timestamp("ms")
+GLUE_TABLE_SOURCE = "glue table"
+
+
+def get_source_schema(view, table_schema):
+    """The columns a view reads: those of the table, its partition key and the tag of the tags it joins"""
+    fields = list(table_schema) + [pa.field(PARTITION_KEY, PARTITION_KEY_TYPE)]
+    if view.tags_prefix:
+        fields.append(TAG_SCHEMA.field("tag"))
+    return pa.schema(fields)
+
+
+def get_view_column_type(source_schema, expression):
+    """The type of a view column over source_schema, None if the columns it reads are missing or of another type"""
+    try:
+        table = ds.dataset(source_schema.empty_table()).to_table(columns={"column": expression})
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+        return None
+    return table.schema.field("column").type
+
+
+def check_view(view_name, input_columns, table_schema, source):
+    """
+    The problems of the InputColumns of the data set reading view_name against the table schema of a source, the
+    glue table or a parquet file: data set columns the view does not have, and view columns whose type quicksight
+    cannot read as the InputColumns type without a cast
+    """
+    view = VIEWS[view_name]
+    source_schema = get_source_schema(view, table_schema)
+    view_columns = {**view.columns, "tag": pc.field("tag")} if view.tags_prefix else view.columns
+    problems = []
+    for input_column in input_columns:
+        name, input_type = input_column["Name"], input_column["Type"]
+        problem = {"View": view_name, "Column": name, "Type": input_type, "Source": source}
+        if input_type not in INPUT_COLUMN_TYPE_CHECKS:
+            problems.append({**problem, "Problem": f"unknown type, expected one of {list(INPUT_COLUMN_TYPE_CHECKS)}"})
+        elif name not in view_columns:
+            problems.append({**problem, "Problem": "the view has no such column"})
+        else:
+            column_type = get_view_column_type(source_schema, view_columns[name])
+            if column_type is None:
+                problems.append({**problem, "Problem": "the columns the view reads are missing"})
+            elif not INPUT_COLUMN_TYPE_CHECKS[input_type](column_type):
+                problems.append({**problem, "Problem": f"the view column is {column_type}"})
+    return problems
+
+
+def list_sample_files(filesystem, root_path, table_prefix, sample_partitions, sample_files):
+    """The first files of the most recent partitions of a table"""
+    partition_dates = list_partition_dates(filesystem, get_table_path(root_path, table_prefix))
+    files = []
+    for partition_date in partition_dates[-sample_partitions:]:
+        partition_path = get_partition_path(root_path, table_prefix, partition_date)
+        files.extend(list_data_files(filesystem, partition_path)[:sample_files])
+    return files
+
+
+def read_file_schemas(filesystem, files, max_workers=DEFAULT_MAX_WORKERS):
+    """The arrow schemas of the footers of parquet files, by file. No column data is read."""
+    if not files:
+        return {}
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(files))) as executor:
+        schemas = executor.map(lambda path: pq.read_schema(path, filesystem=filesystem), files)
+        return dict(zip(files, schemas))
+
+
+def check_contracts(
+    root_uri=None,
+    config_dir=DEFAULT_CONFIG_DIR,
+    sample_partitions=DEFAULT_SAMPLE_PARTITIONS,
+    sample_files=DEFAULT_SAMPLE_FILES,
+    max_workers=DEFAULT_MAX_WORKERS,
+):
+    """
+    Check the InputColumns of every data set config against the glue table schemas the views read, and with a
+    root_uri, against the footers of sample files of the tables under it, e.g. s3://metrics-bucket or a local
+    directory. Files with the same schema are checked once, and a problem is reported for the first file it is
+    found in.
+    """
+    input_columns = read_input_columns(config_dir)
+    problems = []
+    for view_name, columns in input_columns.items():
+        if view_name not in VIEWS:
+            problems.append({"View": view_name, "Source": config_dir, "Problem": "no such athena view"})
+            continue
+        table_schema = TABLE_SCHEMAS[VIEWS[view_name].table_prefix]
+        problems.extend(check_view(view_name, columns, table_schema, GLUE_TABLE_SOURCE))
+
+    files = 0
+    if root_uri:
+        filesystem, root_path = get_filesystem(root_uri)
+        for table_prefix in TABLE_PREFIXES:
+            sample = list_sample_files(filesystem, root_path, table_prefix, sample_partitions, sample_files)
+            files += len(sample)
+            checked = set()
+            for path, schema in read_file_schemas(filesystem, sample, max_workers).items():
+                schema = schema.remove_metadata()
+                if schema in checked:
+                    continue
+                checked.add(schema)
+                for view_name, columns in input_columns.items():
+                    if view_name in VIEWS and VIEWS[view_name].table_prefix == table_prefix:
+                        problems.extend(check_view(view_name, columns, schema, path))
+    logger.info(f"checked {len(input_columns)} data sets against {files} files, found {len(problems)} problems")
+    return {"DataSets": len(input_columns), "Files": files, "Problems": problems}
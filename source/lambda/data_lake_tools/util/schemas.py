@@ -0,0 +1,107 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+import pyarrow as pa
+
+from util.partitions import CODE_BUILD_EVENTS_PREFIX, DEVOPS_EVENTS_PREFIX, GITHUB_EVENTS_PREFIX
+
+# parquet schemas of the glue tables of database_construct.ts, without the created_at partition key. Glue STRING,
+# INTEGER, BIG_INT, DOUBLE and TIMESTAMP columns are string, int32, int64, float64 and timestamp columns.
+DEVOPS_EVENTS_DETAIL_TYPE = pa.struct(
+    [
+        ("eventName", pa.string()),
+        ("repositoryName", pa.string()),
+        ("branchName", pa.string()),
+        ("authorName", pa.string()),
+        ("commitId", pa.string()),
+        ("canaryAlarmName", pa.string()),
+        ("canaryAlarmAppName", pa.string()),
+        ("canaryAlarmRepoName", pa.string()),
+        ("canaryAlarmCurrState", pa.string()),
+        ("canaryAlarmPrevState", pa.string()),
+        ("canaryAlarmCurrStateTimeStamp", pa.timestamp("ms")),
+        ("canaryAlarmPrevStateTimeStamp", pa.timestamp("ms")),
+        ("recoveryDurationMinutes", pa.int32()),
+        ("deploymentState", pa.string()),
+        ("deploymentId", pa.string()),
+        ("deploymentApplication", pa.string()),
+        ("pipelineName", pa.string()),
+        ("executionId", pa.string()),
+        ("stage", pa.string()),
+        ("action", pa.string()),
+        ("state", pa.string()),
+        ("externalExecutionId", pa.string()),
+        ("actionCategory", pa.string()),
+        ("actionOwner", pa.string()),
+        ("actionProvider", pa.string()),
+        ("alarmType", pa.string()),
+    ]
+)
+
+DEVOPS_EVENTS_SCHEMA = pa.schema(
+    [
+        ("version", pa.string()),
+        ("id", pa.string()),
+        ("detail_type", pa.string()),
+        ("source", pa.string()),
+        ("account", pa.string()),
+        ("time", pa.timestamp("ms")),
+        ("region", pa.string()),
+        ("resources", pa.list_(pa.string())),
+        ("detail", DEVOPS_EVENTS_DETAIL_TYPE),
+    ]
+)
+
+CODE_BUILD_EVENTS_SCHEMA = pa.schema(
+    [
+        ("metric_stream_name", pa.string()),
+        ("account_id", pa.string()),
+        ("region", pa.string()),
+        ("namespace", pa.string()),
+        ("metric_name", pa.string()),
+        (
+            "dimensions",
+            pa.struct([("ProjectName", pa.string()), ("BuildId", pa.string()), ("BuildNumber", pa.int32())]),
+        ),
+        ("timestamp", pa.int64()),
+        (
+            "value",
+            pa.struct([("count", pa.float64()), ("sum", pa.float64()), ("max", pa.float64()), ("min", pa.float64())]),
+        ),
+        ("unit", pa.string()),
+    ]
+)
+
+GITHUB_EVENTS_SCHEMA = pa.schema(
+    [
+        ("repository_name", pa.string()),
+        ("branch_name", pa.string()),
+        ("author_name", pa.string()),
+        ("event_name", pa.string()),
+        ("commit_id", pa.list_(pa.string())),
+        ("time", pa.timestamp("ms")),
+    ]
+)
+
+TABLE_SCHEMAS = {
+    DEVOPS_EVENTS_PREFIX: DEVOPS_EVENTS_SCHEMA,
+    CODE_BUILD_EVENTS_PREFIX: CODE_BUILD_EVENTS_SCHEMA,
+    GITHUB_EVENTS_PREFIX: GITHUB_EVENTS_SCHEMA,
+}
+
+# json tables of the tagged resources the tag query lambda reports, one file per account, region and resource type
+TAGGED_RESOURCES_PREFIX = "TaggedResources"
+TAGGED_CODECOMMIT_PREFIX = f"{TAGGED_RESOURCES_PREFIX}/CodeCommit"
+TAGGED_CODEBUILD_PREFIX = f"{TAGGED_RESOURCES_PREFIX}/CodeBuild"
+TAGGED_CODEPIPELINE_PREFIX = f"{TAGGED_RESOURCES_PREFIX}/CodePipeline"
+
+TAGS_SCHEMA = pa.schema(
+    [
+        ("account_id", pa.string()),
+        ("region", pa.string()),
+        ("resource_type", pa.string()),
+        ("resource_name", pa.string()),
+        ("tag", pa.string()),
+        ("create_time_stamp", pa.timestamp("ms")),
+    ]
+)
@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+import logging
+from os import environ
+
+from util.dashboard import DEFAULT_EMBED_SESSION_LIFETIME_MINUTES
+from util.quicksight_application import QuicksightApplication
+from util.state import ApplicationState
+
+logger = logging.getLogger(__name__)
+
+# user logged for the urls of anonymous users
+ANONYMOUS_USER = "anonymous"
+
+# Global dashboards by stack name and region. Keep in execution context of lambda
+_dashboards = dict()
+
+
+def get_dashboard(stack_name, region=None):
+    """Get the dashboard of a stack, its id and arn are derived from the stack name like in the custom resource"""
+    key = (stack_name, region)
+    if key not in _dashboards:
+        quicksight_application = QuicksightApplication(
+            {"StackName": stack_name, "Region": region}, state=ApplicationState()
+        )
+        _dashboards[key] = quicksight_application.get_dashboard()
+    return _dashboards[key]
+
+
+def get_allowed_domains():
+    allowed_domains = environ.get("EMBED_ALLOWED_DOMAINS", "")
+    return [domain.strip() for domain in allowed_domains.split(",") if domain.strip()]
+
+
+def get_embed_url(dashboard, user_arn=None):
+    """
+    Get a new embed url of the dashboard for a registered user, or for an anonymous user without user_arn. An embed
+    url can be redeemed only once, within 5 minutes, so urls are never cached or shared between requests: only the
+    dashboard, which is derived from the stack name, is kept across invocations.
+    """
+    session_lifetime_minutes = int(
+        environ.get("EMBED_SESSION_LIFETIME_MINUTES", DEFAULT_EMBED_SESSION_LIFETIME_MINUTES)
+    )
+    allowed_domains = get_allowed_domains()
+    if user_arn:
+        return dashboard.generate_embed_url_for_registered_user(user_arn, session_lifetime_minutes, allowed_domains)
+    return dashboard.generate_embed_url_for_anonymous_user(session_lifetime_minutes, allowed_domains=allowed_domains)
+
+
+def handler(event, context):
+    """
+    Return the embed url of the dashboard of a stack, the StackName of the event or the STACK_NAME environment
+    variable, for the UserArn of the event or for an anonymous user
+    """
+    stack_name = event.get("StackName") or environ.get("STACK_NAME")
+    if not stack_name:
+        raise ValueError("Missing StackName in event and STACK_NAME environment variable")
+    dashboard = get_dashboard(stack_name, event.get("Region"))
+    user_arn = event.get("UserArn")
+
+    embed_url = get_embed_url(dashboard, user_arn)
+    logger.info(f"returning embed url of dashboard id:{dashboard.id} for user:{user_arn or ANONYMOUS_USER}")
+    return {"DashboardId": dashboard.id, "EmbedUrl": embed_url}
@@ -3,17 +3,26 @@
 # SPDX-License-Identifier: Apache-2.0
 
 import logging
+import time
 
 from crhelper import CfnResource
-from util.logging import get_logger
-from util.quicksight import QuicksightApi
+from util.instrumentation import get_api_call_recorder
+from util.logging import get_logger, payload
+from util.quicksight import QuicksightApi, provision_regions, provision_stacks
+from util.quicksight_resource import QuickSightFailure
+from util.tracing import get_tracer, start_tracing
 
 logger = logging.getLogger(__name__)
 helper = CfnResource(json_logging=False, log_level="INFO")
 
+# UpdateStrategy property value for in place updates with a blue/green dashboard version switch
+BLUE_GREEN_UPDATE_STRATEGY = "blue-green"
+# seconds kept at the end of the invocation to send the response to CloudFormation
+RESPONSE_TIME_MARGIN_SECONDS = 3
+
 
 def get_resource_properties(event, _):
-    logger.debug(f"servicing request event:{event}")
+    logger.debug("servicing request event:%s", payload(event))
     request_type = event["RequestType"]
     resource_properties = event["ResourceProperties"]
     resource = resource_properties["Resource"]
@@ -35,35 +44,43 @@ def log_exception(error):
     logger.error(repr(format_exception))
 
 
+def get_deadline(context):
+    """time.monotonic() value by which the work of the invocation must be done, None without a lambda context"""
+    if not context:
+        return None
+    return time.monotonic() + context.get_remaining_time_in_millis() / 1000 - RESPONSE_TIME_MARGIN_SECONDS
+
+
+def rollback(qs_api, resource):
+    """
+    Delete the resources after a failed create or update. A failed permissions resource leaves them in place, the
+    resources were not created by it and only their permissions may be partly reconciled.
+    """
+    if resource == "permissions":
+        return
+    with get_tracer().span("rollback", category="phase", resource=resource):
+        qs_api.delete_all_resources()
+
+
 @helper.create
-def custom_resource_create(event, _):
+def custom_resource_create(event, context):
     request_type = "Create"
-    resource_properties = get_resource_properties(event, _)
+    resource_properties = get_resource_properties(event, context)
     resource = resource_properties["Resource"]
+    if is_fan_out_request(resource_properties):
+        return custom_resource_fan_out(resource_properties, request_type, deadline=get_deadline(context))
     qs_api = QuicksightApi(resource_properties)
+    tracer = get_tracer()
 
     try:
-        if resource == "all":
-            qs_api.create_all_resources()
-        elif resource == "datasource":
-            qs_api.create_data_source()
-        elif resource == "dataset":
-            qs_api.create_data_sets()
-        elif resource == "analysis":
-            qs_api.create_analysis()
-        elif resource == "dashboard":
-            qs_api.create_dashboard()
-        else:
-            logger.error(f"Not handling request resource:{resource}, request_type:{request_type}")
-            raise ValueError(f"Received unsupported request request_type:{request_type}, resource:{resource}")
+        with tracer.span("create", category="phase", resource=resource):
+            create_resource(qs_api, resource, request_type)
         if resource in ["all", "analysis", "dashboard"]:
-            analysis_url = qs_api.quicksight_application.get_analysis().url
-            dashboard_url = qs_api.quicksight_application.get_dashboard().url
-            helper.Data.update({"analysis_url": analysis_url, "dashboard_url": dashboard_url})
+            helper.Data.update(qs_api.get_response_data())
     except Exception as error:
         # Do logging in addition to crhelper exception handling
         log_exception(error)
-        qs_api.delete_all_resources()
+        rollback(qs_api, resource)
         raise (error)
 
     logger.info(f"finished with request_type:{request_type} resource:{resource}")
@@ -71,26 +88,17 @@ def custom_resource_create(event, _):
 
 
 @helper.delete
-def custom_resource_delete(event, _):
+def custom_resource_delete(event, context):
     request_type = "Delete"
-    resource_properties = get_resource_properties(event, _)
+    resource_properties = get_resource_properties(event, context)
     resource = resource_properties["Resource"]
+    if is_fan_out_request(resource_properties):
+        return custom_resource_fan_out(resource_properties, request_type, deadline=get_deadline(context))
     qs_api = QuicksightApi(resource_properties)
 
     try:
-        if resource == "all":
-            qs_api.delete_all_resources()
-        elif resource == "datasource":
-            qs_api.delete_data_source()
-        elif resource == "dataset":
-            qs_api.delete_data_sets()
-        elif resource == "analysis":
-            qs_api.delete_analysis()
-        elif resource == "dashboard":
-            qs_api.delete_dashboard()
-        else:
-            logger.error(f"Not handling request resource:{resource}, request_type:{request_type}")
-            raise ValueError(f"Received unsupported request request_type:{request_type}, resource:{resource}")
+        with get_tracer().span("delete", category="phase", resource=resource):
+            delete_resource(qs_api, resource, request_type)
     except Exception as error:
         # Do logging in addition to crhelper exception handling
         log_exception(error)
@@ -101,57 +109,233 @@ def custom_resource_delete(event, _):
 
 
 @helper.update
-def custom_resource_update(event, _):
+def custom_resource_update(event, context):
     # For update we delete all the resources and re-create new ones. Any user customization on QuickSight may be lost
+    # With the blue-green UpdateStrategy the resources are updated in place instead
+    # Batch and multi-region requests delete the stacks no longer listed and update the others in place
     request_type = "Update"
-    resource_properties = get_resource_properties(event, _)
+    resource_properties = get_resource_properties(event, context)
     resource = resource_properties["Resource"]
+    if is_fan_out_request(resource_properties):
+        return custom_resource_fan_out(
+            resource_properties,
+            request_type,
+            old_resource_properties=event.get("OldResourceProperties"),
+            deadline=get_deadline(context),
+        )
     qs_api = QuicksightApi(resource_properties)
+    tracer = get_tracer()
+    if resource_properties.get("UpdateStrategy") == BLUE_GREEN_UPDATE_STRATEGY:
+        return custom_resource_update_in_place(
+            qs_api, resource_properties, event.get("OldResourceProperties"), get_deadline(context)
+        )
 
     try:
         # First delete all the resources
-        if resource == "all":
-            qs_api.delete_all_resources()
-        elif resource == "datasource":
-            qs_api.delete_data_source()
-        elif resource == "dataset":
-            qs_api.delete_data_sets()
-        elif resource == "analysis":
-            qs_api.delete_analysis()
-        elif resource == "dashboard":
-            qs_api.delete_dashboard()
-        else:
-            logger.error(f"Not handling request resource:{resource}, request_type:{request_type}")
-            raise ValueError(f"Received unsupported request request_type:{request_type}, resource:{resource}")
+        with tracer.span("delete", category="phase", resource=resource):
+            delete_resource(qs_api, resource, request_type)
 
         # once deleted re-create all the resources
-        if resource == "all":
-            qs_api.create_all_resources()
-        elif resource == "datasource":
-            qs_api.create_data_source()
-        elif resource == "dataset":
-            qs_api.create_data_sets()
-        elif resource == "analysis":
-            qs_api.create_analysis()
-        elif resource == "dashboard":
-            qs_api.create_dashboard()
-        else:
-            logger.error(f"Not handling request resource:{resource}, request_type:{request_type}")
-            raise ValueError(f"Received unsupported request request_type:{request_type}, resource:{resource}")
+        with tracer.span("create", category="phase", resource=resource):
+            create_resource(qs_api, resource, request_type)
         if resource in ["all", "analysis", "dashboard"]:
-            analysis_url = qs_api.quicksight_application.get_analysis().url
-            dashboard_url = qs_api.quicksight_application.get_dashboard().url
-            helper.Data.update({"analysis_url": analysis_url, "dashboard_url": dashboard_url})
+            helper.Data.update(qs_api.get_response_data())
 
+    except Exception as error:
+        rollback(qs_api, resource)
+        # Do logging in addition to crhelper exception handling
+        log_exception(error)
+        raise (error)
+
+    return None
 
+
+def get_dashboard_rollback(resource_properties, old_resource_properties=None):
+    """
+    Whether to roll back the dashboard and the version to publish again. RollbackDashboard is "true" for the
+    version before the published one, or a version number. The rollback is one-shot: it is done only when the
+    value changed since the previous update, a later update with the same value updates the dashboard again.
+    """
+    value = str(resource_properties.get("RollbackDashboard", "false")).strip().lower()
+    old_value = str((old_resource_properties or dict()).get("RollbackDashboard", "false")).strip().lower()
+    if value in ["", "false"] or value == old_value:
+        return False, None
+    if value == "true":
+        return True, None
+    return True, int(value)
+
+
+def custom_resource_update_in_place(qs_api, resource_properties, old_resource_properties=None, deadline=None):
+    """
+    Update the resources without deleting them. The dashboard gets a new version that is published once it is
+    built, within the time left before the deadline, or with a new RollbackDashboard value, an earlier version
+    is published again. Nothing is deleted on failure, the published dashboard version stays live.
+    """
+    resource = resource_properties["Resource"]
+    rollback, rollback_version = get_dashboard_rollback(resource_properties, old_resource_properties)
+
+    try:
+        with get_tracer().span("update", category="phase", resource=resource):
+            if rollback and resource in ["all", "dashboard"]:
+                qs_api.rollback_dashboard(rollback_version)
+            elif resource == "all":
+                qs_api.update_all_resources_in_place(deadline)
+            elif resource == "dashboard":
+                qs_api.update_dashboard_blue_green(deadline)
+            else:
+                raise ValueError(f"Received unsupported {BLUE_GREEN_UPDATE_STRATEGY} update of resource:{resource}")
+        helper.Data.update(qs_api.get_response_data())
+    except Exception as error:
+        # Do logging in addition to crhelper exception handling
+        log_exception(error)
+        raise (error)
+
+    logger.info(f"finished with request_type:Update strategy:{BLUE_GREEN_UPDATE_STRATEGY} resource:{resource}")
+    return None
+
+
+def get_regions(resource_properties):
+    """Regions of a multi-region request, as a list or a comma separated string"""
+    regions = resource_properties.get("Regions") or []
+    if isinstance(regions, str):
+        regions = [region.strip() for region in regions.split(",") if region.strip()]
+    return regions
+
+
+def is_fan_out_request(resource_properties):
+    """Batch requests provision several stacks, multi-region requests provision all resources in several regions"""
+    resource = resource_properties["Resource"]
+    return resource == "batch" or (resource == "all" and bool(get_regions(resource_properties)))
+
+
+def get_fan_out_defaults(resource_properties):
+    return {
+        key: value
+        for key, value in resource_properties.items()
+        if key not in ["ServiceToken", "Resource", "Stacks", "Regions", "MaxConcurrentStacks"]
+    }
+
+
+def fan_out(resource_properties, request_type, old_resource_properties=None, deadline=None):
+    """
+    Provision the stacks listed in the Stacks property of a batch request, with the other resource properties
+    as defaults of every stack, or the resources of a multi-region request in each of its Regions. An update
+    is compared with the stacks or regions of the old resource properties.
+    """
+    properties = get_fan_out_defaults(resource_properties)
+    max_concurrency = resource_properties.get("MaxConcurrentStacks")
+    max_concurrency = int(max_concurrency) if max_concurrency else None
+    # without old resource properties the same stacks or regions are updated, the ones of an old request of
+    # another kind are not known and the listed ones are all created
+    old_stack_configs = old_regions = old_defaults = None
+    if old_resource_properties:
+        old_is_same_kind = is_fan_out_request(old_resource_properties) and (
+            old_resource_properties["Resource"] == resource_properties["Resource"]
+        )
+        old_stack_configs = old_resource_properties.get("Stacks", []) if old_is_same_kind else []
+        old_regions = get_regions(old_resource_properties) if old_is_same_kind else []
+        old_defaults = get_fan_out_defaults(old_resource_properties)
+
+    if resource_properties["Resource"] == "batch":
+        summary = provision_stacks(
+            resource_properties.get("Stacks", []),
+            request_type,
+            defaults=properties,
+            max_concurrency=max_concurrency,
+            old_stack_configs=old_stack_configs,
+            old_defaults=old_defaults,
+            deadline=deadline,
+        )
+        return "Stacks", summary
+    summary = provision_regions(
+        properties,
+        get_regions(resource_properties),
+        request_type,
+        max_concurrency=max_concurrency,
+        old_resource_properties=old_defaults,
+        old_regions=old_regions,
+        deadline=deadline,
+    )
+    return "Regions", summary
+
+
+def custom_resource_fan_out(resource_properties, request_type, old_resource_properties=None, deadline=None):
+    """
+    Run a batch or multi-region request. Each stack rolls back its own resources on failure, so there is no
+    rollback here. Stacks that would not complete before the deadline are not started and fail the request,
+    so CloudFormation gets a response before the function times out.
+    """
+    resource = resource_properties["Resource"]
+
+    try:
+        with get_tracer().span(request_type.lower(), category="phase", resource=resource):
+            key, summary = fan_out(resource_properties, request_type, old_resource_properties, deadline)
+        logger.info("%s request_type:%s summary: %s", key.lower(), request_type, payload(summary))
+        if summary["Failed"]:
+            failed = ", ".join(summary["Failed"])
+            raise QuickSightFailure(f"failed to {request_type.lower()} {key.lower()} {failed}")
+        if summary["Skipped"]:
+            skipped = ", ".join(summary["Skipped"])
+            raise QuickSightFailure(
+                f"not enough time left to {request_type.lower()} {key.lower()} {skipped}, "
+                f"split them across several resources or raise the function timeout"
+            )
+        provisioned = [name for name in summary["Succeeded"] if summary["Results"][name]["RequestType"] != "Delete"]
+        helper.Data.update({key: ",".join(provisioned)})
     except Exception as error:
-        qs_api.delete_all_resources()
         # Do logging in addition to crhelper exception handling
         log_exception(error)
         raise (error)
 
+    logger.info(f"finished with request_type:{request_type} resource:{resource}")
     return None
 
 
+def create_resource(qs_api, resource, request_type):
+    if resource == "all":
+        qs_api.create_all_resources()
+    elif resource == "datasource":
+        qs_api.create_data_source()
+    elif resource == "dataset":
+        qs_api.create_data_sets()
+    elif resource == "analysis":
+        qs_api.create_analysis()
+    elif resource == "dashboard":
+        qs_api.create_dashboard()
+    elif resource == "permissions":
+        qs_api.reconcile_permissions()
+    else:
+        logger.error(f"Not handling request resource:{resource}, request_type:{request_type}")
+        raise ValueError(f"Received unsupported request request_type:{request_type}, resource:{resource}")
+
+
+def delete_resource(qs_api, resource, request_type):
+    if resource == "all":
+        qs_api.delete_all_resources()
+    elif resource == "datasource":
+        qs_api.delete_data_source()
+    elif resource == "dataset":
+        qs_api.delete_data_sets()
+    elif resource == "analysis":
+        qs_api.delete_analysis()
+    elif resource == "dashboard":
+        qs_api.delete_dashboard()
+    elif resource == "permissions":
+        # the resources keep the owner permissions only, the shared permissions are revoked. The profiles are
+        # changed on an api of their own, so an update re-creates the permissions of the principals of qs_api
+        revoke_api = QuicksightApi(qs_api.quicksight_application.resource_properties)
+        revoke_api.quicksight_application.revoke_shared_permissions()
+        revoke_api.reconcile_permissions()
+    else:
+        logger.error(f"Not handling request resource:{resource}, request_type:{request_type}")
+        raise ValueError(f"Received unsupported request request_type:{request_type}, resource:{resource}")
+
+
 def handler(event, context):
-    helper(event, context)
+    tracer = start_tracing(event.get("ResourceProperties"))
+    try:
+        with tracer.span("handler", category="phase", request_type=event.get("RequestType")):
+            helper(event, context)
+    finally:
+        get_api_call_recorder().emit_summary()
+        tracer.flush()
@@ -0,0 +1,14 @@
+#!/usr/bin/env python
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+import pytest
+
+from test.benchmark.harness import write_results
+
+
+@pytest.fixture(scope="session", autouse=True)
+def benchmark_results():
+    """Write the collected results to $BENCHMARK_RESULTS_FILE once all benchmarks ran"""
+    yield
+    write_results()
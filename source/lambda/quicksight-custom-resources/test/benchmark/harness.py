@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+
+logger = logging.getLogger(__name__)
+
+BASELINE_FILE = os.path.join(os.path.dirname(__file__), "baseline.json")
+RESULTS_FILE_ENV_VARIABLE = "BENCHMARK_RESULTS_FILE"
+# fraction a measurement may exceed its baseline before the benchmark fails
+DEFAULT_TOLERANCE = 0.25
+
+# Collected results of the current session, written by the benchmark_results fixture in conftest.py
+_results = dict()
+
+
+class Measurement:
+    """Wall time, peak traced memory and the return value of a measured call"""
+
+    def __init__(self):
+        self.wall_seconds = None
+        self.peak_memory_bytes = None
+        self.result = None
+
+
+def measure(func, *args, trace_memory=True, **kwargs):
+    measurement = Measurement()
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        measurement.result = func(*args, **kwargs)
+    finally:
+        measurement.wall_seconds = time.perf_counter() - start
+        if trace_memory:
+            measurement.peak_memory_bytes = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+    return measurement
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def measure_allocations(func, *args, **kwargs):
+    """Bytes and blocks allocated (and still referenced at return) plus peak traced bytes of one call"""
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        tracemalloc.reset_peak()
+        start_bytes = tracemalloc.get_traced_memory()[0]
+        func(*args, **kwargs)
+        peak_bytes = tracemalloc.get_traced_memory()[1] - start_bytes
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    differences = after.compare_to(before, "filename")
+    return {
+        "allocated_bytes": sum(max(difference.size_diff, 0) for difference in differences),
+        "allocated_blocks": sum(max(difference.count_diff, 0) for difference in differences),
+        "peak_bytes": peak_bytes,
+    }
+
+
+def measure_cold_and_warm(func, reset=None, iterations=50):
+    """
+    Time the first call after reset() (cold) and iterations repeated calls (warm), and trace the
+    allocations of one warm call
+    """
+    if reset:
+        reset()
+    start = time.perf_counter()
+    func()
+    cold_seconds = time.perf_counter() - start
+
+    warm_seconds = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func()
+        warm_seconds.append(time.perf_counter() - start)
+
+    result = {
+        "cold_seconds": round(cold_seconds, 9),
+        "warm_iterations": iterations,
+        "warm_median_seconds": round(statistics.median(warm_seconds), 9),
+        "warm_p95_seconds": round(_percentile(warm_seconds, 0.95), 9),
+    }
+    result.update(measure_allocations(func))
+    return result
+
+
+def record_result(suite, name, result):
+    """Store a benchmark result to be written as json at the end of the session"""
+    _results.setdefault(suite, dict())[name] = result
+    logger.warning(f"benchmark {suite}/{name}: {json.dumps(result, sort_keys=True)}")
+
+
+def get_results():
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": int(time.time()),
+        "results": _results,
+    }
+
+
+def write_results(file_name=None):
+    file_name = file_name or os.environ.get(RESULTS_FILE_ENV_VARIABLE)
+    if not file_name or not _results:
+        return None
+    with open(file_name, "w") as results_fd:
+        json.dump(get_results(), results_fd, indent=2, sort_keys=True)
+    return file_name
+
+
+def load_baseline(suite):
+    with open(BASELINE_FILE, "r") as baseline_fd:
+        baseline = json.load(baseline_fd)
+    return baseline.get("tolerance", DEFAULT_TOLERANCE), baseline.get(suite, dict())
+
+
+def check_regression(suite, name, result):
+    """
+    Fail when any metric with a baseline 'max_<metric>' value exceeds it by more than the tolerance.
+    Returns the list of checked metrics.
+    """
+    tolerance, baseline = load_baseline(suite)
+    limits = baseline.get(name, dict())
+    checked = []
+    for key, limit in limits.items():
+        metric = key[len("max_") :]
+        value = result.get(metric)
+        if value is None:
+            continue
+        allowed = limit * (1 + tolerance)
+        assert value <= allowed, (
+            f"benchmark regression in {suite}/{name}: {metric}={value} exceeds baseline {limit} "
+            f"(+{tolerance:.0%} tolerance, allowed {allowed})"
+        )
+        checked.append(metric)
+    return checked
+
+
+def compare_results(baseline_file, current_file):
+    """Ratio current / baseline of every numeric metric present in both results files"""
+    with open(baseline_file, "r") as baseline_fd:
+        baseline = json.load(baseline_fd)["results"]
+    with open(current_file, "r") as current_fd:
+        current = json.load(current_fd)["results"]
+    comparison = dict()
+    for suite, results in current.items():
+        for name, result in results.items():
+            baseline_result = baseline.get(suite, dict()).get(name, dict())
+            for metric, value in result.items():
+                baseline_value = baseline_result.get(metric)
+                if isinstance(value, (int, float)) and isinstance(baseline_value, (int, float)) and baseline_value:
+                    comparison[f"{suite}/{name}/{metric}"] = round(value / baseline_value, 3)
+    return comparison
+
+
+if __name__ == "__main__":
+    # python -m test.benchmark.harness baseline.json current.json
+    if len(sys.argv) != 3:
+        print("usage: python -m test.benchmark.harness <baseline results json> <current results json>")
+        sys.exit(2)
+    for key, ratio in sorted(compare_results(sys.argv[1], sys.argv[2]).items()):
+        print(f"{key}: {ratio:.3f}x")
@@ -0,0 +1,177 @@
+#!/usr/bin/env python
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+End-to-end benchmarks of the QuickSight custom resource. lambda_function.handler runs against the in-memory
+QuickSight fake with per-call latency, and each run records wall time, QuickSight API call counts and peak
+traced memory. Wall time is also expressed in 'latency units' (wall time / per call latency), which is
+compared against test/benchmark/baseline.json so that slower orchestration fails the run independent of
+the machine. Run with:
+
+    BENCHMARK_RESULTS_FILE=benchmark.json python -m pytest -m benchmark test/benchmark
+"""
+
+import importlib
+import os
+import uuid
+
+import pytest
+from crhelper.resource_helper import SUCCESS
+from moto import mock_sts
+
+from test.benchmark.harness import check_regression, measure, record_result
+from test.fixtures.quicksight_fake import FakeQuickSightClient, install_fake_quicksight_client
+from util.quicksight_application import QuicksightApplication
+from util.quicksight_resource import QuickSightResource
+
+pytestmark = pytest.mark.benchmark
+
+SUITE = "deployment"
+# seconds of simulated latency of a describe call, other operations are multiples of it
+LATENCY = float(os.environ.get("BENCHMARK_QUICKSIGHT_LATENCY", "0.02"))
+SYNTHETIC_SUFFIX = "-synthetic-"
+SYNTHETIC_SUB_TYPES = 50
+
+
+def get_latency_profile(latency):
+    """Per operation latency, creates and updates of QuickSight assets are slower than describes and deletes"""
+    return {
+        "default": latency,
+        "create_data_source": 2 * latency,
+        "create_data_set": 2 * latency,
+        "create_analysis": 3 * latency,
+        "create_dashboard": 3 * latency,
+        "update_dashboard": 3 * latency,
+    }
+
+
+class MockLambdaContext:
+    aws_request_id = "MOCK_REQUEST_ID"
+
+    @staticmethod
+    def get_remaining_time_in_millis():
+        return 30000
+
+
+def generate_event(request_type):
+    event = {
+        "RequestType": request_type,
+        "ResponseURL": "https://cloudformation-custom-resource-response-useast1.s3.amazonaws.com/MOCK",
+        "StackId": f"arn:aws:cloudformation:us-east-1:MOCK_ACCOUNT:stack/ADMDBENCH/{uuid.uuid4()}",
+        "RequestId": str(uuid.uuid4()),
+        "LogicalResourceId": "QuickSightResources",
+        "ResourceType": "Custom::QuickSightResources",
+        "ResourceProperties": {
+            "Resource": "all",
+            "StackName": "ADMDBENCH",
+            "QuickSightPrincipalArn": "arn:aws:quicksight:us-east-1:MOCK_ACCOUNT:user/default/MOCK",
+            "QuickSightSourceTemplateArn": "arn:aws:quicksight:us-east-1:MOCK_ACCOUNT:template/MOCK",
+            "WorkGroupName": "primary",
+        },
+    }
+    if request_type != "Create":
+        event["PhysicalResourceId"] = "ADMDBENCH_QuickSightResources"
+    return event
+
+
+def use_synthetic_sub_types(monkeypatch, count):
+    """Add count data set sub types that reuse the configs of the supported ones"""
+    base_sub_types = list(QuicksightApplication.supported_data_set_types)
+    synthetic_sub_types = [
+        f"{base_sub_types[index % len(base_sub_types)]}{SYNTHETIC_SUFFIX}{index}" for index in range(count)
+    ]
+    load_config = QuickSightResource._load_config
+
+    def load_synthetic_config(self, resource_type, resource_sub_types, config_data):
+        for sub_type in resource_sub_types:
+            base_sub_type = sub_type.split(SYNTHETIC_SUFFIX)[0]
+            base_config_data = dict()
+            load_config(self, resource_type, [base_sub_type], base_config_data)
+            config_data[sub_type] = base_config_data[base_sub_type]
+
+    monkeypatch.setattr(QuickSightResource, "_load_config", load_synthetic_config)
+    monkeypatch.setattr(QuicksightApplication, "supported_data_set_types", base_sub_types + synthetic_sub_types)
+    return len(base_sub_types) + count
+
+
+@pytest.fixture
+def lambda_under_benchmark(monkeypatch):
+    import lambda_function
+
+    # crhelper records a failure to initialize, e.g. without AWS_REGION, when lambda_function is first imported by
+    # another test module. Reload it under the mocked environment so the handler runs with a fresh helper
+    lambda_function = importlib.reload(lambda_function)
+    responses = []
+
+    def send(status=None, reason="", **kwargs):
+        responses.append(status or lambda_function.helper.Status)
+
+    monkeypatch.setattr(lambda_function.helper, "_send", send)
+    QuicksightApplication.clear_global_states()
+    with mock_sts():
+        yield lambda_function, responses
+    QuicksightApplication.clear_global_states()
+
+
+def run_once(monkeypatch, lambda_function, request_type, trace_memory):
+    fake = install_fake_quicksight_client(FakeQuickSightClient(latency=get_latency_profile(LATENCY)), monkeypatch)
+    QuicksightApplication.clear_global_states()
+    context = MockLambdaContext()
+
+    if request_type != "Create":
+        # the resources exist before an update or delete
+        lambda_function.handler(generate_event("Create"), context)
+        fake.call_counts.clear()
+        fake.max_in_flight = 0
+
+    measurement = measure(lambda_function.handler, generate_event(request_type), context, trace_memory=trace_memory)
+    return fake, measurement
+
+
+def run_scenario(monkeypatch, lambda_under_benchmark, request_type, sub_types_count):
+    lambda_function, responses = lambda_under_benchmark
+
+    # memory is traced in a separate run as tracemalloc slows down the code under test, which also warms up
+    # imports and the sts mock before the timed run
+    _, memory_measurement = run_once(monkeypatch, lambda_function, request_type, trace_memory=True)
+    fake, measurement = run_once(monkeypatch, lambda_function, request_type, trace_memory=False)
+
+    assert all(response == SUCCESS for response in responses)
+    result = {
+        "request_type": request_type,
+        "data_set_sub_types": sub_types_count,
+        "wall_seconds": round(measurement.wall_seconds, 4),
+        "latency_units": round(measurement.wall_seconds / LATENCY, 2),
+        "api_calls": sum(fake.call_counts.values()),
+        "api_calls_by_operation": dict(sorted(fake.call_counts.items())),
+        "max_concurrent_api_calls": fake.max_in_flight,
+        "peak_memory_bytes": memory_measurement.peak_memory_bytes,
+    }
+    return fake, result
+
+
+@pytest.mark.parametrize("request_type", ["Create", "Update", "Delete"])
+def test_resource_all(monkeypatch, lambda_under_benchmark, request_type):
+    sub_types_count = len(QuicksightApplication.supported_data_set_types)
+    fake, result = run_scenario(monkeypatch, lambda_under_benchmark, request_type, sub_types_count)
+
+    name = f"{request_type.lower()}-all"
+    record_result(SUITE, name, result)
+    check_regression(SUITE, name, result)
+    if request_type == "Delete":
+        assert not fake.get_resource_ids("data_set")
+    else:
+        assert len(fake.get_resource_ids("data_set")) == sub_types_count
+
+
+@pytest.mark.parametrize("request_type", ["Create", "Update", "Delete"])
+def test_resource_all_synthetic_sub_types(monkeypatch, lambda_under_benchmark, request_type):
+    sub_types_count = use_synthetic_sub_types(monkeypatch, SYNTHETIC_SUB_TYPES)
+    fake, result = run_scenario(monkeypatch, lambda_under_benchmark, request_type, sub_types_count)
+
+    name = f"{request_type.lower()}-all-synthetic"
+    record_result(SUITE, name, result)
+    check_regression(SUITE, name, result)
+    if request_type != "Delete":
+        assert len(fake.get_resource_ids("data_set")) == sub_types_count
@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Micro-benchmarks of the code paths every invocation runs before the first QuickSight call. Each benchmark
+times a cold call (first call after resetting the application state) and repeated warm calls, and traces
+the allocations of one warm call. The account id lookup is replaced with a constant so the numbers show the
+cost of configuration loading and rendering only. The allocations, which do not depend on the machine, are
+compared against test/benchmark/baseline.json. Compare two runs with:
+
+    BENCHMARK_RESULTS_FILE=after.json python -m pytest -m benchmark test/benchmark/test_micro_benchmark.py
+    python -m test.benchmark.harness before.json after.json
+"""
+
+import pytest
+
+from test.benchmark.harness import check_regression, measure_cold_and_warm, record_result
+from test.fixtures.quicksight_test_fixture import TestHelper
+from util.quicksight_application import QuicksightApplication
+from util.quicksight_resource import clear_config_file_cache
+
+pytestmark = pytest.mark.benchmark
+
+SUITE = "micro"
+ITERATIONS = 50
+
+
+def reset_application_state():
+    QuicksightApplication.clear_global_states()
+    clear_config_file_cache()
+
+
+@pytest.fixture
+def resource_properties(monkeypatch):
+    monkeypatch.setattr("util.quicksight_resource.get_aws_account_id", lambda: "MOCK_ACCOUNT")
+    reset_application_state()
+    yield TestHelper.get_resource_properties()
+    reset_application_state()
+
+
+@pytest.fixture
+def quicksight_application(resource_properties):
+    return QuicksightApplication(resource_properties)
+
+
+def run_benchmark(name, func, reset=reset_application_state):
+    result = measure_cold_and_warm(func, reset=reset, iterations=ITERATIONS)
+    record_result(SUITE, name, result)
+    assert check_regression(SUITE, name, result) == ["allocated_blocks", "peak_bytes"]
+    return result
+
+
+def test_quicksight_application_init(resource_properties):
+    result = run_benchmark("QuicksightApplication.__init__", lambda: QuicksightApplication(resource_properties))
+    assert result["warm_median_seconds"] > 0
+
+
+def test_load_config(quicksight_application):
+    data_set = quicksight_application.get_data_sets()["code-change-activity"]
+    sub_types = quicksight_application.get_supported_data_set_sub_types()
+
+    result = run_benchmark(
+        "QuickSightResource._load_config", lambda: data_set._load_config("dataset", sub_types, dict())
+    )
+    assert result["warm_median_seconds"] > 0
+
+
+def test_get_source_entity(quicksight_application):
+    source_entity = quicksight_application.get_analysis().source_entity
+
+    result = run_benchmark("SourceEntity.get_source_entity", source_entity.get_source_entity, reset=None)
+    assert result["warm_median_seconds"] > 0
+
+
+def test_update_data_source_arn(quicksight_application):
+    data_set = quicksight_application.get_data_sets()["code-change-activity"]
+    physical_table_map = data_set._get_map(data_set.sub_type, "PhysicalTableMap")
+
+    result = run_benchmark(
+        "DataSet._update_data_source_arn", lambda: data_set._update_data_source_arn(physical_table_map), reset=None
+    )
+    assert result["warm_median_seconds"] > 0
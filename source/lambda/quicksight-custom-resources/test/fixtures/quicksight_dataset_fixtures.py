@@ -12,6 +12,7 @@ import pytest
 from botocore.stub import ANY, Stubber
 from moto import mock_sts
 from util.quicksight import QuicksightApi
+from util.permissions import get_principal_profiles
 from util.quicksight_application import QuicksightApplication
 
 logger = logging.getLogger(__name__)
@@ -32,6 +33,8 @@ def minimal_data_sets_stub(request):
     quicksight_application_stub = GenericTestStub()
     quicksight_application_stub.prefix = "SOLUTION_UT"
     quicksight_application_stub.quicksight_principal_arn = "arn:MOCK_ARN"
+    quicksight_application_stub.aws_region = "us-east-1"
+    quicksight_application_stub.quicksight_principals = get_principal_profiles("arn:MOCK_ARN")
 
     # stub datasets
     data_sets_stub = dict()
@@ -11,6 +11,7 @@ from moto import mock_sts
 
 from util.quicksight_application import QuicksightApplication
 from util.datasource import DataSource
+from util.permissions import get_principal_profiles
 
 # import other fixtures
 from test.fixtures.quicksight_test_fixture import get_quicksight_api_stubber, TestHelper
@@ -35,6 +36,8 @@ def minimal_data_source_stub(request):
     quicksight_application_stub = GenericTestStub()
     quicksight_application_stub.prefix = "SOLUTION_UT"
     quicksight_application_stub.quicksight_principal_arn = "arn:MOCK_ARN"
+    quicksight_application_stub.aws_region = "us-east-1"
+    quicksight_application_stub.quicksight_principals = get_principal_profiles("arn:MOCK_ARN")
 
     # We use the real object here but with a stubbed quicksight_application
     data_source_stub = DataSource(quicksight_application=quicksight_application_stub, props=None)
@@ -0,0 +1,472 @@
+#!/usr/bin/env python
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+import copy
+import io
+import json
+import logging
+import random
+import re
+import threading
+import time
+import uuid
+import zipfile
+from collections import Counter
+
+import boto3
+import pytest
+
+from util.rate_limiter import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+FAKE_REGION = "us-east-1"
+
+# resource kind (as in boto3 operation names) -> (response key, id parameter, arn resource type, list response key)
+RESOURCE_KINDS = {
+    "data_source": ("DataSource", "DataSourceId", "datasource", "DataSources"),
+    "data_set": ("DataSet", "DataSetId", "dataset", "DataSetSummaries"),
+    "analysis": ("Analysis", "AnalysisId", "analysis", "AnalysisSummaryList"),
+    "dashboard": ("Dashboard", "DashboardId", "dashboard", "DashboardSummaryList"),
+    "template": ("Template", "TemplateId", "template", "TemplateSummaryList"),
+}
+# kinds whose creation is asynchronous in QuickSight and that report a creation status
+ASYNC_KINDS = ["data_source", "analysis", "dashboard", "template"]
+# kinds with numbered versions
+VERSIONED_KINDS = ["dashboard", "template"]
+PLURALS = {
+    "data_sources": "data_source",
+    "data_sets": "data_set",
+    "analyses": "analysis",
+    "dashboards": "dashboard",
+    "templates": "template",
+}
+# asset bundle folder -> (resource kind, override parameters key, override permissions ids key)
+ASSET_BUNDLE_KINDS = {
+    "datasource": ("data_source", "DataSources", "DataSourceIds"),
+    "dataset": ("data_set", "DataSets", "DataSetIds"),
+    "analysis": ("analysis", "Analyses", "AnalysisIds"),
+    "dashboard": ("dashboard", "Dashboards", "DashboardIds"),
+}
+
+OPERATION_PATTERN = re.compile(
+    r"^(create|describe|update|delete|list|describe_permissions|update_permissions)_(.+)$"
+)
+
+
+class FakeResource:
+    def __init__(self, kind, resource_id, arn, params, now):
+        self.kind = kind
+        self.id = resource_id
+        self.arn = arn
+        self.params = params
+        self.permissions = copy.deepcopy(params.get("Permissions", []))
+        self.created_time = now
+        self.versions = [{"params": params, "time": now, "operation": "CREATION"}]
+        self.published_version = 1
+
+
+class FakeQuickSightClient:
+    """
+    Stateful in-memory stand-in for the boto3 QuickSight client.
+
+    Supports create/describe/update/delete/list, describe/update permissions for data sources, data sets,
+    analyses, dashboards and templates, plus dashboard and template versions and asset bundle import jobs with
+    the bundle passed as body, and dashboard embed urls. Asynchronous resources report
+    CREATION_IN_PROGRESS (or UPDATE_IN_PROGRESS) for creation_delay seconds; updating or deleting them while
+    in progress raises ConflictException. Every operation sleeps for its configured latency, and an optional
+    token bucket either raises ThrottlingException (throttle_mode="raise") or waits for a token
+    (throttle_mode="wait"). Exceptions are the botocore modeled exceptions of a real client, so code under
+    test catches them through client.exceptions as usual.
+    """
+
+    def __init__(
+        self,
+        account_id="MOCK_ACCOUNT",
+        region=FAKE_REGION,
+        latency=0.0,
+        latency_jitter=0.0,
+        creation_delay=0.0,
+        rate_limit=None,
+        burst=None,
+        throttle_mode="raise",
+        seed=0,
+    ):
+        self._real_client = boto3.client("quicksight", region_name=region)
+        self.exceptions = self._real_client.exceptions
+        self.meta = self._real_client.meta
+        self.account_id = account_id
+        self.region = region
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.creation_delay = creation_delay
+        self.throttle_mode = throttle_mode
+        self.token_bucket = TokenBucket(rate_limit, burst) if rate_limit else None
+        self.random = random.Random(seed)
+
+        self.lock = threading.RLock()
+        self.resources = {kind: dict() for kind in RESOURCE_KINDS}
+        self.call_counts = Counter()
+        self.calls = []
+        self.throttled = Counter()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.asset_bundle_import_jobs = dict()
+        # error message of the import jobs to fail, None to import the asset bundles
+        self.asset_bundle_import_failure = None
+        self.asset_bundle_import_failure_status = "FAILED_ROLLBACK_COMPLETED"
+        # default number of summaries in a page of the list operations
+        self.list_page_size = 100
+
+    # --- helpers -------------------------------------------------------------------------------------------
+
+    def _error(self, exception_name, operation, message):
+        exception_class = getattr(self.exceptions, exception_name)
+        status_codes = {
+            "ResourceNotFoundException": 404,
+            "ResourceExistsException": 409,
+            "ConflictException": 409,
+            "ThrottlingException": 429,
+            "InvalidParameterValueException": 400,
+        }
+        error_response = {
+            "Error": {"Code": exception_name, "Message": message},
+            "ResponseMetadata": {"HTTPStatusCode": status_codes.get(exception_name, 400)},
+        }
+        return exception_class(error_response, operation)
+
+    def _get_latency(self, operation):
+        if isinstance(self.latency, dict):
+            latency = self.latency.get(operation, self.latency.get("default", 0.0))
+        else:
+            latency = self.latency
+        if self.latency_jitter:
+            with self.lock:
+                latency += self.random.uniform(0, self.latency_jitter)
+        return latency
+
+    def _arn(self, kind, resource_id):
+        arn_type = RESOURCE_KINDS[kind][2]
+        return f"arn:aws:quicksight:{self.region}:{self.account_id}:{arn_type}/{resource_id}"
+
+    def _status(self, resource, version_number=None):
+        version_number = version_number or len(resource.versions)
+        version = resource.versions[version_number - 1]
+        prefix = "CREATION" if version["operation"] == "CREATION" else "UPDATE"
+        if resource.kind in ASYNC_KINDS and time.monotonic() - version["time"] < self.creation_delay:
+            return f"{prefix}_IN_PROGRESS"
+        return f"{prefix}_SUCCESSFUL"
+
+    def _get_resource(self, operation, kind, params):
+        id_name = RESOURCE_KINDS[kind][1]
+        resource = self.resources[kind].get(params.get(id_name))
+        if not resource:
+            raise self._error("ResourceNotFoundException", operation, f"{kind} {params.get(id_name)} not found")
+        return resource
+
+    def _check_not_in_progress(self, operation, resource):
+        if self._status(resource).endswith("_IN_PROGRESS"):
+            raise self._error("ConflictException", operation, f"{resource.kind} {resource.id} is being updated")
+
+    def _version_arn(self, resource, version_number):
+        if resource.kind in VERSIONED_KINDS:
+            return f"{resource.arn}/version/{version_number}"
+        return resource.arn
+
+    def _describe_body(self, resource, version_number=None):
+        version_number = version_number or len(resource.versions)
+        params = resource.versions[version_number - 1]["params"]
+        body = {
+            RESOURCE_KINDS[resource.kind][1]: resource.id,
+            "Arn": resource.arn,
+            "Name": params.get("Name", resource.id),
+            "CreatedTime": resource.created_time,
+            "LastUpdatedTime": resource.versions[-1]["time"],
+        }
+        status = self._status(resource, version_number)
+        if resource.kind in VERSIONED_KINDS:
+            body["Version"] = {
+                "VersionNumber": version_number,
+                "Status": status,
+                "Arn": self._version_arn(resource, version_number),
+                "Description": params.get("VersionDescription", ""),
+                "SourceEntityArn": params.get("SourceEntity", {}).get("SourceTemplate", {}).get("Arn"),
+            }
+        elif resource.kind in ASYNC_KINDS:
+            body["Status"] = status
+        for key in ["Type", "DataSourceParameters", "PhysicalTableMap", "LogicalTableMap", "ImportMode"]:
+            if key in params:
+                body[key] = copy.deepcopy(params[key])
+        return body
+
+    def _response(self, status=200, **kwargs):
+        return {"Status": status, "RequestId": str(uuid.uuid4()), **kwargs}
+
+    # --- generic operations --------------------------------------------------------------------------------
+
+    def _create(self, operation, kind, params):
+        id_name = RESOURCE_KINDS[kind][1]
+        resource_id = params[id_name]
+        with self.lock:
+            if resource_id in self.resources[kind]:
+                raise self._error("ResourceExistsException", operation, f"{kind} {resource_id} already exists")
+            resource = FakeResource(kind, resource_id, self._arn(kind, resource_id), params, time.monotonic())
+            self.resources[kind][resource_id] = resource
+            response = self._response(202 if kind in ASYNC_KINDS else 201, Arn=resource.arn)
+            response[id_name] = resource_id
+            if kind in ASYNC_KINDS:
+                response["CreationStatus"] = self._status(resource)
+            if kind in VERSIONED_KINDS:
+                response["VersionArn"] = self._version_arn(resource, 1)
+            return response
+
+    def _get_version(self, operation, resource, version_number):
+        """A version of a resource, the deleted versions of a template are not found"""
+        if not 1 <= version_number <= len(resource.versions) or resource.versions[version_number - 1].get("deleted"):
+            raise self._error("ResourceNotFoundException", operation, f"version {version_number} not found")
+        return resource.versions[version_number - 1]
+
+    def _describe(self, operation, kind, params):
+        with self.lock:
+            resource = self._get_resource(operation, kind, params)
+            version_number = params.get("VersionNumber")
+            if not version_number and kind == "dashboard":
+                # like QuickSight, describe the published version of a dashboard by default
+                version_number = resource.published_version
+            if version_number:
+                self._get_version(operation, resource, version_number)
+            return self._response(**{RESOURCE_KINDS[kind][0]: self._describe_body(resource, version_number)})
+
+    def _update(self, operation, kind, params):
+        id_name = RESOURCE_KINDS[kind][1]
+        with self.lock:
+            resource = self._get_resource(operation, kind, params)
+            self._check_not_in_progress(operation, resource)
+            merged_params = {**resource.versions[-1]["params"], **params}
+            resource.versions.append({"params": merged_params, "time": time.monotonic(), "operation": "UPDATE"})
+            if kind not in VERSIONED_KINDS:
+                # only versioned resources keep their history
+                resource.versions = resource.versions[-1:]
+            response = self._response(202 if kind in ASYNC_KINDS else 200, Arn=resource.arn)
+            response[id_name] = resource.id
+            if kind in ASYNC_KINDS:
+                response["UpdateStatus"] = self._status(resource)
+            if kind in VERSIONED_KINDS:
+                response["VersionArn"] = self._version_arn(resource, len(resource.versions))
+            return response
+
+    def _delete(self, operation, kind, params):
+        id_name = RESOURCE_KINDS[kind][1]
+        with self.lock:
+            resource = self._get_resource(operation, kind, params)
+            if kind == "template" and params.get("VersionNumber"):
+                # deleting a single template version keeps the numbering of the others
+                self._get_version(operation, resource, params["VersionNumber"])["deleted"] = True
+            else:
+                del self.resources[kind][resource.id]
+            response = self._response(200, Arn=resource.arn)
+            response[id_name] = resource.id
+            return response
+
+    def _list(self, operation, kind, params):
+        with self.lock:
+            summaries = [
+                {RESOURCE_KINDS[kind][1]: resource.id, "Arn": resource.arn, "Name": resource.params.get("Name")}
+                for resource in self.resources[kind].values()
+            ]
+        return self._response(**{RESOURCE_KINDS[kind][3]: summaries})
+
+    def _describe_permissions(self, operation, kind, params):
+        id_name = RESOURCE_KINDS[kind][1]
+        with self.lock:
+            resource = self._get_resource(operation, kind, params)
+            response = self._response(Permissions=copy.deepcopy(resource.permissions))
+            response[id_name] = resource.id
+            response[f"{RESOURCE_KINDS[kind][0]}Arn"] = resource.arn
+            return response
+
+    def _update_permissions(self, operation, kind, params):
+        id_name = RESOURCE_KINDS[kind][1]
+        with self.lock:
+            resource = self._get_resource(operation, kind, params)
+            actions = {permission["Principal"]: set(permission["Actions"]) for permission in resource.permissions}
+            for permission in params.get("GrantPermissions", []):
+                actions.setdefault(permission["Principal"], set()).update(permission["Actions"])
+            for permission in params.get("RevokePermissions", []):
+                actions.get(permission["Principal"], set()).difference_update(permission["Actions"])
+            resource.permissions = [
+                {"Principal": principal, "Actions": sorted(principal_actions)}
+                for principal, principal_actions in actions.items()
+                if principal_actions
+            ]
+            response = self._response(Permissions=copy.deepcopy(resource.permissions))
+            response[id_name] = resource.id
+            response[f"{RESOURCE_KINDS[kind][0]}Arn"] = resource.arn
+            return response
+
+    # --- operations that do not fit the generic pattern ----------------------------------------------------
+
+    def _list_versions(self, operation, kind, params):
+        with self.lock:
+            resource = self._get_resource(operation, kind, params)
+            summaries = [
+                {
+                    "VersionNumber": number,
+                    "Arn": self._version_arn(resource, number),
+                    "Status": self._status(resource, number),
+                    "Description": version["params"].get("VersionDescription", ""),
+                }
+                for number, version in enumerate(resource.versions, start=1)
+                if not version.get("deleted")
+            ]
+        # pages of MaxResults summaries, the token is the offset of the next page
+        start = int(params.get("NextToken", 0))
+        end = start + params.get("MaxResults", self.list_page_size)
+        page = {f"{RESOURCE_KINDS[kind][0]}VersionSummaryList": summaries[start:end]}
+        if end < len(summaries):
+            page["NextToken"] = str(end)
+        return self._response(**page)
+
+    def update_dashboard_published_version(self, **params):
+        def operation(operation_name, kind, params):
+            with self.lock:
+                resource = self._get_resource(operation_name, kind, params)
+                version_number = params["VersionNumber"]
+                self._get_version(operation_name, resource, version_number)
+                if self._status(resource, version_number).endswith("_IN_PROGRESS"):
+                    raise self._error("ConflictException", operation_name, f"version {version_number} is not ready")
+                resource.published_version = version_number
+                return self._response(DashboardId=resource.id, DashboardArn=resource.arn)
+
+        return self._call("update_dashboard_published_version", "dashboard", params, operation)
+
+    def list_dashboard_versions(self, **params):
+        return self._call("list_dashboard_versions", "dashboard", params, self._list_versions)
+
+    def list_template_versions(self, **params):
+        return self._call("list_template_versions", "template", params, self._list_versions)
+
+    def _import_asset_bundle(self, operation, params):
+        """Create the assets of the bundle with the override names, parameters and permissions"""
+        with zipfile.ZipFile(io.BytesIO(params["AssetBundleImportSource"]["Body"])) as bundle:
+            assets = [(name.split("/")[0], json.loads(bundle.read(name))) for name in sorted(bundle.namelist())]
+        for folder, asset in assets:
+            kind, override_key, ids_key = ASSET_BUNDLE_KINDS[folder]
+            id_name = RESOURCE_KINDS[kind][1]
+            for override in params.get("OverrideParameters", {}).get(override_key, []):
+                if override[id_name] == asset[id_name]:
+                    asset.update(override)
+            asset["Permissions"] = [
+                {"Principal": principal, "Actions": override["Permissions"]["Actions"]}
+                for override in params.get("OverridePermissions", {}).get(override_key, [])
+                if asset[id_name] in override[ids_key]
+                for principal in override["Permissions"]["Principals"]
+            ]
+            self._create(operation, kind, asset)
+
+    def start_asset_bundle_import_job(self, **params):
+        def operation(operation_name, kind, params):
+            with self.lock:
+                job_id = params["AssetBundleImportJobId"]
+                if self.asset_bundle_import_failure:
+                    errors = [{"Message": self.asset_bundle_import_failure}]
+                    job = {"JobStatus": self.asset_bundle_import_failure_status, "Errors": errors}
+                else:
+                    self._import_asset_bundle(operation_name, params)
+                    job = {"JobStatus": "SUCCESSFUL", "Errors": []}
+                job["Arn"] = f"arn:aws:quicksight:{self.region}:{self.account_id}:asset-bundle-import-job/{job_id}"
+                job["time"] = time.monotonic()
+                self.asset_bundle_import_jobs[job_id] = job
+                return self._response(202, Arn=job["Arn"], AssetBundleImportJobId=job_id)
+
+        return self._call("start_asset_bundle_import_job", None, params, operation)
+
+    def describe_asset_bundle_import_job(self, **params):
+        def operation(operation_name, kind, params):
+            with self.lock:
+                job = self.asset_bundle_import_jobs.get(params["AssetBundleImportJobId"])
+                if not job:
+                    raise self._error("ResourceNotFoundException", operation_name, "import job not found")
+                status = job["JobStatus"]
+                if time.monotonic() - job["time"] < self.creation_delay:
+                    status = "IN_PROGRESS"
+                return self._response(
+                    JobStatus=status,
+                    Errors=job["Errors"],
+                    Arn=job["Arn"],
+                    AssetBundleImportJobId=params["AssetBundleImportJobId"],
+                )
+
+        return self._call("describe_asset_bundle_import_job", None, params, operation)
+
+    def _generate_embed_url(self, operation, kind, params):
+        with self.lock:
+            dashboard_id = params["ExperienceConfiguration"]["Dashboard"]["InitialDashboardId"]
+            self._get_resource(operation, kind, {"DashboardId": dashboard_id})
+            embed_url = f"https://{self.region}.quicksight.aws.amazon.com/embed/{uuid.uuid4().hex}/dashboards/{dashboard_id}"
+            return self._response(EmbedUrl=embed_url)
+
+    def generate_embed_url_for_registered_user(self, **params):
+        return self._call("generate_embed_url_for_registered_user", "dashboard", params, self._generate_embed_url)
+
+    def generate_embed_url_for_anonymous_user(self, **params):
+        return self._call("generate_embed_url_for_anonymous_user", "dashboard", params, self._generate_embed_url)
+
+    # --- dispatch ------------------------------------------------------------------------------------------
+
+    def _call(self, operation, kind, params, implementation):
+        with self.lock:
+            self.call_counts[operation] += 1
+            self.calls.append((operation, copy.deepcopy(params)))
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            if self.token_bucket:
+                if self.throttle_mode == "wait":
+                    self.token_bucket.acquire()
+                elif not self.token_bucket.try_acquire():
+                    with self.lock:
+                        self.throttled[operation] += 1
+                    raise self._error("ThrottlingException", operation, "Rate exceeded")
+            latency = self._get_latency(operation)
+            if latency:
+                time.sleep(latency)
+            return implementation(operation, kind, params)
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+    def __getattr__(self, name):
+        match = OPERATION_PATTERN.match(name)
+        if match:
+            action, kind = match.groups()
+            if action == "list":
+                kind = PLURALS.get(kind, kind)
+            if kind.endswith("_permissions"):
+                action, kind = f"{action}_permissions", kind[: -len("_permissions")]
+            if kind in RESOURCE_KINDS:
+                implementation = getattr(self, f"_{action}")
+
+                def operation(**params):
+                    return self._call(name, kind, params, implementation)
+
+                return operation
+        raise AttributeError(f"'FakeQuickSightClient' object has no attribute '{name}'")
+
+    def get_resource_ids(self, kind):
+        with self.lock:
+            return sorted(self.resources[kind].keys())
+
+
+def install_fake_quicksight_client(fake_client, monkeypatch):
+    """Make util.helpers.get_quicksight_client() return fake_client for the region of the fake client"""
+    import util.helpers
+
+    monkeypatch.setitem(util.helpers._helpers_service_clients, ("quicksight", fake_client.region), fake_client)
+    return fake_client
+
+
+@pytest.fixture
+def quicksight_fake(monkeypatch):
+    return install_fake_quicksight_client(FakeQuickSightClient(), monkeypatch)
@@ -12,6 +12,8 @@ import pytest
 from botocore.stub import ANY, Stubber
 from moto import mock_sts
 
+from util.permissions import get_principal_profiles
+
 logger = logging.getLogger(__name__)
 
 # globals
@@ -98,6 +100,9 @@ def quicksight_application_stub():
             self.prefix = "ADMD_Unit_Test"
             self.quicksight_principal_arn = "arn:MOCK_ARN"
             self.athena_workgroup = "mock-WorkGroup"
+            self.aws_region = os.environ.get("AWS_REGION")
+            self.quicksight_principals = get_principal_profiles(self.quicksight_principal_arn)
+            self.use_local_definition = False
 
         def get_supported_data_set_sub_types(self):
             return ["code-change-activity", "code-deployment-detail", "recovery-time-detail", "code-pipeline-detail", "code-build-detail", "github-change-activity"]
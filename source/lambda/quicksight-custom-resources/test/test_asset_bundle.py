@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+import io
+import json
+import zipfile
+
+import pytest
+from moto import mock_sts
+
+from test.fixtures.quicksight_fake import FakeQuickSightClient, install_fake_quicksight_client, quicksight_fake
+from test.fixtures.quicksight_test_fixture import quicksight_application_resource_properties
+from util.asset_bundle import AssetBundle, AssetBundleImportJob, AssetBundleImportNotDone
+from util.quicksight import QuicksightApi
+from util.quicksight_resource import QuickSightFailure
+from util.state import ApplicationState
+
+VIEWER = "arn:aws:quicksight:us-east-1:MOCK_ACCOUNT:group/default/MOCK_VIEWERS"
+
+
+@pytest.fixture
+def fast_import_polling(monkeypatch):
+    monkeypatch.setattr("util.asset_bundle.ASSET_BUNDLE_POLL_SECONDS", 0.01)
+    monkeypatch.setattr("util.asset_bundle.ASSET_BUNDLE_MAX_POLL_SECONDS", 0.01)
+
+
+def get_qs_api(resource_properties, **properties):
+    resource_properties = {
+        **resource_properties,
+        "DeploymentEngine": "asset-bundle",
+        "WorkGroupName": "MOCK_WORKGROUP",
+        **properties,
+    }
+    return QuicksightApi(resource_properties, state=ApplicationState())
+
+
+def get_asset_bundle(qs_api):
+    application = qs_api.quicksight_application
+    return AssetBundle([application.get_data_source(), *application.get_data_sets().values()])
+
+
+@mock_sts
+def test_asset_bundle_render(quicksight_application_resource_properties):
+    qs_api = get_qs_api(quicksight_application_resource_properties)
+    data_source = qs_api.quicksight_application.get_data_source()
+
+    with zipfile.ZipFile(io.BytesIO(get_asset_bundle(qs_api).render())) as bundle:
+        names = bundle.namelist()
+        data_set = json.loads(bundle.read(f"dataset/{data_source.prefix}-dataset-code-build-detail.json"))
+
+    assert f"datasource/{data_source.id}.json" in names
+    assert len([name for name in names if name.startswith("dataset/")]) == 6
+    for table in data_set["PhysicalTableMap"].values():
+        assert table["RelationalTable"]["DataSourceArn"] == data_source.arn
+
+
+@mock_sts
+def test_asset_bundle_overrides(quicksight_application_resource_properties):
+    qs_api = get_qs_api(quicksight_application_resource_properties, QuickSightPrincipals=[VIEWER])
+    asset_bundle = get_asset_bundle(qs_api)
+
+    parameters = asset_bundle.get_override_parameters()
+    assert parameters["DataSources"][0]["DataSourceParameters"]["AthenaParameters"]["WorkGroup"] == "MOCK_WORKGROUP"
+    assert len(parameters["DataSets"]) == 6
+
+    permissions = asset_bundle.get_override_permissions()
+    assert [permission["Permissions"]["Principals"] for permission in permissions["DataSets"]] == [
+        [qs_api.quicksight_application.quicksight_principal_arn],
+        [VIEWER],
+    ]
+    assert len(permissions["DataSets"][1]["DataSetIds"]) == 6
+    assert "quicksight:DeleteDataSet" not in permissions["DataSets"][1]["Permissions"]["Actions"]
+
+
+@mock_sts
+def test_import_all_resources(quicksight_application_resource_properties, quicksight_fake):
+    qs_api = get_qs_api(quicksight_application_resource_properties, QuickSightPrincipals=[VIEWER])
+    qs_api.create_all_resources()
+
+    assert quicksight_fake.call_counts["start_asset_bundle_import_job"] == 1
+    assert quicksight_fake.call_counts["create_data_source"] == 0
+    assert quicksight_fake.call_counts["create_data_set"] == 0
+    assert len(quicksight_fake.get_resource_ids("data_set")) == 6
+    assert len(quicksight_fake.get_resource_ids("dashboard")) == 1
+
+    data_source = qs_api.quicksight_application.get_data_source()
+    data_source_params = quicksight_fake.resources["data_source"][data_source.id].params
+    assert data_source_params["DataSourceParameters"]["AthenaParameters"]["WorkGroup"] == "MOCK_WORKGROUP"
+    assert VIEWER in [permission["Principal"] for permission in data_source_params["Permissions"]]
+    assert qs_api.get_global_state().snapshot()["datasource"]["arn"] == data_source.arn
+
+
+@mock_sts
+def test_import_all_resources_falls_back(quicksight_application_resource_properties, quicksight_fake):
+    quicksight_fake.asset_bundle_import_failure = "MOCK_FAILURE"
+    qs_api = get_qs_api(quicksight_application_resource_properties)
+    qs_api.create_all_resources()
+
+    assert quicksight_fake.call_counts["start_asset_bundle_import_job"] == 1
+    assert quicksight_fake.call_counts["create_data_source"] == 1
+    assert quicksight_fake.call_counts["create_data_set"] == 6
+    assert len(quicksight_fake.get_resource_ids("dashboard")) == 1
+
+
+@mock_sts
+@pytest.mark.parametrize("status", ["FAILED", "FAILED_ROLLBACK_ERROR"])
+def test_import_all_resources_not_rolled_back(quicksight_application_resource_properties, quicksight_fake, status):
+    quicksight_fake.asset_bundle_import_failure = "MOCK_FAILURE"
+    quicksight_fake.asset_bundle_import_failure_status = status
+    qs_api = get_qs_api(quicksight_application_resource_properties)
+
+    with pytest.raises(QuickSightFailure, match=status):
+        qs_api.create_all_resources()
+    assert quicksight_fake.call_counts["create_data_source"] == 0
+
+
+@mock_sts
+def test_import_all_resources_timeout(quicksight_application_resource_properties, fast_import_polling, monkeypatch):
+    fake = install_fake_quicksight_client(FakeQuickSightClient(creation_delay=1), monkeypatch)
+    monkeypatch.setattr("util.asset_bundle.ASSET_BUNDLE_TIMEOUT_SECONDS", 0.05)
+    qs_api = get_qs_api(quicksight_application_resource_properties)
+
+    with pytest.raises(AssetBundleImportNotDone, match="import job .* is IN_PROGRESS"):
+        qs_api.create_all_resources()
+    assert fake.call_counts["create_data_source"] == 0
+
+
+@mock_sts
+def test_import_job_waits(quicksight_application_resource_properties, fast_import_polling, monkeypatch):
+    fake = install_fake_quicksight_client(FakeQuickSightClient(creation_delay=0.05), monkeypatch)
+    qs_api = get_qs_api(quicksight_application_resource_properties)
+
+    response = AssetBundleImportJob(qs_api.quicksight_application, get_asset_bundle(qs_api)).run()
+    assert response["JobStatus"] == "SUCCESSFUL"
+    assert fake.call_counts["describe_asset_bundle_import_job"] > 1
+
+
+@mock_sts
+def test_import_job_failure(quicksight_application_resource_properties, quicksight_fake):
+    quicksight_fake.asset_bundle_import_failure = "MOCK_FAILURE"
+    qs_api = get_qs_api(quicksight_application_resource_properties)
+
+    with pytest.raises(QuickSightFailure, match="MOCK_FAILURE"):
+        AssetBundleImportJob(qs_api.quicksight_application, get_asset_bundle(qs_api)).run()
+
+
+@mock_sts
+def test_unknown_deployment_engine(quicksight_application_resource_properties):
+    with pytest.raises(ValueError):
+        get_qs_api(quicksight_application_resource_properties, DeploymentEngine="MOCK_ENGINE")
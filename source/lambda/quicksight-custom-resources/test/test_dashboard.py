@@ -9,9 +9,11 @@ from moto import mock_sts
 
 from util.quicksight_application import QuicksightApplication
 from util.dataset import DataSet
-from util.dashboard import Dashboard
+from util.dashboard import Dashboard, DashboardVersionNotReady
+from util.quicksight_resource import QuickSightFailure
 
 from test.fixtures.quicksight_dashboard_fixtures import DashboardStubber
+from test.fixtures.quicksight_fake import FakeQuickSightClient, install_fake_quicksight_client
 from test.fixtures.quicksight_dataset_fixtures import (
     data_set_type,
     minimal_data_sets_stub,
@@ -100,3 +102,72 @@ def test_dashboard_delete(quicksight_application_stub, minimal_data_sets_stub, t
     DashboardStubber.stub_delete_dashboard_call(sub_type)
     obj.delete()
     dump_state(obj, 'After delete')
+
+@ pytest.fixture
+def fast_version_polling(monkeypatch):
+    monkeypatch.setattr('util.dashboard.DASHBOARD_VERSION_POLL_SECONDS', 0.01)
+    monkeypatch.setattr('util.dashboard.DASHBOARD_VERSION_MAX_POLL_SECONDS', 0.01)
+
+@ pytest.fixture
+def dashboard(quicksight_application_stub, minimal_data_sets_stub, template_arn):
+    return Dashboard(
+        quicksight_application=quicksight_application_stub,
+        data_sets=minimal_data_sets_stub.data_sets_stub,
+        quicksight_template_arn=template_arn,
+        props=None
+    )
+
+@ mock_sts
+def test_dashboard_blue_green_update(dashboard, fast_version_polling, monkeypatch):
+    fake = install_fake_quicksight_client(FakeQuickSightClient(creation_delay=0.05), monkeypatch)
+
+    # a dashboard that does not exist is created
+    assert dashboard.blue_green_update() == (None, 1)
+    assert fake.call_counts['create_dashboard'] == 1
+
+    assert dashboard.blue_green_update() == (1, 2)
+    assert fake.resources['dashboard'][dashboard.id].published_version == 2
+    assert fake.call_counts['update_dashboard'] == 1
+    assert fake.call_counts['delete_dashboard'] == 0
+    # the new version was polled until it was built, then published
+    operations = [operation for operation, _ in fake.calls]
+    assert operations[-1] == 'update_dashboard_published_version'
+    assert operations.count('describe_dashboard') > 2
+
+@ mock_sts
+def test_dashboard_blue_green_update_timeout(dashboard, fast_version_polling, monkeypatch):
+    fake = install_fake_quicksight_client(FakeQuickSightClient(creation_delay=1), monkeypatch)
+    dashboard.create()
+    fake.resources['dashboard'][dashboard.id].versions[0]['time'] -= 1
+
+    with pytest.raises(DashboardVersionNotReady):
+        dashboard.blue_green_update(timeout=0.05)
+    # viewers keep the published version
+    assert fake.resources['dashboard'][dashboard.id].published_version == 1
+
+@ mock_sts
+def test_dashboard_wait_for_failed_version(dashboard, monkeypatch):
+    fake = install_fake_quicksight_client(FakeQuickSightClient(), monkeypatch)
+    dashboard.create()
+    fake.describe_dashboard = lambda **kwargs: {
+        'Dashboard': {'Version': {'VersionNumber': 1, 'Status': 'CREATION_FAILED', 'Errors': [{'Type': 'MOCK'}]}}
+    }
+    with pytest.raises(QuickSightFailure):
+        dashboard.wait_for_version(1)
+
+@ mock_sts
+def test_dashboard_rollback(dashboard, fast_version_polling, monkeypatch):
+    fake = install_fake_quicksight_client(FakeQuickSightClient(), monkeypatch)
+    # the versions are listed one page at a time
+    fake.list_page_size = 1
+    dashboard.blue_green_update()
+    dashboard.blue_green_update()
+    dashboard.blue_green_update()
+
+    assert dashboard.rollback() == 2
+    assert fake.resources['dashboard'][dashboard.id].published_version == 2
+    assert dashboard.rollback() == 1
+    with pytest.raises(QuickSightFailure):
+        dashboard.rollback()
+    assert dashboard.rollback(3) == 3
+    assert fake.call_counts['list_dashboard_versions'] == 3 * 3
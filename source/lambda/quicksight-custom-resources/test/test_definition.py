@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+import json
+import os
+
+import boto3
+import pytest
+from botocore.validate import ParamValidator
+from moto import mock_sts
+
+from test.fixtures.quicksight_fake import quicksight_fake
+from test.fixtures.quicksight_test_fixture import quicksight_application_resource_properties
+from util.definition import Definition, clear_definition_cache, get_cached_definition
+from util.quicksight import QuicksightApi
+from util.state import ApplicationState
+
+# skeleton definition with the six data set declarations and one sheet, the full definition is not shipped
+DEFINITION_FIXTURE = os.path.join(os.path.dirname(__file__), "fixtures", "definition-main.config.json")
+
+
+@pytest.fixture(autouse=True)
+def definition_file(monkeypatch):
+    monkeypatch.setattr("util.definition.DEFINITION_FILE", DEFINITION_FIXTURE)
+    clear_definition_cache()
+    yield DEFINITION_FIXTURE
+    clear_definition_cache()
+
+
+def get_qs_api(resource_properties, **properties):
+    resource_properties = {**resource_properties, "UseLocalDefinition": "true", **properties}
+    return QuicksightApi(resource_properties, state=ApplicationState())
+
+
+@mock_sts
+def test_definition_rendered_with_data_set_arns(quicksight_application_resource_properties):
+    qs_api = get_qs_api(quicksight_application_resource_properties)
+    data_sets = qs_api.quicksight_application.get_data_sets()
+
+    definition = qs_api.quicksight_application.get_dashboard().definition.get_definition()
+    declarations = definition["DataSetIdentifierDeclarations"]
+    assert len(declarations) == 6
+    for declaration in declarations:
+        assert declaration["DataSetArn"] == data_sets[declaration["Identifier"]].arn
+    # the cached definition keeps its placeholders
+    assert "{Aws.ACCOUNT_ID}" in get_cached_definition()["DataSetIdentifierDeclarations"][0]["DataSetArn"]
+
+    service_model = boto3.client("quicksight", region_name="us-east-1").meta.service_model
+    for operation, id_name in [("CreateDashboard", "DashboardId"), ("CreateAnalysis", "AnalysisId")]:
+        parameters = {"AwsAccountId": "123456789012", id_name: "MOCK", "Name": "MOCK", "Definition": definition}
+        report = ParamValidator().validate(parameters, service_model.operation_model(operation).input_shape)
+        assert not report.has_errors(), report.generate_report()
+
+
+def test_definition_cached(tmp_path):
+    definition_file = tmp_path / "definition.json"
+    definition_file.write_text(json.dumps({"Definition": {"DataSetIdentifierDeclarations": [], "Sheets": []}}))
+
+    definition = get_cached_definition(str(definition_file))
+    definition_file.write_text("not json")
+    assert get_cached_definition(str(definition_file)) is definition
+
+    clear_definition_cache()
+    with pytest.raises(ValueError):
+        get_cached_definition(str(definition_file))
+    clear_definition_cache()
+
+
+def test_definition_unknown_data_set(tmp_path):
+    definition_file = tmp_path / "definition.json"
+    declaration = {"Identifier": "MOCK_DATA_SET", "DataSetArn": "arn:MOCK"}
+    definition_file.write_text(json.dumps({"Definition": {"DataSetIdentifierDeclarations": [declaration]}}))
+
+    with pytest.raises(ValueError, match="MOCK_DATA_SET"):
+        Definition({}, str(definition_file)).get_definition()
+    clear_definition_cache()
+
+
+@mock_sts
+def test_local_definition_not_shipped(quicksight_application_resource_properties, monkeypatch, tmp_path):
+    monkeypatch.setattr("util.definition.DEFINITION_FILE", str(tmp_path / "definition-main.config.json"))
+    # UseLocalDefinition is ignored, the source template is used
+    qs_api = get_qs_api(quicksight_application_resource_properties)
+    assert not qs_api.quicksight_application.use_local_definition
+    assert not qs_api.quicksight_application.get_dashboard().use_definition
+
+
+@mock_sts
+def test_create_from_local_definition(quicksight_application_resource_properties, quicksight_fake):
+    qs_api = get_qs_api(quicksight_application_resource_properties)
+    qs_api.create_all_resources()
+
+    application = qs_api.quicksight_application
+    for kind, resource in [("analysis", application.get_analysis()), ("dashboard", application.get_dashboard())]:
+        params = quicksight_fake.resources[kind][resource.id].params
+        assert "SourceEntity" not in params
+        assert len(params["Definition"]["DataSetIdentifierDeclarations"]) == 6
+
+
+@mock_sts
+def test_import_with_local_definition(quicksight_application_resource_properties, quicksight_fake):
+    qs_api = get_qs_api(quicksight_application_resource_properties, DeploymentEngine="asset-bundle")
+    qs_api.create_all_resources()
+
+    assert quicksight_fake.call_counts["start_asset_bundle_import_job"] == 1
+    assert quicksight_fake.call_counts["create_analysis"] == 0
+    assert quicksight_fake.call_counts["create_dashboard"] == 0
+    dashboard = qs_api.quicksight_application.get_dashboard()
+    assert quicksight_fake.get_resource_ids("dashboard") == [dashboard.id]
+    assert qs_api.get_response_data()["dashboard_url"] == dashboard.url
@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+import pytest
+from moto import mock_sts
+
+import embed_url_function
+from test.fixtures.quicksight_fake import quicksight_fake
+
+
+@pytest.fixture
+def dashboard(quicksight_fake):
+    with mock_sts():
+        dashboard = embed_url_function.get_dashboard("MOCK_EMBED_STACK")
+        quicksight_fake.create_dashboard(AwsAccountId="MOCK_ACCOUNT", DashboardId=dashboard.id, Name=dashboard.name)
+        yield dashboard
+
+
+def test_handler_registered_user(dashboard, quicksight_fake, monkeypatch):
+    monkeypatch.setenv("EMBED_ALLOWED_DOMAINS", "https://portal.example.com, https://admin.example.com")
+    event = {"StackName": "MOCK_EMBED_STACK", "UserArn": "arn:MOCK_USER"}
+
+    response = embed_url_function.handler(event, None)
+    assert response["DashboardId"] == dashboard.id
+    assert response["EmbedUrl"].endswith(f"/dashboards/{dashboard.id}")
+    # an embed url can be redeemed only once, a later request gets a new one
+    assert embed_url_function.handler(event, None)["EmbedUrl"] != response["EmbedUrl"]
+
+    assert quicksight_fake.call_counts["generate_embed_url_for_registered_user"] == 2
+    operation, parameters = quicksight_fake.calls[-1]
+    assert parameters["UserArn"] == "arn:MOCK_USER"
+    assert parameters["AllowedDomains"] == ["https://portal.example.com", "https://admin.example.com"]
+
+
+def test_handler_anonymous_user(dashboard, quicksight_fake, monkeypatch):
+    monkeypatch.setenv("STACK_NAME", "MOCK_EMBED_STACK")
+
+    first = embed_url_function.handler({}, None)
+    registered = embed_url_function.handler({"UserArn": "arn:MOCK_USER"}, None)
+    # anonymous visitors never share a url
+    assert embed_url_function.handler({}, None)["EmbedUrl"] != first["EmbedUrl"]
+    assert registered["EmbedUrl"] != first["EmbedUrl"]
+
+    assert quicksight_fake.call_counts["generate_embed_url_for_anonymous_user"] == 2
+    parameters = [params for operation, params in quicksight_fake.calls if operation.endswith("anonymous_user")][0]
+    assert parameters["AuthorizedResourceArns"] == [dashboard.arn]
+
+
+def test_handler_missing_stack_name(monkeypatch):
+    monkeypatch.delenv("STACK_NAME", raising=False)
+    with pytest.raises(ValueError):
+        embed_url_function.handler({}, None)
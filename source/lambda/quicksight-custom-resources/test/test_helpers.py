@@ -20,11 +20,32 @@ from util.helpers import (
 def test_with_aws_account_id():
     assert get_aws_account_id() == "MOCK_ACCOUNT"
 
+@mock_sts
+def test_aws_account_id_is_cached(monkeypatch):
+    import util.helpers
+
+    monkeypatch.setattr(util.helpers, "_helpers_aws_account_id", None)
+    assert get_aws_account_id() == "MOCK_ACCOUNT"
+    monkeypatch.setattr(util.helpers, "get_sts_client", lambda: pytest.fail("identity requested twice"))
+    assert get_aws_account_id() == "MOCK_ACCOUNT"
+
 @mock_sts
 def test_get_sts_client():
     client = get_sts_client()
     assert "https://sts." in client.meta.endpoint_url
 
+def test_get_quicksight_client_per_region():
+    client = get_quicksight_client("eu-west-1")
+    assert client.meta.region_name == "eu-west-1"
+    assert get_quicksight_client("eu-west-1") is client
+    assert get_quicksight_client() is get_quicksight_client(os.environ["AWS_REGION"])
+    assert get_quicksight_client() is not client
+
+def test_aws_partition_of_region():
+    assert get_aws_partition("cn-northwest-1") == "aws-cn"
+    assert get_aws_partition("us-gov-west-1") == "aws-us-gov"
+    assert get_aws_partition("eu-west-1") == "aws"
+
 # @mock_sts
 def test_get_quicksight_client():
     client = get_quicksight_client()
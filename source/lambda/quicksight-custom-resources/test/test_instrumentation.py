@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+import json
+
+import boto3
+import pytest
+from botocore.stub import Stubber
+
+from util.instrumentation import ApiCallRecorder, get_api_call_recorder
+
+
+class MockHttpResponse:
+    def __init__(self, status_code):
+        self.status_code = status_code
+        self.headers = {}
+
+
+@pytest.fixture
+def recorded_client():
+    recorder = ApiCallRecorder()
+    client = boto3.client("quicksight", region_name="us-east-1")
+    recorder.register(client)
+    stubber = Stubber(client)
+    yield recorder, client, stubber
+    stubber.deactivate()
+
+
+def test_records_successful_call(recorded_client):
+    recorder, client, stubber = recorded_client
+    stubber.add_response(
+        "delete_analysis",
+        {"Status": 200, "Arn": "arn:MOCK", "AnalysisId": "MOCK", "RequestId": "MOCK"},
+    )
+    stubber.activate()
+
+    client.delete_analysis(AwsAccountId="FAKE_ACCOUNT", AnalysisId="MOCK")
+
+    summary = recorder.get_summary()["quicksight.DeleteAnalysis"]
+    assert summary["calls"] == 1
+    assert summary["errors"] == 0
+    assert len(summary["latencies_ms"]) == 1
+
+
+def test_records_error_call(recorded_client):
+    recorder, client, stubber = recorded_client
+    stubber.add_client_error("delete_analysis", service_error_code="ResourceNotFoundException", http_status_code=404)
+    stubber.activate()
+
+    with pytest.raises(client.exceptions.ResourceNotFoundException):
+        client.delete_analysis(AwsAccountId="FAKE_ACCOUNT", AnalysisId="MOCK")
+
+    summary = recorder.get_summary()["quicksight.DeleteAnalysis"]
+    assert summary["calls"] == 1
+    assert summary["errors"] == 1
+
+
+def test_counts_throttles_without_changing_retry_decision():
+    recorder = ApiCallRecorder()
+    event_name = "needs-retry.quicksight.CreateDataSet"
+    throttled = (MockHttpResponse(400), {"Error": {"Code": "ThrottlingException"}})
+    succeeded = (MockHttpResponse(200), {})
+
+    assert recorder._needs_retry(event_name=event_name, response=throttled) is None
+    assert recorder._needs_retry(event_name=event_name, response=succeeded) is None
+    assert recorder._needs_retry(event_name=event_name, response=None) is None
+
+    assert recorder.get_summary()["quicksight.CreateDataSet"]["throttles"] == 1
+
+
+def test_emit_summary_embedded_metric_format(recorded_client, capsys):
+    recorder, client, stubber = recorded_client
+    stubber.add_response(
+        "delete_analysis",
+        {"Status": 200, "Arn": "arn:MOCK", "AnalysisId": "MOCK", "RequestId": "MOCK"},
+    )
+    stubber.activate()
+    client.delete_analysis(AwsAccountId="FAKE_ACCOUNT", AnalysisId="MOCK")
+
+    document = recorder.emit_summary()
+
+    emitted = json.loads(capsys.readouterr().out.strip())
+    assert emitted["_aws"] == document["_aws"]
+    directive = emitted["_aws"]["CloudWatchMetrics"][0]
+    assert directive["Dimensions"] == [["FunctionName"]]
+    assert {"Name": "quicksight.DeleteAnalysis.Latency", "Unit": "Milliseconds"} in directive["Metrics"]
+    assert emitted["quicksight.DeleteAnalysis.Calls"] == 1
+    # a new invocation starts with no statistics and emits nothing
+    assert recorder.get_summary() == {}
+    assert recorder.emit_summary() is None
+
+
+def test_emf_directives_are_split_at_limit():
+    recorder = ApiCallRecorder()
+    for index in range(20):
+        recorder._after_call(event_name=f"after-call.quicksight.Operation{index}", parsed={}, context={})
+
+    document = recorder.to_embedded_metric_format()
+    directives = document["_aws"]["CloudWatchMetrics"]
+    assert len(directives) == 2
+    assert all(len(directive["Metrics"]) <= 100 for directive in directives)
+
+
+def test_global_recorder():
+    assert get_api_call_recorder() is get_api_call_recorder()
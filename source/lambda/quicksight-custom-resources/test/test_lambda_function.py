@@ -26,6 +26,7 @@ from test.fixtures.quicksight_datasource_fixtures import (
     quicksight_create_data_source_stubber,
     quicksight_delete_data_source_stubber
 )
+from test.fixtures.quicksight_fake import FakeQuickSightClient, install_fake_quicksight_client, quicksight_fake
 from test.fixtures.quicksight_test_fixture import (
     quicksight_state_all,
     quicksight_lambda_resource_properties,
@@ -180,3 +181,189 @@ def test_invalid_request(lambda_cloudformation_call):
     event = generate_event(request_type, 'TEST_INVALID_REQUEST')
     with pytest.raises(ValueError):
         lambda_func(event, None)
+
+@ mock_sts
+def test_batch_create_update_and_delete(quicksight_fake):
+    from lambda_function import custom_resource_create, custom_resource_delete, custom_resource_update, helper
+
+    event = generate_event('Create', 'batch')
+    event['ResourceProperties'].update({
+        'Stacks': [{'StackName': 'DHTUT_1'}, {'StackName': 'DHTUT_2'}],
+        'MaxConcurrentStacks': '2'
+    })
+    custom_resource_create(event, None)
+    assert helper.Data['Stacks'] == 'DHTUT_1,DHTUT_2'
+    assert len(quicksight_fake.get_resource_ids('dashboard')) == 2
+
+    # DHTUT_1 is no longer listed, DHTUT_2 is kept and DHTUT_3 is added
+    event['RequestType'] = 'Update'
+    event['OldResourceProperties'] = event['ResourceProperties']
+    event['ResourceProperties'] = {
+        **event['OldResourceProperties'],
+        'Stacks': [{'StackName': 'DHTUT_2'}, {'StackName': 'DHTUT_3'}],
+    }
+    quicksight_fake.call_counts.clear()
+    custom_resource_update(event, None)
+    assert helper.Data['Stacks'] == 'DHTUT_2,DHTUT_3'
+    dashboard_ids = quicksight_fake.get_resource_ids('dashboard')
+    assert sorted(dashboard_id.split('-')[0] for dashboard_id in dashboard_ids) == ['DHTUT_2', 'DHTUT_3']
+    assert quicksight_fake.call_counts['delete_dashboard'] == 1
+    assert quicksight_fake.call_counts['create_dashboard'] == 1
+    assert quicksight_fake.call_counts['update_dashboard'] == 1
+
+    event['RequestType'] = 'Delete'
+    custom_resource_delete(event, None)
+    assert not quicksight_fake.get_resource_ids('dashboard')
+
+class MockLambdaContext:
+    def __init__(self, remaining_millis):
+        self.remaining_millis = remaining_millis
+
+    def get_remaining_time_in_millis(self):
+        return self.remaining_millis
+
+@ mock_sts
+def test_batch_time_budget(quicksight_fake):
+    from lambda_function import custom_resource_create
+    from util.quicksight_resource import QuickSightFailure
+
+    event = generate_event('Create', 'batch')
+    event['ResourceProperties']['Stacks'] = [{'StackName': 'DHTUT_1'}]
+    with pytest.raises(QuickSightFailure, match='not enough time left to create stacks DHTUT_1'):
+        custom_resource_create(event, MockLambdaContext(5000))
+    assert quicksight_fake.call_counts['create_data_source'] == 0
+
+    custom_resource_create(event, MockLambdaContext(30000))
+    assert len(quicksight_fake.get_resource_ids('dashboard')) == 1
+
+@ mock_sts
+def test_batch_create_failure(quicksight_fake):
+    from lambda_function import custom_resource_create
+    from util.quicksight_resource import QuickSightFailure
+
+    quicksight_fake.create_dashboard = None
+    event = generate_event('Create', 'batch')
+    event['ResourceProperties']['Stacks'] = [{'StackName': 'DHTUT_1'}]
+    with pytest.raises(QuickSightFailure):
+        custom_resource_create(event, None)
+    assert not quicksight_fake.get_resource_ids('data_set')
+
+@ mock_sts
+def test_multi_region_create(monkeypatch):
+    from lambda_function import custom_resource_create, helper
+
+    fakes = [install_fake_quicksight_client(FakeQuickSightClient(region=region), monkeypatch) for region in ['us-east-1', 'eu-west-1']]
+    event = generate_event('Create', 'all')
+    event['ResourceProperties']['Regions'] = 'us-east-1, eu-west-1'
+    custom_resource_create(event, None)
+    assert helper.Data['Regions'] == 'us-east-1,eu-west-1'
+    assert all(len(fake.get_resource_ids('dashboard')) == 1 for fake in fakes)
+
+@ mock_sts
+def test_permissions_create_and_delete(quicksight_fake):
+    from lambda_function import custom_resource_create, custom_resource_delete
+
+    custom_resource_create(generate_event('Create', 'all'), None)
+
+    event = generate_event('Create', 'permissions')
+    event['ResourceProperties']['QuickSightPrincipals'] = [{'Principal': 'arn:MOCK_TEAM', 'Profile': 'viewer'}]
+    custom_resource_create(event, None)
+    dashboard_id = quicksight_fake.get_resource_ids('dashboard')[0]
+    permissions = quicksight_fake.describe_dashboard_permissions(AwsAccountId='MOCK_ACCOUNT', DashboardId=dashboard_id)
+    assert 'arn:MOCK_TEAM' in [permission['Principal'] for permission in permissions['Permissions']]
+
+    event['RequestType'] = 'Delete'
+    custom_resource_delete(event, None)
+    permissions = quicksight_fake.describe_dashboard_permissions(AwsAccountId='MOCK_ACCOUNT', DashboardId=dashboard_id)
+    assert 'arn:MOCK_TEAM' not in [permission['Principal'] for permission in permissions['Permissions']]
+
+@ mock_sts
+def test_permissions_update(quicksight_fake):
+    from lambda_function import custom_resource_create, custom_resource_update
+
+    custom_resource_create(generate_event('Create', 'all'), None)
+
+    event = generate_event('Create', 'permissions')
+    event['ResourceProperties']['QuickSightPrincipals'] = ['arn:MOCK_TEAM', 'arn:OTHER']
+    custom_resource_create(event, None)
+    event['RequestType'] = 'Update'
+    custom_resource_update(event, None)
+
+    dashboard_id = quicksight_fake.get_resource_ids('dashboard')[0]
+    permissions = quicksight_fake.describe_dashboard_permissions(AwsAccountId='MOCK_ACCOUNT', DashboardId=dashboard_id)
+    principals = [permission['Principal'] for permission in permissions['Permissions']]
+    assert 'arn:MOCK_TEAM' in principals and 'arn:OTHER' in principals
+
+@ mock_sts
+def test_permissions_failure_keeps_resources(quicksight_fake):
+    from lambda_function import custom_resource_create
+
+    custom_resource_create(generate_event('Create', 'all'), None)
+
+    quicksight_fake.update_dashboard_permissions = None
+    event = generate_event('Create', 'permissions')
+    event['ResourceProperties']['QuickSightPrincipals'] = ['arn:MOCK_TEAM']
+    with pytest.raises(Exception):
+        custom_resource_create(event, None)
+    assert len(quicksight_fake.get_resource_ids('data_set')) == 6
+    assert len(quicksight_fake.get_resource_ids('dashboard')) == 1
+
+@ mock_sts
+def test_blue_green_update(quicksight_fake, monkeypatch):
+    from lambda_function import custom_resource_create, custom_resource_update, helper
+
+    monkeypatch.setattr('util.dashboard.DASHBOARD_VERSION_POLL_SECONDS', 0.01)
+    custom_resource_create(generate_event('Create', 'all'), None)
+    created = {kind: quicksight_fake.get_resource_ids(kind) for kind in ['data_source', 'data_set', 'analysis', 'dashboard']}
+
+    event = generate_event('Update', 'all')
+    event['ResourceProperties']['UpdateStrategy'] = 'blue-green'
+    custom_resource_update(event, None)
+    assert {kind: quicksight_fake.get_resource_ids(kind) for kind in created} == created
+    assert quicksight_fake.call_counts['delete_dashboard'] == 0
+    assert quicksight_fake.call_counts['update_data_set'] == 6
+    dashboard = quicksight_fake.resources['dashboard'][created['dashboard'][0]]
+    assert dashboard.published_version == 2
+    assert helper.Data['dashboard_url'].endswith(created['dashboard'][0])
+
+    # the rollback is done once, when RollbackDashboard changes
+    event['OldResourceProperties'] = dict(event['ResourceProperties'])
+    event['ResourceProperties']['RollbackDashboard'] = 'true'
+    custom_resource_update(event, None)
+    assert dashboard.published_version == 1
+
+    event['OldResourceProperties'] = dict(event['ResourceProperties'])
+    custom_resource_update(event, None)
+    assert dashboard.published_version == 3
+
+    event['ResourceProperties']['RollbackDashboard'] = '2'
+    custom_resource_update(event, None)
+    assert dashboard.published_version == 2
+
+@ mock_sts
+def test_blue_green_update_waits_within_time_left(quicksight_fake, monkeypatch):
+    from lambda_function import custom_resource_create, custom_resource_update
+    from util.dashboard import DashboardVersionNotReady
+
+    monkeypatch.setattr('util.dashboard.DASHBOARD_VERSION_POLL_SECONDS', 0.01)
+    custom_resource_create(generate_event('Create', 'dashboard'), None)
+    dashboard = quicksight_fake.resources['dashboard'][quicksight_fake.get_resource_ids('dashboard')[0]]
+    # the published version is built, new versions take 5 seconds
+    quicksight_fake.creation_delay = 5
+    dashboard.versions[0]['time'] -= 5
+
+    event = generate_event('Update', 'dashboard')
+    event['ResourceProperties']['UpdateStrategy'] = 'blue-green'
+    # no time is left for the new version once the response margin is kept
+    with pytest.raises(DashboardVersionNotReady):
+        custom_resource_update(event, MockLambdaContext(3000))
+    assert dashboard.published_version == 1
+
+@ mock_sts
+def test_blue_green_update_unsupported_resource(quicksight_fake):
+    from lambda_function import custom_resource_update
+
+    event = generate_event('Update', 'dataset')
+    event['ResourceProperties']['UpdateStrategy'] = 'blue-green'
+    with pytest.raises(ValueError):
+        custom_resource_update(event, None)
@@ -2,19 +2,22 @@
 # Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
 # SPDX-License-Identifier: Apache-2.0
 
+import datetime
+import json
 import logging
 import os
 import pytest
 
-from util.logging import get_level, get_logger
+from util.logging import JsonFormatter, LazyPayload, get_level, get_logger, get_max_payload_length, payload
 
 @pytest.fixture(scope="function", autouse=True)
 def reset_logging_defaults():
     """Remove any logging configuration defaults that might have existed before starting any test"""
-    try:
-        os.environ.pop("LOG_LEVEL")
-    except KeyError:
-        pass
+    for variable in ["LOG_LEVEL", "LOG_MAX_PAYLOAD_LENGTH"]:
+        try:
+            os.environ.pop(variable)
+        except KeyError:
+            pass
 
 
 @pytest.mark.parametrize("level", ["DEBUG", "INFO", "WARNING", "ERROR"])
@@ -43,4 +46,52 @@ def test_logger_log(caplog):
     assert "This is an error" in caplog.text
     assert "This is a warning" in caplog.text
     assert "This is an informational message" in caplog.text
-    assert "This is a debug message" not in caplog.text
\ No newline at end of file
+    assert "This is a debug message" not in caplog.text
+
+
+def test_payload_redacts_response_metadata():
+    response = {
+        "ResponseMetadata": {"RequestId": "MOCK", "HTTPHeaders": {"date": "MOCK"}},
+        "Arn": "arn:MOCK",
+        "CreatedTime": datetime.datetime(2020, 10, 4),
+        "DataSets": [{"ResponseMetadata": {}, "Name": "MOCK"}],
+    }
+    rendered = json.loads(str(payload(response)))
+    assert rendered == {
+        "Arn": "arn:MOCK",
+        "CreatedTime": "2020-10-04 00:00:00",
+        "DataSets": [{"Name": "MOCK", "ResponseMetadata": "<redacted>"}],
+        "ResponseMetadata": "<redacted>",
+    }
+
+
+def test_payload_truncated():
+    rendered = str(payload({"key": "x" * 100}, max_length=20))
+    assert rendered.startswith('{"key": "xxxxxxxxxxx')
+    assert rendered.endswith("...(truncated 91 characters)")
+
+
+def test_max_payload_length():
+    assert get_max_payload_length() == 2048
+    os.environ["LOG_MAX_PAYLOAD_LENGTH"] = "10"
+    assert get_max_payload_length() == 10
+    assert str(payload({"key": "value"})).endswith("(truncated 6 characters)")
+    os.environ["LOG_MAX_PAYLOAD_LENGTH"] = "not-a-number"
+    assert get_max_payload_length() == 2048
+
+
+def test_payload_not_rendered_when_level_disabled(monkeypatch):
+    def fail_render(self):
+        raise AssertionError("payload rendered for a disabled log level")
+
+    monkeypatch.setattr(LazyPayload, "__str__", fail_render)
+    logger = get_logger(__name__)
+    logger.debug("response: %s", payload({"key": "value"}))
+
+
+def test_json_formatter():
+    record = logging.LogRecord(__name__, logging.INFO, __file__, 1, "response: %s", (payload({"Arn": "arn:MOCK"}),), None)
+    log_entry = json.loads(JsonFormatter().format(record))
+    assert log_entry["level"] == "INFO"
+    assert log_entry["logger"] == __name__
+    assert log_entry["message"] == 'response: {"Arn": "arn:MOCK"}'
@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+import pytest
+from moto import mock_sts
+
+from test.fixtures.quicksight_fake import FakeQuickSightClient, install_fake_quicksight_client, quicksight_fake
+from test.fixtures.quicksight_test_fixture import quicksight_application_resource_properties
+from util.dashboard import Dashboard
+from util.permissions import (
+    NO_ACCESS_PROFILE,
+    OWNER_PROFILE,
+    VIEWER_PROFILE,
+    diff_permissions,
+    get_principal_profiles,
+)
+from util.quicksight import QuicksightApi
+from util.state import ApplicationState
+
+OWNER = "arn:MOCK_OWNER"
+TEAM = "arn:MOCK_TEAM"
+ADMIN = "arn:MOCK_ADMIN"
+
+
+def test_get_principal_profiles():
+    principals = get_principal_profiles(OWNER, [TEAM, {"Principal": ADMIN, "Profile": OWNER_PROFILE}])
+    assert principals == [
+        {"Principal": OWNER, "Profile": OWNER_PROFILE},
+        {"Principal": TEAM, "Profile": VIEWER_PROFILE},
+        {"Principal": ADMIN, "Profile": OWNER_PROFILE},
+    ]
+
+
+@pytest.mark.parametrize(
+    "principals",
+    [[{"Principal": TEAM, "Profile": "editor"}], [{"Profile": VIEWER_PROFILE}], [TEAM, TEAM], [OWNER]],
+)
+def test_get_principal_profiles_invalid(principals):
+    with pytest.raises(ValueError):
+        get_principal_profiles(OWNER, principals)
+
+
+def test_diff_permissions():
+    desired = [{"Principal": OWNER, "Actions": ["a", "b"]}, {"Principal": TEAM, "Actions": ["a"]}]
+    current = [
+        {"Principal": OWNER, "Actions": ["a", "b", "c"]},
+        {"Principal": ADMIN, "Actions": ["a"]},
+    ]
+    grants, revokes = diff_permissions(desired, current)
+    assert grants == [{"Principal": TEAM, "Actions": ["a"]}]
+    assert revokes == [{"Principal": OWNER, "Actions": ["c"]}]
+
+    grants, revokes = diff_permissions(desired, current, prune=True)
+    assert revokes == [{"Principal": OWNER, "Actions": ["c"]}, {"Principal": ADMIN, "Actions": ["a"]}]
+
+    grants, revokes = diff_permissions(desired, current, revoked_principals=[ADMIN])
+    assert revokes == [{"Principal": OWNER, "Actions": ["c"]}, {"Principal": ADMIN, "Actions": ["a"]}]
+
+    assert diff_permissions(desired, desired) == ([], [])
+
+
+def get_qs_api(resource_properties, principals):
+    resource_properties = {**resource_properties, "QuickSightPrincipalArn": OWNER, "QuickSightPrincipals": principals}
+    return QuicksightApi(resource_properties, state=ApplicationState())
+
+
+@mock_sts
+def test_resource_permissions_of_profiles(quicksight_application_resource_properties):
+    qs_api = get_qs_api(quicksight_application_resource_properties, [TEAM, {"Principal": ADMIN, "Profile": "none"}])
+    dashboard = qs_api.quicksight_application.get_dashboard()
+
+    permissions = dashboard._get_permissions()
+    assert [permission["Principal"] for permission in permissions] == [OWNER, TEAM]
+    assert permissions[0]["Actions"] == Dashboard.permission_profiles[OWNER_PROFILE]
+    assert permissions[1]["Actions"] == Dashboard.permission_profiles[VIEWER_PROFILE]
+
+
+@mock_sts
+def test_reconcile_permissions(quicksight_application_resource_properties, monkeypatch):
+    fake = install_fake_quicksight_client(FakeQuickSightClient(latency={"default": 0.01}), monkeypatch)
+    get_qs_api(quicksight_application_resource_properties, []).create_all_resources()
+
+    # onboarding a team changes all nine resources with one update call each
+    qs_api = get_qs_api(quicksight_application_resource_properties, [TEAM])
+    summary = qs_api.reconcile_permissions()
+    assert len(summary["changed"]) == 9
+    assert fake.max_in_flight > 1
+    update_calls = [name for name in fake.call_counts if name.startswith("update_") and name.endswith("_permissions")]
+    assert sum(fake.call_counts[name] for name in update_calls) == 9
+    dashboard_id = qs_api.quicksight_application.get_dashboard().id
+    dashboard_permissions = fake.describe_dashboard_permissions(AwsAccountId="MOCK_ACCOUNT", DashboardId=dashboard_id)
+    assert {permission["Principal"] for permission in dashboard_permissions["Permissions"]} == {OWNER, TEAM}
+
+    # nothing to change on the second run
+    summary = qs_api.reconcile_permissions()
+    assert summary["changed"] == []
+    assert len(summary["unchanged"]) == 9
+
+    # offboarding the team revokes its permissions only
+    qs_api = get_qs_api(quicksight_application_resource_properties, [{"Principal": TEAM, "Profile": NO_ACCESS_PROFILE}])
+    summary = qs_api.reconcile_permissions()
+    assert all(change["grants"] == [] for change in summary["changed"])
+    assert all(revoke["Principal"] == TEAM for change in summary["changed"] for revoke in change["revokes"])
+    dashboard_permissions = fake.describe_dashboard_permissions(AwsAccountId="MOCK_ACCOUNT", DashboardId=dashboard_id)
+    assert [permission["Principal"] for permission in dashboard_permissions["Permissions"]] == [OWNER]
+
+
+@mock_sts
+def test_reconcile_permissions_prune(quicksight_application_resource_properties, quicksight_fake):
+    get_qs_api(quicksight_application_resource_properties, [TEAM]).create_all_resources()
+
+    qs_api = get_qs_api(quicksight_application_resource_properties, [])
+    assert qs_api.reconcile_permissions()["changed"] == []
+    assert len(qs_api.reconcile_permissions(prune=True)["changed"]) == 9
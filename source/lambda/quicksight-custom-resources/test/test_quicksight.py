@@ -5,13 +5,17 @@
 from test.logger_test_helper import dump_state
 import test.logger_test_helper
 import logging
+import time
 import pytest
 from moto import mock_sts
 
-from util.quicksight import QuicksightApi
-from util.quicksight_application import QuicksightApplication
+from util.quicksight import QuicksightApi, get_update_plan, provision_regions, provision_stacks
+from util.quicksight_resource import read_config_file
+from util.state import ApplicationState
+from util.quicksight_application import QuicksightApplication, get_global_state
 from util.template import Template, TemplatePermissionType
 
+from test.fixtures.quicksight_fake import FakeQuickSightClient, install_fake_quicksight_client, quicksight_fake
 from test.fixtures.quicksight_test_fixture import TestHelper, quicksight_application_resource_properties
 from test.fixtures.quicksight_template_fixtures import (
     TemplateStubber,
@@ -109,3 +113,187 @@ def test_quicksight_api_long_app_name(quicksight_application_resource_properties
     QuicksightApplication.clear_global_states()
     qs_api = QuicksightApi(resource_properties)
     assert len(qs_api.quicksight_application.data_source.name) == 80
+
+
+@mock_sts
+def test_quicksight_api_with_own_state(quicksight_application_resource_properties, quicksight_fake):
+    state = ApplicationState()
+    resource_properties = {**quicksight_application_resource_properties, "StackName": "MOCK_OWN_STATE"}
+    qs_api = QuicksightApi(resource_properties, state=state)
+    qs_api.create_data_source()
+
+    assert qs_api.get_global_state() is state
+    assert state["datasource"]["id"] == qs_api.quicksight_application.get_data_source().id
+    assert get_global_state().get("datasource", {}).get("id") != "MOCK_OWN_STATE-datasource"
+
+def test_read_config_file_returns_new_copy(tmp_path):
+    config_file = str(tmp_path / "dataset-mock.config.json")
+    with open(config_file, "w") as config_fd:
+        config_fd.write('{"PhysicalTableMap": {"table": {}}}')
+
+    config = read_config_file(config_file)
+    config["PhysicalTableMap"]["table"]["changed"] = True
+    (tmp_path / "dataset-mock.config.json").unlink()
+    assert read_config_file(config_file) == {"PhysicalTableMap": {"table": {}}}
+
+def get_stack_configs(count):
+    return [
+        {"StackName": f"MOCK_STACK_{index}", "QuickSightPrincipalArn": f"arn:MOCK_PRINCIPAL_{index}"}
+        for index in range(count)
+    ]
+
+@mock_sts
+def test_provision_stacks_create_and_delete(quicksight_fake):
+    defaults = {"QuickSightSourceTemplateArn": "arn:MOCK_TEMPLATE", "WorkGroupName": "MOCK_WORKGROUP"}
+    summary = provision_stacks(get_stack_configs(3), "Create", defaults=defaults, max_concurrency=2)
+
+    assert summary["Succeeded"] == ["MOCK_STACK_0", "MOCK_STACK_1", "MOCK_STACK_2"]
+    assert summary["Failed"] == []
+    assert len(quicksight_fake.get_resource_ids("dashboard")) == 3
+    assert len(quicksight_fake.get_resource_ids("data_set")) == 18
+    dashboard_url = summary["Results"]["MOCK_STACK_1"]["Data"]["dashboard_url"]
+    assert "MOCK_STACK_1" in dashboard_url
+    data_source_ids = quicksight_fake.get_resource_ids("data_source")
+    data_source = quicksight_fake.resources["data_source"][data_source_ids[0]]
+    assert data_source.params["DataSourceParameters"]["AthenaParameters"]["WorkGroup"] == "MOCK_WORKGROUP"
+
+    summary = provision_stacks(get_stack_configs(3), "Delete", defaults=defaults)
+    assert summary["Failed"] == []
+    assert all(not quicksight_fake.get_resource_ids(kind) for kind in ["data_source", "data_set", "analysis", "dashboard"])
+
+@mock_sts
+def test_provision_stacks_failure_is_isolated(quicksight_fake):
+    create_dashboard = quicksight_fake.create_dashboard
+
+    def failing_create_dashboard(**kwargs):
+        if kwargs["DashboardId"].startswith("MOCK_STACK_1"):
+            raise quicksight_fake.exceptions.InvalidParameterValueException(
+                {"Error": {"Code": "InvalidParameterValueException", "Message": "MOCK"}}, "CreateDashboard"
+            )
+        return create_dashboard(**kwargs)
+
+    quicksight_fake.create_dashboard = failing_create_dashboard
+    summary = provision_stacks(get_stack_configs(2), "Create")
+
+    assert summary["Succeeded"] == ["MOCK_STACK_0"]
+    assert summary["Failed"] == ["MOCK_STACK_1"]
+    assert "MOCK" in summary["Results"]["MOCK_STACK_1"]["Reason"]
+    # the failed stack is rolled back, the other stack keeps its resources
+    assert all(resource_id.startswith("MOCK_STACK_0") for resource_id in quicksight_fake.get_resource_ids("data_set"))
+    assert len(quicksight_fake.get_resource_ids("dashboard")) == 1
+
+def test_provision_stacks_invalid_configs():
+    with pytest.raises(ValueError):
+        provision_stacks([{"QuickSightPrincipalArn": "arn:MOCK_PRINCIPAL"}])
+    with pytest.raises(ValueError):
+        provision_stacks([{"StackName": "MOCK_STACK"}, {"StackName": "MOCK_STACK"}])
+
+@mock_sts
+def test_quicksight_api_region(quicksight_application_resource_properties):
+    resource_properties = {**quicksight_application_resource_properties, "Region": "cn-north-1"}
+    qs_api = QuicksightApi(resource_properties, state=ApplicationState())
+    dashboard = qs_api.quicksight_application.get_dashboard()
+
+    assert dashboard.aws_region == "cn-north-1"
+    assert dashboard.arn.startswith("arn:aws-cn:quicksight:cn-north-1:")
+    assert dashboard.url.startswith("https://cn-north-1.quicksight.aws.amazon.com/")
+
+@mock_sts
+def test_provision_regions(quicksight_application_resource_properties, monkeypatch):
+    fakes = {
+        region: install_fake_quicksight_client(FakeQuickSightClient(region=region), monkeypatch)
+        for region in ["us-east-1", "eu-west-1", "ap-southeast-2"]
+    }
+    regions = list(fakes)
+    summary = provision_regions(quicksight_application_resource_properties, regions, "Create")
+
+    assert summary["Succeeded"] == regions
+    for region, fake in fakes.items():
+        assert len(fake.get_resource_ids("dashboard")) == 1
+        assert summary["Results"][region]["Data"]["dashboard_url"].startswith(f"https://{region}.quicksight")
+        data_set = fake.resources["data_set"][fake.get_resource_ids("data_set")[0]]
+        data_source_arn = next(iter(data_set.params["PhysicalTableMap"].values()))["RelationalTable"]["DataSourceArn"]
+        assert f":{region}:" in data_source_arn
+
+    summary = provision_regions(quicksight_application_resource_properties, regions, "Delete")
+    assert summary["Failed"] == []
+    assert all(not fake.get_resource_ids("dashboard") for fake in fakes.values())
+
+def test_get_update_plan():
+    old_targets = {"MOCK_STACK_0": {"Region": "us-east-1"}, "MOCK_STACK_1": {"Region": "us-east-1"}}
+    targets = {"MOCK_STACK_1": {"Region": "eu-west-1"}, "MOCK_STACK_2": {"Region": "us-east-1"}}
+    plan = get_update_plan(old_targets, targets)
+
+    assert {name: target["RequestType"] for name, target in plan.items()} == {
+        "MOCK_STACK_0": "Delete",
+        "MOCK_STACK_1": "Update",
+        "MOCK_STACK_2": "Create",
+    }
+    assert plan["MOCK_STACK_0"]["ResourceProperties"] == {"Region": "us-east-1"}
+    assert plan["MOCK_STACK_1"]["OldResourceProperties"] == {"Region": "us-east-1"}
+
+@mock_sts
+def test_provision_regions_update(quicksight_application_resource_properties, monkeypatch):
+    fakes = {
+        region: install_fake_quicksight_client(FakeQuickSightClient(region=region), monkeypatch)
+        for region in ["us-east-1", "eu-west-1", "ap-southeast-2"]
+    }
+    provision_regions(quicksight_application_resource_properties, ["us-east-1", "eu-west-1"], "Create")
+    for fake in fakes.values():
+        fake.call_counts.clear()
+
+    summary = provision_regions(
+        quicksight_application_resource_properties,
+        ["eu-west-1", "ap-southeast-2"],
+        "Update",
+        old_regions=["us-east-1", "eu-west-1"],
+    )
+    assert summary["Succeeded"] == ["us-east-1", "eu-west-1", "ap-southeast-2"]
+    assert {region: result["RequestType"] for region, result in summary["Results"].items()} == {
+        "us-east-1": "Delete",
+        "eu-west-1": "Update",
+        "ap-southeast-2": "Create",
+    }
+    assert not fakes["us-east-1"].get_resource_ids("dashboard")
+    assert fakes["eu-west-1"].call_counts["delete_dashboard"] == 0
+    assert fakes["eu-west-1"].call_counts["update_dashboard"] == 1
+    assert len(fakes["ap-southeast-2"].get_resource_ids("dashboard")) == 1
+
+@mock_sts
+def test_provision_stacks_skipped_after_deadline(quicksight_fake):
+    summary = provision_stacks(get_stack_configs(2), "Create", deadline=time.monotonic() + 1)
+
+    assert summary["Skipped"] == ["MOCK_STACK_0", "MOCK_STACK_1"]
+    assert not quicksight_fake.get_resource_ids("data_source")
+
+def test_provision_regions_duplicate_region(quicksight_application_resource_properties):
+    with pytest.raises(ValueError):
+        provision_regions(quicksight_application_resource_properties, ["eu-west-1", "eu-west-1"])
+
+@mock_sts
+def test_quicksight_api_pinned_template_version(quicksight_application_resource_properties, quicksight_fake):
+    resource_properties = {**quicksight_application_resource_properties, "QuickSightSourceTemplateVersion": "4"}
+    qs_api = QuicksightApi(resource_properties, state=ApplicationState())
+    source_entity = qs_api.quicksight_application.get_dashboard()._get_source_entity()
+    assert source_entity["SourceTemplate"]["Arn"] == "MOCK_QuickSightSourceTemplateArn/version/4"
+
+@mock_sts
+def test_quicksight_api_publish_and_use_template_version(quicksight_application_resource_properties, quicksight_fake):
+    resource_properties = {**quicksight_application_resource_properties, "StackName": "MOCK_VERSIONED"}
+    qs_api = QuicksightApi(resource_properties, state=ApplicationState())
+    qs_api.publish_template_from_template("arn:MOCK_SOURCE_TEMPLATE")
+    qs_api.publish_template_from_template("arn:MOCK_SOURCE_TEMPLATE")
+    assert qs_api.get_global_state()["template"]["version"] == 2
+
+    template = qs_api.quicksight_application.get_template()
+    template.pin_version(1)
+    version_arn = qs_api.use_template_version()
+    assert version_arn == f"{template.arn}/version/1"
+    qs_api.create_data_source()
+    qs_api.create_data_sets()
+    qs_api.create_analysis()
+    created = dict(quicksight_fake.calls)["create_analysis"]
+    assert created["SourceEntity"]["SourceTemplate"]["Arn"] == version_arn
+    assert quicksight_fake.call_counts["describe_template"] == 0
+
+    assert qs_api.delete_old_template_versions(keep=1) == []
@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from moto import mock_sts
+
+from test.fixtures.quicksight_fake import FakeQuickSightClient, install_fake_quicksight_client, quicksight_fake
+from test.fixtures.quicksight_test_fixture import quicksight_application_resource_properties
+from util.helpers import get_quicksight_client
+from util.quicksight import QuicksightApi
+from util.quicksight_application import QuicksightApplication
+
+
+def create_analysis(client, analysis_id="MOCK_ANALYSIS"):
+    return client.create_analysis(
+        AwsAccountId="MOCK_ACCOUNT",
+        AnalysisId=analysis_id,
+        Name=analysis_id,
+        Permissions=[{"Principal": "arn:MOCK_PRINCIPAL", "Actions": ["quicksight:DescribeAnalysis"]}],
+        SourceEntity={"SourceTemplate": {"Arn": "arn:MOCK_TEMPLATE", "DataSetReferences": []}},
+    )
+
+
+def test_create_describe_delete():
+    client = FakeQuickSightClient()
+
+    response = create_analysis(client)
+    assert response["Status"] == 202
+    assert response["Arn"] == "arn:aws:quicksight:us-east-1:MOCK_ACCOUNT:analysis/MOCK_ANALYSIS"
+
+    analysis = client.describe_analysis(AwsAccountId="MOCK_ACCOUNT", AnalysisId="MOCK_ANALYSIS")["Analysis"]
+    assert analysis["Status"] == "CREATION_SUCCESSFUL"
+    assert client.list_analyses(AwsAccountId="MOCK_ACCOUNT")["AnalysisSummaryList"][0]["AnalysisId"] == "MOCK_ANALYSIS"
+
+    client.delete_analysis(AwsAccountId="MOCK_ACCOUNT", AnalysisId="MOCK_ANALYSIS")
+    with pytest.raises(client.exceptions.ResourceNotFoundException):
+        client.describe_analysis(AwsAccountId="MOCK_ACCOUNT", AnalysisId="MOCK_ANALYSIS")
+    assert client.call_counts["create_analysis"] == 1
+
+
+def test_resource_exists():
+    client = FakeQuickSightClient()
+    create_analysis(client)
+    with pytest.raises(client.exceptions.ResourceExistsException):
+        create_analysis(client)
+
+
+def test_creation_in_progress_and_conflict():
+    client = FakeQuickSightClient(creation_delay=0.05)
+    create_analysis(client)
+
+    analysis = client.describe_analysis(AwsAccountId="MOCK_ACCOUNT", AnalysisId="MOCK_ANALYSIS")["Analysis"]
+    assert analysis["Status"] == "CREATION_IN_PROGRESS"
+    with pytest.raises(client.exceptions.ConflictException):
+        client.update_analysis(AwsAccountId="MOCK_ACCOUNT", AnalysisId="MOCK_ANALYSIS", Name="renamed")
+
+    time.sleep(0.06)
+    analysis = client.describe_analysis(AwsAccountId="MOCK_ACCOUNT", AnalysisId="MOCK_ANALYSIS")["Analysis"]
+    assert analysis["Status"] == "CREATION_SUCCESSFUL"
+    response = client.update_analysis(AwsAccountId="MOCK_ACCOUNT", AnalysisId="MOCK_ANALYSIS", Name="renamed")
+    assert response["UpdateStatus"] == "UPDATE_IN_PROGRESS"
+
+
+def test_dashboard_versions():
+    client = FakeQuickSightClient()
+    parameters = {"AwsAccountId": "MOCK_ACCOUNT", "DashboardId": "MOCK_DASHBOARD", "Name": "MOCK"}
+    assert client.create_dashboard(**parameters)["VersionArn"].endswith("/version/1")
+    assert client.update_dashboard(**parameters)["VersionArn"].endswith("/version/2")
+
+    versions = client.list_dashboard_versions(AwsAccountId="MOCK_ACCOUNT", DashboardId="MOCK_DASHBOARD")
+    assert [version["VersionNumber"] for version in versions["DashboardVersionSummaryList"]] == [1, 2]
+    client.update_dashboard_published_version(AwsAccountId="MOCK_ACCOUNT", DashboardId="MOCK_DASHBOARD", VersionNumber=2)
+    assert client.resources["dashboard"]["MOCK_DASHBOARD"].published_version == 2
+
+
+def test_template_versions():
+    client = FakeQuickSightClient()
+    parameters = {"AwsAccountId": "MOCK_ACCOUNT", "TemplateId": "MOCK_TEMPLATE", "Name": "MOCK"}
+    client.create_template(**parameters)
+    client.update_template(**parameters)
+
+    client.delete_template(AwsAccountId="MOCK_ACCOUNT", TemplateId="MOCK_TEMPLATE", VersionNumber=1)
+    with pytest.raises(client.exceptions.ResourceNotFoundException):
+        client.describe_template(AwsAccountId="MOCK_ACCOUNT", TemplateId="MOCK_TEMPLATE", VersionNumber=1)
+    with pytest.raises(client.exceptions.ResourceNotFoundException):
+        client.delete_template(AwsAccountId="MOCK_ACCOUNT", TemplateId="MOCK_TEMPLATE", VersionNumber=1)
+    template = client.describe_template(AwsAccountId="MOCK_ACCOUNT", TemplateId="MOCK_TEMPLATE", VersionNumber=2)
+    assert template["Template"]["TemplateId"] == "MOCK_TEMPLATE"
+    versions = client.list_template_versions(AwsAccountId="MOCK_ACCOUNT", TemplateId="MOCK_TEMPLATE")
+    assert [version["VersionNumber"] for version in versions["TemplateVersionSummaryList"]] == [2]
+
+
+def test_permissions():
+    client = FakeQuickSightClient()
+    create_analysis(client)
+    client.update_analysis_permissions(
+        AwsAccountId="MOCK_ACCOUNT",
+        AnalysisId="MOCK_ANALYSIS",
+        GrantPermissions=[{"Principal": "arn:MOCK_VIEWER", "Actions": ["quicksight:QueryAnalysis"]}],
+        RevokePermissions=[{"Principal": "arn:MOCK_PRINCIPAL", "Actions": ["quicksight:DescribeAnalysis"]}],
+    )
+    permissions = client.describe_analysis_permissions(AwsAccountId="MOCK_ACCOUNT", AnalysisId="MOCK_ANALYSIS")
+    assert permissions["Permissions"] == [{"Principal": "arn:MOCK_VIEWER", "Actions": ["quicksight:QueryAnalysis"]}]
+
+
+def test_unknown_operation():
+    client = FakeQuickSightClient()
+    assert not hasattr(client, "create_something_else")
+
+
+def test_throttling_raises():
+    client = FakeQuickSightClient(rate_limit=1, burst=2)
+    create_analysis(client, "first")
+    create_analysis(client, "second")
+    with pytest.raises(client.exceptions.ThrottlingException):
+        create_analysis(client, "third")
+    assert client.throttled["create_analysis"] == 1
+
+
+def test_latency_overlaps_concurrent_calls():
+    client = FakeQuickSightClient(latency={"default": 0.05})
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        list(executor.map(lambda index: create_analysis(client, f"analysis-{index}"), range(4)))
+    assert time.monotonic() - start < 0.15
+    assert client.max_in_flight == 4
+
+
+def test_install_fake_quicksight_client(quicksight_fake):
+    assert get_quicksight_client() is quicksight_fake
+
+
+@mock_sts
+def test_quicksight_api_create_and_delete_all(quicksight_application_resource_properties, quicksight_fake):
+    QuicksightApplication.clear_global_states()
+    qs_api = QuicksightApi(quicksight_application_resource_properties)
+
+    qs_api.create_all_resources()
+    assert len(quicksight_fake.get_resource_ids("data_set")) == 6
+    assert quicksight_fake.get_resource_ids("dashboard") == [qs_api.quicksight_application.get_dashboard().id]
+
+    qs_api.delete_all_resources()
+    assert all(not quicksight_fake.get_resource_ids(kind) for kind in ["data_source", "data_set", "analysis", "dashboard"])
+    QuicksightApplication.clear_global_states()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+import time
+
+import boto3
+from botocore.stub import Stubber
+
+from util.rate_limiter import ApiRateLimiter, TokenBucket, get_api_rate_limiter
+
+
+def test_token_bucket_wait():
+    bucket = TokenBucket(rate=100, capacity=1)
+    start = time.monotonic()
+    for _ in range(3):
+        bucket.acquire()
+    assert time.monotonic() - start >= 0.015
+
+
+def test_token_bucket_try_acquire():
+    bucket = TokenBucket(rate=1, capacity=2)
+    assert bucket.try_acquire()
+    assert bucket.try_acquire()
+    assert not bucket.try_acquire()
+
+
+def stubbed_client(rate_limiter, calls):
+    client = boto3.client("quicksight", region_name="us-east-1")
+    rate_limiter.register(client)
+    stubber = Stubber(client)
+    for _ in range(calls):
+        stubber.add_response("list_dashboards", {"DashboardSummaryList": []}, {"AwsAccountId": "MOCK_ACCOUNT"})
+    stubber.activate()
+    return client
+
+
+def test_rate_limiter_waits_for_tokens():
+    client = stubbed_client(ApiRateLimiter(rate=100, burst=1), 3)
+    start = time.monotonic()
+    for _ in range(3):
+        client.list_dashboards(AwsAccountId="MOCK_ACCOUNT")
+    assert time.monotonic() - start >= 0.015
+
+
+def test_rate_limiter_not_configured():
+    rate_limiter = ApiRateLimiter()
+    assert rate_limiter.token_bucket is None
+    client = stubbed_client(rate_limiter, 2)
+    for _ in range(2):
+        client.list_dashboards(AwsAccountId="MOCK_ACCOUNT")
+
+    rate_limiter.configure(rate=10, burst=5)
+    assert rate_limiter.token_bucket.capacity == 5
+
+
+def test_get_api_rate_limiter(monkeypatch):
+    import util.rate_limiter
+
+    monkeypatch.setattr(util.rate_limiter, "_api_rate_limiter", None)
+    monkeypatch.setenv("QUICKSIGHT_API_RATE_LIMIT", "8")
+    rate_limiter = get_api_rate_limiter()
+    assert rate_limiter.token_bucket.rate == 8
+    assert rate_limiter.token_bucket.capacity == 8
+    assert get_api_rate_limiter() is rate_limiter
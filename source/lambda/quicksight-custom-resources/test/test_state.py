@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from util.state import ApplicationState, StateSnapshot
+
+
+def test_snapshot_is_immutable():
+    snapshot = StateSnapshot({"dataset": {"code-change-activity": {"id": "ds1"}}, "tags": ["a", "b"]})
+    with pytest.raises(TypeError):
+        snapshot["dataset"] = {}
+    with pytest.raises(TypeError):
+        snapshot["dataset"]["code-change-activity"]["id"] = "ds2"
+    assert snapshot["tags"] == ("a", "b")
+    assert snapshot.to_dict() == {"dataset": {"code-change-activity": {"id": "ds1"}}, "tags": ["a", "b"]}
+
+
+def test_snapshot_replace_and_merge():
+    snapshot = StateSnapshot({"dataset": {"a": {"id": "a"}}, "datasource": {"id": "src"}})
+
+    replaced = snapshot.replace({"dataset": {"b": {"id": "b"}}})
+    assert replaced.to_dict() == {"dataset": {"b": {"id": "b"}}, "datasource": {"id": "src"}}
+
+    merged = snapshot.merge({"dataset": {"b": {"id": "b"}}})
+    assert merged.to_dict() == {"dataset": {"a": {"id": "a"}, "b": {"id": "b"}}, "datasource": {"id": "src"}}
+
+    # the original snapshot never changes
+    assert snapshot.to_dict() == {"dataset": {"a": {"id": "a"}}, "datasource": {"id": "src"}}
+
+
+def test_application_state_update_keeps_old_snapshots():
+    state = ApplicationState({"analysis": {"id": "old"}})
+    before = state.snapshot()
+    state.update({"analysis": {"id": "new"}})
+    assert before["analysis"]["id"] == "old"
+    assert state["analysis"]["id"] == "new"
+    assert state.get_data() == {"analysis": {"id": "new"}}
+
+
+def test_application_state_concurrent_merge():
+    state = ApplicationState({"dataset": {}})
+    sub_types = [f"sub-type-{index}" for index in range(200)]
+
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        list(executor.map(lambda sub_type: state.merge({"dataset": {sub_type: {"id": sub_type}}}), sub_types))
+
+    assert set(state["dataset"].keys()) == set(sub_types)
+
+
+def test_empty_application_state_is_falsy():
+    assert not ApplicationState()
+    assert ApplicationState({"datasource": {}})
@@ -8,9 +8,10 @@ import pytest
 from moto import mock_sts
 
 from util.quicksight_application import QuicksightApplication
-from util.template import Template, TemplatePermissionType
+from util.template import Template, TemplatePermissionType, get_template_version_arn, get_template_version_number
 
 from test.fixtures.quicksight_dataset_fixtures import minimal_data_sets_stub
+from test.fixtures.quicksight_fake import quicksight_fake
 from test.fixtures.quicksight_template_fixtures import (TemplateStubber, template_arn)
 from test.fixtures.quicksight_test_fixture import quicksight_application_stub
 from test.logger_test_helper import dump_state
@@ -114,3 +115,58 @@ def test_template_update_template_permissions(quicksight_application_stub, minim
         principal=None
     )
     dump_state(obj, 'After template delete obj')
+
+def test_template_version_arn():
+    template_arn = "arn:aws:quicksight:us-east-1:MOCK_ACCOUNT:template/MOCK_TEMPLATE"
+    assert get_template_version_arn(template_arn, 2) == f"{template_arn}/version/2"
+    assert get_template_version_arn(f"{template_arn}/version/2", 5) == f"{template_arn}/version/5"
+    assert get_template_version_number(f"{template_arn}/version/12") == 12
+    assert get_template_version_number(template_arn) is None
+
+@ mock_sts
+def test_template_publish_versions(quicksight_application_stub, minimal_data_sets_stub, source_template_arn, quicksight_fake):
+    obj = Template(quicksight_application=quicksight_application_stub, data_sets=minimal_data_sets_stub.data_sets_stub, props=None)
+
+    obj.publish_from_template(source_template_arn)
+    assert obj.version_number == 1
+    assert quicksight_fake.call_counts['create_template'] == 1
+
+    obj.publish_from_template(source_template_arn, version_description='2')
+    obj.publish_from_template(source_template_arn)
+    assert obj.version_number == 3
+    assert obj.get_version_arn() == f"{obj.arn}/version/3"
+    # the first update finds no template and creates it
+    assert quicksight_fake.call_counts['update_template'] == 3
+    assert quicksight_fake.call_counts['delete_template'] == 0
+
+@ mock_sts
+def test_template_describe_version_cache(quicksight_application_stub, source_template_arn, quicksight_fake):
+    obj = Template(quicksight_application=quicksight_application_stub, data_sets=None, props=None)
+    obj.publish_from_template(source_template_arn)
+    obj.publish_from_template(source_template_arn)
+
+    assert obj.describe_version(1)['Template']['Version']['VersionNumber'] == 1
+    assert obj.describe_version(1)['Template']['Version']['VersionNumber'] == 1
+    obj.describe_version()
+    obj.describe_version()
+    # numbered versions are described once, the latest version every time
+    assert quicksight_fake.call_counts['describe_template'] == 3
+
+@ mock_sts
+def test_template_delete_old_versions(quicksight_application_stub, source_template_arn, quicksight_fake):
+    obj = Template(quicksight_application=quicksight_application_stub, data_sets=None, props=None)
+    for _ in range(5):
+        obj.publish_from_template(source_template_arn)
+    obj.pin_version(1)
+
+    assert obj.delete_old_versions(keep=2) == [2, 3]
+    assert [version['VersionNumber'] for version in obj.list_versions()] == [1, 4, 5]
+    assert obj.get_version_arn() == f"{obj.arn}/version/1"
+    with pytest.raises(ValueError):
+        obj.delete_old_versions(keep=0)
+
+@ mock_sts
+def test_template_version_arn_unknown(quicksight_application_stub):
+    obj = Template(quicksight_application=quicksight_application_stub, data_sets=None, props=None)
+    with pytest.raises(ValueError):
+        obj.get_version_arn()
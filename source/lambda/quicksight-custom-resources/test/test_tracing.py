@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+import json
+
+import boto3
+import pytest
+from botocore.stub import Stubber
+
+from util.tracing import Tracer, get_tracer, start_tracing, traced, traced_resource_call
+
+
+@pytest.fixture
+def global_tracer(monkeypatch):
+    monkeypatch.delenv("QUICKSIGHT_TRACE", raising=False)
+    tracer = start_tracing({"EnableTracing": "true"})
+    yield tracer
+    tracer.reset()
+    tracer.enabled = False
+
+
+def get_spans(trace):
+    return [event for event in trace["traceEvents"] if event["ph"] == "X"]
+
+
+def test_disabled_tracer_records_nothing():
+    tracer = Tracer(enabled=False)
+    with tracer.span("phase"):
+        pass
+    assert get_spans(tracer.get_trace()) == []
+    assert tracer.flush() is None
+
+
+def test_span_is_complete_event():
+    tracer = Tracer(enabled=True)
+    with tracer.span("create", category="phase", resource="all"):
+        pass
+
+    (span,) = get_spans(tracer.get_trace())
+    assert span["name"] == "create"
+    assert span["cat"] == "phase"
+    assert span["args"] == {"resource": "all"}
+    assert span["dur"] >= 0
+    assert {"ts", "pid", "tid"} <= set(span.keys())
+
+
+def test_span_recorded_on_exception():
+    tracer = Tracer(enabled=True)
+    with pytest.raises(ValueError):
+        with tracer.span("create"):
+            raise ValueError("failed")
+    assert len(get_spans(tracer.get_trace())) == 1
+
+
+def test_start_tracing_from_resource_property(monkeypatch):
+    monkeypatch.delenv("QUICKSIGHT_TRACE", raising=False)
+    assert start_tracing({"EnableTracing": "true"}).enabled
+    assert not start_tracing({}).enabled
+    monkeypatch.setenv("QUICKSIGHT_TRACE", "true")
+    assert start_tracing({}).enabled
+    get_tracer().enabled = False
+
+
+def test_decorators(global_tracer):
+    class MockResource:
+        type = "dataset"
+        id = "MOCK_ID"
+
+        @traced_resource_call
+        def create(self):
+            return "created"
+
+    @traced("init")
+    def init():
+        return MockResource().create()
+
+    assert init() == "created"
+    names = [span["name"] for span in get_spans(global_tracer.get_trace())]
+    assert names == ["dataset.create", "init"]
+
+
+def test_api_call_spans():
+    tracer = Tracer(enabled=True)
+    client = boto3.client("quicksight", region_name="us-east-1")
+    tracer.register(client)
+    with Stubber(client) as stubber:
+        stubber.add_response(
+            "delete_dashboard",
+            {"Status": 200, "Arn": "arn:MOCK", "DashboardId": "MOCK", "RequestId": "MOCK"},
+        )
+        client.delete_dashboard(AwsAccountId="FAKE_ACCOUNT", DashboardId="MOCK")
+
+    (span,) = get_spans(tracer.get_trace())
+    assert span["name"] == "quicksight.DeleteDashboard"
+    assert span["cat"] == "api"
+
+
+def test_flush_to_file(tmp_path):
+    tracer = Tracer(enabled=True)
+    with tracer.span("handler"):
+        pass
+    trace_file = tmp_path / "trace.json"
+
+    tracer.flush(str(trace_file))
+
+    trace = json.loads(trace_file.read_text())
+    assert trace["traceEvents"][0]["ph"] == "M"
+    assert len(get_spans(trace)) == 1
+    assert get_spans(tracer.get_trace()) == []
+
+
+def test_flush_to_log_stream(capsys):
+    tracer = Tracer(enabled=True)
+    with tracer.span("handler"):
+        pass
+
+    tracer.flush()
+
+    trace = json.loads(capsys.readouterr().out.strip())
+    assert len(get_spans(trace)) == 1
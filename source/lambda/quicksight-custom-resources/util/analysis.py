@@ -3,15 +3,35 @@
 
 from tenacity import retry, retry_if_exception_type, stop_after_attempt
 
+from util.definition import Definition
 from util.helpers import get_quicksight_client
-from util.logging import get_logger
+from util.logging import get_logger, payload
+from util.permissions import OWNER_PROFILE, VIEWER_PROFILE
 from util.quicksight_resource import QuickSightFailure, QuickSightResource
 from util.source_entity import SourceEntity
+from util.tracing import traced_resource_call
 
 logger = get_logger(__name__)
 
 
 class Analysis(QuickSightResource):
+    # The owner creates the resources and is given full actions for the type, viewers are given read actions
+    permission_profiles = {
+        OWNER_PROFILE: [
+            "quicksight:RestoreAnalysis",
+            "quicksight:UpdateAnalysisPermissions",
+            "quicksight:DeleteAnalysis",
+            "quicksight:QueryAnalysis",
+            "quicksight:DescribeAnalysisPermissions",
+            "quicksight:DescribeAnalysis",
+            "quicksight:UpdateAnalysis",
+        ],
+        VIEWER_PROFILE: [
+            "quicksight:DescribeAnalysis",
+            "quicksight:QueryAnalysis",
+        ],
+    }
+
     def __init__(
         self, quicksight_application=None, data_sets=None, quicksight_template_arn=None, data_source=None, props=None
     ):
@@ -27,11 +47,15 @@ class Analysis(QuickSightResource):
         self.source_entity = SourceEntity(
             data_sets, quicksight_template_arn, self.config_data, source_entity_type="SourceTemplate"
         )
+        # create from the definition shipped with the solution instead of the source template
+        self.use_definition = quicksight_application.use_local_definition
+        self.definition = Definition(data_sets)
 
+    @traced_resource_call
     @retry(retry=retry_if_exception_type(QuickSightFailure), stop=stop_after_attempt(3))
     def create(self):
         logger.info(f"requesting quicksight create_analysis: {self.id}")
-        quicksight_client = get_quicksight_client()
+        quicksight_client = get_quicksight_client(self.aws_region)
 
         try:
             response = quicksight_client.create_analysis(
@@ -39,9 +63,9 @@ class Analysis(QuickSightResource):
                 AnalysisId=self.id,
                 Name=self.name,
                 Permissions=self._get_permissions(),
-                SourceEntity=self._get_source_entity(),
+                **self._get_source(),
             )
-            logger.info(f"finished quicksight create_analysis for id:{self.id}, response: {response}")
+            logger.info("finished quicksight create_analysis for id:%s, response: %s", self.id, payload(response))
         except quicksight_client.exceptions.ResourceExistsException:
             response = quicksight_client.describe_analysis(AwsAccountId=self.aws_account_id, AnalysisId=self.id)
             response = response["Analysis"]
@@ -52,31 +76,50 @@ class Analysis(QuickSightResource):
         self.arn = response["Arn"]
         return response
 
+    @traced_resource_call
+    def update(self):
+        """Update the analysis in place from the source entity, or create it if it does not exist"""
+        logger.info(f"requesting quicksight update_analysis: {self.id}")
+        quicksight_client = get_quicksight_client(self.aws_region)
+
+        try:
+            response = quicksight_client.update_analysis(
+                AwsAccountId=self.aws_account_id,
+                AnalysisId=self.id,
+                Name=self.name,
+                **self._get_source(),
+            )
+        except quicksight_client.exceptions.ResourceNotFoundException:
+            logger.info(f"analysis for id:{self.id} does not exist, creating it")
+            return self.create()
+        logger.info("finished quicksight update_analysis for id:%s, response: %s", self.id, payload(response))
+
+        self.arn = response["Arn"]
+        return response
+
+    @traced_resource_call
     def delete(self):
         logger.info(f"requesting quicksight delete_analysis id:{self.id}")
-        quicksight_client = get_quicksight_client()
+        quicksight_client = get_quicksight_client(self.aws_region)
 
         response = quicksight_client.delete_analysis(AwsAccountId=self.aws_account_id, AnalysisId=self.id)
-        logger.info(f"finished quicksight delete_analysis for id:{self.id}, response: {response}")
+        logger.info("finished quicksight delete_analysis for id:%s, response: %s", self.id, payload(response))
         return response
 
-    def _get_permissions(self):
-        # The principal is the owner of the resource and create the resources and is given full actions for the type
-        permissions = [
-            {
-                "Principal": self.principal_arn,
-                "Actions": [
-                    "quicksight:RestoreAnalysis",
-                    "quicksight:UpdateAnalysisPermissions",
-                    "quicksight:DeleteAnalysis",
-                    "quicksight:QueryAnalysis",
-                    "quicksight:DescribeAnalysisPermissions",
-                    "quicksight:DescribeAnalysis",
-                    "quicksight:UpdateAnalysis"
-                ],
-            }
-        ]
-        return permissions
-
     def _get_source_entity(self):
         return self.source_entity.get_source_entity()
+
+    def _get_source(self):
+        if self.use_definition:
+            return {"Definition": self.definition.get_definition()}
+        return {"SourceEntity": self._get_source_entity()}
+
+    def get_bundle_asset(self):
+        """The analysis as an asset of an asset bundle, only with the local definition, see util.asset_bundle"""
+        if not self.use_definition:
+            raise ValueError("analysis without definition can not be part of an asset bundle")
+        return {
+            "AnalysisId": self.id,
+            "Name": self.name,
+            "Definition": self.definition.get_definition(),
+        }
@@ -0,0 +1,165 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+import io
+import json
+import uuid
+import zipfile
+
+from tenacity import Retrying, retry_if_exception_type, stop_after_delay, wait_exponential
+
+from util.helpers import get_aws_account_id, get_quicksight_client
+from util.logging import get_logger, payload
+from util.quicksight_resource import QuickSightFailure
+from util.tracing import traced
+
+logger = get_logger(__name__)
+
+# DeploymentEngine property values: create the resources with one call each, or import them in one asset bundle
+PER_RESOURCE_DEPLOYMENT_ENGINE = "per-resource"
+ASSET_BUNDLE_DEPLOYMENT_ENGINE = "asset-bundle"
+DEPLOYMENT_ENGINES = [PER_RESOURCE_DEPLOYMENT_ENGINE, ASSET_BUNDLE_DEPLOYMENT_ENGINE]
+
+# polling of the import job until it completes, within the 30 seconds timeout of the lambda
+ASSET_BUNDLE_POLL_SECONDS = 1
+ASSET_BUNDLE_MAX_POLL_SECONDS = 4
+ASSET_BUNDLE_TIMEOUT_SECONDS = 20
+
+ASSET_BUNDLE_SUCCESSFUL_STATUS = "SUCCESSFUL"
+ASSET_BUNDLE_FAILED_STATUSES = ["FAILED", "FAILED_ROLLBACK_COMPLETED", "FAILED_ROLLBACK_ERROR"]
+# status of a job that failed and rolled back with the ROLLBACK failure action, so no resource was left behind
+ASSET_BUNDLE_ROLLED_BACK_STATUS = "FAILED_ROLLBACK_COMPLETED"
+
+# resource type -> (override list key, override ids key, asset id key) of the import job parameters
+ASSET_BUNDLE_KEYS = {
+    "datasource": ("DataSources", "DataSourceIds", "DataSourceId"),
+    "dataset": ("DataSets", "DataSetIds", "DataSetId"),
+    "analysis": ("Analyses", "AnalysisIds", "AnalysisId"),
+    "dashboard": ("Dashboards", "DashboardIds", "DashboardId"),
+}
+
+
+class AssetBundleImportNotDone(Exception):
+    pass
+
+
+class AssetBundleImportFailed(QuickSightFailure):
+    def __init__(self, msg, status):
+        super().__init__(msg)
+        self.status = status
+
+    @property
+    def rolled_back(self):
+        return self.status == ASSET_BUNDLE_ROLLED_BACK_STATUS
+
+
+class AssetBundle:
+    """
+    QuickSight asset bundle of resources that provide get_bundle_asset(), with one json file per asset in a
+    folder of its resource type. Names, the data source workgroup and the permissions of the principals are
+    given as import job overrides instead of in the assets.
+    """
+
+    def __init__(self, resources):
+        self.resources = resources
+
+    def render(self):
+        """Zip of the assets, small enough to be passed as the body of the import job"""
+        body = io.BytesIO()
+        with zipfile.ZipFile(body, "w", zipfile.ZIP_DEFLATED) as bundle:
+            for resource in self.resources:
+                bundle.writestr(f"{resource.type}/{resource.id}.json", json.dumps(resource.get_bundle_asset()))
+        return body.getvalue()
+
+    def get_override_parameters(self):
+        override_parameters = dict()
+        for resource in self.resources:
+            override_key, _, id_key = ASSET_BUNDLE_KEYS[resource.type]
+            override = {id_key: resource.id, "Name": resource.name}
+            if resource.type == "datasource":
+                override["DataSourceParameters"] = {"AthenaParameters": {"WorkGroup": resource.athena_workgroup}}
+            override_parameters.setdefault(override_key, []).append(override)
+        return override_parameters
+
+    def get_override_permissions(self):
+        """Permissions of the principals grouped by resource type and permission profile"""
+        override_permissions = dict()
+        for resource_type, (override_key, ids_key, _) in ASSET_BUNDLE_KEYS.items():
+            resources = [resource for resource in self.resources if resource.type == resource_type]
+            if not resources:
+                continue
+            for profile, actions in resources[0].permission_profiles.items():
+                principals = [
+                    principal["Principal"] for principal in resources[0].principals if principal["Profile"] == profile
+                ]
+                if not principals:
+                    continue
+                override_permissions.setdefault(override_key, []).append(
+                    {
+                        ids_key: [resource.id for resource in resources],
+                        "Permissions": {"Principals": principals, "Actions": list(actions)},
+                    }
+                )
+        return override_permissions
+
+
+class AssetBundleImportJob:
+    """Import an asset bundle with a single start_asset_bundle_import_job call and wait until it completes"""
+
+    def __init__(self, quicksight_application, asset_bundle):
+        self.quicksight_application = quicksight_application
+        self.asset_bundle = asset_bundle
+        self.aws_account_id = get_aws_account_id()
+        self.aws_region = quicksight_application.aws_region
+        self.id = f"{quicksight_application.prefix}-import-{uuid.uuid4().hex[:8]}"
+        self.arn = None
+
+    def start(self):
+        logger.info(f"requesting quicksight start_asset_bundle_import_job id:{self.id}")
+        quicksight_client = get_quicksight_client(self.aws_region)
+        response = quicksight_client.start_asset_bundle_import_job(
+            AwsAccountId=self.aws_account_id,
+            AssetBundleImportJobId=self.id,
+            AssetBundleImportSource={"Body": self.asset_bundle.render()},
+            OverrideParameters=self.asset_bundle.get_override_parameters(),
+            OverridePermissions=self.asset_bundle.get_override_permissions(),
+            FailureAction="ROLLBACK",
+        )
+        logger.info("finished quicksight start_asset_bundle_import_job id:%s, response: %s", self.id, payload(response))
+        self.arn = response["Arn"]
+        return response
+
+    def _get_status(self):
+        quicksight_client = get_quicksight_client(self.aws_region)
+        response = quicksight_client.describe_asset_bundle_import_job(
+            AwsAccountId=self.aws_account_id, AssetBundleImportJobId=self.id
+        )
+        status = response["JobStatus"]
+        logger.debug(f"asset bundle import job id:{self.id} status:{status}")
+        if status in ASSET_BUNDLE_FAILED_STATUSES:
+            raise AssetBundleImportFailed(
+                f"asset bundle import job {self.id} {status}: {response.get('Errors')}", status
+            )
+        if status != ASSET_BUNDLE_SUCCESSFUL_STATUS:
+            raise AssetBundleImportNotDone(f"asset bundle import job {self.id} is {status}")
+        return response
+
+    def wait(self, timeout=None):
+        """
+        Wait until the import job completes, raises AssetBundleImportFailed if it failed, or AssetBundleImportNotDone
+        with the id of the job if it is still running after timeout seconds
+        """
+        retrying = Retrying(
+            retry=retry_if_exception_type(AssetBundleImportNotDone),
+            wait=wait_exponential(
+                multiplier=ASSET_BUNDLE_POLL_SECONDS, min=ASSET_BUNDLE_POLL_SECONDS, max=ASSET_BUNDLE_MAX_POLL_SECONDS
+            ),
+            stop=stop_after_delay(timeout or ASSET_BUNDLE_TIMEOUT_SECONDS),
+            reraise=True,
+        )
+        return retrying(self._get_status)
+
+    @traced("AssetBundleImportJob.run")
+    def run(self, timeout=None):
+        self.start()
+        return self.wait(timeout)
@@ -1,15 +1,50 @@
 # Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
 # SPDX-License-Identifier: Apache-2.0
 
+from tenacity import Retrying, retry_if_exception_type, stop_after_delay, wait_exponential
+
+from util.definition import Definition
 from util.helpers import get_quicksight_client
-from util.logging import get_logger
-from util.quicksight_resource import QuickSightResource
+from util.logging import get_logger, payload
+from util.permissions import OWNER_PROFILE, VIEWER_PROFILE
+from util.quicksight_resource import QuickSightFailure, QuickSightResource, get_version_number
 from util.source_entity import SourceEntity
+from util.tracing import traced_resource_call
 
 logger = get_logger(__name__)
 
+# polling of a new dashboard version until it is built, by default within the 30 seconds timeout of the lambda
+DASHBOARD_VERSION_POLL_SECONDS = 1
+DASHBOARD_VERSION_MAX_POLL_SECONDS = 4
+DASHBOARD_VERSION_TIMEOUT_SECONDS = 20
+# lifetime of an embedded dashboard session once its url is redeemed, between 15 and 600 minutes
+DEFAULT_EMBED_SESSION_LIFETIME_MINUTES = 600
+
+
+class DashboardVersionNotReady(Exception):
+    pass
+
 
 class Dashboard(QuickSightResource):
+    # The owner creates the resources and is given full actions for the type, viewers are given read actions
+    permission_profiles = {
+        OWNER_PROFILE: [
+            "quicksight:DescribeDashboard",
+            "quicksight:ListDashboardVersions",
+            "quicksight:UpdateDashboardPermissions",
+            "quicksight:QueryDashboard",
+            "quicksight:UpdateDashboard",
+            "quicksight:DeleteDashboard",
+            "quicksight:DescribeDashboardPermissions",
+            "quicksight:UpdateDashboardPublishedVersion",
+        ],
+        VIEWER_PROFILE: [
+            "quicksight:DescribeDashboard",
+            "quicksight:ListDashboardVersions",
+            "quicksight:QueryDashboard",
+        ],
+    }
+
     def __init__(
         self,
         quicksight_application=None,
@@ -30,33 +65,209 @@ class Dashboard(QuickSightResource):
         self.source_entity = SourceEntity(
             data_sets, quicksight_template_arn, self.config_data, source_entity_type="SourceTemplate"
         )
+        # create from the definition shipped with the solution instead of the source template
+        self.use_definition = quicksight_application.use_local_definition
+        self.definition = Definition(data_sets)
 
+    @traced_resource_call
     def create(self):
         logger.info(f"requesting quicksight create_dashboard: {self.id}")
-        quicksight_client = get_quicksight_client()
+        quicksight_client = get_quicksight_client(self.aws_region)
 
         response = quicksight_client.create_dashboard(
             AwsAccountId=self.aws_account_id,
             DashboardId=self.id,
             Name=self.name,
             Permissions=self._get_permissions(),
-            SourceEntity=self._get_source_entity(),
+            **self._get_source(),
             DashboardPublishOptions=self._get_dashboard_publish_options(),
         )
-        logger.info(f"finished quicksight create_dashboard for id:{self.id}, response: {response}")
+        logger.info("finished quicksight create_dashboard for id:%s, response: %s", self.id, payload(response))
 
         self.arn = response["Arn"]
         return response
 
+    @traced_resource_call
     def delete(self):
         logger.info(f"requesting quicksight delete_dashboard id:{self.id}")
-        quicksight_client = get_quicksight_client()
+        quicksight_client = get_quicksight_client(self.aws_region)
 
         response = quicksight_client.delete_dashboard(AwsAccountId=self.aws_account_id, DashboardId=self.id)
-        logger.info(f"finished quicksight delete_dashboard for id:{self.id}, response: {response}")
+        logger.info("finished quicksight delete_dashboard for id:%s, response: %s", self.id, payload(response))
+
+        return response
+
+    @traced_resource_call
+    def update(self):
+        """Create a new version of the dashboard from the source entity, the published version is not changed"""
+        logger.info(f"requesting quicksight update_dashboard: {self.id}")
+        quicksight_client = get_quicksight_client(self.aws_region)
+
+        response = quicksight_client.update_dashboard(
+            AwsAccountId=self.aws_account_id,
+            DashboardId=self.id,
+            Name=self.name,
+            **self._get_source(),
+            DashboardPublishOptions=self._get_dashboard_publish_options(),
+        )
+        logger.info("finished quicksight update_dashboard for id:%s, response: %s", self.id, payload(response))
+
+        self.arn = response["Arn"]
+        return response
+
+    def _get_version_status(self, version_number):
+        quicksight_client = get_quicksight_client(self.aws_region)
+        response = quicksight_client.describe_dashboard(
+            AwsAccountId=self.aws_account_id, DashboardId=self.id, VersionNumber=version_number
+        )
+        version = response["Dashboard"]["Version"]
+        status = version["Status"]
+        logger.debug(f"dashboard id:{self.id} version:{version_number} status:{status}")
+        if status.endswith("_FAILED"):
+            raise QuickSightFailure(f"dashboard {self.id} version {version_number} failed: {version.get('Errors')}")
+        if not status.endswith("_SUCCESSFUL"):
+            raise DashboardVersionNotReady(f"dashboard {self.id} version {version_number} is {status}")
+        return status
+
+    @traced_resource_call
+    def wait_for_version(self, version_number, timeout=None):
+        """
+        Wait until a dashboard version is built, at most timeout seconds (DASHBOARD_VERSION_TIMEOUT_SECONDS by
+        default), raises QuickSightFailure if the build failed
+        """
+        if timeout is None:
+            timeout = DASHBOARD_VERSION_TIMEOUT_SECONDS
+        retrying = Retrying(
+            retry=retry_if_exception_type(DashboardVersionNotReady),
+            wait=wait_exponential(
+                multiplier=DASHBOARD_VERSION_POLL_SECONDS,
+                min=DASHBOARD_VERSION_POLL_SECONDS,
+                max=DASHBOARD_VERSION_MAX_POLL_SECONDS,
+            ),
+            stop=stop_after_delay(timeout),
+            reraise=True,
+        )
+        return retrying(self._get_version_status, version_number)
+
+    @traced_resource_call
+    def get_published_version(self):
+        quicksight_client = get_quicksight_client(self.aws_region)
+        response = quicksight_client.describe_dashboard(AwsAccountId=self.aws_account_id, DashboardId=self.id)
+        return response["Dashboard"]["Version"]["VersionNumber"]
+
+    @traced_resource_call
+    def publish_version(self, version_number):
+        logger.info(f"requesting quicksight update_dashboard_published_version id:{self.id} version:{version_number}")
+        quicksight_client = get_quicksight_client(self.aws_region)
 
+        response = quicksight_client.update_dashboard_published_version(
+            AwsAccountId=self.aws_account_id, DashboardId=self.id, VersionNumber=version_number
+        )
+        logger.info(
+            "finished quicksight update_dashboard_published_version for id:%s, response: %s", self.id, payload(response)
+        )
         return response
 
+    @traced_resource_call
+    def blue_green_update(self, timeout=None):
+        """
+        Update the dashboard without downtime: build a new version next to the published one and publish it once
+        it is built. Viewers keep the published version, its permissions and links until the switch, and keep
+        it if the new version fails to build. The dashboard is created if it does not exist.
+        :return: the previously published and the new published version numbers
+        """
+        quicksight_client = get_quicksight_client(self.aws_region)
+        try:
+            previous_version = self.get_published_version()
+        except quicksight_client.exceptions.ResourceNotFoundException:
+            logger.info(f"dashboard id:{self.id} does not exist, creating it")
+            response = self.create()
+            version_number = get_version_number(response["VersionArn"])
+            self.wait_for_version(version_number, timeout)
+            return None, version_number
+
+        response = self.update()
+        version_number = get_version_number(response["VersionArn"])
+        self.wait_for_version(version_number, timeout)
+        self.publish_version(version_number)
+        logger.info(
+            f"published version {version_number} of dashboard id:{self.id}, previous version {previous_version}"
+        )
+        return previous_version, version_number
+
+    @traced_resource_call
+    def list_versions(self):
+        quicksight_client = get_quicksight_client(self.aws_region)
+        parameters = {"AwsAccountId": self.aws_account_id, "DashboardId": self.id}
+        versions = []
+        while True:
+            response = quicksight_client.list_dashboard_versions(**parameters)
+            versions.extend(response.get("DashboardVersionSummaryList", []))
+            if not response.get("NextToken"):
+                break
+            parameters["NextToken"] = response["NextToken"]
+        return sorted(versions, key=lambda version: version["VersionNumber"])
+
+    @traced_resource_call
+    def rollback(self, version_number=None):
+        """
+        Publish an earlier version of the dashboard, by default the most recent successfully built version before
+        the published version
+        :return: the published version number
+        """
+        if not version_number:
+            published_version = self.get_published_version()
+            earlier_versions = [
+                version["VersionNumber"]
+                for version in self.list_versions()
+                if version["VersionNumber"] < published_version and version["Status"].endswith("_SUCCESSFUL")
+            ]
+            if not earlier_versions:
+                raise QuickSightFailure(f"dashboard {self.id} has no version to roll back to from {published_version}")
+            version_number = max(earlier_versions)
+        self.publish_version(version_number)
+        return version_number
+
+    @traced_resource_call
+    def generate_embed_url_for_registered_user(
+        self, user_arn, session_lifetime_minutes=DEFAULT_EMBED_SESSION_LIFETIME_MINUTES, allowed_domains=None
+    ):
+        """Generate a url to embed the dashboard for a registered QuickSight user, to be redeemed within 5 minutes"""
+        logger.info(f"requesting quicksight generate_embed_url_for_registered_user id:{self.id} user:{user_arn}")
+        quicksight_client = get_quicksight_client(self.aws_region)
+        parameters = {
+            "AwsAccountId": self.aws_account_id,
+            "SessionLifetimeInMinutes": session_lifetime_minutes,
+            "UserArn": user_arn,
+            "ExperienceConfiguration": {"Dashboard": {"InitialDashboardId": self.id}},
+        }
+        if allowed_domains:
+            parameters["AllowedDomains"] = allowed_domains
+        response = quicksight_client.generate_embed_url_for_registered_user(**parameters)
+        # the embed url grants access to the dashboard, it is not logged
+        logger.info(f"finished quicksight generate_embed_url_for_registered_user id:{self.id} user:{user_arn}")
+        return response["EmbedUrl"]
+
+    @traced_resource_call
+    def generate_embed_url_for_anonymous_user(
+        self, session_lifetime_minutes=DEFAULT_EMBED_SESSION_LIFETIME_MINUTES, namespace="default", allowed_domains=None
+    ):
+        """Generate a url to embed the dashboard for an anonymous user, to be redeemed within 5 minutes"""
+        logger.info(f"requesting quicksight generate_embed_url_for_anonymous_user id:{self.id}")
+        quicksight_client = get_quicksight_client(self.aws_region)
+        parameters = {
+            "AwsAccountId": self.aws_account_id,
+            "SessionLifetimeInMinutes": session_lifetime_minutes,
+            "Namespace": namespace,
+            "AuthorizedResourceArns": [self.arn],
+            "ExperienceConfiguration": {"Dashboard": {"InitialDashboardId": self.id}},
+        }
+        if allowed_domains:
+            parameters["AllowedDomains"] = allowed_domains
+        response = quicksight_client.generate_embed_url_for_anonymous_user(**parameters)
+        logger.info(f"finished quicksight generate_embed_url_for_anonymous_user id:{self.id}")
+        return response["EmbedUrl"]
+
     def _get_dashboard_publish_options(self):
         dashboard_publish_options = {
             "AdHocFilteringOption": {"AvailabilityStatus": "ENABLED"},
@@ -65,24 +276,21 @@ class Dashboard(QuickSightResource):
         }
         return dashboard_publish_options
 
-    def _get_permissions(self):
-        # The principal is the owner of the resource and create the resources and is given full actions for the type
-        permissions = [
-            {
-                "Principal": self.principal_arn,
-                "Actions": [
-                    "quicksight:DescribeDashboard",
-                    "quicksight:ListDashboardVersions",
-                    "quicksight:UpdateDashboardPermissions",
-                    "quicksight:QueryDashboard",
-                    "quicksight:UpdateDashboard",
-                    "quicksight:DeleteDashboard",
-                    "quicksight:DescribeDashboardPermissions",
-                    "quicksight:UpdateDashboardPublishedVersion",
-                ],
-            }
-        ]
-        return permissions
-
     def _get_source_entity(self):
         return self.source_entity.get_source_entity()
+
+    def _get_source(self):
+        if self.use_definition:
+            return {"Definition": self.definition.get_definition()}
+        return {"SourceEntity": self._get_source_entity()}
+
+    def get_bundle_asset(self):
+        """The dashboard as an asset of an asset bundle, only with the local definition, see util.asset_bundle"""
+        if not self.use_definition:
+            raise ValueError("dashboard without definition can not be part of an asset bundle")
+        return {
+            "DashboardId": self.id,
+            "Name": self.name,
+            "Definition": self.definition.get_definition(),
+            "DashboardPublishOptions": self._get_dashboard_publish_options(),
+        }
@@ -4,13 +4,38 @@
 from tenacity import retry, retry_if_exception_type, stop_after_attempt
 
 from util.helpers import get_quicksight_client
-from util.logging import get_logger
+from util.logging import get_logger, payload
+from util.permissions import OWNER_PROFILE, VIEWER_PROFILE
 from util.quicksight_resource import QuickSightFailure, QuickSightResource
+from util.tracing import traced_resource_call
 
 logger = get_logger(__name__)
 
 
 class DataSet(QuickSightResource):
+    # The owner creates the resources and is given full actions for the type, viewers are given read actions
+    permission_profiles = {
+        OWNER_PROFILE: [
+            "quicksight:DescribeDataSet",
+            "quicksight:DescribeDataSetPermissions",
+            "quicksight:PassDataSet",
+            "quicksight:DescribeIngestion",
+            "quicksight:ListIngestions",
+            "quicksight:UpdateDataSet",
+            "quicksight:DeleteDataSet",
+            "quicksight:CreateIngestion",
+            "quicksight:CancelIngestion",
+            "quicksight:UpdateDataSetPermissions",
+        ],
+        VIEWER_PROFILE: [
+            "quicksight:DescribeDataSet",
+            "quicksight:DescribeDataSetPermissions",
+            "quicksight:PassDataSet",
+            "quicksight:DescribeIngestion",
+            "quicksight:ListIngestions",
+        ],
+    }
+
     def __init__(
         self, quicksight_application=None, data_source=None, data_set_sub_type=None, props=None
     ):
@@ -26,6 +51,7 @@ class DataSet(QuickSightResource):
         self.config_data = dict()
         self._load_config(self.type, quicksight_application.get_supported_data_set_sub_types(), self.config_data)
 
+    @traced_resource_call
     def create(self):
         if not self.data_source:
             raise ValueError("missing datasource value when creating dataset")
@@ -35,19 +61,65 @@ class DataSet(QuickSightResource):
         response = self._create_data_set(physical_table_map, logical_table_map)
         return response
 
+    @traced_resource_call
+    def update(self):
+        """Update the data set in place, keeping its id, arn and permissions, or create it if it does not exist"""
+        if not self.data_source:
+            raise ValueError("missing datasource value when updating dataset")
+        logger.info(f"updating quicksight dataset id:{self.id}")
+        quicksight_client = get_quicksight_client(self.aws_region)
+        physical_table_map = self._get_map(self.sub_type, "PhysicalTableMap")
+        logical_table_map = self._get_map(self.sub_type, "LogicalTableMap")
+        self._update_data_source_arn(physical_table_map)
+        self._update_schema(physical_table_map)
+
+        try:
+            response = quicksight_client.update_data_set(
+                AwsAccountId=self.aws_account_id,
+                DataSetId=self.id,
+                Name=self.name,
+                PhysicalTableMap=physical_table_map,
+                LogicalTableMap=logical_table_map,
+                ImportMode="DIRECT_QUERY",
+            )
+        except quicksight_client.exceptions.ResourceNotFoundException:
+            logger.info(f"dataset for id:{self.id} does not exist, creating it")
+            return self._create_data_set(physical_table_map, logical_table_map)
+        logger.info("finished updating quicksight update_data_set id:%s, response:%s", self.id, payload(response))
+
+        self.arn = response["Arn"]
+        return response
+
+    def get_bundle_asset(self):
+        """The data set as an asset of an asset bundle, see util.asset_bundle"""
+        if not self.data_source:
+            raise ValueError("missing datasource value when rendering dataset")
+        physical_table_map = self._get_map(self.sub_type, "PhysicalTableMap")
+        logical_table_map = self._get_map(self.sub_type, "LogicalTableMap")
+        self._update_data_source_arn(physical_table_map)
+        self._update_schema(physical_table_map)
+        return {
+            "DataSetId": self.id,
+            "Name": self.name,
+            "PhysicalTableMap": physical_table_map,
+            "LogicalTableMap": logical_table_map,
+            "ImportMode": "DIRECT_QUERY",
+        }
+
+    @traced_resource_call
     def delete(self):
         logger.info(f"deleting quicksight dataset id:{self.id}")
-        quicksight_client = get_quicksight_client()
+        quicksight_client = get_quicksight_client(self.aws_region)
 
         response = quicksight_client.delete_data_set(AwsAccountId=self.aws_account_id, DataSetId=self.id)
-        logger.info(f"finished deleting quicksight dataset for id:{self.id}, response:{response}")
+        logger.info("finished deleting quicksight dataset for id:%s, response:%s", self.id, payload(response))
 
         self.arn = response["Arn"]
         return response
 
     @retry(retry=retry_if_exception_type(QuickSightFailure), stop=stop_after_attempt(3))
     def _create_data_set(self, physical_table_map, logical_table_map):
-        quicksight_client = get_quicksight_client()
+        quicksight_client = get_quicksight_client(self.aws_region)
 
         self._update_data_source_arn(physical_table_map)
         self._update_schema(physical_table_map)
@@ -62,7 +134,7 @@ class DataSet(QuickSightResource):
                 LogicalTableMap=logical_table_map,
                 ImportMode="DIRECT_QUERY",
             )
-            logger.info(f"finished creating quicksight create_data_set id:{self.id}, response:{response}")
+            logger.info("finished creating quicksight create_data_set id:%s, response:%s", self.id, payload(response))
         except quicksight_client.exceptions.ResourceExistsException:
             logger.info(f"dataset for id:{self.id} already exists")
             response = quicksight_client.describe_data_set(AwsAccountId=self.aws_account_id, DataSetId=self.id)
@@ -74,28 +146,6 @@ class DataSet(QuickSightResource):
         self.arn = response["Arn"]
         return response
 
-    def _get_permissions(self):
-        # The principal is the owner of the resource and create the resources and is given full actions for the type
-        permissions = [
-            {
-                "Principal": self.principal_arn,
-                "Actions": [
-                    "quicksight:DescribeDataSet",
-                    "quicksight:DescribeDataSetPermissions",
-                    "quicksight:PassDataSet",
-                    "quicksight:DescribeIngestion",
-                    "quicksight:ListIngestions",
-                    "quicksight:UpdateDataSet",
-                    "quicksight:DeleteDataSet",
-                    "quicksight:CreateIngestion",
-                    "quicksight:CancelIngestion",
-                    "quicksight:UpdateDataSetPermissions",
-                ],
-            }
-        ]
-        return permissions
-
-
     def _update_schema(self, obj):
         if not self.schema:
             logger.debug(f"Schema name is not set in object. Using the ones from config file as is in RelationalTable[].Schema in PhysicalTableMap")
@@ -2,21 +2,41 @@
 # SPDX-License-Identifier: Apache-2.0
 
 from util.helpers import get_quicksight_client
-from util.logging import get_logger
+from util.logging import get_logger, payload
+from util.permissions import OWNER_PROFILE, VIEWER_PROFILE
 from util.quicksight_resource import QuickSightResource
+from util.tracing import traced_resource_call
 
 logger = get_logger(__name__)
 
 
 class DataSource(QuickSightResource):
+    # The owner creates the resources and is given full actions for the type, viewers are given read actions
+    permission_profiles = {
+        OWNER_PROFILE: [
+            "quicksight:DescribeDataSource",
+            "quicksight:DescribeDataSourcePermissions",
+            "quicksight:PassDataSource",
+            "quicksight:UpdateDataSource",
+            "quicksight:UpdateDataSourcePermissions",
+            "quicksight:DeleteDataSource",
+        ],
+        VIEWER_PROFILE: [
+            "quicksight:DescribeDataSource",
+            "quicksight:DescribeDataSourcePermissions",
+            "quicksight:PassDataSource",
+        ],
+    }
+
     def __init__(self, quicksight_application=None, props=None):
         super().__init__(quicksight_application, type="datasource", props=props)
         self.use_props(props)
         self.athena_workgroup = "primary"
 
+    @traced_resource_call
     def create(self):
         logger.info(f"creating quicksight datasource id:{self.id}")
-        quicksight_client = get_quicksight_client()
+        quicksight_client = get_quicksight_client(self.aws_region)
 
         data_source_parameters = {"AthenaParameters": {"WorkGroup": self.athena_workgroup}}
 
@@ -30,7 +50,7 @@ class DataSource(QuickSightResource):
                 Permissions=self._get_permissions(),
                 SslProperties={"DisableSsl": False},
             )
-            logger.info(f"finished creating quicksight datasource for id:{self.id}, response {response}")
+            logger.info("finished creating quicksight datasource for id:%s, response %s", self.id, payload(response))
         except quicksight_client.exceptions.ResourceExistsException:
             logger.info(f"datasource for id:{self.id} already exists")
             response = quicksight_client.describe_data_source(AwsAccountId=self.aws_account_id, DataSourceId=self.id)
@@ -39,8 +59,9 @@ class DataSource(QuickSightResource):
         self.arn = response["Arn"]
         return response
 
+    @traced_resource_call
     def update(self):
-        quicksight_client = get_quicksight_client()
+        quicksight_client = get_quicksight_client(self.aws_region)
         quicksight_client.describe_data_source
         data_source_parameters = {"AthenaParameters": {"WorkGroup": self.athena_workgroup}}
         try:
@@ -51,33 +72,31 @@ class DataSource(QuickSightResource):
                 DataSourceParameters=data_source_parameters,
                 SslProperties={"DisableSsl": False},
             )
+        except quicksight_client.exceptions.ResourceNotFoundException:
+            logger.info(f"datasource for id:{self.id} does not exist, creating it")
+            return self.create()
         except quicksight_client.exceptions.ConflictException as exc:
             logger.debug(str(exc))
+            response = quicksight_client.describe_data_source(AwsAccountId=self.aws_account_id, DataSourceId=self.id)
             response = response["DataSource"]
         return response
 
+    def get_bundle_asset(self):
+        """The data source as an asset of an asset bundle, see util.asset_bundle"""
+        return {
+            "DataSourceId": self.id,
+            "Name": self.name,
+            "Type": "ATHENA",
+            "DataSourceParameters": {"AthenaParameters": {"WorkGroup": self.athena_workgroup}},
+            "SslProperties": {"DisableSsl": False},
+        }
+
+    @traced_resource_call
     def delete(self):
         logger.info(f"deleting quicksight datasource id:{self.id}")
-        quicksight_client = get_quicksight_client()
+        quicksight_client = get_quicksight_client(self.aws_region)
 
         response = quicksight_client.delete_data_source(AwsAccountId=self.aws_account_id, DataSourceId=self.id)
-        logger.info(f"finished deleting quicksight datasource for id:{self.id}, response:{response}")
+        logger.info("finished deleting quicksight datasource for id:%s, response:%s", self.id, payload(response))
         self.arn = response["Arn"]
         return response
-
-    def _get_permissions(self):
-        # The principal is the owner of the resource and create the resources and is given full actions for the type
-        permissions = [
-            {
-                "Principal": self.principal_arn,
-                "Actions": [
-                    "quicksight:DescribeDataSource",
-                    "quicksight:DescribeDataSourcePermissions",
-                    "quicksight:PassDataSource",
-                    "quicksight:UpdateDataSource",
-                    "quicksight:UpdateDataSourcePermissions",
-                    "quicksight:DeleteDataSource",
-                ],
-            }
-        ]
-        return permissions
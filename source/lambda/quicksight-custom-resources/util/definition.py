@@ -0,0 +1,67 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+import json
+import os
+
+from util.logging import get_logger
+
+logger = get_logger(__name__)
+
+# The full dashboard definition exported from the source template (describe_dashboard_definition). It is not
+# shipped with the solution: the UseLocalDefinition property is ignored until it is added, see the README
+DEFINITION_FILE = os.path.join(os.path.dirname(__file__), "config", "definition-main.config.json")
+
+# Global cache of parsed definitions. Keep in execution context of lambda
+_definition_cache = dict()
+
+
+def is_definition_shipped(definition_file=None):
+    """Whether the definition file, by default DEFINITION_FILE, was added to the function code"""
+    return os.path.isfile(definition_file or DEFINITION_FILE)
+
+
+def get_cached_definition(definition_file=None):
+    """
+    Get a parsed definition file, by default DEFINITION_FILE. Definitions are large and only their data set
+    declarations change per stack, so they are parsed once and shared, rendered definitions must not be modified.
+    """
+    definition_file = definition_file or DEFINITION_FILE
+    definition = _definition_cache.get(definition_file)
+    if definition is None:
+        with open(definition_file, "r") as definition_fd:
+            definition = json.load(definition_fd)["Definition"]
+        _definition_cache[definition_file] = definition
+    return definition
+
+
+def clear_definition_cache():
+    _definition_cache.clear()
+
+
+class Definition:
+    """
+    Local dashboard definition, used to create the analysis and dashboard without the source template. Data sets
+    are declared with their sub type as identifier.
+    """
+
+    def __init__(self, data_sets, definition_file=None):
+        self.data_sets = data_sets
+        self.definition_file = definition_file
+
+    def get_definition(self):
+        definition = get_cached_definition(self.definition_file)
+        return {**definition, "DataSetIdentifierDeclarations": self._get_data_set_declarations(definition)}
+
+    def _get_data_set_declarations(self, definition):
+        """Declarations of the cached definition with the arns of the data sets of the stack"""
+        declarations = []
+        for declaration in definition.get("DataSetIdentifierDeclarations", []):
+            identifier = declaration["Identifier"]
+            data_set = self.data_sets.get(identifier)
+            if not data_set:
+                raise ValueError(
+                    f"Unknown data set identifier {identifier} in definition, valid identifiers are {list(self.data_sets)}"
+                )
+            declarations.append({"Identifier": identifier, "DataSetArn": data_set.arn})
+        return declarations
@@ -2,50 +2,68 @@
 # SPDX-License-Identifier: Apache-2.0
 
 import json
+import threading
 from os import environ
 
 import boto3
 import botocore.config
 
+from util.instrumentation import get_api_call_recorder
 from util.logging import get_logger
+from util.rate_limiter import get_api_rate_limiter
+from util.tracing import get_tracer
 
 logger = get_logger(__name__)
 
 # Global boto3 clients to help with initialization and performance
 _helpers_service_clients = dict()
+# Creating clients from the default boto3 session is not thread safe
+_helpers_service_clients_lock = threading.Lock()
+# Global caller account id, it does not change during the lifetime of the lambda execution context
+_helpers_aws_account_id = None
 
 
 class EnvironmentVariableError(Exception):
     pass
 
 
-def get_service_client(service_name):
-    """Get the global service boto3 client"""
+def get_service_client(service_name, region_name=None):
+    """Get the global service boto3 client of a region, by default of the lambda region"""
     global _helpers_service_clients
-    if service_name not in _helpers_service_clients:        
-        config = botocore.config.Config(retries=dict(max_attempts=3), user_agent_extra = environ.get("UserAgentExtra"))
-
-        logger.debug(f"Initializing global boto3 client for {service_name}")
-        _helpers_service_clients[service_name] = boto3.client(service_name, config=config, region_name=get_aws_region())
-    return _helpers_service_clients[service_name]
-
-
-def get_quicksight_client():
+    region_name = region_name or get_aws_region()
+    client_key = (service_name, region_name)
+    if client_key in _helpers_service_clients:
+        return _helpers_service_clients[client_key]
+    with _helpers_service_clients_lock:
+        if client_key not in _helpers_service_clients:
+            config = botocore.config.Config(retries=dict(max_attempts=3), user_agent_extra = environ.get("UserAgentExtra"))
+
+            logger.debug(f"Initializing global boto3 client for {service_name} in {region_name}")
+            client = boto3.client(service_name, config=config, region_name=region_name)
+            get_api_rate_limiter().register(client)
+            get_api_call_recorder().register(client)
+            get_tracer().register(client)
+            _helpers_service_clients[client_key] = client
+    return _helpers_service_clients[client_key]
+
+
+def get_quicksight_client(region_name=None):
     """Get the global quicksight boto3 client"""
-    return get_service_client("quicksight")
+    return get_service_client("quicksight", region_name)
 
 
-def get_sts_client():
+def get_sts_client(region_name=None):
     """Get the global sts boto3 client"""
-    return get_service_client("sts")
+    return get_service_client("sts", region_name)
 
 
-def get_aws_partition():
+def get_aws_partition(region_name=None):
     """
     Get the caller's AWS partition by driving it from AWS region
-    :return: partition name for the current AWS region (e.g. aws)
+    :param region_name: the region to get the partition of, by default the region of the lambda
+    :return: partition name for the AWS region (e.g. aws)
     """
-    region_name = environ.get("AWS_REGION")
+    region_name = region_name or environ.get("AWS_REGION")
     china_region_name_prefix = "cn"
     us_gov_cloud_region_name_prefix = "us-gov"
     aws_regions_partition = "aws"
@@ -76,9 +94,12 @@ def get_aws_region():
 
 def get_aws_account_id():
     """
-    Get the caller's AWS account ID
+    Get the caller's AWS account ID, the identity is requested once per lambda execution context
     :return: The AWS account ID
     """
-    sts_client = get_sts_client()
-    identity = sts_client.get_caller_identity()
-    return identity.get("Account")
+    global _helpers_aws_account_id
+    if not _helpers_aws_account_id:
+        sts_client = get_sts_client()
+        identity = sts_client.get_caller_identity()
+        _helpers_aws_account_id = identity.get("Account")
+    return _helpers_aws_account_id
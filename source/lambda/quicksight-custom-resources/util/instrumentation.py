@@ -0,0 +1,209 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+import json
+import threading
+import time
+from os import environ
+
+from util.logging import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_NAMESPACE = "DevOpsMonitoringDashboard"
+DEFAULT_DIMENSION_VALUE = "QuickSightCustomResource"
+# CloudWatch embedded metric format limits
+EMF_MAX_METRICS_PER_DIRECTIVE = 100
+EMF_MAX_VALUES_PER_METRIC = 100
+
+THROTTLING_ERROR_CODES = {
+    "Throttling",
+    "ThrottlingException",
+    "ThrottledException",
+    "RequestThrottledException",
+    "TooManyRequestsException",
+    "ProvisionedThroughputExceededException",
+    "RequestLimitExceeded",
+    "SlowDown",
+    "LimitExceededException",
+}
+
+_START_TIME_CONTEXT_KEY = "instrumentation_start_time"
+
+# Global recorder. Keep in execution context of lambda
+_api_call_recorder = None
+
+
+class OperationStats:
+    """Aggregated statistics of a single AWS API operation"""
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.retries = 0
+        self.throttles = 0
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self.latencies_ms = []
+
+    def get_data(self):
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "retries": self.retries,
+            "throttles": self.throttles,
+            "request_bytes": self.request_bytes,
+            "response_bytes": self.response_bytes,
+            "latencies_ms": list(self.latencies_ms),
+        }
+
+
+def _split_event_name(event_name):
+    """Split e.g. 'after-call.quicksight.CreateDataSet' into ('quicksight', 'CreateDataSet')"""
+    parts = event_name.split(".")
+    service_id = parts[1] if len(parts) > 1 else "unknown"
+    operation = parts[2] if len(parts) > 2 else "unknown"
+    return service_id, operation
+
+
+def _get_body_size(body):
+    if body is None:
+        return 0
+    if isinstance(body, (bytes, bytearray)):
+        return len(body)
+    if isinstance(body, str):
+        return len(body.encode("utf-8"))
+    return len(str(body).encode("utf-8"))
+
+
+class ApiCallRecorder:
+    """
+    Records per operation wall time, retries, throttles and payload sizes of boto3 calls using
+    the botocore before-call, after-call and needs-retry events. The request context botocore passes
+    to both before-call and after-call carries the start time, so concurrent calls from different
+    threads are timed independently.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = dict()
+
+    def register(self, client):
+        events = client.meta.events
+        # botocore calls handlers of more specific event names first, and both the retry handler (needs-retry)
+        # and response stubs (before-call) stop the emit chain, so these handlers are registered in front of them
+        events.register_first("before-call.*.*", self._before_call)
+        events.register("after-call.*.*", self._after_call)
+        events.register_first("needs-retry.*.*", self._needs_retry)
+
+    def _get_stats(self, key):
+        stats = self._stats.get(key)
+        if stats is None:
+            stats = self._stats.setdefault(key, OperationStats())
+        return stats
+
+    def _before_call(self, event_name=None, params=None, context=None, **kwargs):
+        if context is not None:
+            context[_START_TIME_CONTEXT_KEY] = time.perf_counter()
+        service_id, operation = _split_event_name(event_name)
+        request_bytes = _get_body_size((params or {}).get("body"))
+        with self._lock:
+            self._get_stats((service_id, operation)).request_bytes += request_bytes
+
+    def _after_call(self, event_name=None, http_response=None, parsed=None, context=None, **kwargs):
+        start_time = (context or {}).get(_START_TIME_CONTEXT_KEY)
+        latency_ms = (time.perf_counter() - start_time) * 1000 if start_time is not None else None
+        service_id, operation = _split_event_name(event_name)
+        parsed = parsed or {}
+        retries = parsed.get("ResponseMetadata", {}).get("RetryAttempts", 0)
+        response_bytes = 0
+        if http_response is not None and http_response.headers:
+            response_bytes = int(http_response.headers.get("content-length", 0) or 0)
+        is_error = "Error" in parsed or (http_response is not None and http_response.status_code >= 300)
+
+        with self._lock:
+            stats = self._get_stats((service_id, operation))
+            stats.calls += 1
+            stats.retries += retries
+            stats.response_bytes += response_bytes
+            if is_error:
+                stats.errors += 1
+            if latency_ms is not None:
+                stats.latencies_ms.append(latency_ms)
+
+    def _needs_retry(self, event_name=None, response=None, **kwargs):
+        if not response:
+            return None
+        http_response, parsed = response
+        error_code = (parsed or {}).get("Error", {}).get("Code")
+        if error_code in THROTTLING_ERROR_CODES or getattr(http_response, "status_code", None) == 429:
+            service_id, operation = _split_event_name(event_name)
+            with self._lock:
+                self._get_stats((service_id, operation)).throttles += 1
+        # never influence the retry decision
+        return None
+
+    def get_summary(self):
+        """Get a copy of the statistics recorded so far, keyed by 'service.Operation'"""
+        with self._lock:
+            return {f"{service_id}.{operation}": stats.get_data() for (service_id, operation), stats in self._stats.items()}
+
+    def reset(self):
+        with self._lock:
+            self._stats = dict()
+
+    def to_embedded_metric_format(self, namespace=None, dimension_value=None):
+        """Build a CloudWatch embedded metric format document from the recorded statistics"""
+        namespace = namespace or environ.get("METRICS_NAMESPACE", DEFAULT_NAMESPACE)
+        dimension_value = dimension_value or environ.get("AWS_LAMBDA_FUNCTION_NAME", DEFAULT_DIMENSION_VALUE)
+
+        document = {"FunctionName": dimension_value}
+        metric_definitions = []
+        for name, data in sorted(self.get_summary().items()):
+            values = {
+                "Latency": (data["latencies_ms"][-EMF_MAX_VALUES_PER_METRIC:], "Milliseconds"),
+                "Calls": (data["calls"], "Count"),
+                "Errors": (data["errors"], "Count"),
+                "Retries": (data["retries"], "Count"),
+                "Throttles": (data["throttles"], "Count"),
+                "RequestBytes": (data["request_bytes"], "Bytes"),
+                "ResponseBytes": (data["response_bytes"], "Bytes"),
+            }
+            for metric, (value, unit) in values.items():
+                metric_name = f"{name}.{metric}"
+                document[metric_name] = value
+                metric_definitions.append({"Name": metric_name, "Unit": unit})
+
+        document["_aws"] = {
+            "Timestamp": int(time.time() * 1000),
+            "CloudWatchMetrics": [
+                {
+                    "Namespace": namespace,
+                    "Dimensions": [["FunctionName"]],
+                    "Metrics": metric_definitions[index : index + EMF_MAX_METRICS_PER_DIRECTIVE],
+                }
+                for index in range(0, len(metric_definitions), EMF_MAX_METRICS_PER_DIRECTIVE)
+            ],
+        }
+        return document
+
+    def emit_summary(self):
+        """
+        Write the recorded statistics as one embedded metric format line to stdout, where the lambda
+        runtime forwards it to CloudWatch Logs, and start recording a new invocation
+        """
+        if not self._stats:
+            return None
+        document = self.to_embedded_metric_format()
+        print(json.dumps(document), flush=True)
+        self.reset()
+        return document
+
+
+def get_api_call_recorder():
+    """Get the global api call recorder"""
+    global _api_call_recorder
+    if not _api_call_recorder:
+        logger.debug("Initializing global api call recorder")
+        _api_call_recorder = ApiCallRecorder()
+    return _api_call_recorder
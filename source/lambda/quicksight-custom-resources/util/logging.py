@@ -2,10 +2,15 @@
 # Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
 # SPDX-License-Identifier: Apache-2.0
 
+import json
 import logging
 import os
+from collections.abc import Mapping
 
 DEFAULT_LEVEL = "INFO"
+DEFAULT_MAX_PAYLOAD_LENGTH = 2048
+REDACTED_KEYS = ["ResponseMetadata"]
+REDACTED_VALUE = "<redacted>"
 
 
 def get_level():
@@ -16,6 +21,68 @@ def get_level():
     return DEFAULT_LEVEL
 
 
+def get_max_payload_length():
+    requested_length = os.environ.get("LOG_MAX_PAYLOAD_LENGTH", "")
+    if requested_length.isdigit() and int(requested_length) > 0:
+        return int(requested_length)
+    return DEFAULT_MAX_PAYLOAD_LENGTH
+
+
+def _redact(obj):
+    if isinstance(obj, Mapping):
+        return {key: REDACTED_VALUE if key in REDACTED_KEYS else _redact(value) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_redact(item) for item in obj]
+    return obj
+
+
+class LazyPayload:
+    """
+    Log argument for API responses, events and configs. It is only redacted, serialized and
+    truncated when a handler actually emits the record, e.g. not at all for DEBUG records when
+    the log level is INFO.
+    """
+
+    __slots__ = ["obj", "max_length"]
+
+    def __init__(self, obj, max_length=None):
+        self.obj = obj
+        self.max_length = max_length
+
+    def __str__(self):
+        rendered = json.dumps(_redact(self.obj), sort_keys=True, default=str)
+        max_length = self.max_length or get_max_payload_length()
+        if len(rendered) > max_length:
+            rendered = f"{rendered[:max_length]}...(truncated {len(rendered) - max_length} characters)"
+        return rendered
+
+    __repr__ = __str__
+
+
+def payload(obj, max_length=None):
+    """Wrap obj to be logged lazily, e.g. logger.info("response: %s", payload(response))"""
+    return LazyPayload(obj, max_length)
+
+
+class JsonFormatter(logging.Formatter):
+    """Format records as one json object per line"""
+
+    def format(self, record):
+        log_entry = {
+            "timestamp": self.formatTime(record, self.datefmt),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            log_entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(log_entry, default=str)
+
+
+def use_json_format():
+    return os.environ.get("LOG_FORMAT", "").upper() == "JSON"
+
+
 def get_logger(name):
     logger = None
     # first case: running as a lambda function or in pytest with conftest
@@ -27,11 +94,17 @@ def get_logger(name):
         logging.getLogger("boto3").setLevel(logging.WARNING)
         logging.getLogger("botocore").setLevel(logging.WARNING)
         logging.getLogger("urllib3").setLevel(logging.WARNING)
+        if use_json_format():
+            for handler in logger.handlers:
+                handler.setFormatter(JsonFormatter())
     else:
         """
         Configuring loggers is security-sensitive. For this logger, no
         sensitive information is logged and hence suppressing the rule
         """
         logging.basicConfig(level=get_level())  # NOSONAR (python:S4792)
+        if use_json_format():
+            for handler in logging.getLogger().handlers:
+                handler.setFormatter(JsonFormatter())
         logger = logging.getLogger(name)
     return logger
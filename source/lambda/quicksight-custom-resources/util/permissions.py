@@ -0,0 +1,134 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+from concurrent.futures import ThreadPoolExecutor
+
+from util.logging import get_logger, payload
+
+logger = get_logger(__name__)
+
+# permission profiles of a principal on the QuickSight resources
+OWNER_PROFILE = "owner"
+VIEWER_PROFILE = "viewer"
+# revokes all permissions of a principal
+NO_ACCESS_PROFILE = "none"
+PERMISSION_PROFILES = [OWNER_PROFILE, VIEWER_PROFILE, NO_ACCESS_PROFILE]
+
+# number of describe and update permissions calls in flight at the same time
+DEFAULT_MAX_CONCURRENT_CALLS = 10
+
+
+def get_principal_profiles(owner_principal_arn, principals=None):
+    """
+    Get the principals and their permission profiles, owner first. Additional principals are given as
+    {"Principal": arn, "Profile": profile} or as an arn to use the viewer profile.
+    """
+    principal_profiles = [{"Principal": owner_principal_arn, "Profile": OWNER_PROFILE}]
+    known_principals = {owner_principal_arn}
+    for principal in principals or []:
+        if isinstance(principal, str):
+            principal = {"Principal": principal, "Profile": VIEWER_PROFILE}
+        principal_arn = principal.get("Principal")
+        profile = principal.get("Profile", VIEWER_PROFILE)
+        if not principal_arn:
+            raise ValueError(f"Missing Principal in {principal}")
+        if profile not in PERMISSION_PROFILES:
+            raise ValueError(
+                f"Unknown permission profile {profile} of {principal_arn}, valid profiles are {PERMISSION_PROFILES}"
+            )
+        if principal_arn in known_principals:
+            raise ValueError(f"Duplicate principal {principal_arn}")
+        known_principals.add(principal_arn)
+        principal_profiles.append({"Principal": principal_arn, "Profile": profile})
+    return principal_profiles
+
+
+def _to_action_sets(permissions):
+    action_sets = dict()
+    for permission in permissions:
+        action_sets.setdefault(permission["Principal"], set()).update(permission["Actions"])
+    return action_sets
+
+
+class PermissionChange:
+    """Grants and revokes that turn the current permissions of a resource into the desired ones"""
+
+    def __init__(self, resource, grants, revokes):
+        self.resource = resource
+        self.grants = grants
+        self.revokes = revokes
+
+    def __bool__(self):
+        return bool(self.grants or self.revokes)
+
+    def get_data(self):
+        return {"arn": self.resource.arn, "grants": self.grants, "revokes": self.revokes}
+
+
+def diff_permissions(desired, current, revoked_principals=None, prune=False):
+    """
+    Compute the minimal grants and revokes from current to desired permissions, both lists of
+    {"Principal": arn, "Actions": [...]}. Only the actions of the principals in desired and revoked_principals
+    are revoked, unless prune is set, which also revokes the permissions of all other principals.
+    """
+    desired_actions = _to_action_sets(desired)
+    current_actions = _to_action_sets(current)
+    managed_principals = set(desired_actions) | set(revoked_principals or [])
+
+    grants = []
+    revokes = []
+    for principal, actions in desired_actions.items():
+        missing = actions - current_actions.get(principal, set())
+        if missing:
+            grants.append({"Principal": principal, "Actions": sorted(missing)})
+    for principal, actions in current_actions.items():
+        if not prune and principal not in managed_principals:
+            continue
+        extra = actions - desired_actions.get(principal, set())
+        if extra:
+            revokes.append({"Principal": principal, "Actions": sorted(extra)})
+    return grants, revokes
+
+
+class PermissionReconciler:
+    """
+    Bring the permissions of QuickSight resources in line with their permission profiles. The current
+    permissions of all resources are described concurrently, then the changes are applied concurrently, so
+    sharing a set of resources with a new principal takes two rounds of parallel calls.
+    """
+
+    def __init__(self, resources, prune=False, max_concurrency=DEFAULT_MAX_CONCURRENT_CALLS):
+        self.resources = resources
+        self.prune = prune
+        self.max_concurrency = max_concurrency
+
+    def _get_change(self, resource):
+        current = resource.describe_permissions()
+        desired = resource._get_permissions()
+        revoked_principals = [
+            principal["Principal"] for principal in resource.principals if principal["Profile"] == NO_ACCESS_PROFILE
+        ]
+        grants, revokes = diff_permissions(desired, current, revoked_principals, self.prune)
+        return PermissionChange(resource, grants, revokes)
+
+    def plan(self):
+        """Get the permission changes of all resources, including the resources without changes"""
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            return list(executor.map(self._get_change, self.resources))
+
+    def apply(self, changes):
+        changes = [change for change in changes if change]
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            return list(
+                executor.map(lambda change: change.resource.update_permissions(change.grants, change.revokes), changes)
+            )
+
+    def reconcile(self):
+        changes = self.plan()
+        self.apply(changes)
+        summary = {
+            "changed": [change.get_data() for change in changes if change],
+            "unchanged": [change.resource.arn for change in changes if not change],
+        }
+        logger.info("reconciled permissions: %s", payload(summary))
+        return summary
@@ -1,19 +1,41 @@
 # Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
 # SPDX-License-Identifier: Apache-2.0
 
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from os import environ
+
+from util.asset_bundle import (
+    ASSET_BUNDLE_DEPLOYMENT_ENGINE,
+    AssetBundle,
+    AssetBundleImportFailed,
+    AssetBundleImportJob,
+)
 from util.logging import get_logger
+from util.permissions import PermissionReconciler
 from util.quicksight_application import QuicksightApplication
-from util.template import TemplatePermissionType
+from util.state import ApplicationState
+from util.template import DEFAULT_TEMPLATE_VERSIONS_TO_KEEP, TemplatePermissionType
 
 logger = get_logger(__name__)
 
+# number of stacks provisioned at the same time by provision_stacks
+DEFAULT_MAX_CONCURRENT_STACKS = 4
+# seconds a stack is expected to take, a stack is not started with less time left before the deadline
+DEFAULT_STACK_TIME_BUDGET_SECONDS = 10
+
 
 class QuicksightApi:
-    def __init__(self, resource_properties):
-        self.quicksight_application = QuicksightApplication(resource_properties)
+    def __init__(self, resource_properties, state=None):
+        self.quicksight_application = QuicksightApplication(resource_properties, state=state)
         self.global_state = self.quicksight_application.get_global_state()
 
     def create_all_resources(self):
+        if self.quicksight_application.deployment_engine == ASSET_BUNDLE_DEPLOYMENT_ENGINE:
+            return self.import_all_resources()
+        return self.create_resources_one_by_one()
+
+    def create_resources_one_by_one(self):
         responses = []
 
         responses.append(self.create_data_source())
@@ -23,6 +45,47 @@ class QuicksightApi:
 
         return responses
 
+    def import_all_resources(self):
+        """
+        Import the data source and data sets in a single asset bundle import job, together with the analysis
+        and dashboard when they are created from the local definition, otherwise create them after the import.
+        If the import job failed and was rolled back, so no resource was created, all resources are created one by
+        one instead. Any other failure, or a job still running at the timeout, is raised as the state of the
+        resources is unknown.
+        """
+        try:
+            response = self.import_asset_bundle()
+        except AssetBundleImportFailed as error:
+            if not error.rolled_back:
+                raise
+            logger.warning(f"Failed to import asset bundle, creating the resources one by one: {error}")
+            return self.create_resources_one_by_one()
+
+        if self.quicksight_application.use_local_definition:
+            return [response]
+        return [response, self.create_analysis(), self.create_dashboard()]
+
+    def import_asset_bundle(self):
+        data_source = self.quicksight_application.get_data_source()
+        data_sets = self.quicksight_application.get_data_sets()
+        data_set_sub_types = self.quicksight_application.get_supported_data_set_sub_types()
+        analysis = self.quicksight_application.get_analysis()
+        dashboard = self.quicksight_application.get_dashboard()
+
+        resources = [data_source, *[data_sets[data_set_type] for data_set_type in data_set_sub_types]]
+        if self.quicksight_application.use_local_definition:
+            resources.extend([analysis, dashboard])
+        response = AssetBundleImportJob(self.quicksight_application, AssetBundle(resources)).run()
+
+        self.get_global_state().update({"datasource": data_source.get_data()})
+        self.get_global_state().update(
+            {"dataset": {data_set_type: data_sets[data_set_type].get_data() for data_set_type in data_set_sub_types}}
+        )
+        if self.quicksight_application.use_local_definition:
+            self.get_global_state().update({"analysis": {**analysis.get_data(), "url": analysis.url}})
+            self.get_global_state().update({"dashboard": {**dashboard.get_data(), "url": dashboard.url}})
+        return response
+
     def create_data_source(self):
         qs_resource = self.quicksight_application.get_data_source()
         response = qs_resource.create()
@@ -38,22 +101,62 @@ class QuicksightApi:
         for data_set_type in data_set_sub_types:
             response = data_sets[data_set_type].create()
             responses.append(response)
-            self.get_global_state()["dataset"].update({data_set_type: data_sets[data_set_type].get_data()})
+            self.get_global_state().merge({"dataset": {data_set_type: data_sets[data_set_type].get_data()}})
 
         return responses
 
     def create_analysis(self):
         qs_resource = self.quicksight_application.get_analysis()
         response = qs_resource.create()
-        self.get_global_state().update({"analysis": qs_resource.get_data()})
+        self.get_global_state().update({"analysis": {**qs_resource.get_data(), "url": qs_resource.url}})
         return response
 
     def create_dashboard(self):
         qs_resource = self.quicksight_application.get_dashboard()
         response = qs_resource.create()
-        self.get_global_state().update({"dashboard": qs_resource.get_data()})
+        self.get_global_state().update({"dashboard": {**qs_resource.get_data(), "url": qs_resource.url}})
         return response
 
+    def update_all_resources_in_place(self, deadline=None):
+        """
+        Update the data source, data sets and analysis in place and the dashboard blue/green, so the ids,
+        arns, permissions and links of the resources stay valid and viewers do not see a missing dashboard.
+        The new dashboard version is waited for until the deadline (time.monotonic() value) if any.
+        """
+        responses = []
+
+        qs_resource = self.quicksight_application.get_data_source()
+        responses.append(qs_resource.update())
+        self.get_global_state().update({"datasource": qs_resource.get_data()})
+
+        data_sets = self.quicksight_application.get_data_sets()
+        for data_set_type in self.quicksight_application.get_supported_data_set_sub_types():
+            responses.append(data_sets[data_set_type].update())
+            self.get_global_state().merge({"dataset": {data_set_type: data_sets[data_set_type].get_data()}})
+
+        qs_resource = self.quicksight_application.get_analysis()
+        responses.append(qs_resource.update())
+        self.get_global_state().update({"analysis": {**qs_resource.get_data(), "url": qs_resource.url}})
+
+        responses.append(self.update_dashboard_blue_green(deadline))
+        return responses
+
+    def update_dashboard_blue_green(self, deadline=None):
+        qs_resource = self.quicksight_application.get_dashboard()
+        previous_version, version = qs_resource.blue_green_update(get_time_left(deadline))
+        self.get_global_state().update(
+            {"dashboard": {**qs_resource.get_data(), "url": qs_resource.url, "version": version}}
+        )
+        return {"PreviousVersion": previous_version, "Version": version}
+
+    def rollback_dashboard(self, version_number=None):
+        qs_resource = self.quicksight_application.get_dashboard()
+        version = qs_resource.rollback(version_number)
+        self.get_global_state().update(
+            {"dashboard": {**qs_resource.get_data(), "url": qs_resource.url, "version": version}}
+        )
+        return version
+
     def delete_all_resources(self):
         responses = []
         """
@@ -127,6 +230,46 @@ class QuicksightApi:
         self.get_global_state().update({"template": template.get_data()})
         return response
 
+    def publish_template_from_template(self, source_template_arn, version_description=None):
+        qs_resource = self.quicksight_application.get_template()
+        response = qs_resource.publish_from_template(source_template_arn, version_description)
+        self._update_template_state(qs_resource)
+        return response
+
+    def publish_template_from_analysis(self, version_description=None):
+        template = self.quicksight_application.get_template()
+        analysis = self.quicksight_application.get_analysis()
+        response = template.publish_from_analysis(analysis, version_description)
+        self._update_template_state(template)
+        return response
+
+    def publish_template_from_dashboard(self, version_description=None):
+        template = self.quicksight_application.get_template()
+        dashboard = self.quicksight_application.get_dashboard()
+        response = template.publish_from_dashboard(dashboard, version_description)
+        self._update_template_state(template)
+        return response
+
+    def _update_template_state(self, template):
+        self.get_global_state().update(
+            {"template": {**template.get_data(), "version_arn": template.version_arn, "version": template.version_number}}
+        )
+
+    def delete_old_template_versions(self, keep=DEFAULT_TEMPLATE_VERSIONS_TO_KEEP):
+        qs_resource = self.quicksight_application.get_template()
+        return qs_resource.delete_old_versions(keep)
+
+    def use_template_version(self, version_number=None):
+        """
+        Create the analysis and dashboard from a version of the solution template, by default its pinned or
+        latest published version, without describing the template again
+        """
+        version_arn = self.quicksight_application.get_template().get_version_arn(version_number)
+        for qs_resource in [self.quicksight_application.get_analysis(), self.quicksight_application.get_dashboard()]:
+            qs_resource.quicksight_template_arn = version_arn
+            qs_resource.source_entity.source_obj_arn = version_arn
+        return version_arn
+
     def update_template_permissions(
         self, permission: TemplatePermissionType = TemplatePermissionType.PUBLIC, principal=None
     ):
@@ -139,9 +282,35 @@ class QuicksightApi:
         response = qs_resource.delete()
         return response
 
+    def reconcile_permissions(self, prune=None):
+        """
+        Grant and revoke the permissions of the data source, data sets, analysis and dashboard so they match
+        the permission profiles of the owner and of the QuickSightPrincipals. With prune, the permissions of
+        all other principals are revoked, by default as set by the PrunePermissions property.
+        """
+        if prune is None:
+            prune = self.quicksight_application.prune_permissions
+        resources = [
+            self.quicksight_application.get_data_source(),
+            *self.quicksight_application.get_data_sets().values(),
+            self.quicksight_application.get_analysis(),
+            self.quicksight_application.get_dashboard(),
+        ]
+        return PermissionReconciler(resources, prune=prune).reconcile()
+
     def get_global_state(self):
         return self.global_state
 
+    def get_response_data(self):
+        """Build the custom resource response data from the final state snapshot"""
+        snapshot = self.get_global_state().snapshot()
+        analysis = snapshot.get("analysis", {})
+        dashboard = snapshot.get("dashboard", {})
+        return {
+            "analysis_url": analysis.get("url", self.quicksight_application.get_analysis().url),
+            "dashboard_url": dashboard.get("url", self.quicksight_application.get_dashboard().url),
+        }
+
     def describe_data_source(self):
         qs_resource = self.quicksight_application.get_data_source()
         response = qs_resource.describe()
@@ -165,3 +334,193 @@ class QuicksightApi:
         qs_resource = self.quicksight_application.get_dashboard()
         response = qs_resource.describe()
         return response
+
+
+def get_max_concurrent_stacks():
+    return int(environ.get("QUICKSIGHT_MAX_CONCURRENT_STACKS", DEFAULT_MAX_CONCURRENT_STACKS))
+
+
+def get_stack_time_budget():
+    return float(environ.get("QUICKSIGHT_STACK_TIME_BUDGET_SECONDS", DEFAULT_STACK_TIME_BUDGET_SECONDS))
+
+
+class StackNotStarted(Exception):
+    pass
+
+
+def get_time_left(deadline):
+    """Seconds left before a deadline (time.monotonic() value), None without a deadline"""
+    if deadline is None:
+        return None
+    return max(0, deadline - time.monotonic())
+
+
+def _provision_stack(stack_properties, request_type, old_stack_properties=None, deadline=None):
+    """
+    Create, update in place or delete all resources of one stack, with its own application state. A stack
+    updated to another region is deleted from its old region and created in the new one.
+    """
+    qs_api = QuicksightApi(stack_properties, state=ApplicationState())
+    if request_type == "Delete":
+        qs_api.delete_all_resources()
+        return dict()
+
+    if request_type == "Update":
+        old_qs_api = QuicksightApi(old_stack_properties or stack_properties, state=ApplicationState())
+        if old_qs_api.quicksight_application.aws_region == qs_api.quicksight_application.aws_region:
+            qs_api.update_all_resources_in_place(deadline)
+            return qs_api.get_response_data()
+        old_qs_api.delete_all_resources()
+
+    try:
+        qs_api.create_all_resources()
+    except Exception:
+        region = qs_api.quicksight_application.aws_region
+        logger.info(f"rolling back resources of stack {stack_properties['StackName']} in {region}")
+        qs_api.delete_all_resources()
+        raise
+    return qs_api.get_response_data()
+
+
+def _provision_target(target, deadline):
+    """Provision a target, unless there is not enough time left before the deadline to complete it"""
+    time_budget = get_stack_time_budget()
+    if deadline is not None and deadline - time.monotonic() < time_budget:
+        raise StackNotStarted(f"less than {time_budget} seconds left in the invocation")
+    return _provision_stack(
+        target["ResourceProperties"], target["RequestType"], target.get("OldResourceProperties"), deadline
+    )
+
+
+def _provision_concurrently(targets, max_concurrency, deadline=None):
+    """
+    Provision each target (name -> request type, stack resource properties and old stack resource properties
+    of an update) on a thread pool of max_concurrency threads and collect the outcome by target name. With a
+    deadline (time.monotonic() value), targets that would not complete before it are skipped.
+    """
+    results = dict()
+    with ThreadPoolExecutor(max_workers=max_concurrency or get_max_concurrent_stacks()) as executor:
+        futures = {executor.submit(_provision_target, target, deadline): name for name, target in targets.items()}
+        for future in as_completed(futures):
+            name = futures[future]
+            request_type = targets[name]["RequestType"]
+            try:
+                results[name] = {"Status": "SUCCESS", "RequestType": request_type, "Data": future.result()}
+            except StackNotStarted as error:
+                logger.warning(f"{request_type} of {name} skipped: {error}")
+                results[name] = {"Status": "SKIPPED", "RequestType": request_type, "Reason": str(error)}
+            except Exception as error:
+                logger.error(f"{request_type} of {name} failed: {error}")
+                results[name] = {"Status": "FAILED", "RequestType": request_type, "Reason": str(error)}
+
+    return {
+        "Succeeded": [name for name in targets if results[name]["Status"] == "SUCCESS"],
+        "Failed": [name for name in targets if results[name]["Status"] == "FAILED"],
+        "Skipped": [name for name in targets if results[name]["Status"] == "SKIPPED"],
+        "Results": results,
+    }
+
+
+def get_update_plan(old_targets, targets):
+    """
+    Targets of an update (name -> stack resource properties): the targets that are no longer listed are deleted,
+    the new ones created and the others updated in place
+    """
+    plan = {
+        name: {"RequestType": "Delete", "ResourceProperties": stack_properties}
+        for name, stack_properties in old_targets.items()
+        if name not in targets
+    }
+    for name, stack_properties in targets.items():
+        if name in old_targets:
+            plan[name] = {
+                "RequestType": "Update",
+                "ResourceProperties": stack_properties,
+                "OldResourceProperties": old_targets[name],
+            }
+        else:
+            plan[name] = {"RequestType": "Create", "ResourceProperties": stack_properties}
+    return plan
+
+
+def _get_plan(targets, request_type, old_targets):
+    if request_type == "Update":
+        return get_update_plan(targets if old_targets is None else old_targets, targets)
+    return {
+        name: {"RequestType": request_type, "ResourceProperties": stack_properties}
+        for name, stack_properties in targets.items()
+    }
+
+
+def get_stack_targets(stack_configs, defaults=None):
+    """Resource properties of each stack by StackName, the stack config merged over the defaults"""
+    defaults = defaults or dict()
+    stacks = dict()
+    for stack_config in stack_configs:
+        stack_properties = {**defaults, **stack_config}
+        stack_name = stack_properties.get("StackName")
+        if not stack_name:
+            raise ValueError(f"Missing StackName in stack config {stack_config}")
+        if stack_name in stacks:
+            raise ValueError(f"Duplicate StackName {stack_name} in stack configs")
+        stacks[stack_name] = stack_properties
+    return stacks
+
+
+def get_region_targets(resource_properties, regions):
+    """Resource properties of each region"""
+    if len(set(regions)) != len(regions):
+        raise ValueError(f"Duplicate region in {regions}")
+    return {region: {**resource_properties, "Region": region} for region in regions}
+
+
+def provision_stacks(
+    stack_configs,
+    request_type="Create",
+    defaults=None,
+    max_concurrency=None,
+    old_stack_configs=None,
+    old_defaults=None,
+    deadline=None,
+):
+    """
+    Create, update or delete the QuickSight resources of several dashboard stacks in one invocation.
+
+    Each stack config holds the resource properties of one stack (StackName, QuickSightPrincipalArn,
+    WorkGroupName, QuickSightSourceTemplateArn, Region) and is merged over the defaults. Stacks run
+    concurrently, at most max_concurrency at a time, and share the boto3 clients, account id, config files
+    and api rate limit of the execution context. A stack that fails to create is rolled back without
+    affecting the others. An update is compared with the old stack configs and defaults, by default the same
+    stacks: the stacks no longer listed are deleted, the new ones created and the others updated in place.
+    Stacks that cannot complete before the deadline are not started.
+
+    :return: the names of the stacks that succeeded, failed and were skipped, and per stack results with the
+     response data or the failure reason
+    """
+    targets = get_stack_targets(stack_configs, defaults)
+    old_targets = None if old_stack_configs is None else get_stack_targets(old_stack_configs, old_defaults)
+    return _provision_concurrently(_get_plan(targets, request_type, old_targets), max_concurrency, deadline)
+
+
+def provision_regions(
+    resource_properties,
+    regions,
+    request_type="Create",
+    max_concurrency=None,
+    old_resource_properties=None,
+    old_regions=None,
+    deadline=None,
+):
+    """
+    Create, update or delete the same QuickSight resources in several regions in one invocation. Regions run
+    concurrently like the stacks of provision_stacks, each with its own regional QuickSight client, and an
+    update is compared with the old resource properties and regions in the same way.
+
+    :return: the regions that succeeded, failed and were skipped, and per region results with the response data
+     or the failure reason
+    """
+    targets = get_region_targets(resource_properties, regions)
+    old_targets = None
+    if old_regions is not None:
+        old_targets = get_region_targets(old_resource_properties or resource_properties, old_regions)
+    return _provision_concurrently(_get_plan(targets, request_type, old_targets), max_concurrency, deadline)
@@ -1,30 +1,33 @@
 # Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
 # SPDX-License-Identifier: Apache-2.0
 
-import json
-
 import yaml
 
 from util.analysis import Analysis
+from util.asset_bundle import DEPLOYMENT_ENGINES, PER_RESOURCE_DEPLOYMENT_ENGINE
 from util.dashboard import Dashboard
 from util.dataset import DataSet
 from util.datasource import DataSource
-from util.helpers import get_aws_account_id, get_quicksight_client
-from util.logging import get_logger
-from util.template import Template
+from util.definition import is_definition_shipped
+from util.helpers import get_aws_account_id, get_aws_region, get_quicksight_client
+from util.logging import get_logger, payload
+from util.permissions import NO_ACCESS_PROFILE, get_principal_profiles
+from util.state import ApplicationState
+from util.template import Template, get_template_version_arn
+from util.tracing import traced
 
 logger = get_logger(__name__)
 
 # Global state. Keep in execution context of lambda
-_global_state = dict()
+_global_state = ApplicationState()
 
 
 def get_global_state():
     """Get the global state"""
     global _global_state
-    if not _global_state:
+    if _global_state is None:
         logger.debug(f"Initializing global state for quicksight api")
-        _global_state = dict()
+        _global_state = ApplicationState()
     return _global_state
 
 
@@ -33,17 +36,18 @@ def read_config(file_name):
     with open(config_path, "r") as f:
         body = f.read()
     config_dict = yaml.safe_load(body)
-    logger.info(f"config loaded, config: {config_dict}")
+    logger.info("config loaded, config: %s", payload(config_dict))
     return config_dict
 
 
 class QuicksightApplication:
-    def __init__(self, resource_properties):
-
-        supported_data_set_types = ["code-change-activity", "code-deployment-detail", "recovery-time-detail", "code-pipeline-detail", "code-build-detail", "github-change-activity"]
+    supported_data_set_types = ["code-change-activity", "code-deployment-detail", "recovery-time-detail", "code-pipeline-detail", "code-build-detail", "github-change-activity"]
 
+    @traced("QuicksightApplication.__init__")
+    def __init__(self, resource_properties, state=None):
         self.resource_properties = resource_properties
-        self.global_state = get_global_state()
+        # an application with its own state does not share resource data with other applications
+        self.global_state = state if state is not None else get_global_state()
 
         # use config data file if provided
         config_file = resource_properties.get("ConfigDataFile", None)
@@ -52,10 +56,19 @@ class QuicksightApplication:
             self.global_state.update(data)
 
         self.prefix = resource_properties.get("StackName", "Sample_Sol")
+        # the region to deploy the resources to, by default the region of the lambda
+        self.aws_region = resource_properties.get("Region") or get_aws_region()
+        logger.debug(f"Using Region: {self.aws_region}")
 
         self.quicksight_template_arn = resource_properties.get(
             "QuickSightSourceTemplateArn", "Uninitialized QuickSightSourceTemplateArn"
         )
+        # pin the analysis and dashboard to a known good version of the source template
+        source_template_version = resource_properties.get("QuickSightSourceTemplateVersion")
+        if source_template_version:
+            self.quicksight_template_arn = get_template_version_arn(
+                self.quicksight_template_arn, int(source_template_version)
+            )
         logger.debug(f"Using QuickSightSourceTemplateArn: {self.quicksight_template_arn }")
 
         self.quicksight_principal_arn = resource_properties.get(
@@ -63,10 +76,33 @@ class QuicksightApplication:
         )
         logger.debug(f"Using QuickSightPrincipalArn: {self.quicksight_principal_arn }")
 
+        # additional principals the resources are shared with, see util.permissions.get_principal_profiles
+        self.quicksight_principals = get_principal_profiles(
+            self.quicksight_principal_arn, resource_properties.get("QuickSightPrincipals")
+        )
+        logger.debug(f"Using QuickSightPrincipals: {self.quicksight_principals}")
+        self.prune_permissions = str(resource_properties.get("PrunePermissions", "false")).strip().lower() == "true"
+
+        # create all resources one by one, or import them in a single asset bundle, see util.asset_bundle
+        self.deployment_engine = resource_properties.get("DeploymentEngine") or PER_RESOURCE_DEPLOYMENT_ENGINE
+        if self.deployment_engine not in DEPLOYMENT_ENGINES:
+            raise ValueError(
+                f"Unknown DeploymentEngine {self.deployment_engine}, valid engines are {DEPLOYMENT_ENGINES}"
+            )
+
+        # create the analysis and dashboard from the definition in util/config instead of the source template. The
+        # definition is not shipped, so the property is ignored until it is added to the function code
+        self.use_local_definition = (
+            str(resource_properties.get("UseLocalDefinition", "false")).strip().lower() == "true"
+        )
+        if self.use_local_definition and not is_definition_shipped():
+            logger.warning("ignoring UseLocalDefinition, no dashboard definition is shipped in util/config")
+            self.use_local_definition = False
+
         self.data_source = DataSource(quicksight_application=self, props=self.global_state)
         self.data_source.athena_workgroup = resource_properties.get("WorkGroupName", "primary")
 
-        self.data_set_sub_types = supported_data_set_types
+        self.data_set_sub_types = list(self.supported_data_set_types)
         self.data_sets = dict()
         for data_set_sub_type in self.data_set_sub_types:
             data_set = DataSet(
@@ -95,8 +131,7 @@ class QuicksightApplication:
 
         self.template = Template(quicksight_application=self, data_sets=self.data_sets, props=self.global_state)
 
-        global_state_json = json.dumps(self.global_state, indent=2, sort_keys=True)
-        logger.debug(f"QuicksightApi: after init, global data json: {global_state_json}")
+        logger.debug("QuicksightApi: after init, global data json: %s", payload(self.global_state.snapshot()))
 
     def get_data_source(self):
         return self.data_source
@@ -119,9 +154,14 @@ class QuicksightApplication:
     def get_global_state(self):
         return self.global_state
 
+    def revoke_shared_permissions(self):
+        """Change the permission profile of all principals but the owner to no access"""
+        for principal in self.quicksight_principals[1:]:
+            principal["Profile"] = NO_ACCESS_PROFILE
+
     @property
     def edition(self) -> str:
-        qs = get_quicksight_client()
+        qs = get_quicksight_client(self.aws_region)
         try:
             settings = qs.describe_account_settings(AwsAccountId=get_aws_account_id())
             edition = settings.get("AccountSettings").get("Edition")
@@ -134,4 +174,4 @@ class QuicksightApplication:
     @staticmethod
     def clear_global_states():
         global _global_state
-        _global_state = dict()
+        _global_state = ApplicationState()
@@ -3,12 +3,40 @@
 
 import json
 import os
+import re
 
-from util.helpers import get_aws_account_id, get_aws_partition, get_aws_region, get_quicksight_client
-from util.logging import get_logger
+from util.helpers import get_aws_account_id, get_aws_partition, get_quicksight_client
+from util.logging import get_logger, payload
+from util.tracing import traced_resource_call
 
 logger = get_logger(__name__)
 
+# arns of dashboard and template versions end with /version/<number>
+VERSION_ARN_PATTERN = re.compile(r"/version/(\d+)$")
+
+# Global cache of config file contents. Keep in execution context of lambda
+_config_file_cache = dict()
+
+
+def read_config_file(config_file):
+    """Read a resource config file, parsed fresh on each call as resources modify their config data"""
+    body = _config_file_cache.get(config_file)
+    if body is None:
+        with open(config_file, "r") as config_fd:
+            body = config_fd.read()
+        _config_file_cache[config_file] = body
+    return json.loads(body)
+
+
+def clear_config_file_cache():
+    _config_file_cache.clear()
+
+
+def get_version_number(version_arn):
+    """Get the version number of a dashboard or template version arn, None if the arn is not a version arn"""
+    match = VERSION_ARN_PATTERN.search(version_arn or "")
+    return int(match.group(1)) if match else None
+
 
 class ResourceSubTypeError(ValueError):
     pass
@@ -24,12 +52,16 @@ class QuickSightFailure(Exception):
 
 
 class QuickSightResource:
+    # actions of each permission profile, defined by the resource types
+    permission_profiles = dict()
+
     def __init__(self, quicksight_application=None, type=None, sub_type=None, props=None):
         self.quicksight_application = quicksight_application
         self.aws_account_id = get_aws_account_id()
-        self.aws_region = get_aws_region()
-        self.aws_partition = get_aws_partition()
+        self.aws_region = quicksight_application.aws_region
+        self.aws_partition = get_aws_partition(self.aws_region)
         self.principal_arn = quicksight_application.quicksight_principal_arn
+        self.principals = quicksight_application.quicksight_principals
 
         self.type = type
         self.sub_type = sub_type
@@ -108,13 +140,14 @@ class QuickSightResource:
         obj_props = props.get(self.type, None)
         self._update_using_properties(obj_props)
 
+    @traced_resource_call
     def describe(self):
         call_type = self._get_type_for_boto3_call(self.type)
         id_parameter_name = self._get_id_name_for_boto3_call(self.type)
 
         operation = f"describe_{call_type}"
         logger.info(f"requesting quicksight {operation} id:{self.id}")
-        obj = get_quicksight_client()
+        obj = get_quicksight_client(self.aws_region)
 
         if not (hasattr(obj, operation) and callable(getattr(obj, operation))):
             raise NotImplementedError(
@@ -127,9 +160,49 @@ class QuickSightResource:
         }
 
         response = func(**parameters)
-        logger.info(f"finished quicksight {operation} for id:{self.id} response: {response}")
+        logger.info("finished quicksight %s for id:%s response: %s", operation, self.id, payload(response))
         return response
 
+    @traced_resource_call
+    def describe_permissions(self):
+        call_type = self._get_type_for_boto3_call(self.type)
+        id_parameter_name = self._get_id_name_for_boto3_call(self.type)
+
+        operation = f"describe_{call_type}_permissions"
+        logger.info(f"requesting quicksight {operation} id:{self.id}")
+        quicksight_client = get_quicksight_client(self.aws_region)
+        response = getattr(quicksight_client, operation)(
+            **{"AwsAccountId": self.aws_account_id, id_parameter_name: self.id}
+        )
+        logger.info("finished quicksight %s for id:%s response: %s", operation, self.id, payload(response))
+        return response.get("Permissions", [])
+
+    @traced_resource_call
+    def update_permissions(self, grants, revokes):
+        call_type = self._get_type_for_boto3_call(self.type)
+        id_parameter_name = self._get_id_name_for_boto3_call(self.type)
+
+        operation = f"update_{call_type}_permissions"
+        logger.info(f"requesting quicksight {operation} id:{self.id}, grants: {grants}, revokes: {revokes}")
+        quicksight_client = get_quicksight_client(self.aws_region)
+        parameters = {"AwsAccountId": self.aws_account_id, id_parameter_name: self.id}
+        if grants:
+            parameters["GrantPermissions"] = grants
+        if revokes:
+            parameters["RevokePermissions"] = revokes
+        response = getattr(quicksight_client, operation)(**parameters)
+        logger.info("finished quicksight %s for id:%s response: %s", operation, self.id, payload(response))
+        return response
+
+    def _get_permissions(self):
+        """Permissions of all principals with actions in their permission profile, the owner first"""
+        permissions = []
+        for principal in self.principals:
+            actions = self.permission_profiles.get(principal["Profile"])
+            if actions:
+                permissions.append({"Principal": principal["Principal"], "Actions": list(actions)})
+        return permissions
+
     def get_data(self):
         return {
             "id": self.id,
@@ -142,9 +215,7 @@ class QuickSightResource:
         in_dir = os.path.join(os.path.dirname(__file__), "config")
         for sub_type in resource_sub_types:
             config_file = os.path.join(in_dir, f"{resource_type}-{sub_type}.config.json")
-            with open(config_file, "r") as config_fd:
-                config_data_item = json.load(config_fd)
-                config_data[sub_type] = config_data_item
+            config_data[sub_type] = read_config_file(config_file)
 
     def _get_map(self, sub_type, map_type):
         if sub_type not in self.config_data:
@@ -0,0 +1,81 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+import threading
+import time
+from os import environ
+
+from util.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Global rate limiter. Keep in execution context of lambda
+_api_rate_limiter = None
+
+
+class TokenBucket:
+    """Token bucket with a refill rate in tokens per second and a burst capacity"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self):
+        with self.lock:
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class ApiRateLimiter:
+    """
+    Client side rate limit shared by all boto3 clients built in util.helpers, so concurrently provisioned
+    stacks stay below the QuickSight API limits together instead of each retrying on throttling. Calls wait
+    for a token in the before-call event. Without a configured rate, calls are not limited.
+    """
+
+    def __init__(self, rate=None, burst=None):
+        self.token_bucket = None
+        self.configure(rate, burst)
+
+    def configure(self, rate=None, burst=None):
+        self.token_bucket = TokenBucket(rate, burst) if rate else None
+        logger.debug(f"api rate limit set to {rate} calls per second, burst {burst}")
+
+    def register(self, client):
+        client.meta.events.register_first("before-call.*.*", self._before_call)
+
+    def _before_call(self, **kwargs):
+        token_bucket = self.token_bucket
+        if token_bucket:
+            token_bucket.acquire()
+
+
+def get_api_rate_limiter():
+    """Get the global api rate limiter, initially configured by QUICKSIGHT_API_RATE_LIMIT and QUICKSIGHT_API_BURST"""
+    global _api_rate_limiter
+    if not _api_rate_limiter:
+        rate = environ.get("QUICKSIGHT_API_RATE_LIMIT")
+        burst = environ.get("QUICKSIGHT_API_BURST")
+        _api_rate_limiter = ApiRateLimiter(float(rate) if rate else None, float(burst) if burst else None)
+    return _api_rate_limiter
@@ -0,0 +1,121 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+import threading
+from collections.abc import Mapping
+from types import MappingProxyType
+
+from util.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+def _freeze(value):
+    if isinstance(value, StateSnapshot):
+        return value
+    if isinstance(value, Mapping):
+        return StateSnapshot(value)
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def _thaw(value):
+    if isinstance(value, StateSnapshot):
+        return value.to_dict()
+    if isinstance(value, tuple):
+        return [_thaw(item) for item in value]
+    return value
+
+
+class StateSnapshot(Mapping):
+    """
+    Immutable view of the QuickSight application state at a point in time.
+    Nested dictionaries are frozen into snapshots and lists into tuples, so a snapshot
+    can be handed to any thread without copying.
+    """
+
+    def __init__(self, data=None):
+        self._data = MappingProxyType({key: _freeze(value) for key, value in (data or {}).items()})
+
+    def __getitem__(self, key):
+        return self._data[key]
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+    def replace(self, updates):
+        """Return a new snapshot with the top level keys of updates replaced (dict.update semantics)"""
+        data = dict(self._data)
+        data.update(updates)
+        return StateSnapshot(data)
+
+    def merge(self, updates):
+        """Return a new snapshot with updates recursively merged into the nested mappings"""
+        data = dict(self._data)
+        for key, value in updates.items():
+            current = data.get(key)
+            if isinstance(current, StateSnapshot) and isinstance(value, Mapping):
+                data[key] = current.merge(value)
+            else:
+                data[key] = value
+        return StateSnapshot(data)
+
+    def to_dict(self):
+        """Return a mutable deep copy of the snapshot, e.g. for json serialization"""
+        return {key: _thaw(value) for key, value in self._data.items()}
+
+    def __repr__(self):
+        return repr(self.to_dict())
+
+
+class ApplicationState(Mapping):
+    """
+    Holder of the current StateSnapshot. Readers get the current snapshot without locking.
+    Writers compute the merged snapshot outside of any lock and publish it with a compare
+    and swap, retrying when another thread published in between. The dict-like update()
+    keeps the existing callers (config data file, test fixtures) working unchanged.
+    """
+
+    def __init__(self, data=None):
+        self._snapshot = StateSnapshot(data)
+        self._swap_lock = threading.Lock()
+
+    def snapshot(self):
+        return self._snapshot
+
+    def _publish(self, transform):
+        while True:
+            current = self._snapshot
+            proposed = transform(current)
+            with self._swap_lock:
+                if self._snapshot is current:
+                    self._snapshot = proposed
+                    return proposed
+            logger.debug("application state changed while publishing, retrying merge")
+
+    def update(self, updates):
+        """Atomically replace top level keys, same semantics as dict.update"""
+        return self._publish(lambda snapshot: snapshot.replace(updates))
+
+    def merge(self, updates):
+        """Atomically merge nested updates, e.g. {"dataset": {sub_type: data}}"""
+        return self._publish(lambda snapshot: snapshot.merge(updates))
+
+    def get_data(self):
+        return self._snapshot.to_dict()
+
+    def __getitem__(self, key):
+        return self._snapshot[key]
+
+    def __iter__(self):
+        return iter(self._snapshot)
+
+    def __len__(self):
+        return len(self._snapshot)
+
+    def __repr__(self):
+        return repr(self._snapshot)
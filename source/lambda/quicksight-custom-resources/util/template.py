@@ -4,12 +4,29 @@
 from enum import Enum, auto
 
 from util.helpers import get_quicksight_client
-from util.logging import get_logger
-from util.quicksight_resource import QuickSightResource
+from util.logging import get_logger, payload
+from util.permissions import OWNER_PROFILE, VIEWER_PROFILE
+from util.quicksight_resource import VERSION_ARN_PATTERN, QuickSightResource, get_version_number
 from util.source_entity import SourceEntity
+from util.tracing import traced_resource_call
 
 logger = get_logger(__name__)
 
+# a version is immutable once it reached one of these statuses, so its description can be cached
+TEMPLATE_VERSION_FINAL_STATUSES = ["CREATION_SUCCESSFUL", "CREATION_FAILED", "UPDATE_SUCCESSFUL", "UPDATE_FAILED"]
+# number of most recent template versions kept by Template.delete_old_versions
+DEFAULT_TEMPLATE_VERSIONS_TO_KEEP = 3
+
+
+def get_template_version_arn(template_arn, version_number):
+    """Get the arn of a template version from a template arn or the arn of another version of the template"""
+    return f"{VERSION_ARN_PATTERN.sub('', template_arn)}/version/{version_number}"
+
+
+def get_template_version_number(version_arn):
+    """Get the version number of a template version arn, None if the arn is not a version arn"""
+    return get_version_number(version_arn)
+
 
 class TemplatePermissionType(Enum):
     """Simplifies permission setting of template"""
@@ -26,87 +43,197 @@ class TemplatePermissionType(Enum):
 
 
 class Template(QuickSightResource):
+    # The owner creates the resources and is given full actions for the type, viewers are given read actions
+    permission_profiles = {
+        OWNER_PROFILE: [
+            "quicksight:DescribeTemplate",
+            "quicksight:ListTemplateVersions",
+            "quicksight:UpdateTemplatePermissions",
+            "quicksight:UpdateTemplate",
+            "quicksight:DeleteTemplate",
+            "quicksight:DescribeTemplatePermissions",
+        ],
+        VIEWER_PROFILE: [
+            "quicksight:DescribeTemplate",
+            "quicksight:ListTemplateVersions",
+        ],
+    }
+
     def __init__(self, quicksight_application=None, data_sets=None, props=None):
         super().__init__(quicksight_application=quicksight_application, type="template", props=props)
         self.use_props(props)
 
         self.data_sets = data_sets
+        self.version_arn = None
+        self.version_number = None
+        self.pinned_version = None
+        self._version_cache = dict()
 
         self.config_data = {}
         self._load_config(self.type, ["main"], self.config_data)
 
+    @traced_resource_call
     def create_from_analysis(self, analysis):
         logger.info(f"requesting quicksight create_template id {self.id} from analysis")
-        quicksight_client = get_quicksight_client()
+        return self._create(self._get_source_entity_using_analysis(analysis.arn), "analysis")
 
-        analysis_source_entity = SourceEntity(
-            self.data_sets, analysis.arn, self.config_data, source_entity_type="SourceAnalysis"
-        )
+    @traced_resource_call
+    def create_from_dashboard(self, dashboard):
+        logger.info(f"requesting quicksight create_template id {self.id} from dashboard")
+        return self._create(self._get_source_entity_using_analysis(dashboard.arn), "dashboard")
 
-        response = quicksight_client.create_template(
-            AwsAccountId=self.aws_account_id,
-            TemplateId=self.id,
-            Name=self.name,
-            Permissions=self._get_permissions(),
-            SourceEntity=analysis_source_entity.get_source_entity(),
-            VersionDescription="1",
-        )
-        logger.info(f"finished quicksight create_template id:{self.id} from analysis, response: {response}")
+    @traced_resource_call
+    def create_from_template(self, source_template_arn):
+        logger.info(f"requesting quicksight create_template id:{self.id} from template")
+        return self._create(self._get_source_entity_using_template(source_template_arn), "template")
 
-        self.arn = response["Arn"]
-        return response
+    @traced_resource_call
+    def publish_from_analysis(self, analysis, version_description=None):
+        return self._publish(self._get_source_entity_using_analysis(analysis.arn), version_description)
 
-    def create_from_dashboard(self, dashboard):
-        logger.info(f"requesting quicksight create_template id {self.id} from dashboard")
-        quicksight_client = get_quicksight_client()
+    @traced_resource_call
+    def publish_from_dashboard(self, dashboard, version_description=None):
+        return self._publish(self._get_source_entity_using_analysis(dashboard.arn), version_description)
 
-        analysis_source_entity = SourceEntity(
-            self.data_sets, dashboard.arn, self.config_data, source_entity_type="SourceAnalysis"
-        )
+    @traced_resource_call
+    def publish_from_template(self, source_template_arn, version_description=None):
+        return self._publish(self._get_source_entity_using_template(source_template_arn), version_description)
+
+    def _create(self, source_entity, source_name, version_description="1"):
+        quicksight_client = get_quicksight_client(self.aws_region)
 
         response = quicksight_client.create_template(
             AwsAccountId=self.aws_account_id,
             TemplateId=self.id,
             Name=self.name,
             Permissions=self._get_permissions(),
-            SourceEntity=analysis_source_entity.get_source_entity(),
-            VersionDescription="1",
+            SourceEntity=source_entity,
+            VersionDescription=version_description,
+        )
+        logger.info(
+            "finished quicksight create_template id:%s from %s, response: %s", self.id, source_name, payload(response)
         )
-        logger.info(f"finished quicksight create_template id:{self.id} from analysis, response: {response}")
 
         self.arn = response["Arn"]
+        self._update_version(response.get("VersionArn"))
         return response
 
-    def create_from_template(self, source_template_arn):
-        quicksight_client = get_quicksight_client()
+    def _publish(self, source_entity, version_description=None):
+        """
+        Publish a new version of the template with update_template, so the template arn and the arns of the
+        previous versions remain valid for consumers. The template is created if it does not exist yet.
+        """
+        quicksight_client = get_quicksight_client(self.aws_region)
 
-        logger.info(f"requesting quicksight create_template id:{self.id} from template")
-        source_entity = self._get_source_entity_using_template(source_template_arn)
-        response = quicksight_client.create_template(
-            AwsAccountId=self.aws_account_id,
-            TemplateId=self.id,
-            Name=self.name,
-            Permissions=self._get_permissions(),
-            SourceEntity=source_entity,
-            VersionDescription="1",
-        )
-        logger.info(f"finished quicksight create_template id:{self.id} from template, response: {response}")
+        logger.info(f"requesting quicksight update_template id:{self.id}")
+        parameters = {
+            "AwsAccountId": self.aws_account_id,
+            "TemplateId": self.id,
+            "Name": self.name,
+            "SourceEntity": source_entity,
+        }
+        if version_description:
+            parameters["VersionDescription"] = version_description
+        try:
+            response = quicksight_client.update_template(**parameters)
+        except quicksight_client.exceptions.ResourceNotFoundException:
+            logger.info(f"template id:{self.id} does not exist, creating it")
+            return self._create(source_entity, "update", version_description or "1")
+        logger.info("finished quicksight update_template id:%s, response: %s", self.id, payload(response))
 
         self.arn = response["Arn"]
+        self._update_version(response.get("VersionArn"))
         return response
 
+    def _update_version(self, version_arn):
+        self.version_arn = version_arn
+        self.version_number = get_template_version_number(version_arn)
+
+    def pin_version(self, version_number):
+        """Pin a known good version, referenced by get_version_arn and kept by delete_old_versions"""
+        self.pinned_version = version_number
+
+    def get_version_arn(self, version_number=None):
+        """Get the arn of a version of the template, by default the pinned version or else the latest version"""
+        version_number = version_number or self.pinned_version or self.version_number
+        if not version_number:
+            raise ValueError(f"No version of template {self.id} is known, publish or pin a version first")
+        return get_template_version_arn(self.arn, version_number)
+
+    @traced_resource_call
+    def describe_version(self, version_number=None):
+        """
+        Describe a version of the template, by default the latest one. Descriptions of numbered versions in a
+        final status are cached, as a version does not change once it is built.
+        """
+        if version_number in self._version_cache:
+            return self._version_cache[version_number]
+
+        quicksight_client = get_quicksight_client(self.aws_region)
+        parameters = {"AwsAccountId": self.aws_account_id, "TemplateId": self.id}
+        if version_number:
+            parameters["VersionNumber"] = version_number
+        logger.info(f"requesting quicksight describe_template id:{self.id} version:{version_number}")
+        response = quicksight_client.describe_template(**parameters)
+        logger.info("finished quicksight describe_template for id:%s response: %s", self.id, payload(response))
+
+        version = response["Template"].get("Version", {})
+        version_number = version.get("VersionNumber", version_number)
+        if version_number and version.get("Status") in TEMPLATE_VERSION_FINAL_STATUSES:
+            self._version_cache[version_number] = response
+        return response
+
+    @traced_resource_call
+    def list_versions(self):
+        quicksight_client = get_quicksight_client(self.aws_region)
+        parameters = {"AwsAccountId": self.aws_account_id, "TemplateId": self.id}
+        versions = []
+        while True:
+            response = quicksight_client.list_template_versions(**parameters)
+            versions.extend(response.get("TemplateVersionSummaryList", []))
+            if not response.get("NextToken"):
+                break
+            parameters["NextToken"] = response["NextToken"]
+        return sorted(versions, key=lambda version: version["VersionNumber"])
+
+    @traced_resource_call
+    def delete_old_versions(self, keep=DEFAULT_TEMPLATE_VERSIONS_TO_KEEP):
+        """
+        Delete all but the keep most recent versions of the template. The pinned version is never deleted.
+        :return: the numbers of the deleted versions
+        """
+        if keep < 1:
+            raise ValueError(f"At least one template version must be kept, got keep={keep}")
+        quicksight_client = get_quicksight_client(self.aws_region)
+
+        version_numbers = [version["VersionNumber"] for version in self.list_versions()]
+        deleted = []
+        for version_number in version_numbers[:-keep]:
+            if version_number == self.pinned_version:
+                continue
+            logger.info(f"requesting quicksight delete_template id:{self.id} version:{version_number}")
+            quicksight_client.delete_template(
+                AwsAccountId=self.aws_account_id, TemplateId=self.id, VersionNumber=version_number
+            )
+            self._version_cache.pop(version_number, None)
+            deleted.append(version_number)
+        logger.info(f"deleted versions {deleted} of template id:{self.id}")
+        return deleted
+
+    @traced_resource_call
     def delete(self):
-        quicksight_client = get_quicksight_client()
+        quicksight_client = get_quicksight_client(self.aws_region)
 
         logger.info(f"requesting quicksight delete_template id:{self.id}")
         response = quicksight_client.delete_template(AwsAccountId=self.aws_account_id, TemplateId=self.id)
-        logger.info(f"finished quicksight delete_template for id:{self.id}, response: {response}")
+        logger.info("finished quicksight delete_template for id:%s, response: %s", self.id, payload(response))
         return response
 
+    @traced_resource_call
     def update_template_permissions(
         self, permission: TemplatePermissionType = TemplatePermissionType.PUBLIC, principal=None
     ):
-        quicksight_client = get_quicksight_client()
+        quicksight_client = get_quicksight_client(self.aws_region)
 
         logger.debug(f"requesting quicksight update_template_permissions, principal: {principal}")
         if permission == TemplatePermissionType.PUBLIC:
@@ -119,26 +246,17 @@ class Template(QuickSightResource):
             GrantPermissions=[{"Principal": principal, "Actions": ["quicksight:DescribeTemplate"]}],
         )
         logger.info(
-            f"finished quicksight update_template_permissions for id:{self.id} from template, response: {response}"
+            "finished quicksight update_template_permissions for id:%s from template, response: %s",
+            self.id,
+            payload(response),
         )
         return response
 
-    def _get_permissions(self):
-        # The principal is the owner of the resource and create the resources and is given full actions for the type
-        permissions = [
-            {
-                "Principal": self.principal_arn,
-                "Actions": [
-                    "quicksight:DescribeTemplate",
-                    "quicksight:ListTemplateVersions",
-                    "quicksight:UpdateTemplatePermissions",
-                    "quicksight:UpdateTemplate",
-                    "quicksight:DeleteTemplate",
-                    "quicksight:DescribeTemplatePermissions",
-                ],
-            }
-        ]
-        return permissions
+    def _get_source_entity_using_analysis(self, analysis_arn):
+        analysis_source_entity = SourceEntity(
+            self.data_sets, analysis_arn, self.config_data, source_entity_type="SourceAnalysis"
+        )
+        return analysis_source_entity.get_source_entity()
 
     def _get_source_entity_using_template(self, source_template_arn):
         source_entity = {"SourceTemplate": {"Arn": source_template_arn}}
@@ -0,0 +1,167 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from util.logging import get_logger
+
+logger = get_logger(__name__)
+
+TRACE_ENV_VARIABLE = "QUICKSIGHT_TRACE"
+TRACE_FILE_ENV_VARIABLE = "QUICKSIGHT_TRACE_FILE"
+TRACE_RESOURCE_PROPERTY = "EnableTracing"
+
+_START_TIME_CONTEXT_KEY = "tracing_start_time"
+
+# Global tracer. Keep in execution context of lambda
+_tracer = None
+
+
+def _is_true(value):
+    return str(value).strip().lower() in ["true", "1", "yes", "enabled"]
+
+
+class Tracer:
+    """
+    Opt-in recorder of spans in the Chrome trace-event format ("X" complete events), which can be
+    opened in Perfetto or chrome://tracing. Spans are recorded per thread, so overlapping API calls
+    of concurrent provisioning show up as parallel tracks. A disabled tracer records nothing.
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._events = []
+        self._origin = time.perf_counter()
+        self._pid = os.getpid()
+
+    def _to_microseconds(self, perf_counter_value):
+        return round((perf_counter_value - self._origin) * 1_000_000, 3)
+
+    def add_span(self, name, start, end, category="function", args=None):
+        if not self.enabled:
+            return
+        event = {
+            "name": name,
+            "cat": category,
+            "ph": "X",
+            "ts": self._to_microseconds(start),
+            "dur": round((end - start) * 1_000_000, 3),
+            "pid": self._pid,
+            "tid": threading.get_ident(),
+            "args": args or {},
+        }
+        with self._lock:
+            self._events.append(event)
+
+    @contextmanager
+    def span(self, name, category="function", **args):
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_span(name, start, time.perf_counter(), category=category, args=args)
+
+    def register(self, client):
+        """Record a span for every API call made with the boto3 client"""
+        events = client.meta.events
+        events.register_first("before-call.*.*", self._before_call)
+        events.register("after-call.*.*", self._after_call)
+
+    def _before_call(self, context=None, **kwargs):
+        if self.enabled and context is not None:
+            context[_START_TIME_CONTEXT_KEY] = time.perf_counter()
+
+    def _after_call(self, event_name=None, http_response=None, model=None, context=None, **kwargs):
+        start_time = (context or {}).get(_START_TIME_CONTEXT_KEY)
+        if not self.enabled or start_time is None:
+            return
+        name = event_name.split(".", 1)[-1]
+        args = {"status_code": getattr(http_response, "status_code", None)}
+        self.add_span(name, start_time, time.perf_counter(), category="api", args=args)
+
+    def get_trace(self):
+        with self._lock:
+            events = list(self._events)
+        metadata = {
+            "name": "process_name",
+            "ph": "M",
+            "pid": self._pid,
+            "args": {"name": os.environ.get("AWS_LAMBDA_FUNCTION_NAME", "quicksight-custom-resources")},
+        }
+        return {"traceEvents": [metadata] + events, "displayTimeUnit": "ms"}
+
+    def reset(self):
+        with self._lock:
+            self._events = []
+        self._origin = time.perf_counter()
+
+    def flush(self, file_name=None):
+        """
+        Write the recorded trace to file_name (or the file set in QUICKSIGHT_TRACE_FILE),
+        otherwise as a single json line to the log stream, and start a new trace
+        """
+        if not self.enabled:
+            return None
+        trace = self.get_trace()
+        file_name = file_name or os.environ.get(TRACE_FILE_ENV_VARIABLE)
+        if file_name:
+            with open(file_name, "w") as trace_fd:
+                json.dump(trace, trace_fd)
+            logger.info(f"chrome trace with {len(trace['traceEvents'])} events written to {file_name}")
+        else:
+            print(json.dumps(trace), flush=True)
+        self.reset()
+        return trace
+
+
+def get_tracer():
+    """Get the global tracer"""
+    global _tracer
+    if not _tracer:
+        _tracer = Tracer(enabled=_is_true(os.environ.get(TRACE_ENV_VARIABLE, "false")))
+    return _tracer
+
+
+def start_tracing(resource_properties=None):
+    """Enable the global tracer when requested by environment variable or custom resource property"""
+    tracer = get_tracer()
+    requested = os.environ.get(TRACE_ENV_VARIABLE) or (resource_properties or {}).get(TRACE_RESOURCE_PROPERTY, "false")
+    tracer.enabled = _is_true(requested)
+    if tracer.enabled:
+        tracer.reset()
+    return tracer
+
+
+def traced(name, category="function"):
+    """Decorator recording a span for each call of the decorated function on the global tracer"""
+
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with get_tracer().span(name, category=category):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def traced_resource_call(func):
+    """Decorator recording a span named <resource type>.<method> for QuickSightResource methods"""
+
+    @wraps(func)
+    def wrapper(resource, *args, **kwargs):
+        name = f"{resource.type}.{func.__name__}"
+        with get_tracer().span(name, category="resource", id=resource.id):
+            return func(resource, *args, **kwargs)
+
+    return wrapper
@@ -1,19 +1,30 @@
 # Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
 # SPDX-License-Identifier: Apache-2.0
 
+# Keep the imports to what the handler needs, this lambda runs on every stack operation and its cold start adds
+# to the deployment time. util.solution_metrics (requests, the spool) is imported only by the anonymous metric
+# requests, in send_anonymous_metric and handler.
 import logging
-import os
 import uuid
-import requests
-import json
-from copy import copy
-from datetime import datetime
 from crhelper import CfnResource
-from util.solution_metrics import send_metrics
 
 logger = logging.getLogger(__name__)
 helper = CfnResource(json_logging=True, log_level="INFO")
 
+METRICS_RESOURCE_TYPE = "Custom::AnonymousMetric"
+# resource properties that are not metrics data
+METRICS_RESOURCE_PROPERTIES = ["ServiceToken", "Resource", "SolutionId", "UUID", "MetricsURL"]
+
+
+def send_anonymous_metric(event):
+    """Spool the resource properties of an anonymous metric request, with its request type, as metrics data"""
+    from util.solution_metrics import send_metrics
+
+    properties = event["ResourceProperties"]
+    data = {key: value for key, value in properties.items() if key not in METRICS_RESOURCE_PROPERTIES}
+    data["RequestType"] = event["RequestType"]
+    send_metrics(data, properties.get("UUID"), properties.get("SolutionId"), properties.get("MetricsURL"))
+
 
 @helper.create
 @helper.update
@@ -26,6 +37,8 @@ def solution_helper(event, _):
         random_id = str(uuid.uuid4())
         helper.Data.update({"UUID": random_id})
         logger.info(f"[solution_helper] create uuid: {random_id}")
+    elif event["ResourceType"] == METRICS_RESOURCE_TYPE:
+        send_anonymous_metric(event)
 
 
 def handler(event, context):
@@ -34,3 +47,9 @@ def handler(event, context):
         helper(event, context)
     except Exception as error:
         logger.exception(f"[handler] failed: {error}")
+
+    if event.get("ResourceType") == METRICS_RESOURCE_TYPE:
+        # sent once the custom resource response is, within the remaining time of the invocation
+        from util.solution_metrics import flush_metrics
+
+        flush_metrics(context)
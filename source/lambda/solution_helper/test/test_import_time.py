@@ -0,0 +1,30 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+import os
+import subprocess
+import sys
+from unittest import TestCase
+
+LAMBDA_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# modules the UUID and no-op requests must not load
+LAZY_MODULES = ["requests", "util.solution_metrics", "util.metrics_spool"]
+
+HANDLER_SCRIPT = """
+import sys
+import lambda_function
+
+lambda_function.solution_helper({"RequestType": "Create", "ResourceType": "Custom::CreateUUID"}, None)
+lambda_function.solution_helper({"RequestType": "Delete", "ResourceType": "Custom::CreateUUID"}, None)
+print(",".join(module for module in %r if module in sys.modules))
+"""
+
+
+class ImportTimeTest(TestCase):
+
+    def test_handler_does_not_load_metrics_stack(self):
+        environment = {**os.environ, "AWS_REGION": "us-east-1", "AWS_DEFAULT_REGION": "us-east-1"}
+        result = subprocess.run([sys.executable, "-c", HANDLER_SCRIPT % LAZY_MODULES], cwd=LAMBDA_DIR,
+                                env=environment, capture_output=True, text=True, check=True)
+        self.assertEqual(result.stdout.strip(), "")
@@ -2,6 +2,7 @@
 # SPDX-License-Identifier: Apache-2.0
 
 import unittest
+from unittest.mock import patch
 
 
 class LambdaTest(unittest.TestCase):
@@ -18,3 +19,24 @@ class LambdaTest(unittest.TestCase):
 
         lambda_function.solution_helper(event, None)
         self.assertIsNotNone(lambda_function.helper.Data.get("UUID"))
+
+    @patch("util.solution_metrics.get_metrics_spool")
+    def test_anonymous_metric(self, mock_spool):
+        import lambda_function
+
+        event = {
+            "RequestType": "Create",
+            "ResourceType": "Custom::AnonymousMetric",
+            "ResourceProperties": {
+                "ServiceToken": "arn:MOCK_FUNCTION",
+                "SolutionId": "SO0000",
+                "UUID": "2820b493-864c-4ca1-99d3-7174fef7f374",
+                "MetricsURL": "https://example.com",
+                "Region": "us-east-1"
+                }}
+
+        lambda_function.solution_helper(event, None)
+        record = mock_spool.return_value.append.call_args.args[0]
+        self.assertEqual(record["Url"], "https://example.com")
+        self.assertEqual(record["Metrics"]["Solution"], "SO0000")
+        self.assertEqual(record["Metrics"]["Data"], {"Region": "us-east-1", "RequestType": "Create"})
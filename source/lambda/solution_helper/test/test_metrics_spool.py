@@ -0,0 +1,155 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+import os
+import shutil
+import tempfile
+import time
+from unittest import TestCase
+from unittest.mock import MagicMock
+
+from util.metrics_spool import RECORD_HEADER, MetricsSpool, SpoolFlusher
+from util.solution_metrics import MetricsClient
+
+
+class MetricsSpoolTest(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "metrics.spool")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_append_read_remove(self):
+        spool = MetricsSpool(self.path)
+        for index in range(3):
+            spool.append({"index": index})
+
+        self.assertEqual(spool.read(), [{"index": 0}, {"index": 1}, {"index": 2}])
+        self.assertEqual(spool.read(2), [{"index": 0}, {"index": 1}])
+        spool.remove(2)
+        self.assertEqual(spool.read(), [{"index": 2}])
+        # the records are kept in the file for the next execution of the lambda
+        self.assertEqual(MetricsSpool(self.path).read(), [{"index": 2}])
+
+    def test_full_spool_drops_oldest(self):
+        record_size = RECORD_HEADER.size + len(b'{"index": 0}')
+        spool = MetricsSpool(self.path, max_bytes=3 * record_size)
+        for index in range(5):
+            spool.append({"index": index})
+
+        self.assertEqual(spool.read(), [{"index": 2}, {"index": 3}, {"index": 4}])
+        self.assertEqual(spool.dropped, 2)
+        self.assertLessEqual(os.path.getsize(self.path), 3 * record_size)
+
+    def test_partially_written_record_ignored(self):
+        spool = MetricsSpool(self.path)
+        spool.append({"index": 0})
+        with open(self.path, "ab") as spool_fd:
+            spool_fd.write(RECORD_HEADER.pack(100) + b'{"ind')
+
+        self.assertEqual(spool.read(), [{"index": 0}])
+        spool.append({"index": 1})
+        spool.remove(1)
+        self.assertEqual(len(spool), 0)
+
+    def test_remove_after_drop_keeps_unsent_records(self):
+        record_size = RECORD_HEADER.size + len(b'{"index": 0}')
+        spool = MetricsSpool(self.path, max_bytes=3 * record_size)
+        for index in range(3):
+            spool.append({"index": index})
+        records, dropped = spool.read_batch(2)
+
+        # the spool is full, records 0 and 1 are dropped while they are being sent
+        spool.append({"index": 3})
+        spool.append({"index": 4})
+        spool.remove(len(records), dropped)
+        self.assertEqual(spool.read(), [{"index": 2}, {"index": 3}, {"index": 4}])
+
+    def test_record_larger_than_spool(self):
+        spool = MetricsSpool(self.path, max_bytes=10)
+        with self.assertRaises(ValueError):
+            spool.append({"data": "some data"})
+
+
+class SpoolFlusherTest(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.spool = MetricsSpool(os.path.join(self.directory, "metrics.spool"))
+        self.client = MagicMock()
+        self.client.get_timeout.return_value = (1, 2)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def append(self, spool, index):
+        spool.append({"Url": "https://example.com", "Metrics": {"index": index}})
+
+    def get_sent(self):
+        return [call.args[0]["index"] for call in self.client.post.call_args_list]
+
+    def test_flush_in_batches(self):
+        for index in range(5):
+            self.append(self.spool, index)
+        flusher = SpoolFlusher(self.spool, self.client, batch_size=2)
+
+        self.assertEqual(flusher.flush(), 5)
+        self.assertEqual(self.get_sent(), [0, 1, 2, 3, 4])
+        self.assertEqual(self.client.post.call_args.kwargs["url"], "https://example.com")
+        self.assertEqual(len(self.spool), 0)
+
+    def test_flush_with_records_dropped_while_sending(self):
+        record_size = RECORD_HEADER.size + len(b'{"Url": "https://example.com", "Metrics": {"index": 0}}')
+        spool = MetricsSpool(os.path.join(self.directory, "full.spool"), max_bytes=2 * record_size)
+        self.append(spool, 0)
+        self.append(spool, 1)
+        self.client.post.side_effect = lambda record, **kwargs: record["index"] == 1 and self.append(spool, 2)
+        flusher = SpoolFlusher(spool, self.client, batch_size=2)
+
+        flusher.flush()
+        # record 0 was dropped for record 2, only record 1 is removed once sent, record 2 is sent in the next batch
+        self.assertEqual(self.get_sent(), [0, 1, 2])
+        self.assertEqual(len(spool), 0)
+
+    def test_failure_keeps_unsent_records(self):
+        for index in range(3):
+            self.append(self.spool, index)
+        self.client.post.side_effect = [None, ConnectionError("MOCK_OUTAGE")]
+        flusher = SpoolFlusher(self.spool, self.client)
+
+        self.assertEqual(flusher.flush(), 1)
+        self.assertEqual([record["Metrics"]["index"] for record in self.spool.read()], [1, 2])
+
+    def test_failure_backs_off_exponentially(self):
+        self.append(self.spool, 0)
+        self.client.post.side_effect = ConnectionError("MOCK_OUTAGE")
+        flusher = SpoolFlusher(self.spool, self.client, initial_backoff_seconds=0.01, max_backoff_seconds=0.02)
+
+        for expected_backoff in [0.01, 0.02, 0.02]:
+            self.assertEqual(flusher.flush(), 0)
+            self.assertEqual(flusher.backoff_seconds, expected_backoff)
+            # nothing is sent during the backoff
+            self.assertEqual(flusher.flush(), 0)
+            time.sleep(expected_backoff)
+        self.assertEqual(self.client.post.call_count, 3)
+        self.assertEqual(len(self.spool), 1)
+
+        self.client.post.side_effect = None
+        self.assertEqual(flusher.flush(), 1)
+        self.assertEqual(flusher.backoff_seconds, 0)
+        self.assertEqual(len(self.spool), 0)
+
+    def test_flush_within_deadline(self):
+        for index in range(3):
+            self.append(self.spool, index)
+        client = MetricsClient(session=MagicMock())
+        flusher = SpoolFlusher(self.spool, client)
+
+        self.assertEqual(flusher.flush(time.monotonic() - 1), 0)
+        self.assertEqual(len(self.spool), 3)
+        self.assertEqual(flusher.flush(time.monotonic() + 1.5), 3)
+        timeout = client.session.post.call_args.kwargs["timeout"]
+        self.assertLessEqual(timeout[1], 1.5)
+        self.assertEqual(len(self.spool), 0)
@@ -1,19 +1,102 @@
 # Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
 # SPDX-License-Identifier: Apache-2.0
 
+import json
+import os
+import time
 from unittest import TestCase
-from unittest.mock import patch
-from util.solution_metrics import send_metrics
+from unittest.mock import MagicMock, patch
+
+import requests
+
+from util import solution_metrics
+from util.solution_metrics import MetricsClient, flush_metrics, get_spool_flusher, send_metrics
 
 class LambdaTest(TestCase):
 
-    @patch('util.solution_metrics.requests.post')     
-    def test_send_metrics(self, mock_post):
+    @patch('util.solution_metrics.get_metrics_spool')
+    def test_send_metrics(self, mock_spool):
         data = {"data": "some data"}
         uuid = "2820b493-864c-4ca1-99d3-7174fef7f374"
         solution_id = "SO0000"
         url = "https://example.com"
 
-        mock_post.return_value.status_code = 200
         response = send_metrics(data, uuid, solution_id, url)
         self.assertIsNotNone(response)
+        mock_spool.return_value.append.assert_called_once_with({"Url": url, "Metrics": response})
+        self.assertEqual(response["Solution"], solution_id)
+
+    @patch('util.solution_metrics.get_metrics_spool')
+    def test_send_metrics_never_raises(self, mock_spool):
+        mock_spool.return_value.append.side_effect = OSError("MOCK_DISK_FULL")
+        self.assertIsNone(send_metrics({"data": "some data"}))
+
+    @patch('util.solution_metrics.get_spool_flusher')
+    def test_flush_metrics_within_remaining_time(self, mock_flusher):
+        context = MagicMock()
+        context.get_remaining_time_in_millis.return_value = 3000
+        mock_flusher.return_value.flush.return_value = 2
+
+        self.assertEqual(flush_metrics(context), 2)
+        deadline = mock_flusher.return_value.flush.call_args.args[0]
+        self.assertAlmostEqual(deadline - time.monotonic(), 2, delta=0.5)
+
+        mock_flusher.return_value.flush.side_effect = OSError("MOCK_DISK_ERROR")
+        self.assertEqual(flush_metrics(context), 0)
+
+
+class MetricsClientTest(TestCase):
+
+    def setUp(self):
+        self.session = MagicMock()
+        self.client = MetricsClient(url="https://example.com", session=self.session)
+
+    def get_sent_data(self):
+        kwargs = self.session.post.call_args.kwargs
+        self.assertNotIn("content-encoding", kwargs["headers"])
+        return json.loads(kwargs["data"])
+
+    def test_post_sends_one_record(self):
+        self.client.post({"Data": {"data": "first"}})
+        self.assertEqual(self.session.post.call_count, 1)
+        self.assertEqual(self.get_sent_data(), {"Data": {"data": "first"}})
+        self.assertEqual(self.session.post.call_args.kwargs["timeout"], (1, 2))
+
+    def test_timeout_within_remaining_time(self):
+        self.assertEqual(self.client.get_timeout(), (1, 2))
+        self.assertEqual(self.client.get_timeout(1.5), (1, 1.5))
+        self.assertIsNone(self.client.get_timeout(0))
+
+    def test_url_read_when_sending(self):
+        client = MetricsClient(session=self.session)
+        with patch.dict(os.environ, {"METRICS_URL": "https://example.org"}):
+            client.post({"Data": {"data": "some data"}})
+        self.assertEqual(self.session.post.call_args.args[0], "https://example.org")
+
+    def test_post_failure_raises(self):
+        self.session.post.return_value.raise_for_status.side_effect = requests.exceptions.HTTPError("MOCK_ERROR")
+        with self.assertRaises(requests.exceptions.HTTPError):
+            self.client.post({"Data": {"data": "some data"}})
+
+
+class SpoolFlusherTest(TestCase):
+
+    def setUp(self):
+        solution_metrics._spool_flusher = None
+
+    def tearDown(self):
+        solution_metrics._spool_flusher = None
+
+    def test_records_sent_to_their_url(self):
+        flusher = get_spool_flusher()
+        self.assertIs(get_spool_flusher(), flusher)
+        flusher.spool = MagicMock()
+        flusher.spool.read_batch.side_effect = [
+            ([{"Url": "https://example.com", "Metrics": {}}, {"Url": "https://example.org", "Metrics": {}}], 0),
+            ([], 0),
+        ]
+        flusher.client.session = MagicMock()
+
+        self.assertEqual(flusher.flush(), 2)
+        urls = [call.args[0] for call in flusher.client.session.post.call_args_list]
+        self.assertEqual(urls, ["https://example.com", "https://example.org"])
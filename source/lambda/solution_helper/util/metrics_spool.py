@@ -0,0 +1,178 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+import os
+import struct
+import threading
+import time
+import logging
+from json import dumps, loads
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SPOOL_FILE = "/tmp/solution-metrics.spool"
+DEFAULT_MAX_SPOOL_BYTES = 1024 * 1024
+# every record is its json length as 4 byte big endian unsigned int followed by the json
+RECORD_HEADER = struct.Struct(">I")
+
+# records read from the spool at a time by the flusher, each one is sent in a request of its own
+DEFAULT_FLUSH_BATCH_SIZE = 100
+# seconds to wait before retrying after a failed request, doubled after each consecutive failure
+DEFAULT_INITIAL_BACKOFF_SECONDS = 1
+DEFAULT_MAX_BACKOFF_SECONDS = 300
+
+
+class MetricsSpool:
+    """Bounded append-only file of length prefixed metrics records.
+
+    Appending is a single write to the end of the file. When a record does not fit, the oldest records are
+    dropped to make room. Records are removed from the front once sent. A record that was only partially
+    written, e.g. when the lambda was stopped, ends the spool and is discarded on the next rewrite.
+    """
+
+    def __init__(self, path=DEFAULT_SPOOL_FILE, max_bytes=DEFAULT_MAX_SPOOL_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.dropped = 0
+
+    def _size(self):
+        try:
+            return os.path.getsize(self.path)
+        except FileNotFoundError:
+            return 0
+
+    def _read_payloads(self):
+        try:
+            with open(self.path, "rb") as spool_fd:
+                content = spool_fd.read()
+        except FileNotFoundError:
+            return []
+        payloads = []
+        offset = 0
+        while offset + RECORD_HEADER.size <= len(content):
+            (length,) = RECORD_HEADER.unpack_from(content, offset)
+            start = offset + RECORD_HEADER.size
+            if start + length > len(content):
+                logger.debug(f"discarding partially written record at offset {offset} of {self.path}")
+                break
+            payloads.append(content[start:start + length])
+            offset = start + length
+        return payloads
+
+    def _rewrite(self, payloads):
+        temporary_path = f"{self.path}.tmp"
+        with open(temporary_path, "wb") as spool_fd:
+            spool_fd.write(b"".join(RECORD_HEADER.pack(len(payload)) + payload for payload in payloads))
+        os.replace(temporary_path, self.path)
+
+    def append(self, record):
+        payload = dumps(record).encode("utf-8")
+        encoded = RECORD_HEADER.pack(len(payload)) + payload
+        if len(encoded) > self.max_bytes:
+            raise ValueError(f"metrics record of {len(encoded)} bytes is larger than the spool")
+        with self.lock:
+            if self._size() + len(encoded) > self.max_bytes:
+                self._drop_oldest(len(encoded))
+            with open(self.path, "ab") as spool_fd:
+                spool_fd.write(encoded)
+
+    def _drop_oldest(self, needed_bytes):
+        payloads = self._read_payloads()
+        size = sum(RECORD_HEADER.size + len(payload) for payload in payloads)
+        dropped = 0
+        while dropped < len(payloads) and size + needed_bytes > self.max_bytes:
+            size -= RECORD_HEADER.size + len(payloads[dropped])
+            dropped += 1
+        self.dropped += dropped
+        logger.debug(f"metrics spool full, dropping the {dropped} oldest records")
+        self._rewrite(payloads[dropped:])
+
+    def read(self, limit=None):
+        """The oldest records of the spool, at most limit"""
+        return self.read_batch(limit)[0]
+
+    def read_batch(self, limit=None):
+        """The oldest records of the spool, at most limit, and the dropped count to remove them with"""
+        with self.lock:
+            payloads = self._read_payloads()
+            dropped = self.dropped
+        return [loads(payload) for payload in payloads[:limit]], dropped
+
+    def remove(self, count, dropped=None):
+        """Remove the count oldest records, records appended in the meantime are kept.
+
+        With the dropped count of read_batch, the records dropped since they were read, which were the oldest
+        ones, are not counted again, so unsent records are not removed.
+        """
+        with self.lock:
+            if dropped is not None:
+                count = max(0, count - (self.dropped - dropped))
+            self._rewrite(self._read_payloads()[count:])
+
+    def __len__(self):
+        with self.lock:
+            return len(self._read_payloads())
+
+
+class SpoolFlusher:
+    """Sends the records of a spool one by one with a metrics client, within the invocation that flushes.
+
+    A lambda environment is frozen once the handler returns, so the spool is drained synchronously, bounded by a
+    deadline. Each spooled record is {"Url": url, "Metrics": metrics data}. After a failed request the flusher
+    backs off exponentially: the following flushes of the warm execution environment send nothing until the
+    backoff elapsed, so an endpoint outage costs at most one request timeout per backoff.
+    """
+
+    def __init__(self, spool, client,
+                 batch_size=DEFAULT_FLUSH_BATCH_SIZE,
+                 initial_backoff_seconds=DEFAULT_INITIAL_BACKOFF_SECONDS,
+                 max_backoff_seconds=DEFAULT_MAX_BACKOFF_SECONDS):
+        self.spool = spool
+        self.client = client
+        self.batch_size = batch_size
+        self.initial_backoff_seconds = initial_backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.backoff_seconds = 0
+        self.next_attempt = 0
+        self.lock = threading.Lock()
+
+    def _get_remaining_seconds(self, deadline):
+        return None if deadline is None else deadline - time.monotonic()
+
+    def flush(self, deadline=None):
+        """Send the spooled records until none is left, a request fails or the time.monotonic() deadline is reached
+
+        Return: the number of records sent
+        """
+        with self.lock:
+            if time.monotonic() < self.next_attempt:
+                logger.debug(f"not sending usage data for {self.next_attempt - time.monotonic():.1f} seconds")
+                return 0
+            sent = 0
+            while True:
+                records, dropped = self.spool.read_batch(self.batch_size)
+                if not records:
+                    break
+                batch_sent = 0
+                try:
+                    for record in records:
+                        timeout = self.client.get_timeout(self._get_remaining_seconds(deadline))
+                        if timeout is None:
+                            logger.debug(f"no time left to send {len(records) - batch_sent} spooled records")
+                            return sent + batch_sent
+                        self.client.post(record["Metrics"], timeout=timeout, url=record["Url"])
+                        batch_sent += 1
+                except Exception as error:
+                    self.backoff_seconds = min(self.max_backoff_seconds,
+                                               self.backoff_seconds * 2 or self.initial_backoff_seconds)
+                    self.next_attempt = time.monotonic() + self.backoff_seconds
+                    logger.warning(f"Error sending usage data, retrying in {self.backoff_seconds} seconds: {error}")
+                    return sent + batch_sent
+                finally:
+                    if batch_sent:
+                        self.spool.remove(batch_sent, dropped)
+                sent += batch_sent
+            self.backoff_seconds = 0
+            self.next_attempt = 0
+            return sent
@@ -2,39 +2,124 @@
 # SPDX-License-Identifier: Apache-2.0
 
 import os
+import time
 import requests
 from json import dumps
 from datetime import datetime
+from requests.adapters import HTTPAdapter
 import logging
+from util.metrics_spool import DEFAULT_MAX_SPOOL_BYTES, DEFAULT_SPOOL_FILE, MetricsSpool, SpoolFlusher
 
 logger = logging.getLogger(__name__)
 
+# (connect, read) timeout of a metrics request in seconds
+DEFAULT_TIMEOUT = (1, 2)
+# lambda time in milliseconds kept for the rest of the invocation when flushing
+FLUSH_TIME_MARGIN_MS = 1000
+
+# Global metrics spool and spool flusher. Keep in execution context of lambda
+_metrics_spool = None
+_spool_flusher = None
+
+
 def send_metrics(data,
-                 uuid=os.getenv('UUID'),
-                 solution_id=os.getenv('SOLUTION_ID'),
-                 url=os.getenv('METRICS_URL')):
+                 uuid=None,
+                 solution_id=None,
+                 url=None):
     """Sends anonymous customer metrics to s3 via API gateway owned and
         managed by the Solutions Builder team.
 
+    The metrics are appended to the spool under /tmp, so the caller never waits on the network and the data
+    survives an endpoint outage. They are sent by flush_metrics, e.g. once the custom resource response is sent.
+
     Args:
         data - anonymous customer metrics to be sent
-        uuid - uuid of the solution
-        solution_id: unique id of the solution
-        url: url for API Gateway via which data is sent
+        uuid - uuid of the solution, by default the UUID environment variable
+        solution_id: unique id of the solution, by default the SOLUTION_ID environment variable
+        url: url for API Gateway via which data is sent, by default the METRICS_URL environment variable
 
-    Return: response returned by https post request
+    Return: the spooled metrics data, None if it could not be spooled
     """
     try:
         metrics_data = {
-            "Solution": solution_id,
-            "UUID": uuid,
+            "Solution": solution_id or os.getenv('SOLUTION_ID'),
+            "UUID": uuid or os.getenv('UUID'),
             "TimeStamp": str(datetime.utcnow().isoformat()),
             "Data": data
             }
-        json_data = dumps(metrics_data)
-        print('metrics data:' + json_data)
-        headers = {'content-type': 'application/json'}
-        response = requests.post(url, data=json_data, headers=headers, timeout=10)
-        return response
+        get_metrics_spool().append({"Url": url or os.getenv('METRICS_URL'), "Metrics": metrics_data})
+        return metrics_data
+    except Exception as error :
+        logger.exception(f"Error sending usage data: {error}")
+
+
+def flush_metrics(context=None):
+    """Send the spooled metrics within the remaining time of the lambda context, less FLUSH_TIME_MARGIN_MS
+
+    Return: the number of metrics records sent
+    """
+    deadline = None
+    if context is not None:
+        deadline = time.monotonic() + (context.get_remaining_time_in_millis() - FLUSH_TIME_MARGIN_MS) / 1000
+    try:
+        return get_spool_flusher().flush(deadline)
     except Exception as error :
         logger.exception(f"Error sending usage data: {error}")
+        return 0
+
+
+class MetricsClient:
+    """Sends anonymous metrics records over a pooled keep-alive session, one uncompressed json object per request
+        as the metrics endpoint expects.
+
+    Args:
+        url: url for API Gateway via which data is sent, by default the METRICS_URL environment variable when sending
+    """
+
+    def __init__(self, url=None, timeout=DEFAULT_TIMEOUT, session=None):
+        self.url = url
+        self.timeout = timeout
+        self.session = session or self._create_session()
+
+    @staticmethod
+    def _create_session():
+        session = requests.Session()
+        # a single keep-alive connection to the metrics endpoint, no retries of failed requests
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=1, max_retries=0)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
+    def get_timeout(self, remaining_seconds=None):
+        """The (connect, read) timeout of a request that must end within remaining_seconds, None if there is no time"""
+        if remaining_seconds is None:
+            return self.timeout
+        if remaining_seconds <= 0:
+            return None
+        connect_timeout, read_timeout = self.timeout
+        return min(connect_timeout, remaining_seconds), min(read_timeout, remaining_seconds)
+
+    def post(self, metrics_data, timeout=None, url=None):
+        """Send a metrics record, to url instead of the url of the client, raises an exception if it fails"""
+        headers = {'content-type': 'application/json'}
+        response = self.session.post(url or self.url or os.getenv('METRICS_URL'), data=dumps(metrics_data),
+                                     headers=headers, timeout=timeout or self.timeout)
+        response.raise_for_status()
+        return response
+
+
+def get_metrics_spool():
+    """Get the global metrics spool, at METRICS_SPOOL_FILE with at most METRICS_SPOOL_MAX_BYTES"""
+    global _metrics_spool
+    if not _metrics_spool:
+        _metrics_spool = MetricsSpool(os.getenv('METRICS_SPOOL_FILE', DEFAULT_SPOOL_FILE),
+                                      int(os.getenv('METRICS_SPOOL_MAX_BYTES', DEFAULT_MAX_SPOOL_BYTES)))
+    return _metrics_spool
+
+
+def get_spool_flusher():
+    """Get the global flusher of the metrics spool, each record is sent to the url it was spooled with"""
+    global _spool_flusher
+    if not _spool_flusher:
+        _spool_flusher = SpoolFlusher(get_metrics_spool(), MetricsClient())
+    return _spool_flusher
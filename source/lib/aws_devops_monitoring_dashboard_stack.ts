@@ -1071,6 +1071,12 @@ export class DevOpsDashboardStack extends cdk.Stack {
       condition: quickSightCondition
     });
 
+    new cdk.CfnOutput(this, 'QSEmbedUrlFunctionName', {
+      value: qsNestedTemplate.embedUrlFunctionNameOutput,
+      description: 'AWS Lambda function returning embed URLs of the Amazon QuickSight Dashboard for DevOps Monitoring Dashboard on AWS Solution',
+      condition: quickSightCondition
+    });
+
     new cdk.CfnOutput(this, 'APIEndpoint', {
       value: gitHubNestedStack.apiEndpointOutput,
       description: 'Amazon API Endpoint to receive GitHub events for DevOps Monitoring Dashboard on AWS Solution',
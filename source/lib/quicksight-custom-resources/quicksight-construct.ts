@@ -2,20 +2,33 @@
 // Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
 // SPDX-License-Identifier: Apache-2.0
 
-import { Effect, IRole, Policy, PolicyStatement } from 'aws-cdk-lib/aws-iam';
+import { Effect, IRole, Policy, PolicyDocument, PolicyStatement } from 'aws-cdk-lib/aws-iam';
 import * as lambda from 'aws-cdk-lib/aws-lambda';
 import * as cdk from 'aws-cdk-lib';
 import { Construct } from 'constructs';
 import { addCfnSuppressRules } from '@aws-solutions-constructs/core';
 import { RetentionDays } from 'aws-cdk-lib/aws-logs';
 import { NagSuppressions } from 'cdk-nag';
+import { ExecutionRole } from '../solution-helper/lambda-role-cloudwatch-construct';
 
 export enum QuickSightSetup {
   DATA_SET = 'dataset',
   DATA_SOURCE = 'datasource',
   ANALYSIS = 'analysis',
   DASHBOARD = 'dashboard',
-  ALL = 'all'
+  ALL = 'all',
+  BATCH = 'batch'
+}
+
+/**
+ * Resource properties of one dashboard stack of a batch, the ones not set are those of the construct
+ */
+export interface QuickSightStackConfig {
+  readonly stackName: string;
+  readonly principalArn?: string;
+  readonly workgroupName?: string;
+  readonly sourceTemplateArn?: string;
+  readonly region?: string;
 }
 
 export interface QuickSightProps {
@@ -29,16 +42,159 @@ export interface QuickSightProps {
   readonly role: IRole;
   readonly parentStackName: string;
   readonly userAgentExtra: string;
+  /**
+   * Comma separated domains allowed to embed the dashboard, e.g. https://portal.example.com
+   */
+  readonly embedAllowedDomains?: string;
+  /**
+   * Regions all the resources are deployed to, by default the region of the stack
+   */
+  readonly regions?: string[];
+  /**
+   * Dashboard stacks deployed by a batch resource
+   */
+  readonly stacks?: QuickSightStackConfig[];
+  /**
+   * Number of regions or stacks deployed at the same time
+   */
+  readonly maxConcurrentStacks?: number;
 }
+
+// seconds the custom resource function runs, a batch or multi-region deployment runs up to the lambda maximum
+const CUSTOM_RESOURCE_TIMEOUT_SECONDS = 30;
+const FAN_OUT_TIMEOUT_SECONDS = 900;
 export class QuickSight extends Construct {
   private _analysisURL: string;
   private _dashboardURL: string;
+  private _embedUrlFunction: lambda.Function;
 
   constructor(scope: Construct, id: string, props: QuickSightProps) {
     super(scope, id);
     const qsCreateResource = this.createCustomResource(props);
     this._analysisURL = qsCreateResource.getAtt('analysis_url').toString();
     this._dashboardURL = qsCreateResource.getAtt('dashboard_url').toString();
+    this._embedUrlFunction = this.createEmbedUrlFunction(props);
+  }
+
+  /**
+   * Function returning a new embed url of the dashboard for a registered QuickSight user or an anonymous user,
+   * invoked by the portal that embeds the dashboard. Embed urls can be redeemed only once, so none are cached.
+   */
+  private createEmbedUrlFunction(props: QuickSightProps): lambda.Function {
+    const embedUrlRole = new ExecutionRole(this, 'EmbedUrlRole', {
+      inlinePolicyName: 'EmbedUrlPolicy',
+      inlinePolicyDocument: new PolicyDocument({
+        statements: [
+          new PolicyStatement({
+            effect: Effect.ALLOW,
+            actions: [
+              'quicksight:GenerateEmbedUrlForRegisteredUser',
+              'quicksight:GenerateEmbedUrlForAnonymousUser'
+            ],
+            resources: this.getQuickSightResourceArns(props)
+          })
+        ]
+      })
+    });
+
+    const embedUrlFunction = new lambda.Function(this, 'EmbedUrl', {
+      runtime: lambda.Runtime.PYTHON_3_11,
+      handler: 'embed_url_function.handler',
+      description: 'DevOps Monitoring Dashboard on AWS solution - This function generates embed urls of the Amazon QuickSight dashboard.',
+      role: embedUrlRole.Role,
+      code: lambda.Code.fromAsset('lambda/quicksight-custom-resources'),
+      timeout: cdk.Duration.seconds(10),
+      environment: {
+        STACK_NAME: props.parentStackName,
+        EMBED_ALLOWED_DOMAINS: props.embedAllowedDomains ?? '',
+        UserAgentExtra: props.userAgentExtra
+      },
+      logRetention: RetentionDays.THREE_MONTHS
+    });
+
+    const refEmbedUrlFunction = embedUrlFunction.node.findChild('Resource') as lambda.CfnFunction;
+    addCfnSuppressRules(refEmbedUrlFunction, [
+      {
+        id: 'W89',
+        reason: 'There is no need to run this lambda in a VPC'
+      },
+      {
+        id: 'W92',
+        reason: 'There is no need for Reserved Concurrency'
+      }
+    ]);
+
+    NagSuppressions.addResourceSuppressions(embedUrlFunction, [
+      {
+        id: 'AwsSolutions-L1',
+        reason: 'Python 3.11 is most current supported version in lambda.'
+      }
+    ]);
+    NagSuppressions.addResourceSuppressions(
+      embedUrlRole,
+      [
+        {
+          id: 'AwsSolutions-IAM5',
+          reason: 'The embed url calls are restricted to partition, region, account and quicksight resource.'
+        }
+      ],
+      true
+    );
+
+    return embedUrlFunction;
+  }
+
+  /**
+   * Regions the QuickSight resources are deployed to: the region of the stack, the Regions and the regions of the
+   * batch stacks
+   */
+  private getRegions(props: QuickSightProps): string[] {
+    const regions = [cdk.Aws.REGION, ...(props.regions ?? [])];
+    for (const stackConfig of props.stacks ?? []) {
+      if (stackConfig.region) {
+        regions.push(stackConfig.region);
+      }
+    }
+    return [...new Set(regions)];
+  }
+
+  private getQuickSightResourceArns(props: QuickSightProps): string[] {
+    return this.getRegions(props).map(
+      region => `arn:${cdk.Aws.PARTITION}:quicksight:${region}:${cdk.Aws.ACCOUNT_ID}:*/*`
+    );
+  }
+
+  private isFanOut(props: QuickSightProps): boolean {
+    return props.resource === QuickSightSetup.BATCH || (props.regions ?? []).length > 0;
+  }
+
+  private getFanOutProperties(props: QuickSightProps): { [key: string]: any } {
+    const properties: { [key: string]: any } = {};
+    if (props.regions && props.regions.length > 0) {
+      properties.Regions = props.regions;
+    }
+    if (props.stacks) {
+      properties.Stacks = props.stacks.map(stackConfig => {
+        const stackProperties: { [key: string]: string } = { StackName: stackConfig.stackName };
+        if (stackConfig.principalArn) {
+          stackProperties.QuickSightPrincipalArn = stackConfig.principalArn;
+        }
+        if (stackConfig.workgroupName) {
+          stackProperties.WorkGroupName = stackConfig.workgroupName;
+        }
+        if (stackConfig.sourceTemplateArn) {
+          stackProperties.QuickSightSourceTemplateArn = stackConfig.sourceTemplateArn;
+        }
+        if (stackConfig.region) {
+          stackProperties.Region = stackConfig.region;
+        }
+        return stackProperties;
+      });
+    }
+    if (props.maxConcurrentStacks) {
+      properties.MaxConcurrentStacks = props.maxConcurrentStacks;
+    }
+    return properties;
   }
 
   private createCustomResource(props: QuickSightProps): cdk.CustomResource {
@@ -49,8 +205,12 @@ export class QuickSight extends Construct {
           actions: [
             'quicksight:CreateAnalysis',
             'quicksight:DeleteAnalysis',
+            'quicksight:UpdateAnalysis',
+            'quicksight:UpdateAnalysisPermissions',
             'quicksight:CreateDataSet',
             'quicksight:DeleteDataSet',
+            'quicksight:UpdateDataSet',
+            'quicksight:UpdateDataSetPermissions',
             'quicksight:CreateDataSource',
             'quicksight:DeleteDataSource',
             'quicksight:UpdateDataSource',
@@ -63,9 +223,13 @@ export class QuickSight extends Construct {
             'quicksight:RestoreAnalysis',
             'quicksight:SearchAnalyses',
             'quicksight:CreateDashboard',
-            'quicksight:DeleteDashboard'
+            'quicksight:DeleteDashboard',
+            'quicksight:UpdateDashboard',
+            'quicksight:UpdateDashboardPermissions',
+            'quicksight:UpdateDashboardPublishedVersion',
+            'quicksight:StartAssetBundleImportJob'
           ],
-          resources: [`arn:${cdk.Aws.PARTITION}:quicksight:${cdk.Aws.REGION}:${cdk.Aws.ACCOUNT_ID}:*/*`]
+          resources: this.getQuickSightResourceArns(props)
         }),
         new PolicyStatement({
           effect: Effect.ALLOW,
@@ -97,7 +261,7 @@ export class QuickSight extends Construct {
       description: 'DevOps Monitoring Dashboard on AWS solution - This function creates Amazon QuickSight resources.',
       role: props.role,
       code: lambda.Code.fromAsset('lambda/quicksight-custom-resources'),
-      timeout: cdk.Duration.seconds(30),
+      timeout: cdk.Duration.seconds(this.isFanOut(props) ? FAN_OUT_TIMEOUT_SECONDS : CUSTOM_RESOURCE_TIMEOUT_SECONDS),
       environment: {
         UserAgentExtra: props.userAgentExtra
       },
@@ -133,7 +297,8 @@ export class QuickSight extends Construct {
         LogLevel: props.logLevel,
         QuickSightSourceTemplateArn: props.sourceTemplateArn,
         QuickSightPrincipalArn: props.principalArn,
-        WorkGroupName: props.workgroupName
+        WorkGroupName: props.workgroupName,
+        ...this.getFanOutProperties(props)
       },
       resourceType: 'Custom::QuickSightResources'
     });
@@ -149,4 +314,8 @@ export class QuickSight extends Construct {
   public get dashboardURL(): string {
     return this._dashboardURL;
   }
+
+  public get embedUrlFunctionName(): string {
+    return this._embedUrlFunction.functionName;
+  }
 }
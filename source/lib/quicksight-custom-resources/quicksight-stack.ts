@@ -125,4 +125,8 @@ export class QuickSightStack extends NestedStack {
   public get dashboardURLOutput(): string {
     return this._quickSight.dashboardURL;
   }
+
+  public get embedUrlFunctionNameOutput(): string {
+    return this._quickSight.embedUrlFunctionName;
+  }
 }
@@ -0,0 +1,105 @@
+// Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+// SPDX-License-Identifier: Apache-2.0
+
+import * as cdk from 'aws-cdk-lib';
+import { Role, ServicePrincipal } from 'aws-cdk-lib/aws-iam';
+import { arrayWith, objectLike } from '@aws-cdk/assert';
+import '@aws-cdk/assert/jest';
+import { QuickSight, QuickSightProps, QuickSightSetup } from '../lib/quicksight-custom-resources/quicksight-construct';
+
+function createQuickSight(props: Partial<QuickSightProps> = {}): cdk.Stack {
+  const app = new cdk.App();
+  const stack = new cdk.Stack(app, 'QuickSightTestStack');
+  new QuickSight(stack, 'Quicksight', {
+    name: 'SO0143-DevOps Monitoring Dashboard on AWS',
+    description: 'Create QuickSight Resources Template',
+    resource: QuickSightSetup.ALL,
+    sourceTemplateArn: 'arn:aws:quicksight:us-east-1:111111111111:template/test-template',
+    principalArn: 'arn:aws:quicksight:us-east-1:111111111111:user/default/test-user',
+    workgroupName: 'primary',
+    logLevel: 'INFO',
+    role: new Role(stack, 'CustomResourceRole', { assumedBy: new ServicePrincipal('lambda.amazonaws.com') }),
+    parentStackName: 'DevOpsDashboardStack',
+    userAgentExtra: 'AwsSolution/SO0143/v1.0.0',
+    ...props
+  });
+  return stack;
+}
+
+test('embed url function generates embed urls of the dashboard of the stack', () => {
+  const stack = createQuickSight({ embedAllowedDomains: 'https://portal.example.com' });
+
+  expect(stack).toHaveResourceLike('AWS::Lambda::Function', {
+    Handler: 'embed_url_function.handler',
+    Environment: {
+      Variables: {
+        STACK_NAME: 'DevOpsDashboardStack',
+        EMBED_ALLOWED_DOMAINS: 'https://portal.example.com'
+      }
+    }
+  });
+  expect(stack).toHaveResourceLike('AWS::IAM::Role', {
+    Policies: arrayWith(
+      objectLike({
+        PolicyName: 'EmbedUrlPolicy',
+        PolicyDocument: {
+          Statement: [
+            objectLike({
+              Action: ['quicksight:GenerateEmbedUrlForRegisteredUser', 'quicksight:GenerateEmbedUrlForAnonymousUser'],
+              Effect: 'Allow'
+            })
+          ]
+        }
+      })
+    )
+  });
+});
+
+test('custom resource is allowed to call quicksight in the regions it deploys to', () => {
+  const stack = createQuickSight({ regions: ['us-east-1', 'eu-west-1'], maxConcurrentStacks: 2 });
+
+  expect(stack).toHaveResourceLike('Custom::QuickSightResources', {
+    Resource: 'all',
+    Regions: ['us-east-1', 'eu-west-1'],
+    MaxConcurrentStacks: 2
+  });
+  expect(stack).toHaveResourceLike('AWS::IAM::Policy', {
+    PolicyDocument: {
+      Statement: arrayWith(
+        objectLike({
+          Action: arrayWith('quicksight:CreateDashboard'),
+          Resource: arrayWith(
+            { 'Fn::Join': ['', ['arn:', { Ref: 'AWS::Partition' }, ':quicksight:eu-west-1:', { Ref: 'AWS::AccountId' }, ':*/*']] }
+          )
+        })
+      )
+    }
+  });
+  expect(stack).toHaveResourceLike('AWS::Lambda::Function', {
+    Handler: 'lambda_function.handler',
+    Timeout: 900
+  });
+});
+
+test('batch resource deploys the listed stacks', () => {
+  const stack = createQuickSight({
+    resource: QuickSightSetup.BATCH,
+    stacks: [{ stackName: 'TeamA' }, { stackName: 'TeamB', region: 'eu-west-1', workgroupName: 'team-b' }]
+  });
+
+  expect(stack).toHaveResourceLike('Custom::QuickSightResources', {
+    Resource: 'batch',
+    Stacks: [{ StackName: 'TeamA' }, { StackName: 'TeamB', WorkGroupName: 'team-b', Region: 'eu-west-1' }]
+  });
+  expect(stack).toHaveResourceLike('AWS::IAM::Policy', {
+    PolicyDocument: {
+      Statement: arrayWith(
+        objectLike({
+          Resource: arrayWith(
+            { 'Fn::Join': ['', ['arn:', { Ref: 'AWS::Partition' }, ':quicksight:eu-west-1:', { Ref: 'AWS::AccountId' }, ':*/*']] }
+          )
+        })
+      )
+    }
+  });
+});